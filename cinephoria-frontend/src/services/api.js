@@ -34,6 +34,53 @@ export const validateToken = async (token) => {
     return data;
 };
 
+// Neues Access-Token ohne Passwort; liefert auch ein neues refresh_token (das alte ist danach ungültig)
+export const refreshSession = async (refreshToken) => {
+    const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Sitzung ist abgelaufen.');
+    }
+    return data;
+};
+
+export const logoutSession = async (refreshToken) => {
+    const response = await fetch(`${API_BASE_URL}/logout`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Abmelden fehlgeschlagen.');
+    }
+    return data;
+};
+
+// Kurzlebiges Ticket für den Sitzplan-Stream (EventSource kann keinen Authorization-Header setzen):
+// new EventSource(`${API_BASE_URL}/showtimes/${showtimeId}/seats/stream?ticket=${ticket}`)
+export const fetchSeatStreamTicket = async (showtimeId, token) => {
+    const response = await fetch(`${API_BASE_URL}/showtimes/${showtimeId}/seats/stream-ticket`, {
+        method: "POST",
+        headers: {
+            "Authorization": `Bearer ${token}`
+        },
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Stream-Ticket konnte nicht erstellt werden.');
+    }
+    return data;
+};
+
 export const fetchCinemas = async () => {
     const response = await fetch(`${API_BASE_URL}/cinemas`);
     const data = await response.json();
@@ -318,15 +365,16 @@ export const fetchSeatsForShowtime = async (showtimeId, token) => {
 
 
 // 1) PayPal-Order erstellen
-export const createPayPalOrder = async (total_amount) => {
+export const createPayPalOrder = async (total_amount, cart_items = null) => {
     const response = await fetch(`${API_BASE_URL}/paypal/create-order`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-            total_amount: total_amount
-            // Optional: cart_items, user_id, etc.
+            total_amount: total_amount,
+            // Mit cart_items berechnet der Server den Betrag selbst
+            cart_items: cart_items
         })
     });
 
@@ -360,7 +408,8 @@ export const capturePayPalOrder = async (
             nachname,
             email,
             total_amount,
-            cart_items
+            cart_items,
+            guest_id: getGuestId()  // eigene Gast-Reservierungen darf die Buchung übernehmen
         }),
     });
     const data = await response.json();
@@ -624,6 +673,45 @@ export async function addToUserCart(token, seat_id, price, showtime_id) {
     return data;
 }
 
+// Mehrere Sitze auf einmal reservieren (alle oder keiner).
+// seats: [{ seat_id, showtime_id, seat_type_discount_id }]; bei 409 stehen die belegten Sitze
+// samt freien Alternativen (conflicts[].alternatives) in error.conflicts
+export async function addSeatsToUserCart(token, seats) {
+    const response = await fetch(`${API_BASE_URL}/user/cart/batch`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "Authorization": `Bearer ${token}`
+        },
+        body: JSON.stringify({ seats })
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        const error = new Error(data.error || 'Fehler beim Hinzufügen zum User-Warenkorb');
+        error.conflicts = data.conflicts || [];
+        throw error;
+    }
+    return data;
+}
+
+// Die besten count Plätze nebeneinander suchen und reservieren lassen (optional nur ein Sitztyp).
+// Antwort: { reserved_until, seats: [{ seat_id, showtime_id, row, number, price }] }
+export async function addBestSeatsToUserCart(token, showtime_id, count, seat_type_id = null) {
+    const response = await fetch(`${API_BASE_URL}/user/cart/best`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "Authorization": `Bearer ${token}`
+        },
+        body: JSON.stringify({ showtime_id, count, seat_type_id })
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Fehler beim Suchen der besten Sitzplätze');
+    }
+    return data;
+}
+
 export async function removeFromUserCart(token, showtime_id, seat_id) {
     const response = await fetch(`${API_BASE_URL}/user/cart/${showtime_id}/${seat_id}`, {
         method: "DELETE",
@@ -680,6 +768,40 @@ export async function addToGuestCart(seat_id, price, showtime_id) {
     return data;
 }
 
+export async function addSeatsToGuestCart(seats) {
+    const guest_id = getGuestId();
+    const response = await fetch(`${API_BASE_URL}/guest/cart/batch`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json"
+        },
+        body: JSON.stringify({ guest_id, seats })
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        const error = new Error(data.error || 'Fehler beim Hinzufügen zum Guest-Warenkorb');
+        error.conflicts = data.conflicts || [];
+        throw error;
+    }
+    return data;
+}
+
+export async function addBestSeatsToGuestCart(showtime_id, count, seat_type_id = null) {
+    const guest_id = getGuestId();
+    const response = await fetch(`${API_BASE_URL}/guest/cart/best`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json"
+        },
+        body: JSON.stringify({ guest_id, showtime_id, count, seat_type_id })
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Fehler beim Suchen der besten Sitzplätze');
+    }
+    return data;
+}
+
 export async function removeFromGuestCart(showtime_id, seat_id) {
     const guest_id = getGuestId();
     const response = await fetch(`${API_BASE_URL}/guest/cart/${showtime_id}/${seat_id}?guest_id=${guest_id}`, {
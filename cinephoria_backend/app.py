@@ -16,11 +16,15 @@ from cinephoria_backend.routes.supermarkt import supermarkt_bp
 from cinephoria_backend.routes.discounts import discounts_bp
 from cinephoria_backend.routes.extras import extras_bp
 from cinephoria_backend.routes.qr import qr_bp
+from cinephoria_backend.asset_manifest import profile_images
 
 
 
 app = Flask(__name__, static_folder='public', static_url_path='')
 
+# Profilbilder einmal beim Start einlesen, nicht erst beim ersten Profil-Request
+profile_images.refresh()
+
 
 # Einzelne Module verwenden
 app.register_blueprint(movies_bp, url_prefix='')
@@ -46,7 +50,7 @@ CORS(app, resources={
             "http://localhost:5173"
         ],
         "methods": ["GET", "POST", "DELETE", "OPTIONS", "PUT"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "X-Checkout-Token"]
     }
 })
 
@@ -0,0 +1,69 @@
+# cinephoria_backend/asset_manifest.py
+#
+# Dateinamen statischer Verzeichnisse (z. B. public/Profilbilder) im Speicher, statt bei jedem
+# PUT /profile/image und GET /profile/images os.listdir + os.path.isfile pro Datei aufzurufen.
+# Das Manifest wird beim Start eingelesen (app.py) und danach höchstens alle check_interval
+# Sekunden per os.stat auf eine geänderte mtime des Verzeichnisses geprüft – Anlegen, Löschen
+# und Umbenennen von Dateien ändern sie. Nur dann wird das Verzeichnis neu gelesen.
+import os
+import threading
+import time
+from collections import namedtuple
+
+from cinephoria_backend.config import PROFILE_IMAGES_CHECK_INTERVAL
+from cinephoria_backend.seat_type_catalog import JSONDocument
+
+PUBLIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public')
+
+# names: frozenset für die Prüfung, document: sortierte Liste als JSON mit ETag
+Manifest = namedtuple('Manifest', 'mtime names document')
+
+
+def scan_directory(directory):
+    """Dateinamen (ohne Unterverzeichnisse) als Manifest; fehlt das Verzeichnis, ist es leer."""
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+        with os.scandir(directory) as entries:
+            names = frozenset(entry.name for entry in entries if entry.is_file())
+    except OSError as e:
+        print(f"Fehler beim Einlesen von {directory}: {e}")
+        mtime, names = None, frozenset()
+    return Manifest(mtime, names, JSONDocument({'images': sorted(names)}))
+
+
+class AssetManifest:
+    def __init__(self, directory, check_interval=PROFILE_IMAGES_CHECK_INTERVAL, clock=time.monotonic):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._checked_at = None
+
+    def refresh(self):
+        """Prüft die mtime sofort und liest das Verzeichnis nur bei einer Änderung neu."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.directory).st_mtime_ns
+            except OSError:
+                mtime = None
+            if self._manifest is None or mtime is None or mtime != self._manifest.mtime:
+                self._manifest = scan_directory(self.directory)
+            self._checked_at = self.clock()
+            return self._manifest
+
+    def get(self):
+        manifest = self._manifest
+        checked_at = self._checked_at
+        if manifest is not None and self.clock() - checked_at < self.check_interval:
+            return manifest
+        return self.refresh()
+
+    def names(self):
+        return self.get().names
+
+    def document(self):
+        return self.get().document
+
+
+profile_images = AssetManifest(os.path.join(PUBLIC_DIR, 'Profilbilder'))
@@ -0,0 +1,73 @@
+# cinephoria_backend/auth_bench.py
+#
+# Mikro-Benchmark für die Token-Prüfung (auth_context.py): Kosten von jwt.decode gegenüber
+# einem Treffer im Token-Cache, einzeln und pro Request über POST /validate-token.
+# Braucht keine Datenbank; SECRET_KEY muss gesetzt sein.
+#
+# Aufruf: python -m cinephoria_backend.auth_bench [--requests 20000]
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+from cinephoria_backend.app import app
+from cinephoria_backend.auth_context import token_cache, verify_token
+from cinephoria_backend.config import SECRET_KEY
+
+
+def make_token():
+    return jwt.encode({
+        'user_id': 1,
+        'first_name': 'Bench',
+        'last_name': 'Mark',
+        'initials': 'BM',
+        'role': 'admin',
+        'exp': datetime.now(timezone.utc) + timedelta(hours=1)
+    }, SECRET_KEY, algorithm='HS256')
+
+
+def per_call(func, iterations):
+    """Mikrosekunden pro Aufruf."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run(iterations):
+    token = make_token()
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def request_uncached():
+        token_cache.clear()
+        client.post('/validate-token', headers=headers)
+
+    def request_cached():
+        client.post('/validate-token', headers=headers)
+
+    results = {
+        'jwt.decode': per_call(lambda: jwt.decode(token, SECRET_KEY, algorithms=['HS256']), iterations),
+        'verify_token (Cache)': per_call(lambda: verify_token(token), iterations),
+        # steckt in 'Request ohne Cache' mit drin
+        'token_cache.clear': per_call(token_cache.clear, iterations),
+    }
+    # Requests sind deutlich teurer, daher weniger Durchläufe
+    request_iterations = max(iterations // 10, 1)
+    results['Request ohne Cache'] = per_call(request_uncached, request_iterations)
+    results['Request mit Cache'] = per_call(request_cached, request_iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kosten der JWT-Prüfung pro Request messen")
+    parser.add_argument('--requests', type=int, default=20000, help="Durchläufe pro Messung")
+    args = parser.parse_args()
+
+    for name, micros in run(args.requests).items():
+        print(f"{name:28} {micros:8.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# cinephoria_backend/auth_context.py
+#
+# Zentrale Prüfung des Bearer-Tokens. Bisher hat jeder Decorator (token_required, token_optional,
+# admin_required), /validate-token und der Sitzplan (showtimes.get_viewer) den Token selbst mit
+# jwt.decode geprüft, bei verschachtelten Decorators mehrfach pro Request.
+#  - pro Request wird jeder Token höchstens einmal ausgewertet (Ergebnis in flask.g)
+#  - geprüfte Tokens merkt sich ein begrenzter LRU-Cache pro Prozess, Schlüssel ist der
+#    SHA-256 des Tokens, gültig bis exp; ungültige Tokens werden nicht gemerkt
+#  - Tokens mit 'sid' gelten nur, solange ihre Sitzung nicht beendet ist (sessions.py); das
+#    wird auch bei Cache-Treffern gegen die Sperrliste im Speicher geprüft
+#
+# Die Claims sind zwischen Requests geteilt und dürfen nicht verändert werden.
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import jwt
+from flask import g, request
+
+from cinephoria_backend.config import JWT_CACHE_SIZE, SECRET_KEY
+from cinephoria_backend.sessions import revocation_list
+
+AUTH_MISSING = 'missing'
+AUTH_EXPIRED = 'expired'
+AUTH_INVALID = 'invalid'
+AUTH_REVOKED = 'revoked'
+
+# claims ist None, wenn error gesetzt ist
+AuthResult = namedtuple('AuthResult', 'claims error')
+
+
+class TokenCache:
+    """LRU-Cache sha256(token) -> (exp, claims); abgelaufene Einträge gelten als nicht vorhanden."""
+
+    def __init__(self, max_entries=1024, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, exp, claims):
+        with self._lock:
+            self._entries[key] = (exp, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+token_cache = TokenCache(JWT_CACHE_SIZE)
+
+
+def verify_token(token):
+    """
+    Wie jwt.decode(token, SECRET_KEY, algorithms=['HS256']), aber mit Cache.
+    Wirft jwt.ExpiredSignatureError bzw. jwt.InvalidTokenError.
+    """
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+    claims = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    # Tokens ohne exp laufen nie ab; die werden jedes Mal neu geprüft
+    exp = claims.get('exp')
+    if isinstance(exp, (int, float)):
+        token_cache.put(key, exp, claims)
+    return claims
+
+
+def bearer_token():
+    return request.headers.get('Authorization', '').replace('Bearer ', '')
+
+
+def authenticate(token=None):
+    """
+    Prüft den Token des Requests (Standard: Authorization-Header) höchstens einmal pro Request.
+    Gibt AuthResult(claims, error) zurück; error ist None, AUTH_MISSING, AUTH_EXPIRED, AUTH_INVALID
+    oder AUTH_REVOKED (Sitzung beendet).
+    """
+    if token is None:
+        token = bearer_token()
+    if not token:
+        return AuthResult(None, AUTH_MISSING)
+
+    results = g.setdefault('auth_results', {})
+    result = results.get(token)
+    if result is None:
+        try:
+            claims = verify_token(token)
+            session_id = claims.get('sid')
+            if session_id is not None and revocation_list.is_revoked(session_id):
+                result = AuthResult(None, AUTH_REVOKED)
+            else:
+                result = AuthResult(claims, None)
+        except jwt.ExpiredSignatureError:
+            result = AuthResult(None, AUTH_EXPIRED)
+        except jwt.InvalidTokenError:
+            result = AuthResult(None, AUTH_INVALID)
+        results[token] = result
+    return result
+
+
+def current_claims():
+    """Claims des Requests oder None (kein, abgelaufener oder ungültiger Token)."""
+    return authenticate().claims
@@ -0,0 +1,189 @@
+# cinephoria_backend/bookings.py
+#
+# Speichern einer bezahlten Buchung. Buchung, Sitzplätze, Punkte und Punkte-Protokoll werden
+# in einer einzigen Anweisung geschrieben (datenverändernde CTEs), unabhängig von der Anzahl
+# der Sitzplätze: ein Round-Trip statt einem pro Sitz. Preise und Summe kommen aus
+# pricing.price_cart(), nicht vom Client.
+# Jeder gebuchte Sitz wird in derselben Anweisung in seat_claims festgeschrieben (Claim 'booking',
+# läuft nie ab). Übernommen werden nur die eigene Reservierung des Käufers und abgelaufene
+# Reservierungen; ist ein Sitz gebucht oder von jemand anderem reserviert, wirft persist_booking()
+# SeatsAlreadyBooked und nichts wird gespeichert. find_claim_conflicts() prüft dasselbe vor dem
+# PayPal-Capture, damit gar nicht erst bezahlt wird, was sich nicht buchen lässt.
+import uuid
+
+BOOKING_INSERT_QUERY = """
+    WITH new_booking AS (
+        INSERT INTO bookings (
+            user_id,
+            booking_time,
+            payment_status,
+            total_amount,
+            paypal_order_id,
+            vorname,
+            nachname,
+            email,
+            qr_token,
+            qr_seite
+        )
+        VALUES (%(user_id)s, CURRENT_TIMESTAMP, 'completed', %(total_amount)s, %(order_id)s,
+                %(vorname)s, %(nachname)s, %(email)s, %(qr_token)s, %(qr_seite)s)
+        RETURNING booking_id
+    ),
+    new_seats AS (
+        INSERT INTO booking_seats (booking_id, seat_id, showtime_id, seat_type_discount_id, price)
+        SELECT nb.booking_id, item.seat_id, item.showtime_id, item.seat_type_discount_id, item.price
+        FROM new_booking nb
+        CROSS JOIN unnest(%(seat_ids)s::int[], %(showtime_ids)s::int[], %(discount_ids)s::int[],
+                          %(prices)s::numeric[])
+            AS item(seat_id, showtime_id, seat_type_discount_id, price)
+        RETURNING seat_id
+    ),
+    claimed AS (
+        INSERT INTO seat_claims (showtime_id, seat_id, holder_type, holder_id, booking_id, price,
+                                 seat_type_discount_id, reserved_until)
+        SELECT item.showtime_id, item.seat_id, 'booking', nb.booking_id::text, nb.booking_id, item.price,
+               item.seat_type_discount_id, 'infinity'
+        FROM new_booking nb
+        CROSS JOIN unnest(%(seat_ids)s::int[], %(showtime_ids)s::int[], %(discount_ids)s::int[],
+                          %(prices)s::numeric[])
+            AS item(seat_id, showtime_id, seat_type_discount_id, price)
+        ORDER BY item.showtime_id, item.seat_id
+        ON CONFLICT (showtime_id, seat_id) DO UPDATE
+            SET holder_type = 'booking',
+                holder_id = EXCLUDED.holder_id,
+                booking_id = EXCLUDED.booking_id,
+                price = EXCLUDED.price,
+                seat_type_discount_id = EXCLUDED.seat_type_discount_id,
+                reserved_until = EXCLUDED.reserved_until,
+                created_at = NOW()
+            WHERE seat_claims.holder_type <> 'booking'
+              AND (seat_claims.reserved_until < NOW()
+                   OR (seat_claims.holder_type = %(holder_type)s AND seat_claims.holder_id = %(holder_id)s))
+        RETURNING showtime_id, seat_id
+    ),
+    -- 1 Euro = 1 Punkt, nur für angemeldete Benutzer
+    added_points AS (
+        UPDATE user_points
+        SET points = points + %(points)s,
+            last_updated = CURRENT_TIMESTAMP
+        WHERE user_id = %(user_id)s
+        RETURNING user_id
+    ),
+    points_log AS (
+        INSERT INTO points_transactions (user_id, points_change, description)
+        SELECT %(user_id)s, %(points)s, 'Punkte für Buchung ' || nb.booking_id
+        FROM new_booking nb
+        WHERE %(user_id)s::int IS NOT NULL
+        RETURNING transaction_id
+    )
+    SELECT booking_id,
+           (SELECT COUNT(*) FROM new_seats),
+           (SELECT COALESCE(json_agg(json_build_array(showtime_id, seat_id)), '[]') FROM claimed)
+    FROM new_booking
+"""
+
+
+# Sitze, die der Käufer nicht buchen kann: gebucht (nicht von derselben PayPal-Order, sonst
+# scheitert die Wiederholung eines Checkouts an der eigenen Buchung) oder von jemand anderem
+# gültig reserviert
+CLAIM_CONFLICTS_QUERY = """
+    SELECT sc.showtime_id, sc.seat_id
+    FROM seat_claims sc
+    JOIN unnest(%(showtime_ids)s::int[], %(seat_ids)s::int[]) AS item(showtime_id, seat_id)
+      ON sc.showtime_id = item.showtime_id AND sc.seat_id = item.seat_id
+    LEFT JOIN bookings b ON b.booking_id = sc.booking_id
+    WHERE (sc.holder_type = 'booking' AND b.paypal_order_id IS DISTINCT FROM %(order_id)s)
+       OR (sc.holder_type <> 'booking'
+           AND sc.reserved_until >= NOW()
+           AND (sc.holder_type, sc.holder_id) IS DISTINCT FROM (%(holder_type)s, %(holder_id)s))
+    ORDER BY sc.showtime_id, sc.seat_id
+"""
+
+
+class SeatsAlreadyBooked(Exception):
+    """
+    Mindestens ein Sitz ist bereits gebucht oder von jemand anderem reserviert;
+    seats enthält die (showtime_id, seat_id)-Paare.
+    """
+
+    def __init__(self, seats):
+        super().__init__("Sitzplatz bereits gebucht oder reserviert: " + ", ".join(f"{s}/{t}" for s, t in seats))
+        self.seats = seats
+
+
+def parse_cart_items(cart_items):
+    """
+    Zerlegt die cart_items in drei Spalten-Listen (seat_ids, showtime_ids, discount_ids).
+    Wirft ValueError, wenn einem Eintrag seat_id oder showtime_id fehlt oder ein Sitz doppelt vorkommt.
+    """
+    seat_ids, showtime_ids, discount_ids = [], [], []
+    seen = set()
+    for item in cart_items:
+        seat_id = item.get('seat_id')
+        showtime_id = item.get('showtime_id')
+        if not seat_id or not showtime_id:
+            raise ValueError("Jedes cart_item braucht seat_id und showtime_id")
+        if (showtime_id, seat_id) in seen:
+            raise ValueError(f"Sitzplatz {seat_id} ist mehrfach im Warenkorb")
+        seen.add((showtime_id, seat_id))
+        seat_ids.append(seat_id)
+        showtime_ids.append(showtime_id)
+        discount_ids.append(item.get('seat_type_discount_id'))
+    return seat_ids, showtime_ids, discount_ids
+
+
+def _holder_params(holder):
+    return {
+        'holder_type': holder.type if holder else None,
+        'holder_id': holder.id if holder else None,
+    }
+
+
+def find_claim_conflicts(cursor, holder, items, order_id=None):
+    """
+    (showtime_id, seat_id) aller items, die holder (reservations.Holder oder None) nicht buchen
+    kann. Vor dem Capture aufrufen; persist_booking() prüft beim Schreiben noch einmal.
+    """
+    cursor.execute(CLAIM_CONFLICTS_QUERY, {
+        'order_id': order_id,
+        'showtime_ids': [item.showtime_id for item in items],
+        'seat_ids': [item.seat_id for item in items],
+        **_holder_params(holder),
+    })
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def persist_booking(cursor, order_id, user_id, vorname, nachname, email, priced_cart, holder=None):
+    """
+    Legt die Buchung samt Sitzplätzen an und schreibt die Punkte gut.
+    priced_cart ist das Ergebnis von pricing.price_cart(); Reservierungen von holder
+    (reservations.Holder des Käufers) werden übernommen, fremde nicht.
+    Gibt (booking_id, qr_seite) zurück. Der Aufrufer committet; bei SeatsAlreadyBooked
+    muss er zurückrollen.
+    """
+    items = priced_cart.items
+    qr_token = str(uuid.uuid4())
+    qr_seite = str(uuid.uuid4())
+    cursor.execute(BOOKING_INSERT_QUERY, {
+        'user_id': user_id,
+        'total_amount': priced_cart.total,
+        'order_id': order_id,
+        'vorname': vorname,
+        'nachname': nachname,
+        'email': email,
+        'qr_token': qr_token,
+        'qr_seite': qr_seite,
+        'seat_ids': [item.seat_id for item in items],
+        'showtime_ids': [item.showtime_id for item in items],
+        'discount_ids': [item.seat_type_discount_id for item in items],
+        'prices': [item.price for item in items],
+        'points': int(priced_cart.total) if user_id is not None else 0,
+        **_holder_params(holder),
+    })
+    booking_id, _, claimed = cursor.fetchone()
+    claimed = {tuple(seat) for seat in claimed}
+    if len(claimed) < len(items):
+        taken = [(item.showtime_id, item.seat_id) for item in items
+                 if (item.showtime_id, item.seat_id) not in claimed]
+        raise SeatsAlreadyBooked(taken)
+    return booking_id, qr_seite
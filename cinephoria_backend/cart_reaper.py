@@ -0,0 +1,79 @@
+# cinephoria_backend/cart_reaper.py
+#
+# Räumt abgelaufene Reservierungen (seat_claims mit reserved_until in der Vergangenheit; Buchungen
+# laufen nie ab) in Batches ab; der Trigger aus migrations/006_seat_holds.sql meldet die freigewordenen Sitze.
+# Bis dahin filtern die Lesepfade abgelaufene Reservierungen selbst über reserved_until heraus,
+# und reservations.hold_seat() übernimmt einen abgelaufenen Sitz direkt.
+#
+# Aufruf: python -m cinephoria_backend.cart_reaper [--loop]
+import argparse
+import time
+
+from cinephoria_backend.config import CART_REAPER_BATCH, CART_REAPER_INTERVAL, get_db_connection
+
+# Feste Nummer für pg_try_advisory_xact_lock: pro Batch räumt immer nur ein Prozess
+CART_REAPER_LOCK_ID = 4242003
+
+# Ältestes zuerst; SKIP LOCKED, damit eine Reservierung, die gerade benutzt wird, nicht blockiert
+REAP_QUERY = """
+    DELETE FROM seat_claims
+    WHERE hold_id IN (
+        SELECT hold_id FROM seat_claims
+        WHERE reserved_until < NOW()
+        ORDER BY reserved_until
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+
+def reap_batch(conn, batch_size=CART_REAPER_BATCH):
+    """
+    Löscht höchstens batch_size abgelaufene Reservierungen in einer Transaktion.
+    Gibt die Anzahl zurück, oder None, wenn gerade ein anderer Prozess räumt.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (CART_REAPER_LOCK_ID,))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return None
+        cursor.execute(REAP_QUERY, (batch_size,))
+        reaped = cursor.rowcount
+    conn.commit()
+    return reaped
+
+
+def reap_expired_carts(conn, batch_size=CART_REAPER_BATCH):
+    """Räumt Batch für Batch, bis nichts Abgelaufenes mehr übrig ist. Gibt die Summe zurück."""
+    total = 0
+    while True:
+        reaped = reap_batch(conn, batch_size)
+        if reaped is None:
+            return total or None
+        total += reaped
+        if reaped < batch_size:
+            return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Abgelaufene Warenkörbe abräumen")
+    parser.add_argument('--loop', action='store_true', help="alle CART_REAPER_INTERVAL Sekunden wiederholen")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            with get_db_connection() as conn:
+                total = reap_expired_carts(conn)
+            if total is None:
+                print("Reservierungen werden bereits von einem anderen Prozess geräumt")
+            elif total:
+                print(f"Abgelaufene Reservierungen entfernt: {total}")
+        except Exception as e:
+            print(f"Fehler beim Räumen der Warenkörbe: {e}")
+        if not args.loop:
+            break
+        time.sleep(CART_REAPER_INTERVAL)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,540 @@
+# cinephoria_backend/checkout.py
+#
+# Asynchroner Checkout über die Outbox-Tabelle checkout_jobs (migrations/004_checkout_jobs.sql).
+# Der Request legt nur einen Auftrag an; checkout_worker.py führt PayPal-Capture und Buchung aus.
+# Idempotent über paypal_order_id: ein Auftrag pro Order, der Capture läuft mit
+# PayPal-Request-Id, und vor dem Buchen wird geprüft, ob es zur Order schon eine Buchung gibt.
+# Ist eine Order bezahlt, aber nicht buchbar, wird der Capture erstattet (ebenfalls mit
+# PayPal-Request-Id); scheitert das vorübergehend, bleibt der Auftrag 'refund_pending'
+# (migrations/010_checkout_refunds.sql) und der Worker wiederholt die Erstattung.
+# Nach dem Capture steht captured im Auftrag: jeder spätere Fehlschlag endet in einer Erstattung.
+import base64
+import hashlib
+import hmac
+import threading
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+
+import requests
+from psycopg2.extras import Json, RealDictCursor
+
+from cinephoria_backend.bookings import SeatsAlreadyBooked, find_claim_conflicts, persist_booking
+from cinephoria_backend.config import PAYPAL_API_BASE, SECRET_KEY, get_db_connection
+from cinephoria_backend.http_client import http
+from cinephoria_backend.notifications import hub
+from cinephoria_backend.paypal_token import paypal_tokens
+from cinephoria_backend.pricing import PricingError, price_cart
+from cinephoria_backend.reservations import Holder
+
+JOB_CREATED_CHANNEL = 'checkout_job_created'
+JOB_DONE_CHANNEL = 'checkout_job_done'
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_REFUND_PENDING = 'refund_pending'
+JOB_REFUNDED = 'refunded'
+FINAL_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_REFUNDED)
+
+MAX_ATTEMPTS = 5
+LOCK_SECONDS = 120                   # so lange gehört ein Auftrag dem Worker, der ihn geholt hat
+RETRY_DELAYS = (5, 15, 60, 300)      # Sekunden bis zum nächsten Versuch, je Versuch
+
+
+class RetryableCheckoutError(Exception):
+    """Vorübergehender Fehler (PayPal nicht erreichbar, 5xx, abgelaufener Token)."""
+
+
+class CheckoutFailed(Exception):
+    """Endgültiger Fehler, z. B. Zahlung von PayPal abgelehnt."""
+
+
+# ----------------------------------------------------------------------
+# Request-Seite
+# ----------------------------------------------------------------------
+def checkout_token(order_id):
+    """
+    Nachweis für GET /paypal/checkout/<orderID>: nur wer den Auftrag angelegt hat, bekommt ihn.
+    Aus SECRET_KEY abgeleitet, damit eine Wiederholung von POST /paypal/checkout denselben liefert.
+    """
+    digest = hmac.new(SECRET_KEY.encode('utf-8'), f"checkout:{order_id}".encode('utf-8'), hashlib.sha256)
+    return base64.urlsafe_b64encode(digest.digest()[:24]).decode('ascii')
+
+
+def owns_checkout(job, user_id=None, token=None):
+    """Gehört der Auftrag dem Aufrufer (gleicher Nutzer oder gültiger checkout_token)?"""
+    if token and hmac.compare_digest(token, checkout_token(job['paypal_order_id'])):
+        return True
+    return user_id is not None and job.get('user_id') == user_id
+
+
+def buyer_holder(user_id, guest_id=None):
+    """Holder, dessen Reservierungen der Käufer übernehmen darf; None ohne User und guest_id."""
+    if user_id is not None:
+        return Holder.user(user_id)
+    if guest_id:
+        return Holder.guest(guest_id)
+    return None
+
+
+def job_holder(job):
+    return buyer_holder(job['user_id'], job['payload'].get('guest_id'))
+
+
+def enqueue_checkout(cursor, order_id, user_id, payload):
+    """
+    Legt den Auftrag an. Ein zweiter Aufruf mit derselben Order liefert den vorhandenen Auftrag
+    (created ist dann False). Erwartet einen RealDictCursor; gibt die Zeile wie load_checkout()
+    zurück, zusätzlich created und die E-Mail des Auftrags.
+    """
+    cursor.execute("""
+        INSERT INTO checkout_jobs (paypal_order_id, user_id, payload)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (paypal_order_id) DO UPDATE SET updated_at = checkout_jobs.updated_at
+        RETURNING paypal_order_id, user_id, status, attempts, result,
+                  payload->>'email' AS email, (xmax = 0) AS created
+    """, (order_id, user_id, Json(payload)))
+    job = cursor.fetchone()
+    if job['status'] == JOB_PENDING:
+        hub.publish(cursor, JOB_CREATED_CHANNEL, order_id)
+    return job
+
+
+def load_checkout(cursor, order_id):
+    cursor.execute("""
+        SELECT paypal_order_id, user_id, status, attempts, result
+        FROM checkout_jobs
+        WHERE paypal_order_id = %s
+    """, (order_id,))
+    return cursor.fetchone()
+
+
+def checkout_to_dict(job):
+    result = job['result'] or {}
+    response = {'orderID': job['paypal_order_id'], 'status': job['status']}
+    if job['status'] == JOB_COMPLETED:
+        response['booking_id'] = result.get('booking_id')
+        response['qr_token'] = result.get('qr_token')
+    elif result.get('error'):
+        response['error'] = result['error']
+    return response
+
+
+class CheckoutWaiters:
+    """Wartende Status-Abfragen pro Order; werden über NOTIFY 'checkout_job_done' geweckt."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}  # order_id -> [threading.Event]
+
+    @contextmanager
+    def waiting(self, order_id):
+        # Vor dem Lesen des Status anmelden, damit keine Meldung verloren geht
+        hub.ensure_listener()
+        event = threading.Event()
+        with self._lock:
+            self._events.setdefault(order_id, []).append(event)
+        try:
+            yield event
+        finally:
+            with self._lock:
+                events = self._events.get(order_id, [])
+                if event in events:
+                    events.remove(event)
+                if not events:
+                    self._events.pop(order_id, None)
+
+    def notify(self, order_id):
+        with self._lock:
+            if order_id is None:
+                # Listener war getrennt: alle Wartenden prüfen selbst nach
+                events = [e for waiting in self._events.values() for e in waiting]
+            else:
+                events = list(self._events.get(order_id, []))
+        for event in events:
+            event.set()
+
+
+checkout_waiters = CheckoutWaiters()
+hub.subscribe(JOB_DONE_CHANNEL, checkout_waiters.notify)
+
+
+# ----------------------------------------------------------------------
+# Worker-Seite
+# ----------------------------------------------------------------------
+def claim_job(cursor):
+    """
+    Holt den ältesten fälligen Auftrag (auch solche, deren Worker abgestürzt ist) und
+    reserviert ihn für LOCK_SECONDS. Mehrere Worker blockieren sich dank SKIP LOCKED nicht.
+    Aufträge in 'refund_pending' behalten ihren Status, process_job() erstattet dann nur.
+    """
+    cursor.execute("""
+        UPDATE checkout_jobs
+        SET status = CASE WHEN status = 'refund_pending' THEN status ELSE 'running' END,
+            attempts = attempts + 1,
+            locked_until = NOW() + %s * INTERVAL '1 second',
+            updated_at = NOW()
+        WHERE job_id = (
+            SELECT job_id
+            FROM checkout_jobs
+            WHERE (status = 'pending' AND run_after <= NOW())
+               OR (status = 'running' AND locked_until < NOW())
+               OR (status = 'refund_pending' AND run_after <= NOW()
+                   AND (locked_until IS NULL OR locked_until < NOW()))
+            ORDER BY run_after, job_id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING job_id, paypal_order_id, user_id, payload, attempts, status, captured, capture_id, result
+    """, (LOCK_SECONDS,))
+    return cursor.fetchone()
+
+
+def capture_order(order_id):
+    """PayPal-Capture; dank PayPal-Request-Id liefert eine Wiederholung dieselbe Antwort."""
+    try:
+        access_token = paypal_tokens.get_token()
+        response = http.post(
+            f"{PAYPAL_API_BASE}/v2/checkout/orders/{order_id}/capture",
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {access_token}",
+                "PayPal-Request-Id": f"capture-{order_id}",
+            },
+            idempotent=True,
+        )
+    except requests.RequestException as e:
+        raise RetryableCheckoutError(f"PayPal nicht erreichbar: {e}")
+    except Exception as e:
+        raise RetryableCheckoutError(str(e))
+
+    if response.status_code == 401:
+        paypal_tokens.invalidate()
+        raise RetryableCheckoutError("PayPal-Token abgelaufen")
+    if response.status_code >= 500 or response.status_code == 429:
+        raise RetryableCheckoutError(f"PayPal-Fehler {response.status_code}")
+    if response.status_code != 201:
+        print("Fehler beim Capturen der PayPal-Order:", response.text)
+        raise CheckoutFailed("Failed to capture PayPal order")
+
+    capture_data = response.json()
+    if capture_data.get("status") != "COMPLETED":
+        raise CheckoutFailed("Payment was not completed")
+    return capture_data
+
+
+def captured_amount(capture_data):
+    """Von PayPal tatsächlich erfasster Betrag, None wenn die Antwort keinen enthält."""
+    try:
+        capture = capture_data['purchase_units'][0]['payments']['captures'][0]
+        return Decimal(str(capture['amount']['value']))
+    except (KeyError, IndexError, TypeError, InvalidOperation):
+        return None
+
+
+def captured_id(capture_data):
+    """ID des PayPal-Captures für die Erstattung, None wenn die Antwort keine enthält."""
+    try:
+        return capture_data['purchase_units'][0]['payments']['captures'][0]['id']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def refund_capture(capture_id):
+    """
+    Erstattet einen Capture vollständig. Dank PayPal-Request-Id wird auch bei Wiederholungen
+    höchstens einmal erstattet; ein bereits erstatteter Capture gilt als Erfolg.
+    """
+    try:
+        access_token = paypal_tokens.get_token()
+        response = http.post(
+            f"{PAYPAL_API_BASE}/v2/payments/captures/{capture_id}/refund",
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {access_token}",
+                "PayPal-Request-Id": f"refund-{capture_id}",
+            },
+            json={},
+            idempotent=True,
+        )
+    except requests.RequestException as e:
+        raise RetryableCheckoutError(f"PayPal nicht erreichbar: {e}")
+    except Exception as e:
+        raise RetryableCheckoutError(str(e))
+
+    if response.status_code == 401:
+        paypal_tokens.invalidate()
+        raise RetryableCheckoutError("PayPal-Token abgelaufen")
+    if response.status_code >= 500 or response.status_code == 429:
+        raise RetryableCheckoutError(f"PayPal-Fehler {response.status_code}")
+    if response.status_code == 422 and 'CAPTURE_FULLY_REFUNDED' in response.text:
+        return
+    if response.status_code not in (200, 201):
+        print("Fehler beim Erstatten des PayPal-Captures:", response.text)
+        raise CheckoutFailed("Erstattung von PayPal abgelehnt")
+
+
+def check_captured_amount(capture_data, priced_cart):
+    """Wirft CheckoutFailed, wenn PayPal einen anderen Betrag erfasst hat als berechnet."""
+    amount = captured_amount(capture_data)
+    if amount is not None and amount != priced_cart.total:
+        raise CheckoutFailed(
+            f"Bezahlter Betrag {amount} weicht vom Preis {priced_cart.total} ab"
+        )
+
+
+def complete_job(cursor, job, priced_cart):
+    """Bucht und markiert den Auftrag als erledigt; alles in einer Transaktion."""
+    cursor.execute("SELECT status FROM checkout_jobs WHERE job_id = %s FOR UPDATE", (job['job_id'],))
+    row = cursor.fetchone()
+    if row is None or row['status'] == JOB_COMPLETED:
+        return
+
+    # Gibt es schon eine Buchung (früherer Versuch oder synchroner /paypal/capture-order)?
+    cursor.execute("""
+        SELECT booking_id, qr_seite
+        FROM bookings
+        WHERE paypal_order_id = %s
+        ORDER BY booking_id
+        LIMIT 1
+    """, (job['paypal_order_id'],))
+    booking = cursor.fetchone()
+    if booking is not None:
+        booking_id, qr_seite = booking['booking_id'], booking['qr_seite']
+    else:
+        payload = job['payload']
+        # persist_booking() liest Tupel-Zeilen, daher ein normaler Cursor in derselben Transaktion
+        with cursor.connection.cursor() as booking_cursor:
+            booking_id, qr_seite = persist_booking(
+                booking_cursor, job['paypal_order_id'], job['user_id'],
+                payload['vorname'], payload['nachname'], payload['email'], priced_cart,
+                job_holder(job)
+            )
+
+    cursor.execute("""
+        UPDATE checkout_jobs
+        SET status = 'completed', booking_id = %s, result = %s, locked_until = NULL, updated_at = NOW()
+        WHERE job_id = %s
+    """, (booking_id, Json({'booking_id': booking_id, 'qr_token': qr_seite}), job['job_id']))
+    hub.publish(cursor, JOB_DONE_CHANNEL, job['paypal_order_id'])
+
+
+def mark_captured(cursor, job):
+    """Direkt nach dem Capture: ab jetzt wird der Auftrag gebucht oder erstattet, nie nur verworfen."""
+    cursor.execute("""
+        UPDATE checkout_jobs
+        SET captured = TRUE, capture_id = %s, updated_at = NOW()
+        WHERE job_id = %s
+    """, (job['capture_id'], job['job_id']))
+
+
+def reschedule_job(cursor, job, error):
+    """Nächster Versuch; ein bereits bezahlter Auftrag darf hier nicht aufgegeben werden (retry_job)."""
+    if job['attempts'] >= MAX_ATTEMPTS and not job.get('captured'):
+        fail_job(cursor, job, error)
+        return
+    delay = RETRY_DELAYS[min(job['attempts'], len(RETRY_DELAYS)) - 1]
+    # captured noch einmal mitschreiben, falls mark_captured() gescheitert ist
+    cursor.execute("""
+        UPDATE checkout_jobs
+        SET status = 'pending',
+            run_after = NOW() + %s * INTERVAL '1 second',
+            locked_until = NULL,
+            result = %s,
+            captured = captured OR %s,
+            capture_id = COALESCE(%s, capture_id),
+            updated_at = NOW()
+        WHERE job_id = %s AND status = 'running'
+    """, (delay, Json({'error': error}), bool(job.get('captured')), job.get('capture_id'), job['job_id']))
+
+
+def fail_job(cursor, job, error):
+    cursor.execute("""
+        UPDATE checkout_jobs
+        SET status = 'failed', locked_until = NULL, result = %s, updated_at = NOW()
+        WHERE job_id = %s AND status IN ('running', 'refund_pending')
+    """, (Json({'error': error}), job['job_id']))
+    hub.publish(cursor, JOB_DONE_CHANNEL, job['paypal_order_id'])
+
+
+def schedule_refund(cursor, job, error):
+    """Erstattung vorerst gescheitert: bleibt 'refund_pending', ohne Obergrenze für die Versuche."""
+    delay = RETRY_DELAYS[min(job['attempts'], len(RETRY_DELAYS)) - 1]
+    cursor.execute("""
+        UPDATE checkout_jobs
+        SET status = 'refund_pending',
+            capture_id = %s,
+            run_after = NOW() + %s * INTERVAL '1 second',
+            locked_until = NULL,
+            result = %s,
+            updated_at = NOW()
+        WHERE job_id = %s AND status IN ('running', 'refund_pending')
+    """, (job['capture_id'], delay, Json({'error': error}), job['job_id']))
+
+
+def mark_refunded(cursor, job, error):
+    cursor.execute("""
+        UPDATE checkout_jobs
+        SET status = 'refunded', capture_id = %s, locked_until = NULL, result = %s, updated_at = NOW()
+        WHERE job_id = %s AND status IN ('running', 'refund_pending')
+    """, (job['capture_id'], Json({'error': error, 'refunded': True}), job['job_id']))
+    hub.publish(cursor, JOB_DONE_CHANNEL, job['paypal_order_id'])
+
+
+def _finish(action, job, error):
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            action(cursor, job, error)
+
+
+def refund_job(job, error):
+    """
+    Erstattet den Capture eines bezahlten, aber nicht buchbaren Auftrags (job['capture_id']).
+    error ist der Grund und bleibt im Auftrag stehen.
+    """
+    order_id = job['paypal_order_id']
+    if not job.get('capture_id'):
+        print(f"Checkout {order_id}: kein Capture zum Erstatten, bitte manuell prüfen: {error}")
+        _finish(fail_job, job, error)
+        return
+    try:
+        refund_capture(job['capture_id'])
+    except RetryableCheckoutError as e:
+        print(f"Checkout {order_id}: Erstattung fehlgeschlagen, wird wiederholt: {e}")
+        _finish(schedule_refund, job, error)
+        return
+    except CheckoutFailed as e:
+        print(f"Checkout {order_id}: Erstattung abgelehnt, bitte manuell prüfen: {e}")
+        _finish(fail_job, job, error)
+        return
+    print(f"Checkout {order_id}: Capture {job['capture_id']} erstattet ({error})")
+    _finish(mark_refunded, job, error)
+
+
+def retry_job(job, error):
+    """Vorübergehender Fehler: erneut versuchen; ist bezahlt und sind die Versuche aufgebraucht, erstatten."""
+    if job.get('captured') and job['attempts'] >= MAX_ATTEMPTS:
+        print(f"Checkout {job['paypal_order_id']}: nach {job['attempts']} Versuchen nicht gebucht, wird erstattet")
+        refund_job(job, error)
+        return
+    _finish(reschedule_job, job, error)
+
+
+def queue_refund(order_id, user_id, payload, capture_data, error):
+    """
+    Für POST /paypal/capture-order: bezahlt, aber nicht gebucht. Erstattet sofort; scheitert das
+    vorübergehend, übernimmt der Worker als Auftrag in 'refund_pending'. Gibt True zurück,
+    wenn bereits erstattet ist.
+    """
+    capture_id = captured_id(capture_data)
+    if capture_id is None:
+        print(f"Capture {order_id}: keine Capture-ID, bitte manuell erstatten: {error}")
+        return False
+    try:
+        refund_capture(capture_id)
+        return True
+    except CheckoutFailed as e:
+        print(f"Capture {order_id}: Erstattung abgelehnt, bitte manuell prüfen: {e}")
+        return False
+    except RetryableCheckoutError as e:
+        print(f"Capture {order_id}: Erstattung fehlgeschlagen, übernimmt der Worker: {e}")
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO checkout_jobs (paypal_order_id, user_id, payload, status, capture_id, result)
+                VALUES (%s, %s, %s, 'refund_pending', %s, %s)
+                ON CONFLICT (paypal_order_id) DO UPDATE
+                    SET status = 'refund_pending',
+                        capture_id = EXCLUDED.capture_id,
+                        result = EXCLUDED.result,
+                        run_after = NOW(),
+                        locked_until = NULL,
+                        updated_at = NOW()
+                    WHERE checkout_jobs.status <> 'completed'
+            """, (order_id, user_id, Json(payload), capture_id, Json({'error': error})))
+            hub.publish(cursor, JOB_CREATED_CHANNEL, order_id)
+    return False
+
+
+def process_job(job):
+    """Führt einen geholten Auftrag aus. Fehler landen im Auftrag, nicht beim Aufrufer."""
+    order_id = job['paypal_order_id']
+    if job.get('status') == JOB_REFUND_PENDING:
+        refund_job(job, (job.get('result') or {}).get('error', 'Buchung nicht möglich'))
+        return
+
+    if job.get('captured'):
+        # Ein früherer Versuch hat schon bezahlt: keine Prüfung vor dem Capture mehr, kein neuer Capture.
+        # Was jetzt noch scheitert, wird erstattet.
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    priced_cart = price_cart(cursor, job['payload']['cart_items'])
+        except PricingError as e:
+            print(f"Checkout {order_id}: Buchung abgelehnt: {e}")
+            refund_job(job, str(e))
+            return
+        except Exception as e:
+            print(f"Checkout {order_id}: Buchung fehlgeschlagen: {e}")
+            retry_job(job, "Buchung fehlgeschlagen")
+            return
+    else:
+        # Vor dem Capture bepreisen und die Sitze prüfen: was sich nicht buchen lässt, wird nicht bezahlt.
+        # Preise serverseitig, der Betrag im Payload ist nur die Angabe des Clients.
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    priced_cart = price_cart(cursor, job['payload']['cart_items'])
+                    conflicts = find_claim_conflicts(cursor, job_holder(job), priced_cart.items, order_id)
+            if conflicts:
+                raise SeatsAlreadyBooked(conflicts)
+        except (PricingError, SeatsAlreadyBooked) as e:
+            print(f"Checkout {order_id}: vor dem Capture abgelehnt: {e}")
+            _finish(fail_job, job, str(e))
+            return
+        except Exception as e:
+            print(f"Checkout {order_id}: Prüfung fehlgeschlagen: {e}")
+            _finish(reschedule_job, job, "Prüfung fehlgeschlagen")
+            return
+
+        try:
+            capture_data = capture_order(order_id)
+        except RetryableCheckoutError as e:
+            print(f"Checkout {order_id}: Versuch {job['attempts']} fehlgeschlagen: {e}")
+            _finish(reschedule_job, job, str(e))
+            return
+        except CheckoutFailed as e:
+            _finish(fail_job, job, str(e))
+            return
+
+        job = dict(job, captured=True, capture_id=captured_id(capture_data))
+        try:
+            check_captured_amount(capture_data, priced_cart)
+        except CheckoutFailed as e:
+            # Bezahlt, aber nicht zum Preis passend: Capture erstatten
+            print(f"Checkout {order_id}: Buchung abgelehnt: {e}")
+            refund_job(job, str(e))
+            return
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    mark_captured(cursor, job)
+        except Exception as e:
+            print(f"Checkout {order_id}: Capture nicht vermerkt: {e}")
+            retry_job(job, "Buchung fehlgeschlagen")
+            return
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                complete_job(cursor, job, priced_cart)
+    except SeatsAlreadyBooked as e:
+        # Bezahlt, aber so nicht buchbar: Capture erstatten
+        print(f"Checkout {order_id}: Buchung abgelehnt: {e}")
+        refund_job(job, str(e))
+    except Exception as e:
+        # Bezahlt, aber nicht gebucht: erneut versuchen, am Ende erstatten
+        print(f"Checkout {order_id}: Buchung fehlgeschlagen: {e}")
+        retry_job(job, "Buchung fehlgeschlagen")
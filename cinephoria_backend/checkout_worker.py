@@ -0,0 +1,60 @@
+# cinephoria_backend/checkout_worker.py
+#
+# Worker für die Checkout-Outbox (checkout.py). Mehrere Threads holen Aufträge mit
+# FOR UPDATE SKIP LOCKED; neue Aufträge wecken sie per NOTIFY 'checkout_job_created',
+# sonst wird alle CHECKOUT_POLL_INTERVAL Sekunden nachgesehen (z. B. für Wiederholungen).
+#
+# Aufruf: python -m cinephoria_backend.checkout_worker
+import threading
+
+from psycopg2.extras import RealDictCursor
+
+from cinephoria_backend.checkout import JOB_CREATED_CHANNEL, claim_job, process_job
+from cinephoria_backend.config import CHECKOUT_POLL_INTERVAL, CHECKOUT_WORKER_THREADS, get_db_connection
+from cinephoria_backend.notifications import hub
+
+
+def run_once():
+    """Holt und bearbeitet einen Auftrag. Gibt False zurück, wenn nichts fällig war."""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            job = claim_job(cursor)
+    if job is None:
+        return False
+    process_job(job)
+    return True
+
+
+def worker_loop(wakeup, stop):
+    while not stop.is_set():
+        try:
+            if run_once():
+                continue
+        except Exception as e:
+            print(f"Fehler im Checkout-Worker: {e}")
+        wakeup.wait(CHECKOUT_POLL_INTERVAL)
+        wakeup.clear()
+
+
+def main():
+    wakeup = threading.Event()
+    stop = threading.Event()
+    hub.subscribe(JOB_CREATED_CHANNEL, lambda payload: wakeup.set())
+    hub.ensure_listener()
+
+    threads = [
+        threading.Thread(target=worker_loop, args=(wakeup, stop), name=f'checkout-{i}', daemon=True)
+        for i in range(CHECKOUT_WORKER_THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    print(f"Checkout-Worker gestartet ({CHECKOUT_WORKER_THREADS} Threads)")
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == '__main__':
+    main()
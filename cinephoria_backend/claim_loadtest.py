@@ -0,0 +1,187 @@
+# cinephoria_backend/claim_loadtest.py
+#
+# Lasttest für seat_claims: viele gleichzeitige Käufer greifen auf wenige Sitze einer Vorstellung zu.
+# Gemessen werden Durchsatz, Latenz und ob ein Sitz je zweimal vergeben wurde; einziger Schiedsrichter
+# ist der eindeutige Schlüssel (showtime_id, seat_id) in seat_claims (migrations/007_seat_claims.sql).
+#
+#   hold: jeder Käufer reserviert als eigener Gast (reservations.hold_seat)
+#   book: jeder Käufer bucht direkt (bookings.persist_booking), ohne vorherige Reservierung
+#
+# Nur gegen eine lokale Testdatenbank laufen lassen. Alle Zeilen des Tests (Gäste 'loadtest-…',
+# paypal_order_id 'loadtest-…') werden vorher und nachher wieder gelöscht.
+#
+# Aufruf: python -m cinephoria_backend.claim_loadtest --showtime 1 [--claimants 1000] [--seats 10]
+#                                                     [--connections 50] [--book]
+import argparse
+import threading
+import time
+from collections import Counter, namedtuple
+
+from cinephoria_backend.bookings import SeatsAlreadyBooked, persist_booking
+from cinephoria_backend.config import DATABASE_URL
+from cinephoria_backend.db_pool import create_pool
+from cinephoria_backend.pricing import PricedCart, price_cart
+from cinephoria_backend.reservations import Holder, hold_seat
+
+LOADTEST_PREFIX = 'loadtest-'
+
+# Sitze im Saal der Vorstellung, die gerade niemand reserviert oder gebucht hat
+HOT_SEATS_QUERY = """
+    SELECT s.seat_id
+    FROM seats s
+    JOIN showtimes sh ON sh.screen_id = s.screen_id
+    WHERE sh.showtime_id = %s
+      AND NOT EXISTS (
+          SELECT 1 FROM seat_claims sc
+          WHERE sc.showtime_id = sh.showtime_id AND sc.seat_id = s.seat_id
+            AND sc.reserved_until >= NOW()
+      )
+    ORDER BY s.seat_id
+    LIMIT %s
+"""
+
+# Unabhängig vom Client: gibt es Sitze mit mehr als einer Buchung?
+DOUBLE_BOOKED_QUERY = """
+    SELECT COUNT(*) FROM (
+        SELECT 1 FROM booking_seats
+        WHERE showtime_id = %s AND seat_id = ANY(%s)
+        GROUP BY showtime_id, seat_id
+        HAVING COUNT(*) > 1
+    ) doubled
+"""
+
+CLEANUP_QUERIES = (
+    "DELETE FROM seat_claims WHERE holder_type = 'guest' AND holder_id LIKE %(prefix)s",
+    """
+    DELETE FROM booking_seats WHERE booking_id IN (
+        SELECT booking_id FROM bookings WHERE paypal_order_id LIKE %(prefix)s
+    )
+    """,
+    "DELETE FROM bookings WHERE paypal_order_id LIKE %(prefix)s",
+)
+
+ClaimResult = namedtuple('ClaimResult', 'seat_id won error seconds')
+
+
+def cleanup(pool):
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            for query in CLEANUP_QUERIES:
+                cursor.execute(query, {'prefix': LOADTEST_PREFIX + '%'})
+
+
+def load_hot_seats(pool, showtime_id, count):
+    """Gibt die PricedItems der ersten count freien Sitze zurück."""
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(HOT_SEATS_QUERY, (showtime_id, count))
+            seat_ids = [row[0] for row in cursor.fetchall()]
+            if not seat_ids:
+                raise ValueError(f"Keine freien Sitze für Vorstellung {showtime_id}")
+            return price_cart(cursor, [{'seat_id': s, 'showtime_id': showtime_id} for s in seat_ids]).items
+
+
+def claim(pool, number, item, book):
+    """Ein Käufer, ein Versuch. won heißt: Reservierung bzw. Buchung wurde committet."""
+    name = f"{LOADTEST_PREFIX}{number}"
+    started = time.perf_counter()
+    won, error = False, None
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                if book:
+                    try:
+                        persist_booking(cursor, name, None, 'Last', 'Test', f"{name}@example.invalid",
+                                        PricedCart([item], item.price))
+                        won = True
+                    except SeatsAlreadyBooked:
+                        conn.rollback()
+                else:
+                    won = hold_seat(cursor, Holder.guest(name), item.showtime_id, item.seat_id,
+                                    item.base_price) is not None
+                    if not won:
+                        conn.rollback()
+    except Exception as e:
+        won, error = False, str(e)
+    return ClaimResult(item.seat_id, won, error, time.perf_counter() - started)
+
+
+def run_claims(pool, items, claimants, book=False):
+    """
+    Startet claimants Threads gleichzeitig (Barrier), reihum auf die Sitze in items verteilt.
+    Gibt (Ergebnisse, Laufzeit in Sekunden) zurück.
+    """
+    results = [None] * claimants
+    barrier = threading.Barrier(claimants + 1)
+
+    def worker(number):
+        barrier.wait()
+        results[number] = claim(pool, number, items[number % len(items)], book)
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(claimants)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+def summarize(results, elapsed):
+    """Kennzahlen eines Laufs; double_claims zählt Sitze mit mehr als einem Gewinner."""
+    winners = Counter(r.seat_id for r in results if r.won)
+    seconds = [r.seconds for r in results]
+    return {
+        'claimants': len(results),
+        'seconds': round(elapsed, 3),
+        'claims_per_second': round(len(results) / elapsed, 1) if elapsed else None,
+        'won': sum(winners.values()),
+        'conflicts': sum(1 for r in results if not r.won and r.error is None),
+        'errors': sum(1 for r in results if r.error is not None),
+        'double_claims': sum(1 for count in winners.values() if count > 1),
+        'p50_ms': round(percentile(seconds, 0.5) * 1000, 1) if seconds else None,
+        'p99_ms': round(percentile(seconds, 0.99) * 1000, 1) if seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest für gleichzeitige Sitzplatz-Reservierungen")
+    parser.add_argument('--showtime', type=int, required=True, help="showtime_id der Testvorstellung")
+    parser.add_argument('--claimants', type=int, default=1000, help="gleichzeitige Käufer")
+    parser.add_argument('--seats', type=int, default=10, help="Anzahl umkämpfter Sitze")
+    parser.add_argument('--connections', type=int, default=50, help="Größe des Verbindungspools")
+    parser.add_argument('--book', action='store_true', help="direkt buchen statt reservieren")
+    args = parser.parse_args()
+
+    # Wartende Threads teilen sich den Pool, daher großzügiges Timeout
+    pool = create_pool(DATABASE_URL, minconn=1, maxconn=args.connections, timeout=120)
+    try:
+        cleanup(pool)
+        items = load_hot_seats(pool, args.showtime, args.seats)
+        results, elapsed = run_claims(pool, items, args.claimants, book=args.book)
+        stats = summarize(results, elapsed)
+
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(DOUBLE_BOOKED_QUERY, (args.showtime, [item.seat_id for item in items]))
+                stats['double_booked_in_db'] = cursor.fetchone()[0]
+
+        mode = 'Buchungen' if args.book else 'Reservierungen'
+        print(f"{mode}: {stats['claimants']} Käufer auf {len(items)} Sitze mit {args.connections} Verbindungen")
+        for key, value in stats.items():
+            print(f"  {key}: {value}")
+        for error in sorted({r.error for r in results if r.error})[:5]:
+            print(f"  Fehler: {error}")
+    finally:
+        cleanup(pool)
+        pool.closeall()
+
+
+if __name__ == '__main__':
+    main()
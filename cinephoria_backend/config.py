@@ -1,7 +1,10 @@
 # cinephoria_backend/config.py
 import os
+import tempfile
+import threading
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from cinephoria_backend.db_pool import create_pool
 
 # Lade Umgebungsvariablen
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -10,19 +13,104 @@ PAYPAL_CLIENT_SECRET = os.getenv("PAYPAL_CLIENT_SECRET")
 TMDB_BEARER_TOKEN = os.getenv("TMDB_BEARER_TOKEN")
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+# Verbindungspool (pro Prozess, wird nach einem fork neu aufgebaut)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # Sekunden
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # Sekunden Wartezeit auf eine freie Verbindung
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))  # Leerlauf bis SELECT 1
+
+# Ausgehende HTTP-Aufrufe (siehe http_client.py)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))  # offene Verbindungen pro Host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))  # Sekunden
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))  # Sekunden
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))  # Wiederholungen idempotenter Aufrufe
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.3"))  # Sekunden, verdoppelt sich
+
+# Checkout-Worker (siehe checkout_worker.py)
+CHECKOUT_WORKER_THREADS = int(os.getenv("CHECKOUT_WORKER_THREADS", "4"))
+CHECKOUT_POLL_INTERVAL = float(os.getenv("CHECKOUT_POLL_INTERVAL", "5"))  # Sekunden ohne NOTIFY bis zum Nachsehen
+CHECKOUT_MAX_WAIT = float(os.getenv("CHECKOUT_MAX_WAIT", "25"))  # maximales ?wait= bei GET /paypal/checkout/<id>
+
+# Abräumen abgelaufener Warenkörbe (siehe cart_reaper.py)
+CART_REAPER_INTERVAL = float(os.getenv("CART_REAPER_INTERVAL", "30"))  # Sekunden zwischen zwei Läufen
+CART_REAPER_BATCH = int(os.getenv("CART_REAPER_BATCH", "500"))  # Reservierungen pro Transaktion
+
+# Sitzplan-Streams (SSE, siehe routes/showtimes.py); jeder offene Stream belegt einen Request-Thread
+SEAT_STREAM_MAX = int(os.getenv("SEAT_STREAM_MAX", "8"))  # gleichzeitige Streams pro Worker, darüber 503 (Polling)
+
+# Geprüfte JWTs pro Prozess (siehe auth_context.py)
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "1024"))  # Einträge im Speicher
+
+# Anmeldung und Verlängerung per Refresh-Token (siehe sessions.py)
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "60"))  # Laufzeit der Access-Tokens (JWT)
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "30"))  # Sitzung endet nach so vielen Tagen ohne Refresh
+REFRESH_REUSE_GRACE = int(os.getenv("REFRESH_REUSE_GRACE", "10"))  # Sekunden, in denen ein ersetztes Token noch nicht als kopiert gilt
+
+# Passwort-Hashing im Anwendungsserver (siehe passwords.py)
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))  # bcrypt-Kosten (pgcrypto: 6)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))  # Prozesse pro Worker
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "8"))  # Aufträge gleichzeitig, darüber 503
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))  # Sekunden Wartezeit auf das Ergebnis
+
+# Drosselung der auth-Endpunkte (siehe rate_limit.py); Werte pro Minute, zugleich die Burst-Größe
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")  # 'memory' (pro Worker) oder 'postgres' (gemeinsam)
+AUTH_LOGIN_PER_IP = int(os.getenv("AUTH_LOGIN_PER_IP", "20"))  # /login und /register pro IP
+AUTH_LOGIN_PER_EMAIL = int(os.getenv("AUTH_LOGIN_PER_EMAIL", "5"))  # /login und /register pro E-Mail
+AUTH_REQUESTS_PER_IP = int(os.getenv("AUTH_REQUESTS_PER_IP", "300"))  # übrige auth-Endpunkte pro IP
+# Proxies vor der App, die X-Forwarded-For setzen; auf Heroku (DYNO gesetzt) steht der Router davor
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "1" if os.getenv("DYNO") else "0"))
+
+# Manifest der Profilbilder (siehe asset_manifest.py)
+PROFILE_IMAGES_CHECK_INTERVAL = float(os.getenv("PROFILE_IMAGES_CHECK_INTERVAL", "30"))  # Sekunden zwischen zwei mtime-Prüfungen
+
+# TMDB-Client (siehe tmdb.py)
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "5"))  # Sekunden pro Upstream-Request
+TMDB_CACHE_SIZE = int(os.getenv("TMDB_CACHE_SIZE", "512"))  # Einträge im Speicher
+# Verzeichnis für den Cache auf der Platte (von allen Workern geteilt); leer = nur im Speicher
+TMDB_CACHE_DIR = os.getenv("TMDB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cinephoria-tmdb-cache"))
+TMDB_CACHE_MAX_AGE = float(os.getenv("TMDB_CACHE_MAX_AGE", "172800"))  # Sekunden, danach wird eine Cache-Datei gelöscht
+TMDB_CACHE_MAX_FILES = int(os.getenv("TMDB_CACHE_MAX_FILES", "5000"))  # Cache-Dateien auf der Platte, älteste zuerst gelöscht
+TMDB_NOW_PLAYING_PAGES = int(os.getenv("TMDB_NOW_PLAYING_PAGES", "5"))  # Seiten für /movies/now_playing
+TMDB_PAGE_TIMEOUT = float(os.getenv("TMDB_PAGE_TIMEOUT", "3"))  # Sekunden, danach wird eine Seite ausgelassen
+TMDB_MAX_PARALLEL = int(os.getenv("TMDB_MAX_PARALLEL", "8"))  # gleichzeitige Upstream-Requests pro Worker
+MOVIE_SYNC_INTERVAL = float(os.getenv("MOVIE_SYNC_INTERVAL", "900"))  # Sekunden zwischen zwei Katalog-Abgleichen
+
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable is not set")
 
 
 
 # Konfiguration für PayPal und TMDb
-PAYPAL_API_BASE = "https://api-m.sandbox.paypal.com"
-TMDB_API_URL = "https://api.themoviedb.org/3/movie"
+PAYPAL_API_BASE = os.getenv("PAYPAL_API_BASE", "https://api-m.sandbox.paypal.com")
+TMDB_API_URL = os.getenv("TMDB_API_URL", "https://api.themoviedb.org/3/movie")
 HEADERS = {
     "accept": "application/json",
     "Authorization": f"Bearer {TMDB_BEARER_TOKEN}"
 }
 
-# Funktion, um eine Datenbankverbindung zu erstellen
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = create_pool(
+                    DATABASE_URL,
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    timeout=DB_POOL_TIMEOUT,
+                    health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+                )
+    return _db_pool
+
+
+# Funktion, um eine Datenbankverbindung aus dem Pool zu leihen.
+# Verwendung wie bisher: `with get_db_connection() as conn:` – am Ende des Blocks
+# wird committet (bzw. bei Fehlern zurückgerollt) und die Verbindung zurückgegeben.
 def get_db_connection():
-    return psycopg2.connect(DATABASE_URL)
+    return get_db_pool().connection()
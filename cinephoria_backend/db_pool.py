@@ -0,0 +1,272 @@
+# cinephoria_backend/db_pool.py
+import os
+import threading
+import time
+import weakref
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Es konnte innerhalb des Timeouts keine Verbindung ausgeliehen werden."""
+
+
+# Verbindungen aus einem Elternprozess (z. B. gunicorn --preload) dürfen im Kind
+# weder benutzt noch geschlossen werden: close() würde die Session des Elternprozesses
+# beenden. Wir halten sie hier fest, damit der Garbage Collector sie nicht schließt.
+_orphaned_connections = []
+
+
+class _PooledConnection:
+    """
+    Kontextmanager um eine ausgeliehene Verbindung.
+    Verhält sich wie `with psycopg2.connect(...) as conn` (Commit bzw. Rollback am Ende),
+    gibt die Verbindung danach aber an den Pool zurück statt sie offen liegen zu lassen.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self._pool.getconn()
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        conn, self._conn = self._conn, None
+        if exc_type is not None:
+            # Rollback nur nach bestem Bemühen, die ursprüngliche Exception zählt
+            broken = False
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            self._pool.putconn(conn, close=broken)
+            return False
+
+        # Schlägt der Commit fehl (z. B. SerializationFailure, Verbindung weg), ist nichts
+        # gespeichert: Verbindung verwerfen und den Fehler an den Aufrufer weitergeben
+        try:
+            conn.commit()
+        except BaseException:
+            self._pool.putconn(conn, close=True)
+            raise
+        self._pool.putconn(conn)
+        return False
+
+
+class ConnectionPool:
+    """
+    Thread-sicherer Verbindungspool für PostgreSQL.
+
+    - minconn Verbindungen werden beim ersten Zugriff aufgebaut, maxconn ist die harte Obergrenze
+    - beim Ausleihen wird geprüft, ob die Verbindung noch lebt (nach längerer Leerlaufzeit per SELECT 1)
+    - Verbindungen älter als max_lifetime Sekunden werden verworfen und neu aufgebaut
+    - nach einem fork() (gunicorn-Worker) wird der Pool im Kindprozess neu initialisiert
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, max_lifetime=1800,
+                 timeout=10, health_check_after=30, connect=psycopg2.connect):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Ungültige Poolgröße: minconn=%s, maxconn=%s" % (minconn, maxconn))
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._connect = connect
+        self._cond = threading.Condition(threading.Lock())
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = []        # Liste von (conn, zurückgegeben_um)
+        self._created = {}     # id(conn) -> Erstellungszeitpunkt
+        self._in_use = 0
+        self._warmed_up = False
+
+    # ------------------------------------------------------------------
+    # Öffentliche API
+    # ------------------------------------------------------------------
+    def connection(self):
+        return _PooledConnection(self)
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._check_fork()
+            warm_up = 0
+            if not self._warmed_up:
+                self._warmed_up = True
+                # Plätze reservieren, aufgebaut wird außerhalb des Locks
+                warm_up = max(min(self.minconn, self.maxconn - self._size()), 0)
+                self._in_use += warm_up
+        if warm_up:
+            self._warm_up(warm_up)
+
+        # Verbindungsaufbau und SELECT 1 laufen ohne Lock: eine langsame Verbindung soll
+        # nicht alle anderen Threads beim Ausleihen und Zurückgeben blockieren
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._size() < self.maxconn:
+                        self._in_use += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout("Keine freie Datenbankverbindung (maxconn=%s)" % self.maxconn)
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return self._open()
+                except Exception:
+                    self._release_slot()
+                    raise
+            if self._is_usable(conn, returned_at):
+                return conn
+            self._release_slot(conn)
+
+    def putconn(self, conn, close=False):
+        if os.getpid() != self._pid:
+            # Verbindung stammt aus dem Elternprozess
+            _orphaned_connections.append(conn)
+            return
+        # Rollback (ein Round-Trip) und Entscheidung ohne Lock, danach nur noch die Buchhaltung
+        discard = close or conn.closed or self._expired(conn) or not self._reset_session(conn)
+        with self._cond:
+            self._in_use = max(self._in_use - 1, 0)
+            if discard:
+                self._created.pop(id(conn), None)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def closeall(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size(),
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'maxconn': self.maxconn,
+            }
+
+    # ------------------------------------------------------------------
+    # Interna (werden unter self._cond aufgerufen, außer _open, _warm_up, _release_slot,
+    # _is_usable und _reset_session; _expired liest nur)
+    # ------------------------------------------------------------------
+    def _size(self):
+        return len(self._idle) + self._in_use
+
+    def _open(self):
+        conn = self._connect(self.dsn)
+        with self._cond:
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _release_slot(self, conn=None):
+        """Gibt einen reservierten Platz frei; conn (falls angegeben) wird geschlossen. Ohne Lock aufrufen."""
+        with self._cond:
+            self._in_use = max(self._in_use - 1, 0)
+            if conn is not None:
+                self._created.pop(id(conn), None)
+            self._cond.notify()
+        if conn is not None:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def _warm_up(self, count):
+        # Ohne Lock; die count Plätze wurden in getconn() reserviert
+        for built in range(count):
+            try:
+                conn = self._open()
+            except Exception as e:
+                print(f"Fehler beim Aufbau der Pool-Verbindungen: {e}")
+                for _ in range(count - built):
+                    self._release_slot()
+                return
+            with self._cond:
+                self._in_use -= 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _check_fork(self):
+        if os.getpid() != self._pid:
+            _orphaned_connections.extend(conn for conn, _ in self._idle)
+            self._reset_state()
+
+    def _expired(self, conn):
+        created = self._created.get(id(conn))
+        return created is None or time.monotonic() - created > self.max_lifetime
+
+    def _is_usable(self, conn, returned_at):
+        if conn.closed or self._expired(conn):
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reset_session(self, conn):
+        try:
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+_pools = weakref.WeakSet()
+
+
+def _reinit_pools_after_fork():
+    # Im Kind kann ein Lock noch vom Elternprozess gehalten sein, daher neu anlegen statt acquire()
+    for pool in list(_pools):
+        pool._cond = threading.Condition(threading.Lock())
+        pool._check_fork()
+
+
+def create_pool(dsn, **kwargs):
+    pool = ConnectionPool(dsn, **kwargs)
+    _pools.add(pool)
+    return pool
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_pools_after_fork)
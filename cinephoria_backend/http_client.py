@@ -0,0 +1,136 @@
+# cinephoria_backend/http_client.py
+#
+# Gemeinsamer HTTP-Client für alle ausgehenden Aufrufe (TMDB, PayPal).
+# Eine requests.Session pro Prozess hält die Verbindungen pro Host offen (Keep-Alive),
+# statt für jeden Aufruf eine neue TCP/TLS-Verbindung aufzubauen.
+# Idempotente Aufrufe werden bei Verbindungsfehlern und 502/503/504 mit Backoff wiederholt.
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRY_STATUS = frozenset({502, 503, 504})
+
+
+class HTTPClient:
+    def __init__(self, pool_connections=10, pool_maxsize=32, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff=0.3, sleep=time.sleep):
+        self.pool_connections = pool_connections  # Anzahl Hosts mit eigenem Pool
+        self.pool_maxsize = pool_maxsize          # offene Verbindungen pro Host
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self._stats = {}  # host -> Zähler
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, idempotent=None, timeout=None, **kwargs):
+        """
+        Wie requests.request, aber über die gemeinsame Session.
+        idempotent: darf bei Fehlern wiederholt werden (Standard: nur GET/HEAD/OPTIONS/PUT/DELETE).
+        POSTs nur mit idempotent=True, z. B. wenn der Server einen Idempotenz-Schlüssel auswertet.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.retries if idempotent else 0)
+        timeout = self.timeout if timeout is None else timeout
+        host = urlsplit(url).netloc
+        session = self._get_session()
+
+        for attempt in range(attempts):
+            if attempt:
+                self._count(host, 'retries')
+                self.sleep(self.backoff * 2 ** (attempt - 1))
+            last = attempt == attempts - 1
+
+            self._enter(host)
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._count(host, 'errors')
+                if last:
+                    raise
+                continue
+            finally:
+                self._leave(host, time.monotonic() - started)
+
+            if response.status_code in RETRY_STATUS and not last:
+                self._count(host, 'errors')
+                response.close()
+                continue
+            return response
+
+    def stats(self):
+        """Zähler pro Host; saturated zählt Aufrufe, die keine freie Verbindung im Pool mehr vorfanden."""
+        with self._lock:
+            hosts = {host: dict(counters) for host, counters in self._stats.items()}
+        return {'pool_maxsize': self.pool_maxsize, 'hosts': hosts}
+
+    def _get_session(self):
+        # Nach einem fork gehören die offenen Sockets dem Elternprozess: eigene Session anlegen
+        if self._session_pid != os.getpid():
+            with self._lock:
+                if self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                          pool_maxsize=self.pool_maxsize)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+                    self._stats = {}
+        return self._session
+
+    def _host_stats(self, host):
+        counters = self._stats.get(host)
+        if counters is None:
+            counters = self._stats[host] = {
+                'requests': 0, 'errors': 0, 'retries': 0,
+                'in_flight': 0, 'peak_in_flight': 0, 'saturated': 0, 'total_seconds': 0.0
+            }
+        return counters
+
+    def _count(self, host, name):
+        with self._lock:
+            self._host_stats(host)[name] += 1
+
+    def _enter(self, host):
+        with self._lock:
+            counters = self._host_stats(host)
+            if counters['in_flight'] >= self.pool_maxsize:
+                counters['saturated'] += 1
+            counters['requests'] += 1
+            counters['in_flight'] += 1
+            counters['peak_in_flight'] = max(counters['peak_in_flight'], counters['in_flight'])
+
+    def _leave(self, host, seconds):
+        with self._lock:
+            counters = self._host_stats(host)
+            counters['in_flight'] -= 1
+            counters['total_seconds'] += seconds
+
+
+def _create_client():
+    from cinephoria_backend import config
+    return HTTPClient(pool_maxsize=config.HTTP_POOL_MAXSIZE,
+                      connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+                      read_timeout=config.HTTP_READ_TIMEOUT,
+                      retries=config.HTTP_RETRIES,
+                      backoff=config.HTTP_RETRY_BACKOFF)
+
+
+http = _create_client()
@@ -0,0 +1,131 @@
+# cinephoria_backend/layout_cache.py
+#
+# Cache für das Sitzlayout eines Kinosaals (seats JOIN seat_types JOIN screens).
+# Das Layout ändert sich nur über die Admin-Endpunkte in seats.py und seat_types.py;
+# diese rufen publish_layout_change() auf. Über den Postgres-Kanal LAYOUT_CHANNEL
+# erfahren auch alle anderen gunicorn-Worker davon und verwerfen ihre Einträge.
+# Gecacht werden nur existierende Säle; für unbekannte screen_ids wirft get() ScreenNotFound,
+# damit beliebige IDs den Cache nicht wachsen lassen.
+import threading
+
+from cinephoria_backend.notifications import hub
+
+LAYOUT_CHANNEL = 'seat_layout_changed'
+ALL_SCREENS = '*'
+
+LAYOUT_QUERY = """
+    SELECT s.seat_id, s.screen_id, s.row, s.number,
+           st.seat_type_id, st.name AS seat_type_name, st.price, st.color, st.icon,
+           scr.name AS screen_name
+    FROM seats s
+    JOIN seat_types st ON s.seat_type_id = st.seat_type_id
+    JOIN screens scr ON s.screen_id = scr.screen_id
+    WHERE s.screen_id = %s
+    ORDER BY s.row, s.number
+"""
+LAYOUT_COLUMNS = ('seat_id', 'screen_id', 'row', 'number',
+                  'seat_type_id', 'seat_type_name', 'price', 'color', 'icon',
+                  'screen_name')
+
+# Nur bei leerem Layout: Saal ohne Sitze oder gar nicht vorhanden?
+SCREEN_EXISTS_QUERY = "SELECT 1 FROM screens WHERE screen_id = %s"
+
+
+class ScreenNotFound(LookupError):
+    """Den Saal gibt es nicht."""
+
+
+class ScreenLayout:
+    """
+    Unveränderliches Layout eines Saals; version ist der Generationsstempel beim Laden.
+    compact wird von seatmap.compact_layout(), grid von seat_finder.seat_grid() beim ersten
+    Bedarf gefüllt.
+    """
+
+    __slots__ = ('screen_id', 'version', 'seats', 'compact', 'grid')
+
+    def __init__(self, screen_id, version, seats):
+        self.screen_id = screen_id
+        self.version = version
+        self.seats = seats
+        self.compact = None
+        self.grid = None
+
+
+class LayoutCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._layouts = {}
+        self._generation = 0
+        self._stamps = {}       # screen_id -> Generation der letzten Invalidierung
+        self._all_stamp = 0     # Generation der letzten Invalidierung aller Säle
+
+    def get(self, cursor, screen_id):
+        """
+        Liefert das Layout aus dem Cache oder lädt es über den übergebenen Cursor.
+        Wirft ScreenNotFound, wenn es den Saal nicht gibt; das wird nicht gecacht.
+        """
+        with self._lock:
+            layout = self._layouts.get(screen_id)
+            if layout is not None:
+                return layout
+            version = self._generation
+
+        cursor.execute(LAYOUT_QUERY, (screen_id,))
+        seats = tuple(dict(zip(LAYOUT_COLUMNS, row)) for row in cursor.fetchall())
+        if not seats:
+            cursor.execute(SCREEN_EXISTS_QUERY, (screen_id,))
+            if cursor.fetchone() is None:
+                raise ScreenNotFound(screen_id)
+        layout = ScreenLayout(screen_id, version, seats)
+
+        with self._lock:
+            # Nur speichern, wenn während des Ladens niemand invalidiert hat
+            if max(self._stamps.get(screen_id, 0), self._all_stamp) <= version:
+                self._layouts[screen_id] = layout
+        return layout
+
+    def invalidate(self, screen_id=None):
+        with self._lock:
+            self._generation += 1
+            if screen_id is None:
+                self._all_stamp = self._generation
+                self._stamps.clear()
+                self._layouts.clear()
+            else:
+                self._stamps[screen_id] = self._generation
+                self._layouts.pop(screen_id, None)
+
+
+layout_cache = LayoutCache()
+
+
+def get_screen_layout(cursor, screen_id):
+    hub.ensure_listener()
+    return layout_cache.get(cursor, int(screen_id))
+
+
+def publish_layout_change(cursor, screen_id=None):
+    """
+    Innerhalb der ändernden Transaktion aufrufen: verwirft den lokalen Eintrag sofort
+    und verschickt eine NOTIFY, die Postgres erst beim Commit an alle Worker zustellt.
+    screen_id=None invalidiert alle Säle (z. B. bei Änderung eines Sitztyps).
+    """
+    screen_id = None if screen_id is None else int(screen_id)
+    layout_cache.invalidate(screen_id)
+    payload = ALL_SCREENS if screen_id is None else str(screen_id)
+    hub.publish(cursor, LAYOUT_CHANNEL, payload)
+
+
+def _handle_notification(payload):
+    # payload None: Listener war getrennt, es können Änderungen fehlen
+    if payload == ALL_SCREENS or not payload:
+        layout_cache.invalidate()
+        return
+    try:
+        layout_cache.invalidate(int(payload))
+    except ValueError:
+        layout_cache.invalidate()
+
+
+hub.subscribe(LAYOUT_CHANNEL, _handle_notification)
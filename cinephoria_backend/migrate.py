@@ -0,0 +1,48 @@
+# cinephoria_backend/migrate.py
+#
+# Spielt die SQL-Dateien aus migrations/ in Dateinamen-Reihenfolge ein.
+# Bereits eingespielte Dateien stehen in schema_migrations und werden übersprungen.
+# Aufruf: python -m cinephoria_backend.migrate
+import os
+
+from cinephoria_backend.config import get_db_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+# Beliebige, aber feste Nummer für pg_advisory_xact_lock, damit nicht zwei Prozesse gleichzeitig migrieren
+MIGRATION_LOCK_ID = 4242001
+
+
+def pending_migrations(applied):
+    files = sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.sql'))
+    return [f for f in files if f not in applied]
+
+
+def run_migrations(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        cursor.execute("SELECT name FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        done = []
+        for name in pending_migrations(applied):
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+                cursor.execute(f.read())
+            cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            done.append(name)
+    return done
+
+
+if __name__ == '__main__':
+    with get_db_connection() as conn:
+        applied = run_migrations(conn)
+    for name in applied:
+        print(f"Migration eingespielt: {name}")
+    if not applied:
+        print("Keine neuen Migrationen")
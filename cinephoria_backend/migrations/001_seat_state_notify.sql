@@ -0,0 +1,117 @@
+-- Sitzstatus-Änderungen per NOTIFY 'seat_state_changed' an alle Worker melden
+-- (Server-Sent-Events unter /showtimes/<id>/seats/stream, siehe seat_events.py).
+-- Statement-Trigger mit Transition Tables: eine Nachricht pro Vorstellung und Status,
+-- auch bei Löschungen durch ON DELETE CASCADE (abgelaufene Warenkörbe).
+
+CREATE OR REPLACE FUNCTION notify_seat_state(p_showtime_id INTEGER, p_state TEXT, p_holder TEXT, p_seats JSON)
+RETURNS VOID AS $$
+BEGIN
+    PERFORM pg_notify('seat_state_changed', json_build_object(
+        'showtime_id', p_showtime_id,
+        'state', p_state,
+        'holder', p_holder,
+        'seats', p_seats
+    )::text);
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Freigegebene Sitze sind wieder frei, außer sie wurden inzwischen gebucht
+CREATE OR REPLACE FUNCTION notify_cart_items_released() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT c.showtime_id,
+               CASE WHEN EXISTS (
+                   SELECT 1 FROM booking_seats bs
+                   WHERE bs.showtime_id = c.showtime_id AND bs.seat_id = c.seat_id
+               ) THEN 'booked' ELSE 'free' END AS state,
+               json_agg(c.seat_id) AS seats
+        FROM changed_rows c
+        GROUP BY 1, 2
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, r.state, NULL, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION notify_user_cart_items_held() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT showtime_id, 'u:' || user_id AS holder, json_agg(seat_id) AS seats
+        FROM changed_rows
+        GROUP BY showtime_id, user_id
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, 'held', r.holder, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION notify_guest_cart_items_held() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT showtime_id, 'g:' || guest_id AS holder, json_agg(seat_id) AS seats
+        FROM changed_rows
+        GROUP BY showtime_id, guest_id
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, 'held', r.holder, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION notify_booking_seats_booked() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT showtime_id, json_agg(seat_id) AS seats
+        FROM changed_rows
+        GROUP BY showtime_id
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, 'booked', NULL, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP TRIGGER IF EXISTS user_cart_items_held ON user_cart_items;
+CREATE TRIGGER user_cart_items_held
+    AFTER INSERT ON user_cart_items
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_user_cart_items_held();
+
+DROP TRIGGER IF EXISTS user_cart_items_released ON user_cart_items;
+CREATE TRIGGER user_cart_items_released
+    AFTER DELETE ON user_cart_items
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cart_items_released();
+
+DROP TRIGGER IF EXISTS guest_cart_items_held ON guest_cart_items;
+CREATE TRIGGER guest_cart_items_held
+    AFTER INSERT ON guest_cart_items
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_guest_cart_items_held();
+
+DROP TRIGGER IF EXISTS guest_cart_items_released ON guest_cart_items;
+CREATE TRIGGER guest_cart_items_released
+    AFTER DELETE ON guest_cart_items
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cart_items_released();
+
+DROP TRIGGER IF EXISTS booking_seats_booked ON booking_seats;
+CREATE TRIGGER booking_seats_booked
+    AFTER INSERT ON booking_seats
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_booking_seats_booked();
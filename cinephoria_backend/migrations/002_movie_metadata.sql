@@ -0,0 +1,9 @@
+-- Titel und Poster der Filme, damit die Buchungshistorie (/bookings) ohne TMDB-Aufrufe auskommt.
+-- Wird von movie_metadata.py beim ersten Bedarf aus TMDB befüllt.
+
+CREATE TABLE IF NOT EXISTS movie_metadata (
+    movie_id INTEGER PRIMARY KEY,
+    title TEXT,
+    poster_path TEXT,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
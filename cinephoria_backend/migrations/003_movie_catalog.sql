@@ -0,0 +1,32 @@
+-- Lokaler Spiegel des TMDB-Katalogs (movie_sync.py), aus dem der movies-Blueprint antwortet.
+-- Ersetzt movie_metadata aus 002: Titel und Poster stehen jetzt direkt in movies.
+
+CREATE TABLE IF NOT EXISTS movies (
+    movie_id INTEGER PRIMARY KEY,
+    title TEXT,
+    poster_path TEXT,
+    details JSONB,              -- /movie/<id>?language=de-DE, NULL solange nur Titel/Poster bekannt sind
+    release_de JSONB,           -- Eintrag 'DE' aus /movie/<id>/release_dates
+    trailer_key TEXT,           -- YouTube-Key des ersten Trailers
+    synced_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Fertige Listen (now_playing, upcoming) in der Form der bisherigen API-Antworten
+CREATE TABLE IF NOT EXISTS movie_lists (
+    name TEXT PRIMARY KEY,
+    payload JSONB NOT NULL,
+    synced_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Zeitpunkt des letzten Abgleichs mit /movie/changes
+CREATE TABLE IF NOT EXISTS movie_sync_state (
+    name TEXT PRIMARY KEY,
+    synced_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+
+INSERT INTO movies (movie_id, title, poster_path, updated_at)
+SELECT movie_id, title, poster_path, updated_at FROM movie_metadata
+ON CONFLICT (movie_id) DO NOTHING;
+
+DROP TABLE IF EXISTS movie_metadata;
@@ -0,0 +1,26 @@
+-- Outbox für den asynchronen Checkout (checkout.py, checkout_worker.py).
+-- POST /paypal/checkout legt einen Auftrag an, ein Worker führt Capture und Buchung aus.
+-- paypal_order_id ist eindeutig: derselbe Checkout wird höchstens einmal gebucht.
+
+CREATE TABLE IF NOT EXISTS checkout_jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    paypal_order_id TEXT NOT NULL UNIQUE,
+    user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    payload JSONB NOT NULL,                 -- vorname, nachname, email, total_amount, cart_items
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMP WITHOUT TIME ZONE,
+    booking_id INTEGER REFERENCES bookings(booking_id) ON DELETE SET NULL,
+    result JSONB,                           -- {booking_id, qr_token} bzw. {error}
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS checkout_jobs_due_idx
+    ON checkout_jobs (run_after)
+    WHERE status IN ('pending', 'running');
+
+-- Für die Idempotenzprüfung: gibt es zu dieser Order schon eine Buchung?
+CREATE INDEX IF NOT EXISTS bookings_paypal_order_id_idx ON bookings (paypal_order_id);
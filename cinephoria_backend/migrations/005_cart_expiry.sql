@@ -0,0 +1,5 @@
+-- Abgelaufene Warenkörbe werden von cart_reaper.py in Batches (ältestes zuerst) gelöscht
+-- statt bei jedem Warenkorb-Request per Volltabellen-DELETE.
+
+CREATE INDEX IF NOT EXISTS user_carts_valid_until_idx ON user_carts (valid_until);
+CREATE INDEX IF NOT EXISTS guest_carts_valid_until_idx ON guest_carts (valid_until);
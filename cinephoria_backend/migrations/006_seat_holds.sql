@@ -0,0 +1,102 @@
+-- Eine Reservierungstabelle für User und Gäste (reservations.py) statt user_cart_items/user_carts
+-- und guest_cart_items/guest_carts. Der eindeutige Schlüssel (showtime_id, seat_id) gilt jetzt
+-- über beide Arten von Warenkorb hinweg; die gegenseitige Prüfung der Tabellen entfällt.
+
+CREATE TABLE IF NOT EXISTS seat_holds (
+    hold_id BIGSERIAL PRIMARY KEY,
+    showtime_id INTEGER NOT NULL REFERENCES showtimes(showtime_id) ON DELETE CASCADE,
+    seat_id INTEGER NOT NULL REFERENCES seats(seat_id) ON DELETE CASCADE,
+    holder_type TEXT NOT NULL CHECK (holder_type IN ('user', 'guest')),
+    holder_id TEXT NOT NULL,            -- users.id als Text bzw. guest_id
+    price NUMERIC(10,2) NOT NULL,       -- Grundpreis des Sitztyps (pricing.py)
+    seat_type_discount_id INTEGER REFERENCES seat_type_discounts(seat_type_discount_id) ON DELETE SET NULL,
+    reserved_until TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    CONSTRAINT seat_holds_showtime_seat_unique UNIQUE (showtime_id, seat_id)
+);
+
+CREATE INDEX IF NOT EXISTS seat_holds_holder_idx ON seat_holds (holder_type, holder_id);
+CREATE INDEX IF NOT EXISTS seat_holds_reserved_until_idx ON seat_holds (reserved_until);
+
+-- Bestehende Reservierungen übernehmen; maßgeblich war bisher valid_until des Warenkorbs
+-- (kann bei Gast-Warenkörben NULL sein, dann wie in guestcart.py 15 Minuten ab jetzt)
+INSERT INTO seat_holds (showtime_id, seat_id, holder_type, holder_id, price, seat_type_discount_id, reserved_until, created_at)
+SELECT uci.showtime_id, uci.seat_id, 'user', uci.user_id::text, uci.price, uci.seat_type_discount_id,
+       COALESCE(uc.valid_until, uci.reserved_until, NOW() + INTERVAL '15 minutes'),
+       NOW()
+FROM user_cart_items uci
+JOIN user_carts uc ON uc.user_id = uci.user_id
+ON CONFLICT (showtime_id, seat_id) DO NOTHING;
+
+INSERT INTO seat_holds (showtime_id, seat_id, holder_type, holder_id, price, seat_type_discount_id, reserved_until, created_at)
+SELECT gci.showtime_id, gci.seat_id, 'guest', gci.guest_id, gci.price, gci.seat_type_discount_id,
+       COALESCE(gc.valid_until, gci.reserved_until, NOW() + INTERVAL '15 minutes'),
+       NOW()
+FROM guest_cart_items gci
+JOIN guest_carts gc ON gc.guest_id = gci.guest_id
+ON CONFLICT (showtime_id, seat_id) DO NOTHING;
+
+
+-- NOTIFY wie in 001: 'holder' im Format 'u:<user_id>' bzw. 'g:<guest_id>' (seat_events.holder_key)
+CREATE OR REPLACE FUNCTION notify_seat_holds_held() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT showtime_id, left(holder_type, 1) || ':' || holder_id AS holder, json_agg(seat_id) AS seats
+        FROM changed_rows
+        GROUP BY showtime_id, holder_type, holder_id
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, 'held', r.holder, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Übernahme einer abgelaufenen Reservierung (ON CONFLICT DO UPDATE) ist ein UPDATE;
+-- gemeldet werden nur Zeilen mit neuem Inhaber, nicht das Verlängern von reserved_until
+CREATE OR REPLACE FUNCTION notify_seat_holds_taken_over() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT n.showtime_id, left(n.holder_type, 1) || ':' || n.holder_id AS holder, json_agg(n.seat_id) AS seats
+        FROM new_rows n
+        JOIN old_rows o ON o.hold_id = n.hold_id
+        WHERE (o.holder_type, o.holder_id) IS DISTINCT FROM (n.holder_type, n.holder_id)
+        GROUP BY n.showtime_id, n.holder_type, n.holder_id
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, 'held', r.holder, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP TRIGGER IF EXISTS seat_holds_held ON seat_holds;
+CREATE TRIGGER seat_holds_held
+    AFTER INSERT ON seat_holds
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_seat_holds_held();
+
+DROP TRIGGER IF EXISTS seat_holds_taken_over ON seat_holds;
+CREATE TRIGGER seat_holds_taken_over
+    AFTER UPDATE ON seat_holds
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_seat_holds_taken_over();
+
+DROP TRIGGER IF EXISTS seat_holds_released ON seat_holds;
+CREATE TRIGGER seat_holds_released
+    AFTER DELETE ON seat_holds
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cart_items_released();
+
+
+DROP TABLE IF EXISTS user_cart_items;
+DROP TABLE IF EXISTS guest_cart_items;
+DROP TABLE IF EXISTS user_carts;
+DROP TABLE IF EXISTS guest_carts;
+
+DROP FUNCTION IF EXISTS notify_user_cart_items_held();
+DROP FUNCTION IF EXISTS notify_guest_cart_items_held();
@@ -0,0 +1,77 @@
+-- Reservierungen und Buchungen teilen sich einen eindeutigen Schlüssel (showtime_id, seat_id):
+-- aus seat_holds wird seat_claims, eine Buchung ist ein Claim mit holder_type 'booking'
+-- und reserved_until = 'infinity' (läuft nie ab, wird nie übernommen, nie vom cart_reaper geräumt).
+-- Damit kann ein gebuchter Sitz weder reserviert noch ein zweites Mal gebucht werden.
+
+ALTER TABLE IF EXISTS seat_holds RENAME TO seat_claims;
+ALTER TABLE seat_claims RENAME CONSTRAINT seat_holds_showtime_seat_unique TO seat_claims_showtime_seat_unique;
+ALTER INDEX IF EXISTS seat_holds_holder_idx RENAME TO seat_claims_holder_idx;
+ALTER INDEX IF EXISTS seat_holds_reserved_until_idx RENAME TO seat_claims_reserved_until_idx;
+
+ALTER TABLE seat_claims DROP CONSTRAINT IF EXISTS seat_holds_holder_type_check;
+ALTER TABLE seat_claims ADD CONSTRAINT seat_claims_holder_type_check
+    CHECK (holder_type IN ('user', 'guest', 'booking'));
+
+ALTER TABLE seat_claims ADD COLUMN IF NOT EXISTS booking_id INTEGER
+    REFERENCES bookings(booking_id) ON DELETE CASCADE;
+
+-- Vorhandene Buchungen übernehmen (bei bereits doppelt gebuchten Sitzen die erste);
+-- noch laufende Reservierungen auf gebuchten Sitzen werden dabei ersetzt
+INSERT INTO seat_claims (showtime_id, seat_id, holder_type, holder_id, booking_id, price,
+                         seat_type_discount_id, reserved_until, created_at)
+SELECT DISTINCT ON (bs.showtime_id, bs.seat_id)
+       bs.showtime_id, bs.seat_id, 'booking', bs.booking_id::text, bs.booking_id, COALESCE(bs.price, 0),
+       bs.seat_type_discount_id, 'infinity', COALESCE(b.created_at, NOW())
+FROM booking_seats bs
+JOIN bookings b ON b.booking_id = bs.booking_id
+WHERE bs.showtime_id IS NOT NULL AND bs.seat_id IS NOT NULL AND bs.booking_id IS NOT NULL
+ORDER BY bs.showtime_id, bs.seat_id, bs.booking_id
+ON CONFLICT (showtime_id, seat_id) DO UPDATE
+    SET holder_type = 'booking',
+        holder_id = EXCLUDED.holder_id,
+        booking_id = EXCLUDED.booking_id,
+        price = EXCLUDED.price,
+        seat_type_discount_id = EXCLUDED.seat_type_discount_id,
+        reserved_until = EXCLUDED.reserved_until;
+
+
+-- Buchungs-Claims melden sich über den booking_seats-Trigger als 'booked', nicht als 'held'
+CREATE OR REPLACE FUNCTION notify_seat_holds_held() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT showtime_id, left(holder_type, 1) || ':' || holder_id AS holder, json_agg(seat_id) AS seats
+        FROM changed_rows
+        WHERE holder_type <> 'booking'
+        GROUP BY showtime_id, holder_type, holder_id
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, 'held', r.holder, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION notify_seat_holds_taken_over() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT n.showtime_id, left(n.holder_type, 1) || ':' || n.holder_id AS holder, json_agg(n.seat_id) AS seats
+        FROM new_rows n
+        JOIN old_rows o ON o.hold_id = n.hold_id
+        WHERE (o.holder_type, o.holder_id) IS DISTINCT FROM (n.holder_type, n.holder_id)
+          AND n.holder_type <> 'booking'
+        GROUP BY n.showtime_id, n.holder_type, n.holder_id
+    LOOP
+        PERFORM notify_seat_state(r.showtime_id, 'held', r.holder, r.seats);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+ALTER TRIGGER seat_holds_held ON seat_claims RENAME TO seat_claims_held;
+ALTER TRIGGER seat_holds_taken_over ON seat_claims RENAME TO seat_claims_taken_over;
+ALTER TRIGGER seat_holds_released ON seat_claims RENAME TO seat_claims_released;
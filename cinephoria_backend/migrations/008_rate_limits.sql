@@ -0,0 +1,11 @@
+-- Token-Buckets für die Drosselung der auth-Endpunkte (rate_limit.py, RATE_LIMIT_STORE=postgres).
+-- UNLOGGED: nach einem Absturz dürfen die Buckets leer sein, dafür kein WAL pro Login-Versuch.
+-- Einträge, die länger als eine Stunde unbenutzt sind, räumt rate_limit.py selbst ab.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    bucket_key TEXT PRIMARY KEY,        -- '<limit>:<ip>' bzw. '<limit>:email:<sha256>'
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS rate_limit_buckets_updated_at_idx ON rate_limit_buckets (updated_at);
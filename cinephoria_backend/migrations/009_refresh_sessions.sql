@@ -0,0 +1,21 @@
+-- Refresh-Tokens (sessions.py): eine Zeile pro Anmeldung, egal wie oft erneuert wurde.
+-- Gespeichert wird nur der SHA-256 (32 Byte) des aktuellen und des vorherigen Tokens; taucht der
+-- vorherige noch einmal auf, wurde er kopiert und die ganze Sitzung wird beendet (revoked_at).
+-- Abgelaufene und beendete Sitzungen räumt der nächste Login desselben Nutzers ab.
+
+CREATE TABLE IF NOT EXISTS refresh_sessions (
+    session_id BIGSERIAL PRIMARY KEY,   -- steht als 'sid' in den Access-Tokens
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token_hash BYTEA NOT NULL,
+    previous_hash BYTEA,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    rotated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    revoked_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS refresh_sessions_token_hash_idx ON refresh_sessions (token_hash);
+CREATE INDEX IF NOT EXISTS refresh_sessions_previous_hash_idx ON refresh_sessions (previous_hash);
+CREATE INDEX IF NOT EXISTS refresh_sessions_user_idx ON refresh_sessions (user_id);
+-- Für das Laden der Sperrliste (nur kürzlich beendete Sitzungen)
+CREATE INDEX IF NOT EXISTS refresh_sessions_revoked_at_idx ON refresh_sessions (revoked_at)
+    WHERE revoked_at IS NOT NULL;
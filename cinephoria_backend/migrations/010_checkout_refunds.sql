@@ -0,0 +1,17 @@
+-- Erstattungen im asynchronen Checkout (checkout.py): ist eine Order bezahlt, aber nicht buchbar
+-- (Sitz vergeben, Betrag passt nicht), wird der Capture über PayPal erstattet. Scheitert das
+-- vorübergehend, bleibt der Auftrag 'refund_pending' und der Worker versucht es erneut.
+-- capture_id ist die ID des PayPal-Captures, auf die sich die Erstattung bezieht; captured wird
+-- direkt nach dem Capture gesetzt, damit ein späterer Versuch weiß, dass schon bezahlt ist.
+
+ALTER TABLE checkout_jobs ADD COLUMN IF NOT EXISTS capture_id TEXT;
+ALTER TABLE checkout_jobs ADD COLUMN IF NOT EXISTS captured BOOLEAN NOT NULL DEFAULT FALSE;
+
+ALTER TABLE checkout_jobs DROP CONSTRAINT IF EXISTS checkout_jobs_status_check;
+ALTER TABLE checkout_jobs ADD CONSTRAINT checkout_jobs_status_check
+    CHECK (status IN ('pending', 'running', 'completed', 'failed', 'refund_pending', 'refunded'));
+
+DROP INDEX IF EXISTS checkout_jobs_due_idx;
+CREATE INDEX IF NOT EXISTS checkout_jobs_due_idx
+    ON checkout_jobs (run_after)
+    WHERE status IN ('pending', 'running', 'refund_pending');
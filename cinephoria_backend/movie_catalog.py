@@ -0,0 +1,158 @@
+# cinephoria_backend/movie_catalog.py
+#
+# Lokaler Spiegel des TMDB-Katalogs. movie_sync.py schreibt die Tabellen movies und movie_lists
+# und meldet das über NOTIFY 'movie_catalog_changed'. Jeder Worker hält einen Schnappschuss im
+# Speicher, aus dem der movies-Blueprint ohne Datenbank- oder TMDB-Zugriff antwortet.
+# Nach einer Änderung wird im Hintergrund neu geladen, bis dahin gilt der alte Schnappschuss.
+import threading
+import time
+
+from cinephoria_backend.config import TMDB_API_URL, TMDB_NOW_PLAYING_PAGES, TMDB_PAGE_TIMEOUT, get_db_connection
+from cinephoria_backend.notifications import hub
+from cinephoria_backend.tmdb import tmdb_client, LIST_TTL
+
+CATALOG_CHANNEL = 'movie_catalog_changed'
+
+# Nach einem fehlgeschlagenen Laden so lange nicht erneut versuchen (Sekunden)
+RETRY_AFTER = 30
+
+
+# ----------------------------------------------------------------------
+# Aufbereitung der TMDB-Antworten (gemeinsam für Spiegel und Direktabruf)
+# ----------------------------------------------------------------------
+def now_playing_urls(pages=None):
+    pages = TMDB_NOW_PLAYING_PAGES if pages is None else pages
+    return [f"{TMDB_API_URL}/now_playing?language=de-DE&page={i}&region=DE" for i in range(1, pages + 1)]
+
+
+def upcoming_url():
+    return f"{TMDB_API_URL}/upcoming?language=de-DE&page=1&region=DE"
+
+
+def merge_now_playing(responses):
+    """Seiten in Reihenfolge zusammenführen, nur Filme mit Poster."""
+    results = []
+    for i, response in enumerate(responses, start=1):
+        if response.status_code == 200:
+            data = response.json()
+            results.extend(movie for movie in data['results'] if movie.get('poster_path'))
+        else:
+            print(f"Fehler bei Seite {i}: {response.status_code}")
+    return {"results": results}
+
+
+def fetch_now_playing(ttl=LIST_TTL[0], stale_ttl=LIST_TTL[1]):
+    responses = tmdb_client.get_many(now_playing_urls(), ttl, stale_ttl, timeout=TMDB_PAGE_TIMEOUT)
+    return merge_now_playing(responses)
+
+
+def german_release(release_dates):
+    # Nur der Eintrag mit 'iso_3166_1': 'DE'
+    return next((item for item in release_dates.get('results', []) if item.get('iso_3166_1') == 'DE'), None)
+
+
+def trailer_key(videos):
+    # Erster Eintrag mit 'type' == 'Trailer' und 'site' == 'YouTube'
+    trailer = next((item for item in videos.get('results', [])
+                    if item.get('type') == 'Trailer' and item.get('site') == 'YouTube'), None)
+    return trailer.get('key') if trailer else None
+
+
+# ----------------------------------------------------------------------
+# Schnappschuss im Speicher
+# ----------------------------------------------------------------------
+class CatalogMovie:
+    __slots__ = ('movie_id', 'details', 'release_de', 'trailer_key')
+
+    def __init__(self, movie_id, details, release_de, trailer_key):
+        self.movie_id = movie_id
+        self.details = details
+        self.release_de = release_de
+        self.trailer_key = trailer_key
+
+
+class CatalogSnapshot:
+    def __init__(self, movies=None, lists=None):
+        self.movies = movies or {}   # movie_id -> CatalogMovie (nur vollständig gespiegelte Filme)
+        self.lists = lists or {}     # 'now_playing' / 'upcoming' -> fertige Antwort
+
+
+def load_snapshot(cursor):
+    cursor.execute("""
+        SELECT movie_id, details, release_de, trailer_key
+        FROM movies
+        WHERE details IS NOT NULL
+    """)
+    movies = {row[0]: CatalogMovie(*row) for row in cursor.fetchall()}
+    cursor.execute("SELECT name, payload FROM movie_lists")
+    lists = {row[0]: row[1] for row in cursor.fetchall()}
+    return CatalogSnapshot(movies, lists)
+
+
+class MovieCatalog:
+    def __init__(self, loader=None):
+        self._loader = loader or self._load_from_db
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._stale = True
+        self._loading = False
+        self._failed_at = None
+
+    def snapshot(self):
+        """
+        Aktueller Schnappschuss. Der erste Aufruf lädt synchron, danach wird nach einer
+        Änderungsmeldung im Hintergrund neu geladen. Ist die Datenbank nicht erreichbar,
+        gibt es einen leeren Schnappschuss (die Aufrufer fragen dann TMDB direkt).
+        """
+        hub.ensure_listener()
+        snapshot = self._snapshot
+        if not self._stale:
+            return snapshot
+        if snapshot is None:
+            return self._reload() or CatalogSnapshot()
+        self._reload_in_background()
+        return snapshot
+
+    def invalidate(self, payload=None):
+        self._stale = True
+
+    def _reload_in_background(self):
+        with self._lock:
+            if self._loading or self._backing_off():
+                return
+        threading.Thread(target=self._reload, name='movie-catalog', daemon=True).start()
+
+    def _reload(self):
+        with self._lock:
+            if self._loading or self._backing_off():
+                return self._snapshot
+            self._loading = True
+            # Meldungen während des Ladens lösen ein erneutes Laden aus
+            self._stale = False
+        try:
+            snapshot = self._loader()
+        except Exception as e:
+            print(f"Fehler beim Laden des Filmkatalogs: {e}")
+            with self._lock:
+                self._stale = True
+                self._failed_at = time.monotonic()
+                self._loading = False
+            return self._snapshot
+        with self._lock:
+            self._snapshot = snapshot
+            self._failed_at = None
+            self._loading = False
+        return snapshot
+
+    def _backing_off(self):
+        return self._failed_at is not None and time.monotonic() - self._failed_at < RETRY_AFTER
+
+    @staticmethod
+    def _load_from_db():
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                return load_snapshot(cursor)
+
+
+movie_catalog = MovieCatalog()
+hub.subscribe(CATALOG_CHANNEL, movie_catalog.invalidate)
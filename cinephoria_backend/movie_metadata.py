@@ -0,0 +1,80 @@
+# cinephoria_backend/movie_metadata.py
+#
+# Titel und Poster für eine Menge von movie_ids. Gelesen wird aus dem Katalog-Spiegel movies
+# (migrations/003_movie_catalog.sql); nur Filme, die dort noch fehlen, werden parallel bei TMDB
+# geholt und anschließend gespeichert. Im Normalfall braucht die Buchungshistorie also keinen
+# einzigen TMDB-Aufruf.
+import psycopg2.extras
+
+from cinephoria_backend.config import TMDB_API_URL, get_db_connection
+from cinephoria_backend.tmdb import tmdb_client, DETAILS_TTL
+
+POSTER_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+
+def movie_info(title, poster_path):
+    return {
+        'title': title,
+        'poster_url': f"{POSTER_BASE_URL}{poster_path}" if poster_path else None
+    }
+
+
+def load_movie_metadata(cursor, movie_ids):
+    """Gespeicherte Metadaten als {movie_id: {'title', 'poster_url'}}; fehlende Filme fehlen im Ergebnis."""
+    if not movie_ids:
+        return {}
+    cursor.execute("""
+        SELECT movie_id, title, poster_path
+        FROM movies
+        WHERE movie_id = ANY(%s)
+    """, (list(movie_ids),))
+    return {row[0]: movie_info(row[1], row[2]) for row in cursor.fetchall()}
+
+
+def fetch_movie_metadata(movie_ids):
+    """Holt die Filme parallel von TMDB. Gibt {movie_id: (title, poster_path)} für alle Treffer zurück."""
+    movie_ids = list(movie_ids)
+    urls = [f"{TMDB_API_URL}/{movie_id}?language=de-DE" for movie_id in movie_ids]
+    fetched = {}
+    for movie_id, response in zip(movie_ids, tmdb_client.get_many(urls, *DETAILS_TTL)):
+        if response.status_code == 200:
+            data = response.json()
+            fetched[movie_id] = (data.get('title'), data.get('poster_path'))
+        else:
+            print(f"Filmdetails für {movie_id} nicht verfügbar: {response.status_code}")
+    return fetched
+
+
+def store_movie_metadata(cursor, fetched):
+    psycopg2.extras.execute_values(cursor, """
+        INSERT INTO movies (movie_id, title, poster_path)
+        VALUES %s
+        ON CONFLICT (movie_id) DO UPDATE
+        SET title = EXCLUDED.title, poster_path = EXCLUDED.poster_path, updated_at = NOW()
+    """, [(movie_id, title, poster_path) for movie_id, (title, poster_path) in fetched.items()])
+
+
+def complete_movie_metadata(known, movie_ids):
+    """
+    Ergänzt known (Ergebnis von load_movie_metadata) um die fehlenden Filme.
+    Außerhalb der Datenbank-Transaktion aufrufen, damit während der TMDB-Aufrufe
+    keine Verbindung aus dem Pool belegt ist. Nicht auffindbare Filme bekommen
+    title/poster_url None und werden beim nächsten Mal erneut versucht.
+    """
+    missing = [movie_id for movie_id in movie_ids if movie_id not in known]
+    if not missing:
+        return known
+
+    fetched = fetch_movie_metadata(missing)
+    for movie_id in missing:
+        known[movie_id] = movie_info(*fetched.get(movie_id, (None, None)))
+
+    if fetched:
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    store_movie_metadata(cursor, fetched)
+        except Exception as e:
+            # Nur ein Cache: die Antwort geht trotzdem raus
+            print(f"Fehler beim Speichern der Filmdaten: {e}")
+    return known
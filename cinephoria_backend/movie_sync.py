@@ -0,0 +1,196 @@
+# cinephoria_backend/movie_sync.py
+#
+# Gleicht den lokalen Filmkatalog (movies, movie_lists) mit TMDB ab:
+#  - now_playing und upcoming werden jedes Mal neu geholt
+#  - Filme aus diesen Listen oder mit kommenden Vorstellungen, die noch nicht gespiegelt sind,
+#    werden vollständig geladen (Details, Freigabe DE, Trailer in einem Aufruf pro Film)
+#  - bereits gespiegelte Filme nur, wenn TMDB sie seit dem letzten Lauf unter /movie/changes meldet
+# Danach bekommen alle Worker per NOTIFY 'movie_catalog_changed' Bescheid (movie_catalog.py).
+#
+# Aufruf: python -m cinephoria_backend.movie_sync [--full] [--loop]
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.extras
+from psycopg2.extras import Json
+
+from cinephoria_backend.config import TMDB_API_URL, MOVIE_SYNC_INTERVAL, get_db_connection
+from cinephoria_backend.movie_catalog import (
+    CATALOG_CHANNEL, now_playing_urls, upcoming_url, merge_now_playing, german_release, trailer_key
+)
+from cinephoria_backend.notifications import hub
+from cinephoria_backend.tmdb import tmdb_client
+
+# Feste Nummer für pg_try_advisory_xact_lock: es läuft immer nur ein Abgleich
+MOVIE_SYNC_LOCK_ID = 4242002
+
+# /movie/changes reicht höchstens 14 Tage zurück; ist der letzte Lauf älter, wird alles erneuert
+CHANGES_WINDOW = timedelta(days=14)
+
+# Gesamtzeit für alle parallelen TMDB-Aufrufe eines Schritts (Sekunden)
+SYNC_TIMEOUT = 60
+
+
+def details_url(movie_id):
+    return f"{TMDB_API_URL}/{movie_id}?language=de-DE&append_to_response=release_dates,videos"
+
+
+def fetch_lists():
+    """Neue Listen-Antworten; eine Liste, die nicht vollständig geladen werden konnte, fehlt im Ergebnis."""
+    lists = {}
+    responses = tmdb_client.get_many(now_playing_urls(), timeout=SYNC_TIMEOUT, cache=False)
+    if all(response.status_code == 200 for response in responses):
+        lists['now_playing'] = merge_now_playing(responses)
+    else:
+        print("now_playing unvollständig, Liste wird nicht aktualisiert")
+
+    response = tmdb_client.get(upcoming_url(), timeout=SYNC_TIMEOUT, cache=False)
+    if response.status_code == 200:
+        lists['upcoming'] = response.json()
+    else:
+        print(f"upcoming nicht verfügbar: {response.status_code}")
+    return lists
+
+
+def fetch_changed_ids(since):
+    """IDs aller Filme, die TMDB seit since geändert hat, oder None, wenn TMDB nicht antwortet."""
+    ids = set()
+    page = 1
+    while True:
+        url = f"{TMDB_API_URL}/changes?start_date={since:%Y-%m-%d}&page={page}"
+        response = tmdb_client.get(url, timeout=SYNC_TIMEOUT, cache=False)
+        if response.status_code != 200:
+            print(f"/movie/changes nicht verfügbar: {response.status_code}")
+            return None
+        data = response.json()
+        ids.update(item['id'] for item in data.get('results', []))
+        if page >= data.get('total_pages', 1):
+            return ids
+        page += 1
+
+
+def fetch_movie_entries(movie_ids):
+    """Gibt {movie_id: (details, release_de, trailer_key)} für alle erfolgreich geladenen Filme zurück."""
+    movie_ids = list(movie_ids)
+    urls = [details_url(movie_id) for movie_id in movie_ids]
+    entries = {}
+    for movie_id, response in zip(movie_ids, tmdb_client.get_many(urls, timeout=SYNC_TIMEOUT, cache=False)):
+        if response.status_code != 200:
+            print(f"Film {movie_id} nicht verfügbar: {response.status_code}")
+            continue
+        details = dict(response.json())
+        release_dates = details.pop('release_dates', None) or {}
+        videos = details.pop('videos', None) or {}
+        entries[movie_id] = (details, german_release(release_dates), trailer_key(videos))
+    return entries
+
+
+def store_movies(cursor, entries, synced_at):
+    psycopg2.extras.execute_values(cursor, """
+        INSERT INTO movies (movie_id, title, poster_path, details, release_de, trailer_key, synced_at)
+        VALUES %s
+        ON CONFLICT (movie_id) DO UPDATE
+        SET title = EXCLUDED.title,
+            poster_path = EXCLUDED.poster_path,
+            details = EXCLUDED.details,
+            release_de = EXCLUDED.release_de,
+            trailer_key = EXCLUDED.trailer_key,
+            synced_at = EXCLUDED.synced_at,
+            updated_at = NOW()
+    """, [
+        (movie_id, details.get('title'), details.get('poster_path'), Json(details),
+         Json(release_de) if release_de is not None else None, key, synced_at)
+        for movie_id, (details, release_de, key) in entries.items()
+    ])
+
+
+def store_lists(cursor, lists, synced_at):
+    psycopg2.extras.execute_values(cursor, """
+        INSERT INTO movie_lists (name, payload, synced_at)
+        VALUES %s
+        ON CONFLICT (name) DO UPDATE
+        SET payload = EXCLUDED.payload, synced_at = EXCLUDED.synced_at
+    """, [(name, Json(payload), synced_at) for name, payload in lists.items()])
+
+
+def try_sync_lock(cursor):
+    cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (MOVIE_SYNC_LOCK_ID,))
+    return cursor.fetchone()[0]
+
+
+def sync_movies(connection=get_db_connection, full=False):
+    """
+    Ein Abgleich. Gibt die Anzahl neu geladener Filme zurück, oder None, wenn gerade ein
+    anderer Prozess abgleicht. Die TMDB-Aufrufe laufen ohne Datenbankverbindung; erst zum
+    Schreiben wird eine Transaktion mit dem Advisory-Lock geöffnet.
+    """
+    started = datetime.now(timezone.utc).replace(tzinfo=None)
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            # Läuft schon ein Abgleich, gar nicht erst bei TMDB laden
+            if not try_sync_lock(cursor):
+                return None
+            cursor.execute("SELECT synced_at FROM movie_sync_state WHERE name = 'changes'")
+            row = cursor.fetchone()
+            since = row[0] if row else None
+            cursor.execute("SELECT movie_id FROM movies WHERE details IS NOT NULL")
+            mirrored = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT DISTINCT movie_id FROM showtimes WHERE start_time >= NOW() - INTERVAL '1 day'")
+            scheduled = {row[0] for row in cursor.fetchall()}
+
+    lists = fetch_lists()
+    wanted = scheduled | {movie['id'] for payload in lists.values() for movie in payload.get('results', [])}
+
+    if full or since is None or started - since > CHANGES_WINDOW:
+        changed = mirrored
+    else:
+        changed = fetch_changed_ids(since)
+
+    entries = fetch_movie_entries(sorted((wanted - mirrored) | (mirrored & (changed or set()))))
+
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            if not try_sync_lock(cursor):
+                return None
+            if entries:
+                store_movies(cursor, entries, started)
+            if lists:
+                store_lists(cursor, lists, started)
+            # Ohne Antwort von /movie/changes beim nächsten Lauf ab demselben Zeitpunkt weitermachen;
+            # hat inzwischen ein neuerer Lauf geschrieben, bleibt dessen Zeitpunkt stehen
+            if changed is not None:
+                cursor.execute("""
+                    INSERT INTO movie_sync_state (name, synced_at) VALUES ('changes', %s)
+                    ON CONFLICT (name) DO UPDATE SET synced_at = EXCLUDED.synced_at
+                    WHERE movie_sync_state.synced_at < EXCLUDED.synced_at
+                """, (started,))
+            if entries or lists:
+                hub.publish(cursor, CATALOG_CHANNEL, '')
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filmkatalog mit TMDB abgleichen")
+    parser.add_argument('--full', action='store_true', help="alle gespiegelten Filme neu laden")
+    parser.add_argument('--loop', action='store_true', help="alle MOVIE_SYNC_INTERVAL Sekunden wiederholen")
+    args = parser.parse_args()
+
+    full = args.full
+    while True:
+        try:
+            count = sync_movies(full=full)
+            if count is None:
+                print("Abgleich läuft bereits in einem anderen Prozess")
+            else:
+                print(f"Filmkatalog abgeglichen: {count} Filme aktualisiert")
+            full = False
+        except Exception as e:
+            print(f"Fehler beim Abgleich des Filmkatalogs: {e}")
+        if not args.loop:
+            break
+        time.sleep(MOVIE_SYNC_INTERVAL)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# cinephoria_backend/notifications.py
+#
+# Eine LISTEN-Verbindung pro Prozess, die Postgres-NOTIFYs an registrierte Handler verteilt
+# (Layout-Cache, Sitzstatus-Stream, ...). Ohne DATABASE_URL oder solange der Listener nicht
+# verbunden ist, werden mit publish() verschickte Nachrichten direkt im Prozess zugestellt.
+import os
+import select
+import threading
+import time
+
+import psycopg2
+
+from cinephoria_backend import config
+
+
+class NotificationHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}          # channel -> [handler]
+        self._listening = set()      # Kanäle, auf denen die aktuelle Verbindung lauscht
+        self._listener_pid = None
+
+    def subscribe(self, channel, handler):
+        """
+        Registriert handler(payload) für channel. Nach einem (Wieder-)Verbindungsaufbau
+        wird handler(None) aufgerufen, da in der Zwischenzeit Nachrichten verloren sein können.
+        """
+        with self._lock:
+            self._handlers.setdefault(channel, []).append(handler)
+
+    def unsubscribe(self, channel, handler):
+        with self._lock:
+            handlers = self._handlers.get(channel, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def publish(self, cursor, channel, payload):
+        # Innerhalb der Transaktion aufrufen: Postgres stellt die Nachricht erst beim Commit zu
+        cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+        if not self.is_listening(channel):
+            self.dispatch(channel, payload)
+
+    def dispatch(self, channel, payload):
+        with self._lock:
+            handlers = list(self._handlers.get(channel, []))
+        for handler in handlers:
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Fehler im Notification-Handler für {channel}: {e}")
+
+    def is_listening(self, channel):
+        return self._listener_pid == os.getpid() and channel in self._listening
+
+    def ensure_listener(self):
+        """Startet den LISTEN-Thread dieses Prozesses (einmal pro Prozess, auch nach fork)."""
+        if self._listener_pid == os.getpid() or not config.DATABASE_URL:
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listening = set()
+        thread = threading.Thread(target=self._listen_forever, args=(config.DATABASE_URL,),
+                                  name='notification-listener', daemon=True)
+        thread.start()
+
+    def _listen_forever(self, dsn):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.autocommit = True
+                backoff = 1
+                while True:
+                    self._listen_new_channels(conn)
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.dispatch(notify.channel, notify.payload)
+            except Exception as e:
+                print(f"Fehler im Notification-Listener: {e}")
+                with self._lock:
+                    channels, self._listening = self._listening, set()
+                if conn is not None:
+                    conn.close()
+                for channel in channels:
+                    self.dispatch(channel, None)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _listen_new_channels(self, conn):
+        with self._lock:
+            pending = [channel for channel in self._handlers if channel not in self._listening]
+        if not pending:
+            return
+        with conn.cursor() as cursor:
+            for channel in pending:
+                cursor.execute(f'LISTEN "{channel}"')
+        with self._lock:
+            self._listening.update(pending)
+        # Vor dem LISTEN verschickte Nachrichten sind verloren
+        for channel in pending:
+            self.dispatch(channel, None)
+
+
+hub = NotificationHub()
@@ -0,0 +1,136 @@
+# cinephoria_backend/passwords.py
+#
+# Passwörter hashen und prüfen im Anwendungsserver statt in Postgres (crypt()/gen_salt('bf')).
+# bcrypt ist absichtlich teuer; bisher lief das auf dem gemeinsamen Datenbankserver und kostete
+# beim Login einen zweiten Round-Trip. Jetzt übernimmt das ein kleiner Prozesspool pro Worker:
+#  - höchstens PASSWORD_HASH_QUEUE Aufträge gleichzeitig (laufend + wartend); ist der Pool voll,
+#    wird sofort mit PasswordHasherBusy abgelehnt statt zu warten (Login-Ansturm => 503)
+#  - bestehende pgcrypto-Hashes ($2a$) prüft bcrypt direkt; beim nächsten Login werden sie
+#    (wie alle Hashes mit zu niedrigen Kosten) neu gehasht, siehe PasswordHasher.needs_rehash()
+#  - pgcrypto kürzt Passwörter auf 72 Byte, bcrypt ab 5.0 nicht mehr: wir kürzen selbst
+#  - die Pool-Prozesse starten per forkserver: ein fork aus dem gthread-Worker heraus würde
+#    Locks anderer Threads im Kind gesperrt lassen. Stirbt ein Pool-Prozess (OOM-Kill),
+#    wird der Pool verworfen und der Auftrag einmal in einem neuen Pool wiederholt.
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from cinephoria_backend.config import (
+    PASSWORD_HASH_QUEUE, PASSWORD_HASH_ROUNDS, PASSWORD_HASH_TIMEOUT, PASSWORD_HASH_WORKERS
+)
+
+BCRYPT_MAX_BYTES = 72
+
+# $2a$/$2b$/$2y$, Kosten, 53 Zeichen Salt + Hash
+BCRYPT_HASH = re.compile(r'^\$2[aby]\$(\d{2})\$[./A-Za-z0-9]{53}$')
+
+
+class PasswordHasherBusy(Exception):
+    """Alle Plätze im Hashing-Pool sind belegt; der Client soll es gleich noch einmal versuchen."""
+
+
+def _encode(password):
+    return password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+
+
+# Laufen im Pool-Prozess, daher Funktionen auf Modulebene
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('ascii')
+
+
+def _check(password, stored):
+    return bcrypt.checkpw(_encode(password), stored.encode('ascii'))
+
+
+def _process_pool(max_workers):
+    # 'forkserver' gibt es nicht überall (Windows); dort 'spawn'
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+
+
+def is_bcrypt_hash(stored):
+    return bool(stored) and BCRYPT_HASH.match(stored) is not None
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=8, rounds=12, timeout=10,
+                 executor_factory=_process_pool):
+        self.workers = workers
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor_factory = executor_factory
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            # Nach einem fork (gunicorn) gehört der Pool dem Elternprozess
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = self._executor_factory(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Passwort-Pool ausgelastet")
+        release_later = False
+        try:
+            for _ in range(2):
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(fn, *args)
+                    return future.result(timeout=self.timeout)
+                except TimeoutError:
+                    # Der Platz wird erst frei, wenn der Auftrag wirklich fertig ist
+                    future.add_done_callback(lambda _: self._slots.release())
+                    release_later = True
+                    raise PasswordHasherBusy("Passwort-Pool antwortet nicht rechtzeitig")
+                except BrokenProcessPool:
+                    # Ein Pool-Prozess ist gestorben (z. B. OOM-Kill): neuer Pool, einmal wiederholen
+                    print("Passwort-Pool defekt, wird neu gestartet")
+                    self._discard_executor(executor)
+            raise PasswordHasherBusy("Passwort-Pool nicht verfügbar")
+        finally:
+            if not release_later:
+                self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, stored):
+        """Prüft gegen einen bcrypt-Hash (auch von pgcrypto). Wirft ValueError bei anderen Formaten."""
+        if not is_bcrypt_hash(stored):
+            raise ValueError("Kein bcrypt-Hash")
+        return self._run(_check, password, stored)
+
+    def needs_rehash(self, stored):
+        """True für Hashes, die nicht von uns ($2b$) stammen oder zu billig sind."""
+        match = BCRYPT_HASH.match(stored or '')
+        return match is None or not stored.startswith('$2b$') or int(match.group(1)) < self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_QUEUE,
+    rounds=PASSWORD_HASH_ROUNDS,
+    timeout=PASSWORD_HASH_TIMEOUT,
+)
@@ -0,0 +1,136 @@
+# cinephoria_backend/paypal_token.py
+#
+# PayPal-Access-Token (client_credentials) pro Prozess zwischenspeichern.
+# PayPal-Tokens gelten mehrere Stunden (expires_in); bisher wurde vor jeder Order und jedem
+# Capture ein neuer geholt. Kurz vor Ablauf wird im Hintergrund erneuert, gleichzeitige
+# Checkouts teilen sich einen einzigen Abruf.
+import os
+import threading
+import time
+
+from cinephoria_backend.http_client import http
+
+
+class PayPalTokenError(Exception):
+    pass
+
+
+def request_access_token(api_base, client_id, client_secret):
+    """Holt einen neuen Token. Gibt (access_token, expires_in) zurück."""
+    # Ein zweiter Token-Abruf schadet nicht, daher darf wiederholt werden
+    response = http.post(
+        f"{api_base}/v1/oauth2/token",
+        headers={
+            "Accept": "application/json",
+            "Accept-Language": "en_US",
+        },
+        data={"grant_type": "client_credentials"},
+        auth=(client_id, client_secret),
+        idempotent=True,
+    )
+    if response.status_code == 200:
+        data = response.json()
+        return data['access_token'], int(data.get('expires_in') or 0)
+    else:
+        print(response.json())
+        raise PayPalTokenError('Failed to obtain PayPal access token')
+
+
+class PayPalTokenManager:
+    def __init__(self, fetch, refresh_before=300, min_lifetime=60, clock=time.monotonic):
+        """
+        fetch(): liefert (access_token, expires_in).
+        refresh_before: so viele Sekunden vor Ablauf wird im Hintergrund erneuert.
+        min_lifetime: Tokens, die kürzer gelten, werden nicht mehr ausgegeben.
+        """
+        self._fetch = fetch
+        self.refresh_before = refresh_before
+        self.min_lifetime = min_lifetime
+        self.clock = clock
+        self._lock = threading.Lock()          # schützt Token und Zähler
+        self._refresh_lock = threading.Lock()  # nur ein Abruf gleichzeitig
+        self._token = None
+        self._expires_at = 0
+        self._generation = 0                   # zählt erfolgreiche Abrufe
+        self._refreshing = False
+        self._pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'background_refreshes': 0, 'errors': 0}
+
+    def get_token(self):
+        now = self.clock()
+        with self._lock:
+            if self._pid != os.getpid():
+                # Nach fork: Token darf bleiben, Lock-Zustand nicht
+                self._pid = os.getpid()
+                self._refresh_lock = threading.Lock()
+                self._refreshing = False
+            token, remaining = self._token, self._expires_at - now
+            generation = self._generation
+            if token is not None and remaining > self.min_lifetime:
+                self._stats['hits'] += 1
+                start_background = remaining <= self.refresh_before and not self._refreshing
+                if start_background:
+                    self._refreshing = True
+            else:
+                self._stats['misses'] += 1
+                token = None
+
+        if token is not None:
+            if start_background:
+                threading.Thread(target=self._background_refresh, args=(generation,),
+                                 name='paypal-token', daemon=True).start()
+            return token
+        return self._refresh(generation)
+
+    def invalidate(self):
+        # Z. B. wenn PayPal mit 401 antwortet
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['expires_in'] = max(0, round(self._expires_at - self.clock())) if self._token else 0
+        return stats
+
+    def _refresh(self, generation):
+        with self._refresh_lock:
+            # Wer auf den Lock gewartet hat, bekommt den Token des Vorgängers
+            with self._lock:
+                if self._generation != generation and self._token is not None:
+                    return self._token
+            try:
+                token, expires_in = self._fetch()
+            except Exception:
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise
+            with self._lock:
+                self._token = token
+                self._expires_at = self.clock() + expires_in
+                self._generation += 1
+                self._stats['refreshes'] += 1
+            return token
+
+    def _background_refresh(self, generation):
+        try:
+            self._refresh(generation)
+            with self._lock:
+                self._stats['background_refreshes'] += 1
+        except Exception as e:
+            # Der alte Token gilt noch; beim nächsten Aufruf wird es erneut versucht
+            print(f"PayPal-Token konnte nicht erneuert werden: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+def _create_manager():
+    from cinephoria_backend import config
+    return PayPalTokenManager(lambda: request_access_token(
+        config.PAYPAL_API_BASE, config.PAYPAL_CLIENT_ID, config.PAYPAL_CLIENT_SECRET
+    ))
+
+
+paypal_tokens = _create_manager()
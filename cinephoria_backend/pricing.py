@@ -0,0 +1,150 @@
+# cinephoria_backend/pricing.py
+#
+# Serverseitige Preisberechnung für Warenkorb, create-order und Capture. Der Preis eines
+# Sitzes ergibt sich aus seat_types.price abzüglich des gewählten seat_type_discounts
+# (Prozent und/oder Betrag, nie unter 0) – dieselbe Rechnung wie im Warenkorb des Frontends.
+# Die Matrix aus Sitztyp-Preisen und Rabatten liegt im Speicher; discounts.py und
+# seat_types.py rufen bei Änderungen publish_pricing_change() auf, über PRICING_CHANNEL
+# verwerfen auch alle anderen gunicorn-Worker ihre Kopie.
+import threading
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+from cinephoria_backend.notifications import hub
+
+PRICING_CHANNEL = 'pricing_changed'
+
+CENT = Decimal('0.01')
+
+SEAT_TYPE_PRICES_QUERY = "SELECT seat_type_id, price FROM seat_types"
+SEAT_TYPE_DISCOUNTS_QUERY = """
+    SELECT seat_type_discount_id, seat_type_id, discount_amount, discount_percentage
+    FROM seat_type_discounts
+"""
+SEAT_TYPES_QUERY = "SELECT seat_id, seat_type_id FROM seats WHERE seat_id = ANY(%s)"
+
+PricedItem = namedtuple('PricedItem', 'seat_id showtime_id seat_type_discount_id base_price price')
+PricedCart = namedtuple('PricedCart', 'items total')
+
+
+class PricingError(ValueError):
+    """Sitz unbekannt oder Rabatt passt nicht zum Sitztyp."""
+
+
+def _decimal(value):
+    return Decimal(str(value)) if value is not None else None
+
+
+class PriceMatrix:
+    """Unveränderliche Preise je Sitztyp und Rabatte je seat_type_discount_id."""
+
+    __slots__ = ('version', 'base_prices', 'discounts')
+
+    def __init__(self, version, base_prices, discounts):
+        self.version = version
+        self.base_prices = base_prices  # seat_type_id -> Decimal
+        self.discounts = discounts      # seat_type_discount_id -> (seat_type_id, amount, percentage)
+
+    def price(self, seat_type_id, seat_type_discount_id=None):
+        """Gibt (Grundpreis, Endpreis) zurück; wirft PricingError bei ungültiger Kombination."""
+        base = self.base_prices.get(seat_type_id)
+        if base is None:
+            raise PricingError(f"Unbekannter Sitztyp {seat_type_id}")
+        if not seat_type_discount_id:
+            return base, base
+
+        discount = self.discounts.get(seat_type_discount_id)
+        if discount is None or discount[0] != seat_type_id:
+            raise PricingError("Ungültiger seat_type_discount_id für den angegebenen Sitzplatz")
+        _, amount, percentage = discount
+        price = base
+        if percentage:
+            price -= base * percentage / 100
+        if amount:
+            price -= amount
+        return base, max(price, Decimal('0')).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PriceMatrixCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._generation = 0
+
+    def get(self, cursor):
+        """Liefert die Matrix aus dem Cache oder lädt sie über den übergebenen Cursor."""
+        with self._lock:
+            if self._matrix is not None:
+                return self._matrix
+            version = self._generation
+
+        cursor.execute(SEAT_TYPE_PRICES_QUERY)
+        base_prices = {row[0]: _decimal(row[1]) for row in cursor.fetchall()}
+        cursor.execute(SEAT_TYPE_DISCOUNTS_QUERY)
+        discounts = {
+            row[0]: (row[1], _decimal(row[2]), _decimal(row[3]))
+            for row in cursor.fetchall()
+        }
+        matrix = PriceMatrix(version, base_prices, discounts)
+
+        with self._lock:
+            # Nur speichern, wenn während des Ladens niemand invalidiert hat
+            if self._generation == version:
+                self._matrix = matrix
+        return matrix
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._matrix = None
+
+
+price_matrix_cache = PriceMatrixCache()
+
+
+def get_price_matrix(cursor):
+    hub.ensure_listener()
+    return price_matrix_cache.get(cursor)
+
+
+def price_cart(cursor, cart_items):
+    """
+    Berechnet die Preise aller cart_items (seat_id, showtime_id, seat_type_discount_id)
+    mit einer Abfrage für die Sitztypen, unabhängig von der Anzahl der Sitze.
+    Gibt PricedCart(items, total) zurück; wirft PricingError bei unbekannten Sitzen/Rabatten.
+    """
+    matrix = get_price_matrix(cursor)
+    seat_ids = list({item.get('seat_id') for item in cart_items})
+    if seat_ids:
+        cursor.execute(SEAT_TYPES_QUERY, (seat_ids,))
+        seat_types = dict(cursor.fetchall())
+    else:
+        seat_types = {}
+
+    items = []
+    for item in cart_items:
+        seat_id = item.get('seat_id')
+        if seat_id not in seat_types:
+            raise PricingError(f"Unbekannter Sitzplatz {seat_id}")
+        discount_id = item.get('seat_type_discount_id')
+        base, price = matrix.price(seat_types[seat_id], discount_id)
+        items.append(PricedItem(seat_id, item.get('showtime_id'), discount_id, base, price))
+    return PricedCart(items, sum((item.price for item in items), Decimal('0.00')))
+
+
+def price_seat(cursor, seat_id, seat_type_discount_id=None):
+    """Preis eines einzelnen Sitzes als PricedItem (z. B. beim Hinzufügen zum Warenkorb)."""
+    item = {'seat_id': seat_id, 'seat_type_discount_id': seat_type_discount_id}
+    return price_cart(cursor, [item]).items[0]
+
+
+def publish_pricing_change(cursor):
+    """
+    Innerhalb der ändernden Transaktion aufrufen: verwirft die lokale Matrix sofort
+    und verschickt eine NOTIFY, die Postgres erst beim Commit an alle Worker zustellt.
+    """
+    price_matrix_cache.invalidate()
+    hub.publish(cursor, PRICING_CHANNEL, '')
+
+
+hub.subscribe(PRICING_CHANNEL, lambda payload: price_matrix_cache.invalidate())
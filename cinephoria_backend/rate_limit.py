@@ -0,0 +1,148 @@
+# cinephoria_backend/rate_limit.py
+#
+# Drosselung der auth-Endpunkte mit Token-Buckets: jeder Schlüssel (IP, E-Mail) hat capacity
+# Marken, die laufend mit rate pro Sekunde nachgefüllt werden (gleitendes Fenster statt fester
+# Minutenblöcke). Jede Anfrage kostet eine Marke; ist keine da, gibt es 429 mit Retry-After –
+# vor jeder Datenbankabfrage und vor dem teuren Passwortvergleich (passwords.py).
+#
+# Speicher austauschbar über RATE_LIMIT_STORE:
+#  - 'memory':   pro Prozess (Standard); bei mehreren gunicorn-Workern gilt das Limit pro Worker
+#  - 'postgres': gemeinsam für alle Worker, ein UPSERT pro Prüfung (migrations/008_rate_limits.sql)
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from cinephoria_backend.config import get_db_connection
+
+# Ergebnis einer Prüfung; retry_after in Sekunden, 0 wenn erlaubt
+Decision = namedtuple('Decision', 'allowed retry_after')
+
+# Bucket-Parameter: capacity Marken, nachgefüllt mit per_minute Marken pro Minute
+Limit = namedtuple('Limit', 'name capacity per_minute')
+
+
+def _retry_after(missing, rate):
+    return missing / rate if rate > 0 else 60.0
+
+
+class MemoryBucketStore:
+    """Buckets im Speicher, begrenzt auf max_entries (der am längsten unbenutzte fliegt raus)."""
+
+    def __init__(self, max_entries=10000, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (Marken, Zeitpunkt)
+
+    def take(self, key, capacity, rate, cost=1):
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return Decision(True, 0)
+        return Decision(False, _retry_after(cost - tokens, rate))
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Nachfüllen und Abbuchen in einer Anweisung; keine Zeile zurück heißt: nicht genug Marken
+TAKE_QUERY = """
+    INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at)
+    VALUES (%(key)s, %(capacity)s - %(cost)s, clock_timestamp())
+    ON CONFLICT (bucket_key) DO UPDATE
+        SET tokens = LEAST(%(capacity)s, b.tokens
+                           + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s) - %(cost)s,
+            updated_at = clock_timestamp()
+        WHERE LEAST(%(capacity)s, b.tokens
+                    + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s) >= %(cost)s
+    RETURNING tokens
+"""
+
+TOKENS_QUERY = """
+    SELECT LEAST(%(capacity)s, tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * %(rate)s)
+    FROM rate_limit_buckets
+    WHERE bucket_key = %(key)s
+"""
+
+# Volle Buckets sind gleichbedeutend mit keinem Eintrag
+PRUNE_QUERY = "DELETE FROM rate_limit_buckets WHERE updated_at < NOW() - INTERVAL '1 hour'"
+
+
+class PostgresBucketStore:
+    """Buckets in rate_limit_buckets (UNLOGGED), von allen Workern geteilt."""
+
+    def __init__(self, connection=get_db_connection, prune_every=1000):
+        self._connection = connection
+        self.prune_every = prune_every
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        params = {'key': key, 'capacity': capacity, 'rate': rate, 'cost': cost}
+        with self._lock:
+            self._calls += 1
+            prune = self.prune_every and self._calls % self.prune_every == 0
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                if prune:
+                    cursor.execute(PRUNE_QUERY)
+                cursor.execute(TAKE_QUERY, params)
+                if cursor.fetchone() is not None:
+                    return Decision(True, 0)
+                cursor.execute(TOKENS_QUERY, params)
+                row = cursor.fetchone()
+                tokens = float(row[0]) if row else 0.0
+        return Decision(False, _retry_after(cost - tokens, rate))
+
+    def clear(self):
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM rate_limit_buckets")
+
+
+def hashed_key(prefix, value):
+    # E-Mail-Adressen landen so nicht im Klartext in rate_limit_buckets
+    digest = hashlib.sha256(value.strip().lower().encode('utf-8')).hexdigest()[:32]
+    return f"{prefix}:{digest}"
+
+
+class RateLimiter:
+    def __init__(self, store):
+        self.store = store
+
+    def check(self, limits):
+        """
+        limits: Liste von (Limit, Schlüssel). Alle Buckets werden belastet; erlaubt ist die
+        Anfrage nur, wenn alle Marken hatten. Fällt der Speicher aus, wird durchgelassen.
+        """
+        retry_after = 0
+        for limit, key in limits:
+            try:
+                decision = self.store.take(f"{limit.name}:{key}", limit.capacity, limit.per_minute / 60)
+            except Exception as e:
+                print(f"Rate-Limit {limit.name} nicht prüfbar: {e}")
+                continue
+            if not decision.allowed:
+                retry_after = max(retry_after, decision.retry_after)
+        if retry_after:
+            return Decision(False, retry_after)
+        return Decision(True, 0)
+
+
+def create_store(kind):
+    if kind == 'postgres':
+        return PostgresBucketStore()
+    if kind == 'memory':
+        return MemoryBucketStore()
+    raise ValueError(f"Unbekannter RATE_LIMIT_STORE: {kind}")
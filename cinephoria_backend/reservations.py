@@ -0,0 +1,326 @@
+# cinephoria_backend/reservations.py
+#
+# Reservierungen (Sitze im Warenkorb) von Usern und Gästen in der Tabelle seat_claims
+# (migrations/006_seat_holds.sql, 007_seat_claims.sql), eindeutig je (showtime_id, seat_id).
+# Gebuchte Sitze stehen dort ebenfalls, als Claim 'booking' ohne Ablauf (bookings.py).
+# Ob ein Sitz frei ist, entscheidet allein der INSERT ... ON CONFLICT: keine Vorab-Prüfung
+# und damit kein Zeitfenster zwischen Prüfung und Eintrag, auch keine Advisory-Locks.
+# Eine abgelaufene Reservierung wird dabei direkt übernommen; die übrigen räumt cart_reaper.py ab.
+# Jede Änderung verlängert alle noch gültigen Reservierungen des Inhabers, im selben Statement.
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from cinephoria_backend.bookings import parse_cart_items
+
+HOLD_MINUTES = 15
+MAX_BATCH_SEATS = 20     # Obergrenze für hold_seats() pro Request
+ALTERNATIVES_PER_SEAT = 3
+
+HOLDER_USER = 'user'
+HOLDER_GUEST = 'guest'
+
+
+class Holder(namedtuple('Holder', 'type id')):
+    """Inhaber einer Reservierung: ein angemeldeter User oder ein Gast (guest_id)."""
+
+    __slots__ = ()
+
+    @classmethod
+    def user(cls, user_id):
+        return cls(HOLDER_USER, str(user_id))
+
+    @classmethod
+    def guest(cls, guest_id):
+        return cls(HOLDER_GUEST, str(guest_id))
+
+
+def hold_deadline():
+    return datetime.now(timezone.utc) + timedelta(minutes=HOLD_MINUTES)
+
+
+# Verlängert die übrigen gültigen Reservierungen des Inhabers (ohne den Sitz des Statements,
+# damit keine Zeile in zwei CTEs zugleich geändert wird)
+_TOUCH_HOLDER = """
+    UPDATE seat_claims
+    SET reserved_until = %(reserved_until)s
+    WHERE holder_type = %(holder_type)s AND holder_id = %(holder_id)s
+      AND reserved_until >= NOW()
+      AND (showtime_id, seat_id) <> (%(showtime_id)s, %(seat_id)s)
+"""
+
+HOLD_SEAT_QUERY = """
+    WITH held AS (
+        INSERT INTO seat_claims (showtime_id, seat_id, holder_type, holder_id, price,
+                                seat_type_discount_id, reserved_until)
+        VALUES (%(showtime_id)s, %(seat_id)s, %(holder_type)s, %(holder_id)s, %(price)s,
+                %(seat_type_discount_id)s, %(reserved_until)s)
+        ON CONFLICT (showtime_id, seat_id) DO UPDATE
+            SET holder_type = EXCLUDED.holder_type,
+                holder_id = EXCLUDED.holder_id,
+                price = EXCLUDED.price,
+                seat_type_discount_id = EXCLUDED.seat_type_discount_id,
+                reserved_until = EXCLUDED.reserved_until,
+                created_at = NOW()
+            WHERE seat_claims.reserved_until < NOW()
+        RETURNING seat_id
+    ),
+    touched AS (""" + _TOUCH_HOLDER + """
+          AND EXISTS (SELECT 1 FROM held)
+    )
+    SELECT seat_id FROM held
+"""
+
+# Mehrere Sitze mit einem mehrzeiligen INSERT; zurück kommen die Sitze, die nicht reserviert
+# werden konnten. Feste Reihenfolge beim Einfügen, damit sich zwei Batches nicht verklemmen.
+HOLD_SEATS_QUERY = """
+    WITH requested AS (
+        SELECT *
+        FROM unnest(%(showtime_ids)s::int[], %(seat_ids)s::int[], %(prices)s::numeric[],
+                    %(discount_ids)s::int[])
+            AS r(showtime_id, seat_id, price, seat_type_discount_id)
+    ),
+    held AS (
+        INSERT INTO seat_claims (showtime_id, seat_id, holder_type, holder_id, price,
+                                seat_type_discount_id, reserved_until)
+        SELECT showtime_id, seat_id, %(holder_type)s, %(holder_id)s, price,
+               seat_type_discount_id, %(reserved_until)s
+        FROM requested
+        ORDER BY showtime_id, seat_id
+        ON CONFLICT (showtime_id, seat_id) DO UPDATE
+            SET holder_type = EXCLUDED.holder_type,
+                holder_id = EXCLUDED.holder_id,
+                price = EXCLUDED.price,
+                seat_type_discount_id = EXCLUDED.seat_type_discount_id,
+                reserved_until = EXCLUDED.reserved_until,
+                created_at = NOW()
+            WHERE seat_claims.reserved_until < NOW()
+        RETURNING showtime_id, seat_id
+    ),
+    touched AS (
+        UPDATE seat_claims
+        SET reserved_until = %(reserved_until)s
+        WHERE holder_type = %(holder_type)s AND holder_id = %(holder_id)s
+          AND reserved_until >= NOW()
+          AND (showtime_id, seat_id) NOT IN (SELECT showtime_id, seat_id FROM requested)
+    )
+    SELECT r.showtime_id, r.seat_id
+    FROM requested r
+    WHERE NOT EXISTS (
+        SELECT 1 FROM held h
+        WHERE h.showtime_id = r.showtime_id AND h.seat_id = r.seat_id
+    )
+    ORDER BY r.showtime_id, r.seat_id
+"""
+
+# Freie Sitze gleichen Typs im selben Saal, nächstgelegene zuerst (erst Reihe, dann Platznummer).
+# Läuft nur nach einem Konflikt, damit der Client nicht blind denselben Sitz erneut versucht.
+ALTERNATIVES_QUERY = """
+    SELECT c.showtime_id, c.seat_id, alt.seat_id
+    FROM unnest(%(showtime_ids)s::int[], %(seat_ids)s::int[]) AS c(showtime_id, seat_id)
+    JOIN seats s ON s.seat_id = c.seat_id
+    CROSS JOIN LATERAL (
+        SELECT a.seat_id,
+               abs(ascii(a.row) - ascii(s.row)) * 1000 + abs(a.number - s.number) AS distance
+        FROM seats a
+        WHERE a.screen_id = s.screen_id
+          AND a.seat_type_id = s.seat_type_id
+          AND a.seat_id <> ALL(%(exclude)s::int[])
+          AND NOT EXISTS (
+              SELECT 1 FROM seat_claims sc
+              WHERE sc.showtime_id = c.showtime_id AND sc.seat_id = a.seat_id
+                AND sc.reserved_until >= NOW()
+          )
+        ORDER BY distance, a.seat_id
+        LIMIT %(limit)s
+    ) alt
+    ORDER BY c.showtime_id, c.seat_id, alt.distance, alt.seat_id
+"""
+
+RELEASE_SEAT_QUERY = """
+    WITH released AS (
+        DELETE FROM seat_claims
+        WHERE showtime_id = %(showtime_id)s AND seat_id = %(seat_id)s
+          AND holder_type = %(holder_type)s AND holder_id = %(holder_id)s
+        RETURNING seat_id
+    ),
+    touched AS (""" + _TOUCH_HOLDER + """
+    )
+    SELECT COUNT(*) FROM released
+"""
+
+CLEAR_HOLDS_QUERY = """
+    DELETE FROM seat_claims
+    WHERE holder_type = %(holder_type)s AND holder_id = %(holder_id)s
+"""
+
+SET_DISCOUNT_QUERY = """
+    UPDATE seat_claims
+    SET seat_type_discount_id = %(seat_type_discount_id)s
+    WHERE showtime_id = %(showtime_id)s AND seat_id = %(seat_id)s
+      AND holder_type = %(holder_type)s AND holder_id = %(holder_id)s
+      AND reserved_until >= NOW()
+    RETURNING seat_id
+"""
+
+LOAD_HOLDS_QUERY = """
+    SELECT seat_id, price, reserved_until, showtime_id, seat_type_discount_id
+    FROM seat_claims
+    WHERE holder_type = %(holder_type)s AND holder_id = %(holder_id)s
+      AND reserved_until >= NOW()
+    ORDER BY created_at, hold_id
+"""
+
+
+def _params(holder, **params):
+    params['holder_type'] = holder.type
+    params['holder_id'] = holder.id
+    return params
+
+
+def hold_seat(cursor, holder, showtime_id, seat_id, price, seat_type_discount_id=None):
+    """
+    Reserviert den Sitz für holder. Gibt reserved_until zurück, oder None, wenn der Sitz
+    schon (gültig) reserviert ist – auch vom selben Inhaber. Der Aufrufer committet.
+    """
+    reserved_until = hold_deadline()
+    cursor.execute(HOLD_SEAT_QUERY, _params(
+        holder,
+        showtime_id=showtime_id,
+        seat_id=seat_id,
+        price=price,
+        seat_type_discount_id=seat_type_discount_id,
+        reserved_until=reserved_until,
+    ))
+    if cursor.fetchone() is None:
+        return None
+    return reserved_until
+
+
+def validate_batch(seats):
+    """
+    Prüft die Sitzliste eines Batch-Requests ([{showtime_id, seat_id, seat_type_discount_id}]).
+    Wirft ValueError mit einer Meldung für den Client.
+    """
+    if not seats or not isinstance(seats, list):
+        raise ValueError("seats ist erforderlich")
+    if len(seats) > MAX_BATCH_SEATS:
+        raise ValueError(f"Höchstens {MAX_BATCH_SEATS} Sitzplätze pro Anfrage")
+    if not all(isinstance(seat, dict) for seat in seats):
+        raise ValueError("Jedes cart_item braucht seat_id und showtime_id")
+    parse_cart_items(seats)
+
+
+def hold_seats(cursor, holder, priced_items):
+    """
+    Reserviert mehrere Sitze (pricing.PricedItem mit showtime_id) in einem Statement.
+    Gibt (reserved_until, konflikte) zurück; konflikte ist eine Liste von (showtime_id, seat_id).
+    Bei Konflikten muss der Aufrufer zurückrollen, damit keiner der Sitze reserviert bleibt.
+    Wirft ValueError, wenn ein Sitz doppelt vorkommt.
+    """
+    keys = [(item.showtime_id, item.seat_id) for item in priced_items]
+    if len(set(keys)) != len(keys):
+        raise ValueError("Jeder Sitzplatz darf nur einmal vorkommen")
+
+    reserved_until = hold_deadline()
+    cursor.execute(HOLD_SEATS_QUERY, _params(
+        holder,
+        showtime_ids=[item.showtime_id for item in priced_items],
+        seat_ids=[item.seat_id for item in priced_items],
+        prices=[item.base_price for item in priced_items],
+        discount_ids=[item.seat_type_discount_id for item in priced_items],
+        reserved_until=reserved_until,
+    ))
+    conflicts = [(row[0], row[1]) for row in cursor.fetchall()]
+    return reserved_until, conflicts
+
+
+def find_alternatives(cursor, conflicts, exclude=(), limit=ALTERNATIVES_PER_SEAT):
+    """
+    Schlägt zu jedem belegten Sitz (showtime_id, seat_id) bis zu limit freie Sitze vor.
+    exclude: weitere seat_ids, die nicht vorgeschlagen werden sollen (z. B. der Rest des Batches).
+    Gibt {(showtime_id, seat_id): [seat_id, ...]} zurück; eine Abfrage für alle Konflikte.
+    """
+    if not conflicts:
+        return {}
+    # IDs aus dem Request-JSON können Strings sein, die Abfrage liefert ints
+    conflicts = [(int(showtime_id), int(seat_id)) for showtime_id, seat_id in conflicts]
+    cursor.execute(ALTERNATIVES_QUERY, {
+        'showtime_ids': [showtime_id for showtime_id, _ in conflicts],
+        'seat_ids': [seat_id for _, seat_id in conflicts],
+        'exclude': sorted({seat_id for _, seat_id in conflicts} | set(exclude)),
+        'limit': limit,
+    })
+    alternatives = {conflict: [] for conflict in conflicts}
+    for showtime_id, seat_id, alternative in cursor.fetchall():
+        alternatives[(showtime_id, seat_id)].append(alternative)
+    return alternatives
+
+
+def conflicts_to_dict(conflicts, alternatives=None):
+    alternatives = alternatives or {}
+    return [
+        {
+            'showtime_id': showtime_id,
+            'seat_id': seat_id,
+            'alternatives': alternatives.get((showtime_id, seat_id), [])
+        } for showtime_id, seat_id in conflicts
+    ]
+
+
+def held_seats_to_dict(priced_items):
+    return [
+        {
+            'seat_id': item.seat_id,
+            'showtime_id': item.showtime_id,
+            'price': float(item.base_price),
+            'seat_type_discount_id': item.seat_type_discount_id
+        } for item in priced_items
+    ]
+
+
+def release_seat(cursor, holder, showtime_id, seat_id):
+    """Gibt einen Sitz des Inhabers frei. Gibt True zurück, wenn er reserviert war."""
+    cursor.execute(RELEASE_SEAT_QUERY, _params(
+        holder,
+        showtime_id=showtime_id,
+        seat_id=seat_id,
+        reserved_until=hold_deadline(),
+    ))
+    return cursor.fetchone()[0] > 0
+
+
+def clear_holds(cursor, holder):
+    cursor.execute(CLEAR_HOLDS_QUERY, _params(holder))
+
+
+def set_hold_discount(cursor, holder, showtime_id, seat_id, seat_type_discount_id):
+    """Setzt den Rabatt einer gültigen Reservierung (None entfernt ihn). False, wenn es keine gibt."""
+    cursor.execute(SET_DISCOUNT_QUERY, _params(
+        holder,
+        showtime_id=showtime_id,
+        seat_id=seat_id,
+        seat_type_discount_id=seat_type_discount_id,
+    ))
+    return cursor.fetchone() is not None
+
+
+def load_cart(cursor, holder):
+    """
+    Gültige Reservierungen des Inhabers im Format der /user/cart- und /guest/cart-Antwort.
+    Erwartet einen DictCursor.
+    """
+    cursor.execute(LOAD_HOLDS_QUERY, _params(holder))
+    holds = cursor.fetchall()
+    valid_until = max((hold['reserved_until'] for hold in holds), default=None)
+    return {
+        'valid_until': valid_until.astimezone(timezone.utc).isoformat() if valid_until else None,
+        'cart_items': [
+            {
+                'seat_id': hold['seat_id'],
+                'price': float(hold['price']),
+                'reserved_until': hold['reserved_until'].isoformat(),
+                'showtime_id': hold['showtime_id'],
+                'seat_type_discount_id': hold['seat_type_discount_id']
+            } for hold in holds
+        ]
+    }
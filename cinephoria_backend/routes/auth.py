@@ -1,48 +1,88 @@
 # cinephoria_backend/routes/auth.py
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify
 import jwt
+import math
 from datetime import datetime, timedelta, timezone
 from functools import wraps
-import os
 
 # Importiere die zentralen Konfigurationswerte aus config.py
-from cinephoria_backend.config import DATABASE_URL, SECRET_KEY, get_db_connection
+from cinephoria_backend.config import (
+    ACCESS_TOKEN_MINUTES, AUTH_LOGIN_PER_EMAIL, AUTH_LOGIN_PER_IP, AUTH_REQUESTS_PER_IP, DATABASE_URL,
+    RATE_LIMIT_STORE, REFRESH_REUSE_GRACE, REFRESH_TOKEN_DAYS, SECRET_KEY, TRUSTED_PROXIES, get_db_connection
+)
+from cinephoria_backend.asset_manifest import profile_images
+from cinephoria_backend.auth_context import (
+    AUTH_EXPIRED, AUTH_INVALID, AUTH_MISSING, AUTH_REVOKED, authenticate, current_claims
+)
+from cinephoria_backend.passwords import PasswordHasherBusy, is_bcrypt_hash, password_hasher
+from cinephoria_backend.rate_limit import Limit, RateLimiter, create_store, hashed_key
+from cinephoria_backend.sessions import create_session, revoke_session, rotate_refresh_token
 
 # Erstelle den Blueprint
 auth_bp = Blueprint('auth', __name__)
 
-# Middleware für Token-Validierung
+# Drosselung vor jeder Datenbankarbeit (rate_limit.py). Login und Registrierung zählen
+# pro IP und pro E-Mail, alle übrigen auth-Endpunkte nur großzügig pro IP.
+rate_limiter = RateLimiter(create_store(RATE_LIMIT_STORE))
+CREDENTIAL_ENDPOINTS = {'auth.login', 'auth.register'}
+LOGIN_IP_LIMIT = Limit('login-ip', AUTH_LOGIN_PER_IP, AUTH_LOGIN_PER_IP)
+LOGIN_EMAIL_LIMIT = Limit('login-email', AUTH_LOGIN_PER_EMAIL, AUTH_LOGIN_PER_EMAIL)
+AUTH_IP_LIMIT = Limit('auth-ip', AUTH_REQUESTS_PER_IP, AUTH_REQUESTS_PER_IP)
+
+
+def client_ip():
+    # Hinter TRUSTED_PROXIES Proxies steht die echte Adresse an dieser Stelle von X-Forwarded-For
+    route = request.access_route
+    if TRUSTED_PROXIES and len(route) >= TRUSTED_PROXIES:
+        return route[-TRUSTED_PROXIES]
+    return request.remote_addr or 'unbekannt'
+
+
+@auth_bp.before_request
+def throttle_auth_requests():
+    if request.method == 'OPTIONS':
+        return None
+    ip = client_ip()
+    if request.endpoint in CREDENTIAL_ENDPOINTS:
+        limits = [(LOGIN_IP_LIMIT, ip)]
+        email = (request.get_json(silent=True) or {}).get('email')
+        if isinstance(email, str) and email.strip():
+            limits.append((LOGIN_EMAIL_LIMIT, hashed_key('email', email)))
+    else:
+        limits = [(AUTH_IP_LIMIT, ip)]
+
+    decision = rate_limiter.check(limits)
+    if not decision.allowed:
+        response = jsonify({'error': 'Zu viele Anfragen, bitte später erneut versuchen'})
+        response.headers['Retry-After'] = str(max(1, math.ceil(decision.retry_after)))
+        return response, 429
+    return None
+
+# Fehlermeldungen zu auth_context.authenticate()
+AUTH_ERRORS = {
+    AUTH_MISSING: 'Token fehlt',
+    AUTH_EXPIRED: 'Token abgelaufen',
+    AUTH_INVALID: 'Ungültiges Token',
+    AUTH_REVOKED: 'Sitzung beendet',
+}
+
+# Middleware für Token-Validierung; der Token wird pro Request nur einmal geprüft (auth_context.py)
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'Token fehlt'}), 401
-        try:
-            decoded = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            request.user = decoded  # Speichere die Nutzerdaten in request.user
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token abgelaufen'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Ungültiges Token'}), 401
+        claims, error = authenticate()
+        if error:
+            return jsonify({'error': AUTH_ERRORS[error]}), 401
+        request.user = claims  # Speichere die Nutzerdaten in request.user
         return f(*args, **kwargs)
     return decorated
 
 def token_optional(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if token:
-            try:
-                decoded = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-                request.user = decoded  # Speichere die Nutzerdaten in request.user
-            except jwt.ExpiredSignatureError:
-                request.user = None
-            except jwt.InvalidTokenError:
-                request.user = None
-        else:
-            request.user = None  # Kein Token vorhanden
+        # Kein, abgelaufener oder ungültiger Token: None
+        request.user = current_claims()
         return f(*args, **kwargs)
     return decorated
 
@@ -60,22 +100,80 @@ def admin_required(f):
 # Token Validierung Endpunkt
 @auth_bp.route('/validate-token', methods=['POST'])
 def validate_token():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Token fehlt'}), 401
+    decoded, error = authenticate()
+    if error:
+        return jsonify({'error': AUTH_ERRORS[error]}), 401
+    return jsonify({
+        'user_id': decoded['user_id'],
+        'first_name': decoded.get('first_name', ''),
+        'last_name': decoded.get('last_name', ''),
+        'initials': decoded.get('initials', ''),
+        'role': decoded.get('role', '')
+    }), 200
+
+# Antwort, wenn der Passwort-Pool ausgelastet ist (passwords.py)
+def password_pool_busy():
+    response = jsonify({'error': 'Zu viele Anmeldungen, bitte gleich noch einmal versuchen'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def check_password(password, stored_password):
+    """
+    Prüft das Passwort im Passwort-Pool. Nur Hashes, die bcrypt nicht kennt (z. B. alte
+    md5-Hashes aus pgcrypto), werden noch von der Datenbank geprüft.
+    """
+    if is_bcrypt_hash(stored_password):
+        return password_hasher.verify(password, stored_password)
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT crypt(%s, %s) = %s AS password_match",
+                (password, stored_password, stored_password)
+            )
+            return bool(cursor.fetchone()[0])
+
+
+def upgrade_password_hash(user_id, password, stored_password):
+    """Ersetzt alte oder zu billige Hashes nach erfolgreichem Login; Fehler stören den Login nicht."""
     try:
-        decoded = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return jsonify({
-            'user_id': decoded['user_id'],
-            'first_name': decoded.get('first_name', ''),
-            'last_name': decoded.get('last_name', ''),
-            'initials': decoded.get('initials', ''),
-            'role': decoded.get('role', '')
-        }), 200
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token abgelaufen'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Ungültiges Token'}), 401
+        new_hash = password_hasher.hash(password)
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                # Nur, wenn sich das Passwort inzwischen nicht geändert hat
+                cursor.execute(
+                    "UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                    (new_hash, user_id, stored_password)
+                )
+    except Exception as e:
+        print(f"Passwort-Hash für User {user_id} nicht erneuert: {e}")
+
+
+REFRESH_TOKEN_SECONDS = REFRESH_TOKEN_DAYS * 24 * 60 * 60
+
+
+def issue_tokens(user_id, vorname, nachname, role, session_id, refresh_token):
+    """Antwortdaten mit neuem Access-Token (JWT) für die Sitzung session_id."""
+    initials = f"{vorname[0].upper()}{nachname[0].upper()}"
+    token = jwt.encode({
+        'user_id': user_id,
+        'first_name': vorname,
+        'last_name': nachname,
+        'initials': initials,
+        'role': role,
+        'sid': session_id,
+        'exp': datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    }, SECRET_KEY, algorithm='HS256')
+    return {
+        'token': token,
+        'refresh_token': refresh_token,
+        'expires_in': ACCESS_TOKEN_MINUTES * 60,
+        'first_name': vorname,
+        'last_name': nachname,
+        'initials': initials,
+        'role': role
+    }
+
 
 # Login-Endpunkt
 @auth_bp.route('/login', methods=['POST'])
@@ -88,6 +186,7 @@ def login():
         return jsonify({'error': 'E-Mail und Passwort sind erforderlich'}), 400
 
     try:
+        # Die Verbindung wird vor dem (teuren) Passwortvergleich zurückgegeben
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
@@ -95,43 +194,72 @@ def login():
                     (email,)
                 )
                 result = cursor.fetchone()
-                if not result:
-                    return jsonify({'error': 'Ungültige E-Mail oder Passwort'}), 401
+        if not result:
+            return jsonify({'error': 'Ungültige E-Mail oder Passwort'}), 401
 
-                user_id, stored_password, vorname, nachname, role = result
+        user_id, stored_password, vorname, nachname, role = result
 
-                # Passwortüberprüfung (mithilfe der PostgreSQL crypt()-Funktion)
-                cursor.execute(
-                    "SELECT crypt(%s, %s) = %s AS password_match",
-                    (password, stored_password, stored_password)
-                )
-                is_valid = cursor.fetchone()[0]
-
-                if is_valid:
-                    initials = f"{vorname[0].upper()}{nachname[0].upper()}"
-                    token = jwt.encode({
-                        'user_id': user_id,
-                        'first_name': vorname,
-                        'last_name': nachname,
-                        'initials': initials,
-                        'role': role,
-                        'exp': datetime.now(timezone.utc) + timedelta(hours=1)
-                    }, SECRET_KEY, algorithm='HS256')
-                    return jsonify({
-                        'message': 'Login erfolgreich',
-                        'token': token,
-                        'first_name': vorname,
-                        'last_name': nachname,
-                        'initials': initials,
-                        'role': role
-                    }), 200
-                else:
-                    return jsonify({'error': 'Ungültige E-Mail oder Passwort'}), 401
+        # Passwortüberprüfung im Anwendungsserver (passwords.py)
+        is_valid = check_password(password, stored_password)
+
+        if is_valid:
+            # Neue Sitzung mit Refresh-Token (sessions.py)
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    session_id, refresh_token = create_session(cursor, user_id, REFRESH_TOKEN_SECONDS)
+            if password_hasher.needs_rehash(stored_password):
+                upgrade_password_hash(user_id, password, stored_password)
+            data = issue_tokens(user_id, vorname, nachname, role, session_id, refresh_token)
+            return jsonify({'message': 'Login erfolgreich', **data}), 200
+        else:
+            return jsonify({'error': 'Ungültige E-Mail oder Passwort'}), 401
 
+    except PasswordHasherBusy as e:
+        print(f"Login abgewiesen: {e}")
+        return password_pool_busy()
     except Exception as e:
         print(f"Fehler: {e}")
         return jsonify({'error': 'Fehler bei der Anmeldung'}), 500
 
+# Neues Access-Token per Refresh-Token, ohne Passwort; das Refresh-Token wird dabei ersetzt
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    data = request.get_json(silent=True) or {}
+    token = data.get('refresh_token')
+    if not isinstance(token, str) or not token:
+        return jsonify({'error': 'refresh_token ist erforderlich'}), 400
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                session = rotate_refresh_token(cursor, token, REFRESH_TOKEN_SECONDS, REFRESH_REUSE_GRACE)
+        if session is None:
+            return jsonify({'error': 'Ungültiges oder abgelaufenes Refresh-Token'}), 401
+        return jsonify(issue_tokens(
+            session.user_id, session.first_name, session.last_name, session.role,
+            session.session_id, session.refresh_token
+        )), 200
+    except Exception as e:
+        print(f"Fehler beim Erneuern des Tokens: {e}")
+        return jsonify({'error': 'Fehler beim Erneuern des Tokens'}), 500
+
+# Logout: beendet die Sitzung; ihre Access-Tokens gelten ab sofort nicht mehr
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    data = request.get_json(silent=True) or {}
+    token = data.get('refresh_token')
+    if not isinstance(token, str) or not token:
+        return jsonify({'error': 'refresh_token ist erforderlich'}), 400
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                revoke_session(cursor, token)
+        return jsonify({'message': 'Abgemeldet'}), 200
+    except Exception as e:
+        print(f"Fehler beim Abmelden: {e}")
+        return jsonify({'error': 'Fehler beim Abmelden'}), 500
+
 # Registrierungs-Endpunkt
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -152,13 +280,20 @@ def register():
                 if cursor.fetchone():
                     return jsonify({'error': 'Benutzer mit dieser E-Mail existiert bereits'}), 409
 
-                # Passwort hashen mit der PostgreSQL crypt()-Funktion
+        # Passwort hashen im Passwort-Pool (passwords.py), ohne dabei eine Verbindung zu halten
+        password_hash = password_hasher.hash(password)
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
                 cursor.execute(
-                    "INSERT INTO users (vorname, nachname, email, password) VALUES (%s, %s, %s, crypt(%s, gen_salt('bf')))",
-                    (vorname, nachname, email, password)
+                    "INSERT INTO users (vorname, nachname, email, password) VALUES (%s, %s, %s, %s)",
+                    (vorname, nachname, email, password_hash)
                 )
         return jsonify({'message': 'Registrierung erfolgreich'}), 201
 
+    except PasswordHasherBusy as e:
+        print(f"Registrierung abgewiesen: {e}")
+        return password_pool_busy()
     except Exception as e:
         print(f"Fehler bei der Registrierung: {e}")
         return jsonify({'error': 'Fehler bei der Registrierung'}), 500
@@ -222,14 +357,8 @@ def profile():
 
 
 def get_allowed_profile_images():
-    # Nutze current_app.static_folder, falls du das in Blueprints oder in App-Kontexten verwenden möchtest
-    profile_images_dir = os.path.join(current_app.static_folder, 'Profilbilder')
-    try:
-        images = [f for f in os.listdir(profile_images_dir) if os.path.isfile(os.path.join(profile_images_dir, f))]
-        return images
-    except Exception as e:
-        current_app.logger.error(f"Fehler beim Abrufen der Profilbilder: {e}")
-        return []
+    # frozenset aus dem Manifest im Speicher (asset_manifest.py), kein Zugriff aufs Dateisystem
+    return profile_images.names()
 
 
 
@@ -264,8 +393,12 @@ def update_profile_image():
 @token_required
 def list_profile_images():
     try:
-        images = get_allowed_profile_images()
-        return jsonify({'images': images}), 200
+        # Gleiche Liste für alle Nutzer; mit ETag antwortet ein unverändertes Manifest mit 304
+        document = profile_images.document()
+        response = Response(document.body, mimetype='application/json')
+        response.set_etag(document.etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Fehler beim Auflisten der Profilbilder: {e}")
         return jsonify({'error': 'Fehler beim Auflisten der Profilbilder'}), 500
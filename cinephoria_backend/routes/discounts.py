@@ -1,8 +1,10 @@
 # cinephoria_backend/routes/discounts.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 import psycopg2.extras
 from cinephoria_backend.config import get_db_connection
 from cinephoria_backend.routes.auth import admin_required
+from cinephoria_backend.pricing import publish_pricing_change
+from cinephoria_backend.seat_type_catalog import SEAT_TYPE_CATALOG_QUERY, get_seat_type_catalog
 
 discounts_bp = Blueprint('discounts', __name__)
 
@@ -42,7 +44,7 @@ def add_discount():
                 conn.commit()
                 return jsonify({'message': 'Discount hinzugefügt', 'discount_id': discount_id}), 201
     except psycopg2.IntegrityError:
-        conn.rollback()
+        # Rollback erfolgt bereits beim Verlassen des with-Blocks
         return jsonify({'error': 'Discount mit diesem Namen existiert bereits'}), 409
     except Exception as e:
         return jsonify({'error': 'Fehler beim Hinzufügen des Discounts'}), 500
@@ -69,10 +71,12 @@ def update_discount(discount_id):
                 """, (name, description, discount_id))
                 if cursor.rowcount == 0:
                     return jsonify({'error': 'Discount nicht gefunden'}), 404
+                # Name und Beschreibung stehen im Sitztyp-Katalog
+                publish_pricing_change(cursor)
                 conn.commit()
                 return jsonify({'message': 'Discount aktualisiert'}), 200
     except psycopg2.IntegrityError:
-        conn.rollback()
+        # Rollback erfolgt bereits beim Verlassen des with-Blocks
         return jsonify({'error': 'Ein Discount mit diesem Namen existiert bereits'}), 409
     except Exception as e:
         return jsonify({'error': 'Fehler beim Aktualisieren des Discounts'}), 500
@@ -87,6 +91,8 @@ def delete_discount(discount_id):
                 cursor.execute("DELETE FROM discounts WHERE discount_id = %s", (discount_id,))
                 if cursor.rowcount == 0:
                     return jsonify({'error': 'Discount nicht gefunden'}), 404
+                # Zugeordnete seat_type_discounts fallen mit weg
+                publish_pricing_change(cursor)
                 conn.commit()
                 return jsonify({'message': 'Discount gelöscht'}), 200
     except Exception as e:
@@ -129,6 +135,7 @@ def assign_discount_to_seat_type():
                         discount_amount = EXCLUDED.discount_amount,
                         discount_percentage = EXCLUDED.discount_percentage
                 """, (seat_type_id, discount_id, discount_amount, discount_percentage))
+                publish_pricing_change(cursor)
                 conn.commit()
                 return jsonify({'message': 'Discount dem Sitztyp zugewiesen'}), 200
     except Exception as e:
@@ -154,98 +161,41 @@ def remove_discount_from_seat_type():
                 """, (seat_type_id, discount_id))
                 if cursor.rowcount == 0:
                     return jsonify({'error': 'Verknüpfung nicht gefunden'}), 404
+                publish_pricing_change(cursor)
                 conn.commit()
                 return jsonify({'message': 'Discount vom Sitztyp entfernt'}), 200
     except Exception as e:
         return jsonify({'error': 'Fehler beim Entfernen des Discounts vom Sitztyp'}), 500
 
+# Beide Lese-Endpunkte kommen aus dem vorberechneten Katalog (seat_type_catalog.py):
+# ein Speicherzugriff, mit ETag und 304-Unterstützung. Neu gebaut wird nur nach Admin-Änderungen.
+def _load_catalog_rows():
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            cursor.execute(SEAT_TYPE_CATALOG_QUERY)
+            return cursor.fetchall()
+
+
+def _document_response(document):
+    response = Response(document.body, mimetype='application/json')
+    response.set_etag(document.etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
+
+
 @discounts_bp.route('/seat_types_with_discounts', methods=['GET'])  #SucheDis
 def get_seat_types_with_discounts():
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-                cursor.execute("""
-                    SELECT 
-                        st.seat_type_id,
-                        st.name AS seat_type_name,
-                        st.price, 
-                        st.color,
-                        st.icon,
-                        d.discount_id,
-                        d.name AS discount_name,
-                        d.description,
-                        std.discount_amount,
-                        std.discount_percentage,
-                        std.seat_type_discount_id
-                    FROM seat_types st
-                    LEFT JOIN seat_type_discounts std ON st.seat_type_id = std.seat_type_id
-                    LEFT JOIN discounts d ON std.discount_id = d.discount_id
-                    ORDER BY st.seat_type_id
-                """)
-                results = cursor.fetchall()
-
-                seat_types = {}
-                for row in results:
-                    seat_type_id = row['seat_type_id']
-                    if seat_type_id not in seat_types:
-                        seat_types[seat_type_id] = {
-                            'seat_type_id': seat_type_id,
-                            'name': row['seat_type_name'],
-                            'price': float(row['price']),
-                            'color': row['color'],
-                            'icon': row['icon'],
-                            'discounts': []
-                        }
-                    if row['discount_id']:
-                        seat_types[seat_type_id]['discounts'].append({
-                            'discount_id': row['discount_id'],
-                            'name': row['discount_name'],
-                            'description': row['description'],
-                            'discount_amount': float(row['discount_amount']) if row['discount_amount'] else None,
-                            'discount_percentage': float(row['discount_percentage']) if row['discount_percentage'] else None,
-                            'seat_type_discount_id': row['seat_type_discount_id']
-                        })
-
-                seat_types_list = list(seat_types.values())
-
-        return jsonify({'seat_types': seat_types_list}), 200
+        catalog = get_seat_type_catalog(_load_catalog_rows)
     except Exception as e:
         return jsonify({'error': 'Fehler beim Abrufen der Sitztypen mit Discounts'}), 500
-
+    return _document_response(catalog.seat_types)
 
 
 @discounts_bp.route('/discount/<int:seat_type_id>', methods=['GET']) 
 def get_discount_for_seat_type(seat_type_id):
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-                cursor.execute("""
-                    SELECT 
-                        std.discount_id,
-                        std.seat_type_discount_id,
-                        d.name AS discount_name,
-                        d.description,
-                        std.discount_amount,
-                        std.discount_percentage
-                    FROM seat_type_discounts std
-                    JOIN discounts d ON std.discount_id = d.discount_id
-                    WHERE std.seat_type_id = %s
-                """, (seat_type_id,))
-                results = cursor.fetchall()
-
-                discounts = []
-                for row in results:
-                    discounts.append({
-                        'discount_id': row['discount_id'],
-                        'seat_type_discount_id': row['seat_type_discount_id'],
-                        'name': row['discount_name'],
-                        'description': row['description'],
-                        'discount_amount': float(row['discount_amount']) if row['discount_amount'] else None,
-                        'discount_percentage': float(row['discount_percentage']) if row['discount_percentage'] else None
-                    })
-
-        return jsonify({'discounts': discounts}), 200
+        catalog = get_seat_type_catalog(_load_catalog_rows)
     except Exception as e:
         return jsonify({'error': 'Fehler beim Abrufen des Discounts für Sitztyp'}), 500
-
-
+    return _document_response(catalog.discounts_for(seat_type_id))
@@ -4,8 +4,10 @@ import psycopg2
 import psycopg2.extras
 from cinephoria_backend.config import get_db_connection
 from cinephoria_backend.routes.auth import token_required, admin_required
-from cinephoria_backend.config import TMDB_API_URL, HEADERS
-import requests
+from cinephoria_backend.movie_metadata import load_movie_metadata, complete_movie_metadata
+from cinephoria_backend.http_client import http
+from cinephoria_backend.paypal_token import paypal_tokens
+from cinephoria_backend.tmdb import tmdb_client
 
 
 extras_bp = Blueprint('extras', __name__)
@@ -61,24 +63,12 @@ def get_user_bookings():
                 if not bookings:
                     return jsonify({'bookings': []}), 200
 
-                # Sammeln aller eindeutigen movie_ids, um später die Filmdetails abzurufen
+                # Titel und Poster aller eindeutigen movie_ids aus dem Katalog-Spiegel (movies)
                 movie_ids = list({booking['movie_id'] for booking in bookings})
+                movie_details = load_movie_metadata(cursor, movie_ids)
 
-        # Abrufen der Filmdetails von TMDB für jede eindeutige movie_id
-        movie_details = {}
-        for movie_id in movie_ids:
-            movie_response = requests.get(f"{TMDB_API_URL}/{movie_id}?language=de-DE", headers=HEADERS)
-            if movie_response.status_code == 200:
-                movie_data = movie_response.json()
-                movie_details[movie_id] = {
-                    'title': movie_data.get('title'),
-                    'poster_url': f"https://image.tmdb.org/t/p/w500{movie_data.get('poster_path')}" if movie_data.get('poster_path') else None
-                }
-            else:
-                movie_details[movie_id] = {
-                    'title': None,
-                    'poster_url': None
-                }
+        # Noch unbekannte Filme parallel bei TMDB holen (ohne belegte DB-Verbindung)
+        movie_details = complete_movie_metadata(movie_details, movie_ids)
 
         # Aufbau der finalen Buchungsstruktur
         bookings_list = []
@@ -334,3 +324,13 @@ def get_leaderboard():
         return jsonify({'error': 'Fehler beim Abrufen des Leaderboards'}), 500
     
 
+
+@extras_bp.route('/admin/outbound-stats', methods=['GET'])
+@admin_required
+def get_outbound_stats():
+    # Zähler dieses Workers: Verbindungspools (TMDB, PayPal), TMDB-Cache und PayPal-Token
+    return jsonify({
+        'http': http.stats(),
+        'tmdb': tmdb_client.stats(),
+        'paypal_token': paypal_tokens.stats()
+    }), 200
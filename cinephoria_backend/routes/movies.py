@@ -1,33 +1,30 @@
 # routes/movies.py
 from flask import Blueprint, jsonify, request
-import requests
-from cinephoria_backend.config import TMDB_API_URL, HEADERS
+from cinephoria_backend.config import TMDB_API_URL
+from cinephoria_backend.movie_catalog import movie_catalog, fetch_now_playing, upcoming_url, german_release, trailer_key
+from cinephoria_backend.tmdb import tmdb_client, LIST_TTL, DETAILS_TTL, EXTRAS_TTL
 
 
 movies_bp = Blueprint('movies', __name__)
 
+# Alle Endpunkte antworten aus dem lokalen Katalog (movie_catalog.py, befüllt von movie_sync.py).
+# Nur was dort noch fehlt, wird wie bisher direkt bei TMDB abgefragt.
+
 @movies_bp.route('/movies/now_playing', methods=['GET'])
 def get_now_playing():
-    results = []
-    for i in range(1, 6):  # Seiten 1 bis 5 durchlaufen
-        url = f"{TMDB_API_URL}/now_playing?language=de-DE&page={i}&region=DE"
-        response = requests.get(url, headers=HEADERS)
-        
-        if response.status_code == 200:
-            data = response.json()
-            filtered_results = [
-                movie for movie in data['results'] if movie.get('poster_path')
-            ]
-            results.extend(filtered_results)
-        else:
-            print(f"Fehler bei Seite {i}: {response.status_code}")
-    
-    return jsonify({"results": results})
+    now_playing = movie_catalog.snapshot().lists.get('now_playing')
+    if now_playing is None:
+        # Alle Seiten parallel laden; eine langsame Seite wird nach TMDB_PAGE_TIMEOUT ausgelassen
+        now_playing = fetch_now_playing()
+    return jsonify(now_playing)
 
 @movies_bp.route('/movies/upcoming', methods=['GET'])
 def get_upcoming():
-    url = f"{TMDB_API_URL}/upcoming?language=de-DE&page=1&region=DE"
-    response = requests.get(url, headers=HEADERS)
+    upcoming = movie_catalog.snapshot().lists.get('upcoming')
+    if upcoming is not None:
+        return jsonify(upcoming)
+
+    response = tmdb_client.get(upcoming_url(), *LIST_TTL)
     if response.status_code == 200:
         return jsonify(response.json())
     else:
@@ -35,8 +32,12 @@ def get_upcoming():
 
 @movies_bp.route('/movies/<int:movie_id>', methods=['GET'])
 def get_movie_details(movie_id):
+    movie = movie_catalog.snapshot().movies.get(movie_id)
+    if movie is not None:
+        return jsonify(movie.details)
+
     url = f"{TMDB_API_URL}/{movie_id}?language=de-DE"
-    response = requests.get(url, headers=HEADERS)
+    response = tmdb_client.get(url, *DETAILS_TTL)
     if response.status_code == 200:
         return jsonify(response.json())
     else:
@@ -45,48 +46,47 @@ def get_movie_details(movie_id):
 
 @movies_bp.route('/movie/<int:movie_id>/release_dates', methods=['GET'])
 def get_movie_release_dates(movie_id):
-    # URL für die TMDB-API mit der spezifischen Film-ID
-    url = f"{TMDB_API_URL}/{movie_id}/release_dates"
-    
-    # Anfrage an die API senden
-    response = requests.get(url, headers=HEADERS)
-    
-    # Erfolgreiche Antwort zurückgeben
-    if response.status_code == 200:
-        # JSON-Antwort parsen
-        data = response.json()
+    movie = movie_catalog.snapshot().movies.get(movie_id)
+    if movie is not None:
+        release = movie.release_de
+    else:
+        # URL für die TMDB-API mit der spezifischen Film-ID
+        url = f"{TMDB_API_URL}/{movie_id}/release_dates"
         
+        # Anfrage an die API senden
+        response = tmdb_client.get(url, *EXTRAS_TTL)
+        if response.status_code != 200:
+            # Fehler behandeln und Fehlermeldung zurückgeben
+            return jsonify({"error": f"Unable to fetch details for movie ID {movie_id}"}), response.status_code
+
         # Filtere nur den Eintrag mit 'iso_3166_1': 'DE'
-        german_release = next((item for item in data['results'] if item['iso_3166_1'] == 'DE'), None)
-        
-        if german_release:
-            return jsonify(german_release)
-        else:
-            return jsonify({"error": "No release date found for Germany (DE)"}), 404
+        release = german_release(response.json())
+
+    if release:
+        return jsonify(release)
     else:
-        # Fehler behandeln und Fehlermeldung zurückgeben
-        return jsonify({"error": f"Unable to fetch details for movie ID {movie_id}"}), response.status_code
+        return jsonify({"error": "No release date found for Germany (DE)"}), 404
     
 
 @movies_bp.route('/movie/<int:movie_id>/trailer_url', methods=['GET'])
 def get_movie_trailer_url(movie_id):
-    # URL für die TMDB-API mit der spezifischen Film-ID
-    url = f"{TMDB_API_URL}/{movie_id}/videos?language=de-DE"
+    movie = movie_catalog.snapshot().movies.get(movie_id)
+    if movie is not None:
+        key = movie.trailer_key
+    else:
+        # URL für die TMDB-API mit der spezifischen Film-ID
+        url = f"{TMDB_API_URL}/{movie_id}/videos?language=de-DE"
 
-    # Anfrage an die API senden
-    response = requests.get(url, headers=HEADERS)
-    
-    # Erfolgreiche Antwort zurückgeben
-    if response.status_code == 200:
-        data = response.json()
-        
-        # Filtert den Eintrag mit 'type' == 'Trailer' und 'site' == 'YouTube'
-        trailer = next((item for item in data.get('results', []) if item.get('type') == 'Trailer' and item.get('site') == 'YouTube'), None)
-        
-        if trailer and 'key' in trailer:
-            embed_url = f"https://www.youtube.com/embed/{trailer['key']}"
-            return jsonify({"trailer_url": embed_url}), 200
-        else:
-            return jsonify({"error": "No Trailer found."}), 404
+        # Anfrage an die API senden
+        response = tmdb_client.get(url, *EXTRAS_TTL)
+        if response.status_code != 200:
+            return jsonify({"error": f"Unable to fetch Trailer for movie ID {movie_id}"}), response.status_code
+
+        # Erster Eintrag mit 'type' == 'Trailer' und 'site' == 'YouTube'
+        key = trailer_key(response.json())
+
+    if key:
+        embed_url = f"https://www.youtube.com/embed/{key}"
+        return jsonify({"trailer_url": embed_url}), 200
     else:
-        return jsonify({"error": f"Unable to fetch Trailer for movie ID {movie_id}"}), response.status_code
\ No newline at end of file
+        return jsonify({"error": "No Trailer found."}), 404
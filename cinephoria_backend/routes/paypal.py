@@ -1,14 +1,23 @@
 # cinephoria_backend/routes/paypal.py
 import jwt 
 from flask import Blueprint, request, jsonify
-import requests
 import uuid
 from cinephoria_backend.config import (
     PAYPAL_API_BASE,
-    PAYPAL_CLIENT_ID,
-    PAYPAL_CLIENT_SECRET,
+    CHECKOUT_MAX_WAIT,
     get_db_connection
 )
+from psycopg2.extras import RealDictCursor
+from cinephoria_backend.bookings import (
+    SeatsAlreadyBooked, find_claim_conflicts, parse_cart_items, persist_booking
+)
+from cinephoria_backend.checkout import (
+    FINAL_STATES, CheckoutFailed, enqueue_checkout, load_checkout, checkout_to_dict, checkout_waiters,
+    buyer_holder, check_captured_amount, checkout_token, owns_checkout, queue_refund
+)
+from cinephoria_backend.http_client import http
+from cinephoria_backend.paypal_token import paypal_tokens
+from cinephoria_backend.pricing import price_cart
 from cinephoria_backend.routes.auth import token_optional
 import logging
 
@@ -18,28 +27,62 @@ logger = logging.getLogger(__name__)
 paypal_bp = Blueprint('paypal', __name__)
 
 def get_paypal_access_token():
-    response = requests.post(
-        f"{PAYPAL_API_BASE}/v1/oauth2/token",
-        headers={
-            "Accept": "application/json",
-            "Accept-Language": "en_US",
-        },
-        data={"grant_type": "client_credentials"},
-        auth=(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET),
-    )
-    if response.status_code == 200:
-        return response.json()['access_token']
-    else:
-        print(response.json())
-        raise Exception('Failed to obtain PayPal access token')
+    # Zwischengespeicherter Token, siehe paypal_token.py
+    return paypal_tokens.get_token()
+
+def price_checkout(cart_items, holder=None, order_id=None):
+    """
+    Prüft die cart_items und berechnet die Preise serverseitig (pricing.py). Wirft ValueError,
+    bzw. SeatsAlreadyBooked, wenn ein Sitz gebucht oder von jemand anderem reserviert ist.
+    """
+    parse_cart_items(cart_items)
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            priced_cart = price_cart(cursor, cart_items)
+            conflicts = find_claim_conflicts(cursor, holder, priced_cart.items, order_id)
+    if conflicts:
+        raise SeatsAlreadyBooked(conflicts)
+    return priced_cart
+
+def seats_taken_response(e, **extra):
+    return jsonify({
+        "error": "Sitzplatz bereits gebucht oder reserviert",
+        "conflicts": [{"showtime_id": s, "seat_id": t} for s, t in e.seats],
+        **extra
+    }), 409
+
+def checkout_payload(data, priced_cart):
+    """Payload eines Auftrags in checkout_jobs (POST /paypal/checkout, Erstattungen)."""
+    return {
+        'vorname': data.get('vorname'),
+        'nachname': data.get('nachname'),
+        'email': data.get('email'),
+        'total_amount': str(priced_cart.total),
+        'cart_items': data.get('cart_items', []),
+        'guest_id': data.get('guest_id')
+    }
 
 @paypal_bp.route('/paypal/create-order', methods=['POST'])
 def create_paypal_order():
     data = request.get_json()
     total_amount = data.get('total_amount')
+    cart_items = data.get('cart_items')
+
+    if not total_amount and not cart_items:
+        return jsonify({"error": "cart_items oder total_amount ist erforderlich"}), 400
 
-    if not total_amount:
-        return jsonify({"error": "total_amount ist erforderlich"}), 400
+    priced_cart = None
+    if cart_items:
+        # Mit Warenkorb bestimmt der Server den Betrag; total_amount allein nur für ältere Clients,
+        # der Capture prüft den bezahlten Betrag ohnehin gegen die berechneten Preise
+        try:
+            priced_cart = price_checkout(cart_items)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            print("Fehler bei der Preisberechnung:", e)
+            return jsonify({"error": str(e)}), 500
+        total_amount = priced_cart.total
 
     try:
         access_token = get_paypal_access_token()
@@ -60,18 +103,25 @@ def create_paypal_order():
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {access_token}",
+            # Mit PayPal-Request-Id legt PayPal bei einer Wiederholung keine zweite Order an
+            "PayPal-Request-Id": str(uuid.uuid4()),
         }
 
-        response = requests.post(url, json=payload, headers=headers)
+        response = http.post(url, json=payload, headers=headers, idempotent=True)
         
         if response.status_code != 201:
+            if response.status_code == 401:
+                # Token wurde von PayPal verworfen: beim nächsten Aufruf neu holen
+                paypal_tokens.invalidate()
             print("Fehler beim Erstellen der PayPal-Order:", response.text)
             return jsonify({"error": "Failed to create PayPal order"}), 400
 
         order_data = response.json()
         order_id = order_data["id"]
 
-        return jsonify({"orderID": order_id}), 200
+        if priced_cart is None:
+            return jsonify({"orderID": order_id}), 200
+        return jsonify({"orderID": order_id, "total_amount": str(priced_cart.total)}), 200
 
     except Exception as e:
         print("Fehler in create_paypal_order:", e)
@@ -86,101 +136,66 @@ def capture_paypal_order():
     nachname = data.get('nachname')
     email = data.get('email')
     user_id = request.user.get('user_id') if request.user else None
-    total_amount = data.get('total_amount')
+    guest_id = data.get('guest_id')
+    holder = buyer_holder(user_id, guest_id)
     cart_items = data.get('cart_items', [])
 
-    if not order_id or not vorname or not nachname or not email or total_amount is None or not cart_items:
+    if not order_id or not vorname or not nachname or not email or not cart_items:
         return jsonify({"error": "Fehlende Buchungsdaten"}), 400
 
+    # Vor dem Capture prüfen und bepreisen, damit nicht bezahlt wird, was sich nicht buchen lässt.
+    # total_amount des Clients wird nicht mehr verwendet.
+    try:
+        priced_cart = price_checkout(cart_items, holder, order_id)
+    except SeatsAlreadyBooked as e:
+        return seats_taken_response(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print("Fehler bei der Preisberechnung:", e)
+        return jsonify({"error": str(e)}), 500
+
     try:
         access_token = get_paypal_access_token()
         url = f"{PAYPAL_API_BASE}/v2/checkout/orders/{order_id}/capture"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {access_token}",
+            "PayPal-Request-Id": f"capture-{order_id}",
         }
-        response = requests.post(url, headers=headers)
+        response = http.post(url, headers=headers, idempotent=True)
         if response.status_code != 201:
+            if response.status_code == 401:
+                # Token wurde von PayPal verworfen: beim nächsten Aufruf neu holen
+                paypal_tokens.invalidate()
             print("Fehler beim Capturen der PayPal-Order:", response.text)
             return jsonify({"error": "Failed to capture PayPal order"}), 400
 
         capture_data = response.json()
 
         if capture_data.get("status") == "COMPLETED":
-            # Erzeuge QR-Code Tokens oder ähnliches
-            qr_token = str(uuid.uuid4())
-            qr_seite = str(uuid.uuid4())
-
-            with get_db_connection() as conn:
-                with conn.cursor() as cursor:
-                    # Buchung in die bookings-Tabelle eintragen
-                    cursor.execute("""
-                        INSERT INTO bookings (
-                            user_id,
-                            booking_time,
-                            payment_status,
-                            total_amount,
-                            paypal_order_id,
-                            vorname,
-                            nachname,
-                            email,
-                            qr_token,
-                            qr_seite
+            try:
+                check_captured_amount(capture_data, priced_cart)
+            except CheckoutFailed as e:
+                # Bezahlt, aber nicht zum Preis passend: Capture erstatten
+                print(f"Capture {order_id} abgelehnt: {e}")
+                refunded = queue_refund(order_id, user_id, checkout_payload(data, priced_cart), capture_data, str(e))
+                return jsonify({"error": "Bezahlter Betrag passt nicht zum Warenkorb", "refunded": refunded}), 409
+
+            # Buchung, Sitzplätze und Punkte in einem Round-Trip schreiben (bookings.py)
+            try:
+                with get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        booking_id, qr_seite = persist_booking(
+                            cursor, order_id, user_id, vorname, nachname, email, priced_cart, holder
                         )
-                        VALUES (%s, CURRENT_TIMESTAMP, 'completed', %s, %s, %s, %s, %s, %s, %s)
-                        RETURNING booking_id
-                    """, (
-                        user_id, 
-                        total_amount,
-                        order_id,
-                        vorname,
-                        nachname,
-                        email,
-                        qr_token,
-                        qr_seite
-                    ))
-                    booking_id = cursor.fetchone()[0]
-
-                    # Alle zugehörigen Sitzplätze (cart_items) in booking_seats eintragen
-                    for item in cart_items:
-                        seat_id = item.get('seat_id')
-                        showtime_id = item.get('showtime_id')
-                        seat_type_discount_id = item.get('seat_type_discount_id')
-                        if not seat_id or not showtime_id:
-                            conn.rollback()
-                            return jsonify({"error": "Jedes cart_item braucht seat_id und showtime_id"}), 400
-
-                        cursor.execute("""
-                            INSERT INTO booking_seats 
-                                (booking_id, seat_id, showtime_id, seat_type_discount_id)
-                            VALUES (%s, %s, %s, %s)
-                        """, (booking_id, seat_id, showtime_id, seat_type_discount_id))
-                    
-                    # --- Punkte gutschreiben ---
-                    # Hier gehen wir davon aus, dass der total_amount korrekt übergeben wird.
-                    # Falls du auf Nummer sicher gehen möchtest, kannst du alternativ auch
-                    # nochmal über die cart_items anhand der DB-Preise den Gesamtbetrag berechnen.
-                    if user_id is not None:
-                        points_to_add = int(total_amount)  # 1 Euro = 1 Punkt
-
-                        # Update der user_points-Tabelle
-                        cursor.execute("""
-                            UPDATE user_points
-                            SET points = points + %s,
-                                last_updated = CURRENT_TIMESTAMP
-                            WHERE user_id = %s
-                        """, (points_to_add, user_id))
-
-                        # Protokollierung der Punkte-Transaktion
-                        cursor.execute("""
-                            INSERT INTO points_transactions (user_id, points_change, description)
-                            VALUES (%s, %s, %s)
-                        """, (user_id, points_to_add, f'Punkte für Buchung {booking_id}'))
-                    else:
-                        logging.error(f"USER_ID IST NULL: {user_id}")
-
-
-                    conn.commit()
+            except SeatsAlreadyBooked as e:
+                # Bezahlt, aber der Sitz wurde seit der Prüfung vergeben: Capture erstatten
+                print(f"Capture {order_id} abgelehnt: {e}")
+                refunded = queue_refund(order_id, user_id, checkout_payload(data, priced_cart), capture_data, str(e))
+                return seats_taken_response(e, refunded=refunded)
+            if user_id is None:
+                logging.error(f"USER_ID IST NULL: {user_id}")
 
             return jsonify({
                 "message": "Payment captured and booking completed",
@@ -193,3 +208,87 @@ def capture_paypal_order():
     except Exception as e:
         print("Fehler in capture_paypal_order:", e)
         return jsonify({"error": str(e)}), 500
+
+
+# Asynchroner Checkout: der Request legt nur einen Auftrag an (checkout_jobs), Capture und
+# Buchung übernimmt checkout_worker.py. Das Ergebnis fragt der Client über
+# GET /paypal/checkout/<orderID> ab (mit ?wait=Sekunden als Long-Polling). Die Antwort enthält
+# das Ticket (qr_token), daher nur für den Nutzer des Auftrags oder mit dem checkout_token aus
+# POST /paypal/checkout im Header X-Checkout-Token (nicht in der URL, landet sonst in Logs).
+@paypal_bp.route('/paypal/checkout', methods=['POST'])
+@token_optional
+def create_checkout():
+    data = request.get_json()
+    order_id = data.get('orderID')
+    vorname = data.get('vorname')
+    nachname = data.get('nachname')
+    email = data.get('email')
+    user_id = request.user.get('user_id') if request.user else None
+    guest_id = data.get('guest_id')
+    holder = buyer_holder(user_id, guest_id)
+    cart_items = data.get('cart_items', [])
+
+    if not order_id or not vorname or not nachname or not email or not cart_items:
+        return jsonify({"error": "Fehlende Buchungsdaten"}), 400
+
+    try:
+        priced_cart = price_checkout(cart_items, holder, order_id)
+    except SeatsAlreadyBooked as e:
+        return seats_taken_response(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print("Fehler bei der Preisberechnung:", e)
+        return jsonify({"error": str(e)}), 500
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                job = enqueue_checkout(cursor, order_id, user_id, checkout_payload(data, priced_cart))
+    except Exception as e:
+        print("Fehler in create_checkout:", e)
+        return jsonify({"error": str(e)}), 500
+
+    # Wiederholung eines bestehenden Auftrags nur durch denselben Nutzer bzw. mit derselben E-Mail,
+    # sonst bekäme jeder mit der Order-ID den checkout_token und damit das Ticket
+    if not job['created'] and not owns_checkout(job, user_id) and \
+            (job['email'] or '').strip().lower() != email.strip().lower():
+        return jsonify({"error": "Für diese Order existiert bereits ein Checkout"}), 409
+
+    response = checkout_to_dict(job)
+    response['status_url'] = f"/paypal/checkout/{order_id}"
+    response['checkout_token'] = checkout_token(order_id)
+    return jsonify(response), 200 if job['status'] in FINAL_STATES else 202
+
+
+@paypal_bp.route('/paypal/checkout/<order_id>', methods=['GET'])
+@token_optional
+def get_checkout(order_id):
+    user_id = request.user.get('user_id') if request.user else None
+    token = request.headers.get('X-Checkout-Token')
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), CHECKOUT_MAX_WAIT)
+    except ValueError:
+        return jsonify({"error": "wait muss eine Zahl sein"}), 400
+
+    try:
+        with checkout_waiters.waiting(order_id) as done:
+            job = _load_checkout(order_id)
+            # Fremde Aufträge sind nicht von nicht vorhandenen zu unterscheiden
+            if job is None or not owns_checkout(job, user_id, token):
+                return jsonify({"error": "Checkout nicht gefunden"}), 404
+            if job['status'] not in FINAL_STATES and wait > 0:
+                # Ohne belegte DB-Verbindung auf die Meldung des Workers warten
+                if done.wait(wait):
+                    job = _load_checkout(order_id)
+    except Exception as e:
+        print("Fehler in get_checkout:", e)
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(checkout_to_dict(job)), 200
+
+
+def _load_checkout(order_id):
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            return load_checkout(cursor, order_id)
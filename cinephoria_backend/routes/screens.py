@@ -1,7 +1,9 @@
 # cinephoria_backend/routes/screens.py
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response
 from cinephoria_backend.config import get_db_connection
+from cinephoria_backend.layout_cache import ScreenNotFound, get_screen_layout
+from cinephoria_backend.seatmap import compact_layout
 
 screens_bp = Blueprint('screens', __name__)
 
@@ -63,3 +65,22 @@ def get_screens():
         print(f"Fehler: {e}")
         return jsonify({'error': 'Fehler beim Abrufen der Kinosäle'}), 500
 
+
+# Statisches Layout-Dokument eines Saals (kompaktes Sitzplan-Format, siehe seatmap.py).
+# Ändert sich nur über die Sitz-Admin-Endpunkte, daher mit ETag und 304-Unterstützung.
+@screens_bp.route('/screens/<int:screen_id>/layout', methods=['GET'])
+def get_screen_layout_document(screen_id):
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                compact = compact_layout(get_screen_layout(cursor, screen_id))
+
+        response = Response(compact.document, mimetype='application/json')
+        response.set_etag(compact.etag)
+        response.headers['Cache-Control'] = 'public, no-cache'
+        return response.make_conditional(request)
+    except ScreenNotFound:
+        return jsonify({'error': 'Saal nicht gefunden'}), 404
+    except Exception as e:
+        print(f"Fehler: {e}")
+        return jsonify({'error': 'Fehler beim Abrufen des Saal-Layouts'}), 500
@@ -3,6 +3,8 @@
 from flask import Blueprint, jsonify, request
 from cinephoria_backend.config import DATABASE_URL, get_db_connection
 from cinephoria_backend.routes.auth import admin_required
+from cinephoria_backend.layout_cache import publish_layout_change
+from cinephoria_backend.pricing import publish_pricing_change
 
 seat_types_bp = Blueprint('seat_types', __name__)
 
@@ -52,6 +54,7 @@ def add_seat_type():
                     (name, price, color, icon)
                 )
                 seat_type_id = cursor.fetchone()[0]
+                publish_pricing_change(cursor)
                 conn.commit()
                 return jsonify({'message': 'Sitztyp hinzugefügt', 'seat_type_id': seat_type_id}), 201
     except Exception as e:
@@ -102,6 +105,9 @@ def update_seat_type(seat_type_id):
                 if cursor.rowcount == 0:
                     return jsonify({'error': 'Sitztyp nicht gefunden'}), 404
 
+                # Name/Preis/Farbe stecken in den gecachten Layouts aller Säle
+                publish_layout_change(cursor)
+                publish_pricing_change(cursor)
                 conn.commit()
                 return jsonify({'message': 'Sitztyp aktualisiert'}), 200
     except Exception as e:
@@ -120,6 +126,8 @@ def delete_seat_type(seat_type_id):
                 """, (seat_type_id,))
                 if cursor.rowcount == 0:
                     return jsonify({'error': 'Sitztyp nicht gefunden'}), 404
+                publish_layout_change(cursor)
+                publish_pricing_change(cursor)
 
         return jsonify({'message': 'Sitztyp gelöscht'}), 200
 
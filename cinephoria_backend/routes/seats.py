@@ -3,6 +3,7 @@ from flask import Blueprint, jsonify, request
 from cinephoria_backend.config import get_db_connection
 import psycopg2.extras
 from cinephoria_backend.routes.auth import admin_required
+from cinephoria_backend.layout_cache import ScreenNotFound, get_screen_layout, publish_layout_change
 
 seats_bp = Blueprint('seats', __name__)
 
@@ -50,6 +51,7 @@ def create_seat():
                 """, (screen_id, row, number, seat_type_id))
 
                 seat_id = cursor.fetchone()[0]
+                publish_layout_change(cursor, screen_id)
 
         return jsonify({'message': 'Sitz erstellt', 'seat_id': seat_id}), 201
 
@@ -66,9 +68,11 @@ def delete_seat(seat_id):
                 cursor.execute("""
                     DELETE FROM seats
                     WHERE seat_id = %s
+                    RETURNING screen_id
                 """, (seat_id,))
                 if cursor.rowcount == 0:
                     return jsonify({'error': 'Sitz nicht gefunden'}), 404
+                publish_layout_change(cursor, cursor.fetchone()[0])
 
         return jsonify({'message': 'Sitz gelöscht'}), 200
 
@@ -91,6 +95,7 @@ def delete_all_seats():
                     WHERE screen_id = %s
                 """, (screen_id,))
                 # rowcount kann ignoriert werden, da wir alle Sitze löschen
+                publish_layout_change(cursor, screen_id)
 
         return jsonify({'message': 'Alle Sitze gelöscht'}), 200
     except Exception as e:
@@ -106,26 +111,24 @@ def get_seats():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT s.seat_id, s.screen_id, s.row, s.number, st.name AS seat_type_name, st.price
-                    FROM seats s
-                    JOIN seat_types st ON s.seat_type_id = st.seat_type_id
-                    WHERE s.screen_id = %s
-                """, (screen_id,))
-                seats = cursor.fetchall()
+                # Layout aus dem Cache; wird nur nach Admin-Änderungen neu geladen
+                layout = get_screen_layout(cursor, screen_id)
                 seats_list = [
                     {
-                        'seat_id': seat[0],
-                        'screen_id': seat[1],
-                        'row': seat[2],
-                        'number': seat[3],
-                        'type': seat[4],  # seat_type_name
-                        'price': float(seat[5])
-                    } for seat in seats
+                        'seat_id': seat['seat_id'],
+                        'screen_id': seat['screen_id'],
+                        'row': seat['row'],
+                        'number': seat['number'],
+                        'type': seat['seat_type_name'],
+                        'price': float(seat['price'])
+                    } for seat in layout.seats
                 ]
 
         return jsonify({'seats': seats_list}), 200
 
+    except ScreenNotFound:
+        # Wie bisher: unbekannter Saal hat keine Sitze
+        return jsonify({'seats': []}), 200
     except Exception as e:
         print(f"Fehler beim Abrufen der Sitze: {e}")
         return jsonify({'error': 'Fehler beim Abrufen der Sitze'}), 500
@@ -236,6 +239,8 @@ def batch_update_seats():
                     seats_to_delete_tuples = [(seat['row'], seat['number']) for seat in seats_to_delete]
                     cursor.execute(delete_query, (screen_id, tuple(seats_to_delete_tuples)))
 
+                publish_layout_change(cursor, screen_id)
+
                 # Commit der Transaktion
                 conn.commit()
 
@@ -1,12 +1,38 @@
 # cinephoria_backend/routes/showtimes.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
 import jwt
 from psycopg2.extras import DictCursor
-from cinephoria_backend.config import get_db_connection, SECRET_KEY
+from cinephoria_backend.auth_context import authenticate
+from cinephoria_backend.config import SEAT_STREAM_MAX, SECRET_KEY, get_db_connection
 from cinephoria_backend.routes.auth import admin_required
+from cinephoria_backend.layout_cache import get_screen_layout
+from cinephoria_backend.seat_events import format_sse, holder_key, seat_event_broker
+from cinephoria_backend.seatmap import (
+    compact_layout,
+    encode_availability,
+    load_seat_map,
+    load_seat_states,
+    seat_to_dict
+)
 
 showtimes_bp = Blueprint('showtimes', __name__)
 
+# Sekunden ohne Ereignis, nach denen der SSE-Stream einen Keep-Alive-Kommentar schickt
+STREAM_KEEPALIVE = 15
+
+# Jeder offene Stream belegt einen Request-Thread des gthread-Workers. Höchstens SEAT_STREAM_MAX
+# Streams pro Worker, die übrigen Threads bleiben für normale Requests; darüber antwortet der
+# Stream mit 503 und der Client pollt /availability.
+stream_slots = threading.BoundedSemaphore(SEAT_STREAM_MAX)
+
+# EventSource kann keine Header setzen. Statt des Access-Tokens (landet als ?token= in Access-
+# und Proxy-Logs) gibt es ein kurzlebiges Ticket, das nur den Stream einer Vorstellung öffnet.
+STREAM_TICKET_AUDIENCE = 'seat-stream'
+STREAM_TICKET_SECONDS = 60
+
 
 @showtimes_bp.route('/showtimes', methods=['POST'])
 @admin_required
@@ -142,142 +168,170 @@ def update_showtime(showtime_id):
         return jsonify({'error': 'Fehler beim Aktualisieren des Showtimes'}), 500
     
 
-@showtimes_bp.route('/showtimes/<int:showtime_id>/seats', methods=['GET'])
-def get_seats_for_showtime(showtime_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+def get_viewer():
+    """
+    Ermittelt, wer den Sitzplan ansieht: (user_id, guest_id).
+    user_id hat Vorrang (wenn der Token im Authorization-Header gültig ist), sonst wird guest_id verwendet.
+    """
     guest_id = request.args.get('guest_id', None)
-    user_id = None
 
-    # Versuch den Token zu dekodieren, um user_id zu erhalten
-    if token:
-        try:
-            decoded = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            user_id = decoded['user_id']
-        except jwt.ExpiredSignatureError:
-            pass
-        except jwt.InvalidTokenError:
-            pass
-
-    # user_id hat Vorrang (wenn token gültig), sonst guest_id verwenden
-    # Wenn beides None ist, ist der Nutzer anonym ohne guest_id (sollte eigentlich nicht passieren, da guest_id immer generiert wird)
-    
-    # Zuerst abgelaufene Reservierungen löschen
-    with get_db_connection() as conn:
-        with conn.cursor() as cursor:
-           # cursor.execute("DELETE FROM guest_cart_items WHERE reserved_until < NOW()")
-            #cursor.execute("DELETE FROM user_cart_items WHERE reserved_until < NOW()")
-            print('Test')
+    # Abgelaufener oder ungültiger Token: als Gast weiter (auth_context.py)
+    claims = authenticate().claims
+    user_id = claims.get('user_id') if claims else None
+    return user_id, guest_id
+
+
+def get_stream_viewer(showtime_id):
+    """
+    Wie get_viewer(), aber für EventSource: angemeldete Nutzer kommen mit ?ticket= aus
+    POST /showtimes/<id>/seats/stream-ticket. Gibt (user_id, guest_id, error) zurück.
+    """
+    ticket = request.args.get('ticket')
+    guest_id = request.args.get('guest_id', None)
+    if not ticket:
+        return None, guest_id, None
+    try:
+        # Access-Tokens haben kein aud und werden hier abgelehnt, Tickets umgekehrt überall sonst
+        claims = jwt.decode(ticket, SECRET_KEY, algorithms=['HS256'], audience=STREAM_TICKET_AUDIENCE)
+    except jwt.InvalidTokenError:
+        return None, None, 'Ungültiges oder abgelaufenes Stream-Ticket'
+    if claims.get('showtime_id') != showtime_id:
+        return None, None, 'Stream-Ticket gilt nicht für diese Vorstellung'
+    return claims.get('user_id'), guest_id, None
 
+
+@showtimes_bp.route('/showtimes/<int:showtime_id>/seats/stream-ticket', methods=['POST'])
+def create_stream_ticket(showtime_id):
+    claims, error = authenticate()
+    if error:
+        return jsonify({'error': 'Anmeldung erforderlich'}), 401
+    ticket = jwt.encode({
+        'user_id': claims['user_id'],
+        'showtime_id': showtime_id,
+        'aud': STREAM_TICKET_AUDIENCE,
+        'exp': datetime.now(timezone.utc) + timedelta(seconds=STREAM_TICKET_SECONDS)
+    }, SECRET_KEY, algorithm='HS256')
+    return jsonify({'ticket': ticket, 'expires_in': STREAM_TICKET_SECONDS}), 200
+
+
+@showtimes_bp.route('/showtimes/<int:showtime_id>/seats', methods=['GET'])
+def get_seats_for_showtime(showtime_id):
+    user_id, guest_id = get_viewer()
+
+    # Buchungen und beide Warenkörbe werden in einer Abfrage aufgelöst, das Layout kommt aus dem Cache (siehe seatmap.py)
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cursor:
-                # Showtime -> screen_id ermitteln
-                cursor.execute("SELECT screen_id FROM showtimes WHERE showtime_id = %s", (showtime_id,))
-                screen = cursor.fetchone()
-                if not screen:
+                seats = load_seat_map(cursor, showtime_id, user_id=user_id, guest_id=guest_id)
+                if seats is None:
                     return jsonify({'error': 'Showtime nicht gefunden'}), 404
-                screen_id = screen['screen_id']
 
-                # Alle Sitzplätze für diesen Kinosaal holen
-                cursor.execute("""
-                    SELECT s.seat_id, s.row, s.number, st.name AS seat_type_name, st.price, st.color, st.icon, scr.name AS screen_name
-                    FROM seats s
-                    JOIN seat_types st ON s.seat_type_id = st.seat_type_id
-                    JOIN screens scr ON s.screen_id = scr.screen_id
-                    WHERE s.screen_id = %s
-                    ORDER BY s.row, s.number
-                """, (screen_id,))
-                all_seats = cursor.fetchall()
-
-                # Bereits gebuchte Sitzplätze (booking_seats, payment_status=completed)
-                cursor.execute("""
-                    SELECT bs.seat_id 
-                    FROM booking_seats bs
-                    WHERE bs.showtime_id = %s 
-                """, (showtime_id,)) # AND b.payment_status = 'completed'
-                booked_seats = {row['seat_id'] for row in cursor.fetchall()}
-
-                # Reservierte Sitzplätze in user_carts
-                cursor.execute("""
-                    SELECT uci.seat_id, uci.user_id, uc.valid_until
-                    FROM user_cart_items uci
-                    JOIN user_carts uc ON uci.user_id = uc.user_id
-                    WHERE uci.showtime_id = %s 
-                """, (showtime_id,))
-                user_reserved = cursor.fetchall()
-
-                # Reservierte Sitzplätze in guest_carts
-                cursor.execute("""
-                    SELECT gci.seat_id, gci.guest_id, gc.valid_until
-                    FROM guest_cart_items gci
-                    JOIN guest_carts gc ON gci.guest_id = gc.guest_id
-                    WHERE gci.showtime_id = %s
-                """, (showtime_id,))
-                guest_reserved = cursor.fetchall()
-
-                # Sets für Reserved Seats erstellen
-                reserved_by_others = set()
-                reserved_by_self = set()
-
-                # Alle User-Reservierungen durchgehen
-                for r in user_reserved:
-                    sid = r['seat_id']
-                    uid = r['user_id']
-                    if user_id and uid == user_id:
-                        # Gehört dem aktuellen eingeloggten User
-                        reserved_by_self.add(sid)
-                    else:
-                        reserved_by_others.add(sid)
-
-                # Alle Gast-Reservierungen durchgehen
-                for r in guest_reserved:
-                    sid = r['seat_id']
-                    gid = r['guest_id']
-                    if guest_id and gid == guest_id and not user_id:
-                        # Gehört diesem Gast (nicht eingeloggt)
-                        reserved_by_self.add(sid)
-                    else:
-                        reserved_by_others.add(sid)
-
-                seats_list = []
-                for seat in all_seats:
-                    sid = seat['seat_id']
-                    # Reihenfolge der Checks:
-                    # 1. Bereits gebucht -> unavailable
-                    # 2. Von anderen reserviert -> unavailable
-                    # 3. Vom Nutzer selbst reserviert -> verfügbar aber reserved_by_self=true
-                    # 4. Sonst available
-
-                    if sid in booked_seats:
-                        status = 'unavailable'
-                        rbs = False
-                    elif sid in reserved_by_others:
-                        status = 'unavailable'
-                        rbs = False
-                    elif sid in reserved_by_self:
-                        # Sitzplatz gehört dem aktuellen User/Gast
-                        status = 'available'
-                        rbs = True
-                    else:
-                        status = 'available'
-                        rbs = False
-
-                    seats_list.append({
-                        'seat_id': sid,
-                        'row': seat['row'],
-                        'number': seat['number'],
-                        'type': seat['seat_type_name'],
-                        'price': float(seat['price']),
-                        'color': seat['color'] or '#678be0',
-                        'icon': seat['icon'],
-                        'status': status,
-                        'reserved_by_self': rbs,
-                        'screen_name': seat['screen_name']
-                    })
-                    
+        seats_list = [seat_to_dict(seat, state) for seat, state in seats]
         return jsonify({'seats': seats_list}), 200
     except Exception as e:
         print(f"Fehler beim Abrufen der Sitzplätze: {e}")
         return jsonify({'error': 'Fehler beim Abrufen der Sitzplätze'}), 500
 
 
+# Kompakte Alternative zu /seats für das Polling: nur die Status-Bitmap (2 Bit pro Sitz, base64).
+# Das zugehörige Layout liefert /screens/<screen_id>/layout; layout_etag zeigt an, ob es sich geändert hat.
+@showtimes_bp.route('/showtimes/<int:showtime_id>/availability', methods=['GET'])
+def get_availability_for_showtime(showtime_id):
+    user_id, guest_id = get_viewer()
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cursor:
+                result = load_seat_states(cursor, showtime_id, user_id=user_id, guest_id=guest_id)
+                if result is None:
+                    return jsonify({'error': 'Showtime nicht gefunden'}), 404
+                screen_id, states = result
+                compact = compact_layout(get_screen_layout(cursor, screen_id))
+
+        encoded = encode_availability(compact, states)
+        response = jsonify({
+            'showtime_id': showtime_id,
+            'screen_id': screen_id,
+            'layout_etag': compact.etag,
+            'seat_count': compact.size,
+            'states': encoded
+        })
+        # Persönlich (held_by_self), daher private; unverändert => 304
+        response.set_etag(hashlib.sha1(f"{compact.etag}:{encoded}".encode('ascii')).hexdigest())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        print(f"Fehler beim Abrufen der Verfügbarkeit: {e}")
+        return jsonify({'error': 'Fehler beim Abrufen der Verfügbarkeit'}), 500
+
+
+# Server-Sent-Events statt Polling: zuerst ein Snapshot im Format von /availability,
+# danach nur noch Deltas ({"seats": [...], "state": ..., "code": ...}) bei Änderungen.
+# Der Stream hält keine Datenbankverbindung; alle Streams eines Workers teilen sich einen Listener.
+# Angemeldete Nutzer öffnen ihn mit ?ticket= (siehe create_stream_ticket), Gäste mit ?guest_id=.
+@showtimes_bp.route('/showtimes/<int:showtime_id>/seats/stream', methods=['GET'])
+def stream_seats_for_showtime(showtime_id):
+    user_id, guest_id, error = get_stream_viewer(showtime_id)
+    if error:
+        return jsonify({'error': error}), 401
+
+    if not stream_slots.acquire(blocking=False):
+        response = jsonify({
+            'error': 'Zu viele Live-Sitzpläne, bitte die Verfügbarkeit abfragen',
+            'poll_url': f'/showtimes/{showtime_id}/availability'
+        })
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    # Erst abonnieren, dann den Snapshot laden, damit keine Änderung dazwischen verloren geht
+    subscription = seat_event_broker.subscribe(showtime_id, holder_key(user_id, guest_id))
+    finished = threading.Event()
+
+    def finish():
+        # Einmalig: am Ende des Generators oder beim Schließen der Antwort (auch ungestartet)
+        if not finished.is_set():
+            finished.set()
+            seat_event_broker.unsubscribe(subscription)
+            stream_slots.release()
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cursor:
+                result = load_seat_states(cursor, showtime_id, user_id=user_id, guest_id=guest_id)
+                if result is None:
+                    finish()
+                    return jsonify({'error': 'Showtime nicht gefunden'}), 404
+                screen_id, states = result
+                compact = compact_layout(get_screen_layout(cursor, screen_id))
+    except Exception as e:
+        finish()
+        print(f"Fehler beim Öffnen des Sitzplan-Streams: {e}")
+        return jsonify({'error': 'Fehler beim Öffnen des Sitzplan-Streams'}), 500
+
+    snapshot = {
+        'showtime_id': showtime_id,
+        'screen_id': screen_id,
+        'layout_etag': compact.etag,
+        'seat_count': compact.size,
+        'states': encode_availability(compact, states)
+    }
+
+    def events():
+        try:
+            yield format_sse('snapshot', snapshot)
+            while True:
+                event = subscription.get(timeout=STREAM_KEEPALIVE)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event = dict(event)
+                yield format_sse(event.pop('event'), event)
+        finally:
+            finish()
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(finish)
+    return response
@@ -74,7 +74,7 @@ def add_supermarkt_item():
                 conn.commit()
                 return jsonify({'item': new_item_dict}), 201
     except psycopg2.errors.UniqueViolation:
-        conn.rollback()
+        # Rollback erfolgt bereits beim Verlassen des with-Blocks
         return jsonify({'error': 'Ein Artikel mit diesem Barcode existiert bereits'}), 400
     except Exception as e:
         return jsonify({'error': 'Fehler beim Hinzufügen des Supermarkt-Items'}), 500
@@ -135,7 +135,7 @@ def update_supermarkt_item(item_id):
                 else:
                     return jsonify({'error': 'Item nicht gefunden'}), 404
     except psycopg2.errors.UniqueViolation:
-        conn.rollback()
+        # Rollback erfolgt bereits beim Verlassen des with-Blocks
         return jsonify({'error': 'Ein Artikel mit diesem Barcode existiert bereits'}), 400
     except Exception as e:
         return jsonify({'error': 'Fehler beim Aktualisieren des Supermarkt-Items'}), 500
@@ -2,84 +2,39 @@
 # cinephoria_backend/routes/usercart.py
 from flask import Blueprint, jsonify, request
 from cinephoria_backend.config import get_db_connection
+from cinephoria_backend.pricing import PricingError, price_cart, price_seat
+from cinephoria_backend.reservations import (
+    Holder, clear_holds, conflicts_to_dict, find_alternatives, held_seats_to_dict, hold_seat, hold_seats,
+    load_cart, release_seat, set_hold_discount, validate_batch
+)
 from cinephoria_backend.routes.auth import token_required
+from cinephoria_backend.seat_finder import best_seats_to_dict, hold_best_seats, parse_seat_type_id, validate_count
 import psycopg2.extras
-from datetime import datetime, timedelta, timezone
 
 user_cart_bp = Blueprint('user_cart', __name__)
 
 
-def clear_expired_user_cart_items():
-    with get_db_connection() as conn:
-        with conn.cursor() as cursor:
-            delete_sql = """
-                        WITH expired_users AS (
-                            SELECT user_id
-                            FROM user_carts
-                            WHERE valid_until < NOW()
-                        )
+# Die Reservierungen liegen in seat_claims (reservations.py), gemeinsam mit denen der Gäste.
+# Abgelaufene Reservierungen sind unsichtbar und werden von cart_reaper.py abgeräumt.
 
-                        DELETE FROM user_carts
-                        WHERE user_id IN (SELECT user_id FROM expired_users);
-                    """
-            cursor.execute(delete_sql)
-            conn.commit()
 
 @user_cart_bp.route('/user/cart', methods=['GET'])
 @token_required
 def get_user_cart():
-    clear_expired_user_cart_items()
     user_id = request.user.get('user_id')
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-                # Überprüfen, ob der Benutzer einen Warenkorb hat und valid_until abrufen
-                cursor.execute("SELECT user_id, valid_until FROM user_carts WHERE user_id = %s", (user_id,))
-                cart = cursor.fetchone()
-                if cart is None:
-                    valid_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-                    cursor.execute("INSERT INTO user_carts (user_id, valid_until) VALUES (%s, %s)", (user_id, valid_until,))
-                    conn.commit()
-                    cart = {'user_id': user_id, 'valid_until': valid_until}
-                else:
-                    if cart['valid_until'] is None:
-                        valid_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-                        cursor.execute("UPDATE user_carts SET valid_until = %s WHERE user_id = %s", (valid_until, user_id))
-                        conn.commit()
-                        cart['valid_until'] = valid_until
-
-                # Abrufen der Warenkorb-Elemente mit showtime_id
-                cursor.execute("""
-                    SELECT seat_id, price, reserved_until, showtime_id, seat_type_discount_id
-                    FROM user_cart_items
-                    WHERE user_id = %s
-                """, (user_id,))
-                items = cursor.fetchall()
-                cart_items = []
-                for item in items:
-                    cart_items.append({
-                        'seat_id': item['seat_id'],
-                        'price': float(item['price']),
-                        'reserved_until': item['reserved_until'].isoformat(),
-                        'showtime_id': item['showtime_id'],
-                        'seat_type_discount_id': item['seat_type_discount_id']
-                    })
-        return jsonify({
-            'valid_until': cart['valid_until'].astimezone(timezone.utc).isoformat() if cart['valid_until'] else None,
-            'cart_items': cart_items
-        }), 200
+                cart = load_cart(cursor, Holder.user(user_id))
+        return jsonify(cart), 200
     except Exception as e:
         print(f"Fehler beim Abrufen des Warenkorbs: {e}")
         return jsonify({'error': 'Fehler beim Abrufen des Warenkorbs'}), 500
 
 
-
-
-
 @user_cart_bp.route('/user/cart/<int:showtime_id>/<int:seat_id>', methods=['DELETE'])
 @token_required
 def remove_from_user_cart(showtime_id, seat_id):
-    clear_expired_user_cart_items()
     user_id = request.user.get('user_id')
     
     if not showtime_id:
@@ -88,16 +43,8 @@ def remove_from_user_cart(showtime_id, seat_id):
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                valid_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-
-                cursor.execute("""
-                    UPDATE user_carts SET valid_until = %s WHERE user_id = %s
-                """, (valid_until, user_id))
-                # Entfernen des Sitzplatzes mit showtime_id
-                cursor.execute("""
-                    DELETE FROM user_cart_items
-                    WHERE user_id = %s AND seat_id = %s AND showtime_id = %s
-                """, (user_id, seat_id, showtime_id))
+                # Entfernen des Sitzplatzes, die übrigen Reservierungen werden verlängert
+                release_seat(cursor, Holder.user(user_id), showtime_id, seat_id)
                 conn.commit()
         return jsonify({'message': 'Sitzplatz aus dem Warenkorb entfernt'}), 200
     except Exception as e:
@@ -112,77 +59,48 @@ def clear_user_cart():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                valid_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-                cursor.execute("""
-                    UPDATE user_carts SET valid_until = %s WHERE user_id = %s
-                               """, (valid_until, user_id))
                 # Löschen aller Sitzplätze im Warenkorb
-                cursor.execute("""
-                    DELETE FROM user_cart_items
-                    WHERE user_id = %s
-                """, (user_id,))
+                clear_holds(cursor, Holder.user(user_id))
                 conn.commit()
         return jsonify({'message': 'Warenkorb geleert'}), 200
     except Exception as e:
         print(f"Fehler beim Leeren des Warenkorbs: {e}")
         return jsonify({'error': 'Fehler beim Leeren des Warenkorbs'}), 500
-    
-
 
 
 @user_cart_bp.route('/user/cart', methods=['POST'])
 @token_required
 def add_to_user_cart():
-    clear_expired_user_cart_items()
     user_id = request.user.get('user_id')
     data = request.get_json()
     seat_id = data.get('seat_id')
-    price = data.get('price')
     showtime_id = data.get('showtime_id')
     seat_type_discount_id = data.get('seat_type_discount_id')
 
-    if not user_id or not seat_id or price is None or not showtime_id:
-        return jsonify({'error': 'seat_id, price und showtime_id sind erforderlich'}), 400
+    if not user_id or not seat_id or not showtime_id:
+        return jsonify({'error': 'seat_id und showtime_id sind erforderlich'}), 400
 
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                # Sicherstellen, dass der Warenkorb existiert
-                valid_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-                cursor.execute("SELECT user_id FROM user_carts WHERE user_id = %s", (user_id,))
-                if cursor.fetchone() is None:
-                    cursor.execute("INSERT INTO user_carts (user_id, valid_until) VALUES (%s, %s)", (user_id, valid_until,))
-                    conn.commit()
-
-                # Überprüfen, ob der Sitz bereits in guest_cart_items reserviert ist
-                cursor.execute("""
-                    SELECT seat_id FROM guest_cart_items 
-                    WHERE seat_id = %s AND showtime_id = %s
-                """, (seat_id, showtime_id))
-                if cursor.fetchone():
-                    return jsonify({'error': 'Der Sitzplatz ist bereits reserviert'}), 409
-
-                # Reserviere den Sitzplatz
-                reserved_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-
-                # Versuch, den Sitzplatz hinzuzufügen
-                cursor.execute("""
-                    INSERT INTO user_cart_items (user_id, seat_id, price, reserved_until, showtime_id, seat_type_discount_id)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (seat_id, showtime_id) DO NOTHING
-                    RETURNING seat_id
-                """, (user_id, seat_id, price, reserved_until, showtime_id, seat_type_discount_id))
-
-                result = cursor.fetchone()
-
-                if result is None:
-                    # Der Sitzplatz ist bereits reserviert
-                    return jsonify({'error': 'Der Sitzplatz ist bereits reserviert'}), 409
-
-                # Aktualisieren Sie das gültige Ablaufdatum des Warenkorbs
-                cursor.execute("""
-                    UPDATE user_carts SET valid_until = %s WHERE user_id = %s
-                """, (valid_until, user_id))
+                # Grundpreis des Sitztyps kommt vom Server, nicht vom Client (pricing.py)
+                try:
+                    price = price_seat(cursor, seat_id, seat_type_discount_id).base_price
+                except PricingError as e:
+                    return jsonify({'error': str(e)}), 400
+
+                # Reserviere den Sitzplatz; belegt (auch durch einen Gast) heißt None
+                reserved_until = hold_seat(
+                    cursor, Holder.user(user_id), showtime_id, seat_id, price, seat_type_discount_id
+                )
+                if reserved_until is None:
+                    # Freie Sitze in der Nähe mitliefern, statt den Client raten zu lassen
+                    conn.rollback()
+                    alternatives = find_alternatives(cursor, [(showtime_id, seat_id)])
+                    return jsonify({
+                        'error': 'Der Sitzplatz ist bereits reserviert',
+                        'alternatives': next(iter(alternatives.values()))
+                    }), 409
                 conn.commit()
 
         return jsonify({'message': 'Sitzplatz zum Warenkorb hinzugefügt', 'reserved_until': reserved_until.isoformat()}), 201
@@ -191,6 +109,94 @@ def add_to_user_cart():
         print(f"Fehler beim Hinzufügen zum Warenkorb: {e}")
         return jsonify({'error': 'Fehler beim Hinzufügen zum Warenkorb'}), 500
 
+#-->Mehrere Sitze auf einmal (z. B. für eine Familie): alle oder keiner
+@user_cart_bp.route('/user/cart/batch', methods=['POST'])
+@token_required
+def add_seats_to_user_cart():
+    user_id = request.user.get('user_id')
+    data = request.get_json() or {}
+    seats = data.get('seats')
+
+    try:
+        validate_batch(seats)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    # Grundpreise aller Sitze mit einer Abfrage (pricing.py)
+                    priced_cart = price_cart(cursor, seats)
+                    reserved_until, conflicts = hold_seats(cursor, Holder.user(user_id), priced_cart.items)
+                except ValueError as e:
+                    conn.rollback()
+                    return jsonify({'error': str(e)}), 400
+
+                if conflicts:
+                    # Nichts reservieren, wenn nicht alle Sitze frei sind
+                    conn.rollback()
+                    alternatives = find_alternatives(
+                        cursor, conflicts, exclude=[item.seat_id for item in priced_cart.items]
+                    )
+                    return jsonify({
+                        'error': 'Nicht alle Sitzplätze sind verfügbar',
+                        'conflicts': conflicts_to_dict(conflicts, alternatives)
+                    }), 409
+                conn.commit()
+
+        return jsonify({
+            'message': 'Sitzplätze zum Warenkorb hinzugefügt',
+            'reserved_until': reserved_until.isoformat(),
+            'seats': held_seats_to_dict(priced_cart.items)
+        }), 201
+
+    except Exception as e:
+        print(f"Fehler beim Hinzufügen zum Warenkorb: {e}")
+        return jsonify({'error': 'Fehler beim Hinzufügen zum Warenkorb'}), 500
+
+#-->Die besten N Plätze nebeneinander suchen und direkt reservieren (seat_finder.py)
+@user_cart_bp.route('/user/cart/best', methods=['POST'])
+@token_required
+def add_best_seats_to_user_cart():
+    user_id = request.user.get('user_id')
+    data = request.get_json() or {}
+    showtime_id = data.get('showtime_id')
+    count = data.get('count')
+    seat_type_id = data.get('seat_type_id')
+
+    if not showtime_id:
+        return jsonify({'error': 'showtime_id ist erforderlich'}), 400
+    try:
+        validate_count(count)
+        seat_type_id = parse_seat_type_id(seat_type_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+                try:
+                    best = hold_best_seats(cursor, Holder.user(user_id), showtime_id, count, seat_type_id)
+                except ValueError as e:
+                    conn.rollback()
+                    return jsonify({'error': str(e)}), 400
+                if best is None:
+                    return jsonify({'error': 'Showtime nicht gefunden'}), 404
+                if not best.items:
+                    return jsonify({'error': f'Keine {count} freien Sitzplätze nebeneinander'}), 409
+                conn.commit()
+
+        return jsonify({
+            'message': 'Sitzplätze zum Warenkorb hinzugefügt',
+            'reserved_until': best.reserved_until.isoformat(),
+            'seats': best_seats_to_dict(best)
+        }), 201
+
+    except Exception as e:
+        print(f"Fehler beim Suchen der besten Sitzplätze: {e}")
+        return jsonify({'error': 'Fehler beim Suchen der besten Sitzplätze'}), 500
+
 #-->Um den Sitzen im Warenkorb einen Discount (ermäßigung) zu geben
 @user_cart_bp.route('/user/cart/update', methods=['POST'])
 @token_required
@@ -208,38 +214,16 @@ def update_user_cart():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                # Überprüfen, ob der Sitz im Warenkorb des Benutzers existiert
-                cursor.execute("""
-                    SELECT cart_item_id, seat_type_discount_id
-                    FROM user_cart_items
-                    WHERE user_id = %s AND seat_id = %s AND showtime_id = %s
-                """, (user_id, seat_id, showtime_id))
-                cart_item = cursor.fetchone()
-
-                if not cart_item:
-                    return jsonify({'error': 'Der Sitzplatz ist nicht im Warenkorb des Benutzers'}), 404
-
-                cart_item_id, current_discount_id = cart_item
-
                 if seat_type_discount_id:
-                    # Validierung des seat_type_discount_id
-                    cursor.execute("""
-                        SELECT 1 
-                        FROM seat_type_discounts 
-                        WHERE seat_type_discount_id = %s 
-                        AND seat_type_id = (
-                            SELECT seat_type_id FROM seats WHERE seat_id = %s
-                        )
-                    """, (seat_type_discount_id, seat_id))
-                    if not cursor.fetchone():
+                    # Validierung des seat_type_discount_id über die Preismatrix
+                    try:
+                        price_seat(cursor, seat_id, seat_type_discount_id)
+                    except PricingError:
                         return jsonify({'error': 'Ungültiger seat_type_discount_id für den angegebenen Sitzplatz'}), 400
 
                 # Aktualisieren des seat_type_discount_id (kann auch NULL sein)
-                cursor.execute("""
-                    UPDATE user_cart_items
-                    SET seat_type_discount_id = %s
-                    WHERE cart_item_id = %s
-                """, (seat_type_discount_id, cart_item_id))
+                if not set_hold_discount(cursor, Holder.user(user_id), showtime_id, seat_id, seat_type_discount_id):
+                    return jsonify({'error': 'Der Sitzplatz ist nicht im Warenkorb des Benutzers'}), 404
 
                 conn.commit()
 
@@ -247,4 +231,4 @@ def update_user_cart():
 
     except Exception as e:
         print(f"Fehler beim Aktualisieren des Warenkorbs: {e}")
-        return jsonify({'error': 'Fehler beim Aktualisieren des Warenkorbs'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Fehler beim Aktualisieren des Warenkorbs'}), 500
@@ -0,0 +1,117 @@
+# cinephoria_backend/seat_events.py
+#
+# Verteilung von Sitzstatus-Änderungen an die SSE-Streams der Sitzpläne.
+# Die Datenbank meldet jede Änderung an seat_claims und booking_seats über NOTIFY
+# 'seat_state_changed' (migrations/001_seat_state_notify.sql, 006_seat_holds.sql, 007_seat_claims.sql).
+# Pro Prozess gibt es genau einen Listener (notifications.hub), der Broker verteilt an alle
+# Abonnenten der Vorstellung.
+import json
+import queue
+import threading
+
+from cinephoria_backend.notifications import hub
+from cinephoria_backend.seatmap import SEAT_HELD, SEAT_HELD_BY_SELF, STATUS_CODES
+
+SEAT_CHANNEL = 'seat_state_changed'
+
+# Ereignis für einen Abonnenten, der Änderungen verpasst hat und den Sitzplan neu laden muss
+RESYNC = {'event': 'resync'}
+
+
+def holder_key(user_id=None, guest_id=None):
+    # Gleiches Format wie 'holder' in den NOTIFY-Nachrichten
+    if user_id is not None:
+        return f"u:{user_id}"
+    if guest_id:
+        return f"g:{guest_id}"
+    return None
+
+
+class Subscription:
+    def __init__(self, showtime_id, holder, maxsize=256):
+        self.showtime_id = showtime_id
+        self.holder = holder
+        self._queue = queue.Queue(maxsize)
+
+    def get(self, timeout=None):
+        """Nächstes Ereignis oder None, wenn innerhalb von timeout nichts passiert ist."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Zu langsamer Client: ausstehende Deltas verwerfen, er lädt den Sitzplan neu
+            self._drain()
+            try:
+                self._queue.put_nowait(RESYNC)
+            except queue.Full:
+                pass
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class SeatEventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # showtime_id -> set(Subscription)
+
+    def subscribe(self, showtime_id, holder=None):
+        hub.ensure_listener()
+        subscription = Subscription(showtime_id, holder)
+        with self._lock:
+            self._subscriptions.setdefault(showtime_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.showtime_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.showtime_id]
+
+    def subscriber_count(self, showtime_id=None):
+        with self._lock:
+            if showtime_id is not None:
+                return len(self._subscriptions.get(showtime_id, ()))
+            return sum(len(s) for s in self._subscriptions.values())
+
+    def handle_notification(self, payload):
+        if payload is None:
+            # Listener war getrennt: alle Abonnenten müssen neu laden
+            with self._lock:
+                subscriptions = [s for subs in self._subscriptions.values() for s in subs]
+            for subscription in subscriptions:
+                subscription.put(RESYNC)
+            return
+
+        message = json.loads(payload)
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(message['showtime_id'], ()))
+        for subscription in subscriptions:
+            state = message['state']
+            if state == SEAT_HELD and message.get('holder') and message['holder'] == subscription.holder:
+                state = SEAT_HELD_BY_SELF
+            subscription.put({
+                'event': 'seats',
+                'seats': message['seats'],
+                'state': state,
+                'code': STATUS_CODES[state]
+            })
+
+
+seat_event_broker = SeatEventBroker()
+hub.subscribe(SEAT_CHANNEL, seat_event_broker.handle_notification)
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,169 @@
+# cinephoria_backend/seat_finder.py
+#
+# "Beste N Plätze nebeneinander" für eine Vorstellung: statt den Sitzplan zu laden und Sitze
+# einzeln anzuklicken, sucht der Server den besten freien Block und reserviert ihn sofort.
+#
+# Das Raster (Reihen × Platznummern) eines Saals wird einmal aus dem gecachten Layout gebaut
+# und hängt am ScreenLayout, samt fester Bewertung jedes Sitzes. Pro Anfrage kommt nur die
+# Belegung der Vorstellung dazu (eine Abfrage, seatmap.load_seat_states) als bytearray je Reihe;
+# die Suche nach zusammenhängenden freien Plätzen läuft dann im Speicher.
+# Reserviert wird über reservations.hold_seats(): war jemand schneller, wird zurückgerollt
+# und der nächstbeste Block versucht.
+from collections import namedtuple
+
+from cinephoria_backend.layout_cache import get_screen_layout
+from cinephoria_backend.pricing import PricedItem, get_price_matrix
+from cinephoria_backend.reservations import MAX_BATCH_SEATS, hold_seats
+from cinephoria_backend.seatmap import load_seat_states
+
+# Reihen sind nach Bezeichnung sortiert, die erste liegt an der Leinwand. Am besten sitzt man
+# bei etwa zwei Dritteln der Saaltiefe und mittig; eine Reihe Abstand zählt wie zwei Plätze zur Seite.
+IDEAL_ROW_SHARE = 2 / 3
+ROW_WEIGHT = 2
+MAX_HOLD_ATTEMPTS = 3
+
+Cell = namedtuple('Cell', 'seat_id row number seat_type_id score')
+BestSeats = namedtuple('BestSeats', 'reserved_until items cells')
+
+
+class SeatGrid:
+    """Reihen des Saals als Tupel von Cells, nach Platznummer sortiert."""
+
+    __slots__ = ('rows', 'index')
+
+    def __init__(self, rows):
+        self.rows = rows
+        # seat_id -> (Reihenindex, Position in der Reihe)
+        self.index = {
+            cell.seat_id: (row_index, position)
+            for row_index, cells in enumerate(rows)
+            for position, cell in enumerate(cells)
+        }
+
+
+def seat_grid(layout):
+    """Baut das Raster einmalig und hängt es an das gecachte Layout."""
+    if layout.grid is not None:
+        return layout.grid
+
+    by_row = {}
+    for seat in layout.seats:
+        by_row.setdefault(seat['row'], []).append(seat)
+
+    labels = sorted(by_row)
+    ideal_row = round((len(labels) - 1) * IDEAL_ROW_SHARE)
+    rows = []
+    for row_index, label in enumerate(labels):
+        seats = sorted(by_row[label], key=lambda seat: seat['number'])
+        centre = (seats[0]['number'] + seats[-1]['number']) / 2
+        rows.append(tuple(
+            Cell(seat['seat_id'], label, seat['number'], seat['seat_type_id'],
+                 ROW_WEIGHT * abs(row_index - ideal_row) + abs(seat['number'] - centre))
+            for seat in seats
+        ))
+    layout.grid = SeatGrid(rows)
+    return layout.grid
+
+
+def occupancy_grid(grid, states):
+    """Belegung als bytearray je Reihe (1 = nicht frei); states wie aus load_seat_states()."""
+    occupancy = [bytearray(len(cells)) for cells in grid.rows]
+    for seat_id in states:
+        position = grid.index.get(seat_id)
+        if position is not None:
+            occupancy[position[0]][position[1]] = 1
+    return occupancy
+
+
+def find_blocks(grid, occupancy, count, seat_type_id=None):
+    """
+    Alle Blöcke aus count freien Plätzen nebeneinander (lückenlose Nummern, ein Sitztyp),
+    der beste zuerst. seat_type_id schränkt auf einen Sitztyp ein.
+    """
+    blocks = []
+    for row_index, cells in enumerate(grid.rows):
+        taken = occupancy[row_index]
+        run_start = 0
+        for position, cell in enumerate(cells):
+            if taken[position] or (seat_type_id is not None and cell.seat_type_id != seat_type_id):
+                run_start = position + 1
+                continue
+            previous = cells[position - 1] if position > run_start else None
+            if previous and (cell.number != previous.number + 1 or cell.seat_type_id != previous.seat_type_id):
+                # Gang oder anderer Sitztyp: hier beginnt ein neuer Block
+                run_start = position
+            if position - run_start + 1 >= count:
+                block = cells[position - count + 1:position + 1]
+                blocks.append((sum(c.score for c in block), row_index, block[0].number, block))
+    blocks.sort(key=lambda block: block[:3])
+    return [block[3] for block in blocks]
+
+
+def validate_count(count):
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_BATCH_SEATS:
+        raise ValueError(f"count muss zwischen 1 und {MAX_BATCH_SEATS} liegen")
+
+
+def parse_seat_type_id(seat_type_id):
+    """seat_type_id als int (auch "2" aus JSON) oder None; wirft ValueError bei ungültigen Werten."""
+    if seat_type_id is None:
+        return None
+    if isinstance(seat_type_id, bool):
+        raise ValueError("seat_type_id muss eine Zahl sein")
+    try:
+        return int(seat_type_id)
+    except (TypeError, ValueError):
+        raise ValueError("seat_type_id muss eine Zahl sein")
+
+
+def hold_best_seats(cursor, holder, showtime_id, count, seat_type_id=None):
+    """
+    Sucht die besten count Plätze nebeneinander und reserviert sie für holder.
+    Gibt None zurück, wenn die Vorstellung nicht existiert, sonst BestSeats; ist kein Block
+    frei, sind items und cells leer. Erwartet einen DictCursor; der Aufrufer committet.
+    Wirft ValueError bei ungültigem count oder seat_type_id.
+    """
+    validate_count(count)
+    seat_type_id = parse_seat_type_id(seat_type_id)
+    result = load_seat_states(cursor, showtime_id)
+    if result is None:
+        return None
+    screen_id, states = result
+    grid = seat_grid(get_screen_layout(cursor, screen_id))
+    matrix = get_price_matrix(cursor)
+    occupancy = occupancy_grid(grid, states)
+    blocks = find_blocks(grid, occupancy, count, seat_type_id)
+
+    def is_free(block):
+        return not any(occupancy[r][p] for r, p in (grid.index[cell.seat_id] for cell in block))
+
+    for _ in range(MAX_HOLD_ATTEMPTS):
+        block = next((block for block in blocks if is_free(block)), None)
+        if block is None:
+            break
+        items = [
+            PricedItem(cell.seat_id, showtime_id, None, *matrix.price(cell.seat_type_id))
+            for cell in block
+        ]
+        reserved_until, conflicts = hold_seats(cursor, holder, items)
+        if not conflicts:
+            return BestSeats(reserved_until, items, block)
+        # Jemand war schneller: nichts behalten, Sitze als belegt markieren, nächsten Block versuchen
+        cursor.connection.rollback()
+        for _, seat_id in conflicts:
+            row_index, position = grid.index[seat_id]
+            occupancy[row_index][position] = 1
+    return BestSeats(None, [], [])
+
+
+def best_seats_to_dict(best):
+    return [
+        {
+            'seat_id': item.seat_id,
+            'showtime_id': item.showtime_id,
+            'row': cell.row,
+            'number': cell.number,
+            'price': float(item.base_price),
+            'seat_type_discount_id': None
+        } for item, cell in zip(best.items, best.cells)
+    ]
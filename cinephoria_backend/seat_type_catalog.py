@@ -0,0 +1,138 @@
+# cinephoria_backend/seat_type_catalog.py
+#
+# Vorberechnete Antworten für /seat_types_with_discounts und /discount/<seat_type_id>.
+# Sitztypen und Rabatte ändern sich nur über die Admin-Endpunkte in discounts.py und
+# seat_types.py; diese rufen pricing.publish_pricing_change() auf. Auf denselben Kanal
+# hört dieser Cache und baut die JSON-Dokumente beim nächsten Abruf neu.
+import hashlib
+import json
+import threading
+
+from cinephoria_backend.notifications import hub
+from cinephoria_backend.pricing import PRICING_CHANNEL
+
+SEAT_TYPE_CATALOG_QUERY = """
+    SELECT
+        st.seat_type_id,
+        st.name AS seat_type_name,
+        st.price,
+        st.color,
+        st.icon,
+        d.discount_id,
+        d.name AS discount_name,
+        d.description,
+        std.discount_amount,
+        std.discount_percentage,
+        std.seat_type_discount_id
+    FROM seat_types st
+    LEFT JOIN seat_type_discounts std ON st.seat_type_id = std.seat_type_id
+    LEFT JOIN discounts d ON std.discount_id = d.discount_id
+    ORDER BY st.seat_type_id, std.seat_type_discount_id
+"""
+
+
+class JSONDocument:
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, document):
+        self.body = json.dumps(document, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+
+NO_DISCOUNTS = JSONDocument({'discounts': []})
+
+
+class SeatTypeCatalog:
+    """Unveränderliche Dokumente: alle Sitztypen mit Rabatten und die Rabatte je Sitztyp."""
+
+    __slots__ = ('version', 'seat_types', 'discounts')
+
+    def __init__(self, version, seat_types, discounts):
+        self.version = version
+        self.seat_types = seat_types    # JSONDocument für /seat_types_with_discounts
+        self.discounts = discounts      # seat_type_id -> JSONDocument für /discount/<id>
+
+    def discounts_for(self, seat_type_id):
+        return self.discounts.get(seat_type_id, NO_DISCOUNTS)
+
+
+def _amount(value):
+    return float(value) if value else None
+
+
+def build_catalog(version, rows):
+    """Baut aus den Zeilen von SEAT_TYPE_CATALOG_QUERY beide Antwortformate."""
+    seat_types = {}
+    for row in rows:
+        seat_type_id = row['seat_type_id']
+        if seat_type_id not in seat_types:
+            seat_types[seat_type_id] = {
+                'seat_type_id': seat_type_id,
+                'name': row['seat_type_name'],
+                'price': float(row['price']),
+                'color': row['color'],
+                'icon': row['icon'],
+                'discounts': []
+            }
+        if row['discount_id']:
+            seat_types[seat_type_id]['discounts'].append({
+                'discount_id': row['discount_id'],
+                'name': row['discount_name'],
+                'description': row['description'],
+                'discount_amount': _amount(row['discount_amount']),
+                'discount_percentage': _amount(row['discount_percentage']),
+                'seat_type_discount_id': row['seat_type_discount_id']
+            })
+
+    discounts = {
+        seat_type_id: JSONDocument({'discounts': [
+            {
+                'discount_id': d['discount_id'],
+                'seat_type_discount_id': d['seat_type_discount_id'],
+                'name': d['name'],
+                'description': d['description'],
+                'discount_amount': d['discount_amount'],
+                'discount_percentage': d['discount_percentage']
+            } for d in seat_type['discounts']
+        ]})
+        for seat_type_id, seat_type in seat_types.items()
+    }
+    return SeatTypeCatalog(version, JSONDocument({'seat_types': list(seat_types.values())}), discounts)
+
+
+class SeatTypeCatalogCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._generation = 0
+
+    def get(self, load_rows):
+        """Liefert den Katalog aus dem Speicher; load_rows() wird nur nach einer Änderung aufgerufen."""
+        with self._lock:
+            if self._catalog is not None:
+                return self._catalog
+            version = self._generation
+
+        catalog = build_catalog(version, load_rows())
+
+        with self._lock:
+            # Nur speichern, wenn während des Ladens niemand invalidiert hat
+            if self._generation == version:
+                self._catalog = catalog
+        return catalog
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._catalog = None
+
+
+seat_type_catalog = SeatTypeCatalogCache()
+
+
+def get_seat_type_catalog(load_rows):
+    hub.ensure_listener()
+    return seat_type_catalog.get(load_rows)
+
+
+hub.subscribe(PRICING_CHANNEL, lambda payload: seat_type_catalog.invalidate())
@@ -0,0 +1,162 @@
+# cinephoria_backend/seatmap.py
+#
+# Sitzplan einer Vorstellung: Buchungen und Reservierungen stehen gemeinsam in seat_claims
+# und werden in einer einzigen Abfrage aufgelöst und mit dem gecachten Saal-Layout zusammengeführt.
+# Abgelaufene, von cart_reaper.py noch nicht geräumte Reservierungen zählen nicht.
+import base64
+import hashlib
+import json
+
+from cinephoria_backend.layout_cache import get_screen_layout
+
+# Status eines Sitzplatzes in einer Vorstellung
+SEAT_FREE = 'free'
+SEAT_BOOKED = 'booked'
+SEAT_HELD = 'held'                  # von jemand anderem im Warenkorb
+SEAT_HELD_BY_SELF = 'held_by_self'  # vom anfragenden User/Gast im Warenkorb
+
+# Kompaktes Format: 2 Bit pro Sitz, Reihenfolge wie im Layout-Dokument
+STATUS_CODES = {SEAT_FREE: 0, SEAT_BOOKED: 1, SEAT_HELD: 2, SEAT_HELD_BY_SELF: 3}
+
+
+# Nur der veränderliche Teil: Saal der Vorstellung plus alle Sitze, die nicht frei sind.
+# Das Layout selbst kommt aus dem layout_cache.
+SEAT_STATE_QUERY = """
+    WITH seat_state AS (
+        SELECT seat_id,
+               CASE
+                   WHEN holder_type = 'booking' THEN 'booked'
+                   WHEN (holder_type = 'user' AND holder_id = %(user_id)s::text)
+                     OR (%(user_id)s IS NULL AND holder_type = 'guest' AND holder_id = %(guest_id)s)
+                       THEN 'held_by_self'
+                   ELSE 'held'
+               END AS seat_state
+        FROM seat_claims
+        WHERE showtime_id = %(showtime_id)s
+          AND reserved_until >= NOW()
+    )
+    SELECT sh.screen_id, ss.seat_id, ss.seat_state
+    FROM showtimes sh
+    LEFT JOIN seat_state ss ON TRUE
+    WHERE sh.showtime_id = %(showtime_id)s
+"""
+
+
+def load_seat_states(cursor, showtime_id, user_id=None, guest_id=None):
+    """
+    Gibt (screen_id, {seat_id: status}) für alle nicht freien Sitze zurück,
+    oder None, wenn die Vorstellung nicht existiert. Ein Round-Trip.
+    """
+    cursor.execute(SEAT_STATE_QUERY, {
+        'showtime_id': showtime_id,
+        'user_id': user_id,
+        'guest_id': guest_id,
+    })
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    states = {row['seat_id']: row['seat_state'] for row in rows if row['seat_id'] is not None}
+    return rows[0]['screen_id'], states
+
+
+def load_seat_map(cursor, showtime_id, user_id=None, guest_id=None):
+    """
+    Lädt alle Sitzplätze einer Vorstellung inkl. Status. Erwartet einen DictCursor.
+    Gibt None zurück, wenn die Vorstellung nicht existiert, sonst eine Liste von
+    (sitz, status)-Paaren in Layout-Reihenfolge (leer, wenn der Saal keine Sitze hat).
+    Bei warmem Layout-Cache ist das ein Round-Trip.
+    """
+    result = load_seat_states(cursor, showtime_id, user_id=user_id, guest_id=guest_id)
+    if result is None:
+        return None
+    screen_id, states = result
+    layout = get_screen_layout(cursor, screen_id)
+    return [(seat, states.get(seat['seat_id'], SEAT_FREE)) for seat in layout.seats]
+
+
+def seat_to_dict(seat, state):
+    # Format der bisherigen /showtimes/<id>/seats-Antwort
+    return {
+        'seat_id': seat['seat_id'],
+        'row': seat['row'],
+        'number': seat['number'],
+        'type': seat['seat_type_name'],
+        'price': float(seat['price']),
+        'color': seat['color'] or '#678be0',
+        'icon': seat['icon'],
+        'status': 'available' if state in (SEAT_FREE, SEAT_HELD_BY_SELF) else 'unavailable',
+        'reserved_by_self': state == SEAT_HELD_BY_SELF,
+        'screen_name': seat['screen_name']
+    }
+
+
+# ----------------------------------------------------------------------
+# Kompaktes Format: statisches Layout-Dokument + Status-Bitmap pro Vorstellung
+# ----------------------------------------------------------------------
+class CompactLayout:
+    __slots__ = ('document', 'etag', 'index', 'size')
+
+    def __init__(self, document, etag, index, size):
+        self.document = document  # fertig serialisiertes JSON (bytes)
+        self.etag = etag
+        self.index = index        # seat_id -> Position in der Bitmap
+        self.size = size
+
+
+def compact_layout(layout):
+    """
+    Baut das Layout-Dokument eines Saals einmalig und hängt es an das gecachte Layout.
+    Sitztypen stehen nur einmal drin, jeder Sitz ist ein Array [seat_id, row, number, typ_index].
+    """
+    if layout.compact is not None:
+        return layout.compact
+
+    seat_types = []
+    type_index = {}
+    seats = []
+    index = {}
+    for position, seat in enumerate(layout.seats):
+        seat_type_id = seat['seat_type_id']
+        if seat_type_id not in type_index:
+            type_index[seat_type_id] = len(seat_types)
+            seat_types.append({
+                'seat_type_id': seat_type_id,
+                'name': seat['seat_type_name'],
+                'price': float(seat['price']),
+                'color': seat['color'] or '#678be0',
+                'icon': seat['icon']
+            })
+        seats.append([seat['seat_id'], seat['row'], seat['number'], type_index[seat_type_id]])
+        index[seat['seat_id']] = position
+
+    document = {
+        'screen_id': layout.screen_id,
+        'screen_name': layout.seats[0]['screen_name'] if layout.seats else None,
+        'seat_types': seat_types,
+        'seats': seats,
+        'status_codes': STATUS_CODES,
+    }
+    body = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    etag = hashlib.sha1(body).hexdigest()
+    layout.compact = CompactLayout(body, etag, index, len(seats))
+    return layout.compact
+
+
+def encode_availability(compact, states):
+    """
+    Packt die Status aller Sitze in 2 Bit pro Sitz (Sitz i: Byte i // 4, Bits (i % 4) * 2)
+    und gibt das Ergebnis base64-kodiert zurück. states enthält nur die nicht freien Sitze.
+    """
+    bitmap = bytearray((compact.size + 3) // 4)
+    for seat_id, state in states.items():
+        position = compact.index.get(seat_id)
+        if position is None:
+            continue
+        bitmap[position >> 2] |= STATUS_CODES[state] << ((position & 3) * 2)
+    return base64.b64encode(bytes(bitmap)).decode('ascii')
+
+
+def decode_availability(encoded, size):
+    # Gegenstück zu encode_availability (für Tests und Python-Clients)
+    bitmap = base64.b64decode(encoded)
+    return [(bitmap[i >> 2] >> ((i & 3) * 2)) & 3 for i in range(size)]
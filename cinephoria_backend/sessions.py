@@ -0,0 +1,196 @@
+# cinephoria_backend/sessions.py
+#
+# Refresh-Tokens für die Verlängerung der Anmeldung ohne Passwort. Beim Login entsteht eine
+# Sitzung (migrations/009_refresh_sessions.sql) mit einem zufälligen Refresh-Token; in der
+# Datenbank liegt nur dessen SHA-256. POST /token/refresh tauscht das Token gegen ein neues
+# Access-Token und ein neues Refresh-Token (Rotation) – eine UPDATE-Anweisung, kein bcrypt.
+#  - wird ein bereits ersetztes Token erneut vorgelegt (nach REFRESH_REUSE_GRACE Sekunden),
+#    hat es jemand kopiert: die Sitzung wird beendet
+#  - Access-Tokens tragen die session_id als 'sid'. Beendete Sitzungen stehen in einer
+#    Sperrliste im Speicher (RevocationList), die auth_context.authenticate() bei jedem Request
+#    prüft; andere Worker erfahren davon über NOTIFY 'session_revoked'.
+import hashlib
+import secrets
+import threading
+from collections import namedtuple
+
+from cinephoria_backend.config import ACCESS_TOKEN_MINUTES, get_db_connection
+from cinephoria_backend.notifications import hub
+
+SESSION_CHANNEL = 'session_revoked'
+
+REFRESH_TOKEN_BYTES = 32
+
+# Ergebnis von rotate_refresh_token()
+Session = namedtuple('Session', 'session_id user_id first_name last_name role refresh_token')
+
+# Legt die Sitzung an und räumt dabei alte Sitzungen des Nutzers ab, deren letztes
+# Access-Token abgelaufen sein muss (LEAST ignoriert ein fehlendes revoked_at)
+CREATE_SESSION_QUERY = """
+    WITH pruned AS (
+        DELETE FROM refresh_sessions
+        WHERE user_id = %(user_id)s
+          AND LEAST(revoked_at, expires_at) < NOW() - make_interval(secs => %(access_seconds)s)
+    )
+    INSERT INTO refresh_sessions (user_id, token_hash, expires_at)
+    VALUES (%(user_id)s, %(token_hash)s, NOW() + make_interval(secs => %(lifetime)s))
+    RETURNING session_id
+"""
+
+# Nur das aktuelle Token einer laufenden Sitzung wird getauscht; die Laufzeit beginnt neu
+ROTATE_QUERY = """
+    UPDATE refresh_sessions s
+    SET previous_hash = s.token_hash,
+        token_hash = %(new_hash)s,
+        rotated_at = NOW(),
+        expires_at = NOW() + make_interval(secs => %(lifetime)s)
+    FROM users u
+    WHERE s.token_hash = %(old_hash)s
+      AND s.revoked_at IS NULL
+      AND s.expires_at > NOW()
+      AND u.id = s.user_id
+    RETURNING s.session_id, u.id, u.vorname, u.nachname, u.role
+"""
+
+# Ein ersetztes Token nach der Schonfrist: Sitzung beenden
+REUSE_QUERY = """
+    UPDATE refresh_sessions
+    SET revoked_at = NOW()
+    WHERE previous_hash = %(old_hash)s
+      AND revoked_at IS NULL
+      AND rotated_at < NOW() - make_interval(secs => %(grace)s)
+    RETURNING session_id
+"""
+
+REVOKE_QUERY = """
+    UPDATE refresh_sessions
+    SET revoked_at = NOW()
+    WHERE token_hash = %s AND revoked_at IS NULL
+    RETURNING session_id
+"""
+
+REVOKED_SESSIONS_QUERY = """
+    SELECT session_id FROM refresh_sessions
+    WHERE revoked_at > NOW() - make_interval(secs => %s)
+"""
+
+
+def new_refresh_token():
+    return secrets.token_urlsafe(REFRESH_TOKEN_BYTES)
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+class RevocationList:
+    """
+    session_ids der Sitzungen, die innerhalb der Access-Token-Laufzeit beendet wurden.
+    Wird beim ersten Bedarf (und nach einem Verbindungsabbruch des Listeners) aus der
+    Datenbank geladen; einzelne Sperren kommen per NOTIFY dazu.
+    """
+
+    def __init__(self, connection=get_db_connection, access_seconds=ACCESS_TOKEN_MINUTES * 60):
+        self._connection = connection
+        self.access_seconds = access_seconds
+        self._lock = threading.Lock()
+        self._revoked = None
+        self._generation = 0
+
+    def _load(self):
+        with self._lock:
+            version = self._generation
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(REVOKED_SESSIONS_QUERY, (self.access_seconds,))
+                revoked = {row[0] for row in cursor.fetchall()}
+        with self._lock:
+            # Nur speichern, wenn während des Ladens niemand invalidiert hat
+            if self._generation == version:
+                self._revoked = revoked
+            return self._revoked if self._revoked is not None else revoked
+
+    def is_revoked(self, session_id):
+        """Kann die Liste nicht geladen werden, gilt die Sitzung als gültig (Access-Tokens laufen ab)."""
+        revoked = self._revoked
+        if revoked is None:
+            hub.ensure_listener()
+            try:
+                revoked = self._load()
+            except Exception as e:
+                print(f"Sperrliste der Sitzungen nicht ladbar: {e}")
+                return False
+        return session_id in revoked
+
+    def add(self, session_id):
+        with self._lock:
+            if self._revoked is not None:
+                self._revoked = self._revoked | {session_id}
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._revoked = None
+
+    def handle_notification(self, payload):
+        # None: Listener war getrennt, Sperren können fehlen
+        if payload is None:
+            self.invalidate()
+        else:
+            self.add(int(payload))
+
+
+revocation_list = RevocationList()
+
+
+def _publish_revocation(cursor, session_id):
+    revocation_list.add(session_id)
+    hub.publish(cursor, SESSION_CHANNEL, str(session_id))
+
+
+def create_session(cursor, user_id, lifetime):
+    """Legt eine Sitzung an und gibt (session_id, refresh_token) zurück; der Aufrufer committet."""
+    refresh_token = new_refresh_token()
+    params = {
+        'user_id': user_id,
+        'token_hash': token_hash(refresh_token),
+        'lifetime': lifetime,
+        'access_seconds': revocation_list.access_seconds,
+    }
+    cursor.execute(CREATE_SESSION_QUERY, params)
+    return cursor.fetchone()[0], refresh_token
+
+
+def rotate_refresh_token(cursor, refresh_token, lifetime, grace):
+    """
+    Tauscht refresh_token gegen ein neues. Gibt Session zurück oder None, wenn das Token
+    unbekannt, abgelaufen oder ersetzt ist; ein kopiertes Token beendet dabei die Sitzung.
+    Der Aufrufer committet (auch im Fehlerfall, damit die Sperre bestehen bleibt).
+    """
+    new_token = new_refresh_token()
+    old_hash = token_hash(refresh_token)
+    cursor.execute(ROTATE_QUERY, {'old_hash': old_hash, 'new_hash': token_hash(new_token), 'lifetime': lifetime})
+    row = cursor.fetchone()
+    if row is not None:
+        session_id, user_id, vorname, nachname, role = row
+        return Session(session_id, user_id, vorname, nachname, role, new_token)
+
+    cursor.execute(REUSE_QUERY, {'old_hash': old_hash, 'grace': grace})
+    row = cursor.fetchone()
+    if row is not None:
+        print(f"Refresh-Token der Sitzung {row[0]} wiederverwendet, Sitzung beendet")
+        _publish_revocation(cursor, row[0])
+    return None
+
+
+def revoke_session(cursor, refresh_token):
+    """Beendet die Sitzung zu refresh_token; gibt die session_id zurück oder None."""
+    cursor.execute(REVOKE_QUERY, (token_hash(refresh_token),))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    _publish_revocation(cursor, row[0])
+    return row[0]
+
+
+hub.subscribe(SESSION_CHANNEL, revocation_list.handle_notification)
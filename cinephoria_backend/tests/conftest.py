@@ -0,0 +1,75 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cinephoria_backend.movie_catalog import CatalogSnapshot, movie_catalog
+from cinephoria_backend.passwords import password_hasher
+from cinephoria_backend.paypal_token import paypal_tokens
+from cinephoria_backend.pricing import price_matrix_cache
+from cinephoria_backend.routes.auth import rate_limiter
+from cinephoria_backend.seat_type_catalog import seat_type_catalog
+from cinephoria_backend.sessions import revocation_list
+from cinephoria_backend.tmdb import ResponseCache, tmdb_client
+
+
+@pytest.fixture(autouse=True)
+def isolated_tmdb_cache(monkeypatch):
+    # Jeder Test startet mit leerem TMDB-Cache und ohne Cache-Dateien auf der Platte
+    monkeypatch.setattr(tmdb_client, "cache", ResponseCache())
+    return tmdb_client.cache
+
+
+@pytest.fixture(autouse=True)
+def empty_movie_catalog(monkeypatch):
+    # Leerer Filmkatalog ohne Datenbank: die movies-Endpunkte fragen TMDB direkt
+    snapshot = CatalogSnapshot()
+    monkeypatch.setattr(movie_catalog, "_snapshot", snapshot)
+    monkeypatch.setattr(movie_catalog, "_stale", False)
+    return snapshot
+
+
+@pytest.fixture(autouse=True)
+def fresh_paypal_token():
+    # Kein PayPal-Token aus einem vorherigen Test wiederverwenden
+    paypal_tokens.invalidate()
+    yield
+    paypal_tokens.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def fresh_price_caches():
+    # Preismatrix und Sitztyp-Katalog werden pro Test aus den jeweiligen DB-Mocks geladen
+    price_matrix_cache.invalidate()
+    seat_type_catalog.invalidate()
+    yield
+    price_matrix_cache.invalidate()
+    seat_type_catalog.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def fast_password_hasher(monkeypatch):
+    # Threads statt Prozesse und minimale bcrypt-Kosten, damit die Tests schnell bleiben
+    monkeypatch.setattr(password_hasher, "_executor_factory", ThreadPoolExecutor)
+    monkeypatch.setattr(password_hasher, "_executor", None)
+    monkeypatch.setattr(password_hasher, "rounds", 4)
+    yield password_hasher
+    password_hasher.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    # Alle Tests laufen von 127.0.0.1; die Login-Limits sollen nicht testübergreifend zählen
+    rate_limiter.store.clear()
+    yield
+    rate_limiter.store.clear()
+
+
+@pytest.fixture(autouse=True)
+def fresh_revocation_list():
+    # Gesperrte Sitzungen werden pro Test neu geladen (bzw. im Test vorgegeben)
+    revocation_list.invalidate()
+    yield revocation_list
+    revocation_list.invalidate()
@@ -0,0 +1,56 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import json
+from unittest import mock
+
+from cinephoria_backend.asset_manifest import AssetManifest
+
+
+def test_manifest_lists_files_only(tmp_path):
+    (tmp_path / "b.png").write_bytes(b"")
+    (tmp_path / "a.jpg").write_bytes(b"")
+    (tmp_path / "unterordner").mkdir()
+
+    manifest = AssetManifest(str(tmp_path))
+    assert manifest.names() == frozenset({"a.jpg", "b.png"})
+    assert json.loads(manifest.document().body) == {"images": ["a.jpg", "b.png"]}
+
+
+def test_manifest_stats_directory_only_after_interval(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"")
+    now = [0.0]
+    manifest = AssetManifest(str(tmp_path), check_interval=30, clock=lambda: now[0])
+    first = manifest.refresh()
+
+    with mock.patch("cinephoria_backend.asset_manifest.os.stat", wraps=os.stat) as stat, \
+            mock.patch("cinephoria_backend.asset_manifest.os.scandir", wraps=os.scandir) as scandir:
+        for _ in range(100):
+            assert "a.png" in manifest.names()
+        assert stat.call_count == 0
+
+        # Nach dem Intervall: ein stat, unveränderte mtime => kein neues Einlesen
+        now[0] = 31
+        assert manifest.get() is first
+        assert stat.call_count == 1
+        assert scandir.call_count == 0
+
+
+def test_manifest_rescans_when_directory_changes(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"")
+    now = [0.0]
+    manifest = AssetManifest(str(tmp_path), check_interval=30, clock=lambda: now[0])
+    etag = manifest.document().etag
+
+    (tmp_path / "neu.png").write_bytes(b"")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1_000_000))
+    assert "neu.png" not in manifest.names()
+
+    now[0] = 31
+    assert "neu.png" in manifest.names()
+    assert manifest.document().etag != etag
+
+
+def test_missing_directory_gives_empty_manifest(tmp_path):
+    manifest = AssetManifest(str(tmp_path / "fehlt"))
+    assert manifest.names() == frozenset()
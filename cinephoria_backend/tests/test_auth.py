@@ -2,14 +2,20 @@ import os
 os.environ["SECRET_KEY"] = "testsecret"
 
 import pytest
+import hashlib
 import json
 from unittest import mock
 from datetime import datetime, timedelta, timezone
 import jwt
+import bcrypt
 
 from cinephoria_backend.app import app
 from cinephoria_backend.config import SECRET_KEY
 
+# bcrypt-Hash wie von passwords.py ($2b$) bzw. wie von pgcrypto crypt(..., gen_salt('bf')) ($2a$)
+def bcrypt_hash(password, rounds=4, prefix=b"2b"):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds, prefix=prefix)).decode()
+
 # Hilfsfunktion, um einen Fake-Datenbankkontextmanager zu erstellen
 def fake_db_connection():
     conn = mock.MagicMock()
@@ -24,11 +30,11 @@ def test_login_success(mock_get_db_connection):
     conn, cursor = fake_db_connection()
     mock_get_db_connection.return_value = conn
 
-    # Erster Aufruf: SELECT id, password, vorname, nachname, role FROM users WHERE email = %s
-    # Zweiter Aufruf: SELECT crypt(%s, %s) = %s AS password_match
+    # Einziger Aufruf: SELECT id, password, vorname, nachname, role FROM users WHERE email = %s
+    # Das Passwort wird im Anwendungsserver geprüft (passwords.py), nicht mehr per crypt()
     cursor.fetchone.side_effect = [
-        (1, "hashed_password", "Max", "Mustermann", "user"),
-        [True]
+        (1, bcrypt_hash("password"), "Max", "Mustermann", "user"),
+        (42,),  # session_id der neuen Sitzung (sessions.create_session)
     ]
 
     # Erstelle ein Fake-Payload für den Login
@@ -39,10 +45,17 @@ def test_login_success(mock_get_db_connection):
     data = response.get_json()
     assert response.status_code == 200
     assert "token" in data
+    # Aktueller Hash: kein Neu-Hashen, nur noch die Sitzung mit dem Refresh-Token anlegen
+    assert cursor.execute.call_count == 2
+    assert "INSERT INTO refresh_sessions" in cursor.execute.call_args[0][0]
+    assert data["refresh_token"] and data["expires_in"] == 3600
+    # In der Datenbank landet nur der Hash des Refresh-Tokens
+    assert cursor.execute.call_args[0][1]["token_hash"] == hashlib.sha256(data["refresh_token"].encode()).digest()
     # Überprüfe z. B. den Inhalt des Tokens:
     decoded = jwt.decode(data["token"], SECRET_KEY, algorithms=["HS256"])
     assert decoded["user_id"] == 1
     assert decoded["first_name"] == "Max"
+    assert decoded["sid"] == 42
 
 @mock.patch("cinephoria_backend.routes.auth.get_db_connection")
 def test_login_invalid_user(mock_get_db_connection):
@@ -59,3 +72,144 @@ def test_login_invalid_user(mock_get_db_connection):
 
     assert response.status_code == 401
     assert "error" in data
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_login_upgrades_pgcrypto_hash(mock_get_db_connection):
+    conn, cursor = fake_db_connection()
+    mock_get_db_connection.return_value = conn
+    legacy = bcrypt_hash("geheim", rounds=6, prefix=b"2a")
+    cursor.fetchone.return_value = (1, legacy, "Max", "Mustermann", "user")
+
+    client = app.test_client()
+    response = client.post("/login", json={"email": "test@example.com", "password": "falsch"})
+    assert response.status_code == 401
+    assert cursor.execute.call_count == 1
+
+    response = client.post("/login", json={"email": "test@example.com", "password": "geheim"})
+    assert response.status_code == 200
+    # Kein crypt() in der Datenbank, danach der neue Hash mit Schutz gegen zwischenzeitliche Änderungen
+    sql, params = cursor.execute.call_args[0]
+    assert "crypt" not in sql and sql.startswith("UPDATE users SET password")
+    assert params[0].startswith("$2b$04$") and params[1:] == (1, legacy)
+    assert bcrypt.checkpw(b"geheim", params[0].encode())
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_login_sheds_load_when_hashing_pool_is_full(mock_get_db_connection, fast_password_hasher):
+    conn, cursor = fake_db_connection()
+    mock_get_db_connection.return_value = conn
+    cursor.fetchone.return_value = (1, bcrypt_hash("geheim", rounds=4), "Max", "Mustermann", "user")
+
+    with mock.patch.object(fast_password_hasher, "_slots") as slots:
+        slots.acquire.return_value = False
+        response = app.test_client().post("/login", json={"email": "test@example.com", "password": "geheim"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_register_hashes_in_application(mock_get_db_connection):
+    conn, cursor = fake_db_connection()
+    mock_get_db_connection.return_value = conn
+    cursor.fetchone.return_value = None
+
+    response = app.test_client().post("/register", json={
+        "first_name": "Max", "last_name": "Mustermann", "email": "neu@example.com", "password": "geheim"
+    })
+    assert response.status_code == 201
+    sql, params = cursor.execute.call_args[0]
+    assert "gen_salt" not in sql
+    assert bcrypt.checkpw(b"geheim", params[3].encode())
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_refresh_issues_new_tokens_without_password(mock_get_db_connection, fast_password_hasher):
+    conn, cursor = fake_db_connection()
+    mock_get_db_connection.return_value = conn
+    cursor.fetchone.return_value = (42, 1, "Max", "Mustermann", "admin")
+
+    with mock.patch.object(fast_password_hasher, "_run") as run:
+        response = app.test_client().post("/token/refresh", json={"refresh_token": "alt"})
+    assert response.status_code == 200
+    run.assert_not_called()
+    data = response.get_json()
+    assert data["refresh_token"] != "alt"
+    decoded = jwt.decode(data["token"], SECRET_KEY, algorithms=["HS256"])
+    assert decoded["user_id"] == 1 and decoded["role"] == "admin" and decoded["sid"] == 42
+    # Eine Anweisung: altes Token gegen das neue tauschen
+    sql, params = cursor.execute.call_args[0]
+    assert sql.strip().startswith("UPDATE refresh_sessions")
+    assert params["old_hash"] == hashlib.sha256(b"alt").digest()
+    assert params["new_hash"] == hashlib.sha256(data["refresh_token"].encode()).digest()
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_refresh_rejects_unknown_token(mock_get_db_connection):
+    conn, cursor = fake_db_connection()
+    mock_get_db_connection.return_value = conn
+    cursor.fetchone.return_value = None
+
+    client = app.test_client()
+    assert client.post("/token/refresh", json={}).status_code == 400
+    response = client.post("/token/refresh", json={"refresh_token": "unbekannt"})
+    assert response.status_code == 401
+    # Rotation und Prüfung auf ein wiederverwendetes Token
+    assert cursor.execute.call_count == 2
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_logout_revokes_access_tokens_of_the_session(mock_get_db_connection):
+    conn, cursor = fake_db_connection()
+    mock_get_db_connection.return_value = conn
+    cursor.fetchone.return_value = (42,)
+    token = jwt.encode({
+        "user_id": 1, "role": "user", "sid": 42,
+        "exp": datetime.now(timezone.utc) + timedelta(hours=1)
+    }, SECRET_KEY, algorithm="HS256")
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with mock.patch("cinephoria_backend.sessions.revocation_list._revoked", set()):
+        assert client.post("/validate-token", headers=headers).status_code == 200
+        assert client.post("/logout", json={"refresh_token": "abc"}).status_code == 200
+        response = client.post("/validate-token", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["error"] == "Sitzung beendet"
+
+
+def test_profile_images_listing_supports_etag():
+    token = jwt.encode({
+        "user_id": 1, "role": "user", "exp": datetime.now(timezone.utc) + timedelta(hours=1)
+    }, SECRET_KEY, algorithm="HS256")
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/profile/images", headers=headers)
+    assert response.status_code == 200
+    assert "default.png" in response.get_json()["images"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    etag = response.headers["ETag"]
+    response = client.get("/profile/images", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_profile_image_is_validated_against_manifest(mock_get_db_connection):
+    conn, cursor = fake_db_connection()
+    mock_get_db_connection.return_value = conn
+    token = jwt.encode({
+        "user_id": 1, "role": "user", "exp": datetime.now(timezone.utc) + timedelta(hours=1)
+    }, SECRET_KEY, algorithm="HS256")
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with mock.patch("cinephoria_backend.asset_manifest.os.scandir") as scandir:
+        response = client.put("/profile/image", json={"profile_image": "../config.py"}, headers=headers)
+        assert response.status_code == 400
+        response = client.put("/profile/image", json={"profile_image": "default.png"}, headers=headers)
+        assert response.status_code == 200
+    # Das Manifest wurde beim Start gelesen, nicht pro Request
+    scandir.assert_not_called()
+    assert cursor.execute.call_args[0][1] == ("default.png", 1)
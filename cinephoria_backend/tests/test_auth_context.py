@@ -0,0 +1,80 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import jwt
+import pytest
+
+from cinephoria_backend import auth_context
+from cinephoria_backend.app import app
+from cinephoria_backend.auth_context import TokenCache
+from cinephoria_backend.config import SECRET_KEY
+
+
+def make_token(**claims):
+    claims.setdefault("user_id", 7)
+    claims.setdefault("role", "admin")
+    claims.setdefault("exp", datetime.now(timezone.utc) + timedelta(hours=1))
+    return jwt.encode(claims, SECRET_KEY, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    auth_context.token_cache.clear()
+    yield
+    auth_context.token_cache.clear()
+
+
+def test_verified_token_is_decoded_once():
+    token = make_token()
+    with mock.patch("cinephoria_backend.auth_context.jwt.decode", wraps=jwt.decode) as decode:
+        assert auth_context.verify_token(token)["user_id"] == 7
+        assert auth_context.verify_token(token)["user_id"] == 7
+    assert decode.call_count == 1
+
+
+def test_invalid_tokens_are_not_cached():
+    token = make_token()[:-2] + "xx"
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidTokenError):
+            auth_context.verify_token(token)
+    assert len(auth_context.token_cache) == 0
+
+
+def test_cache_entries_end_at_exp_and_are_bounded():
+    now = [1000.0]
+    cache = TokenCache(max_entries=2, clock=lambda: now[0])
+    cache.put(b"a", 1010, {"user_id": 1})
+    cache.put(b"b", 2000, {"user_id": 2})
+    cache.get(b"a")
+    cache.put(b"c", 2000, {"user_id": 3})
+    # b war am längsten unbenutzt
+    assert cache.get(b"b") is None and len(cache) == 2
+    now[0] = 1010
+    assert cache.get(b"a") is None
+    assert cache.get(b"c") == {"user_id": 3}
+
+
+def test_expired_token_is_rejected_even_if_cached():
+    token = make_token(exp=datetime.now(timezone.utc) + timedelta(seconds=30))
+    auth_context.verify_token(token)
+    later = datetime.now(timezone.utc).timestamp() + 60
+    with mock.patch.object(auth_context.token_cache, "clock", return_value=later), \
+         mock.patch("cinephoria_backend.auth_context.jwt.decode", side_effect=jwt.ExpiredSignatureError):
+        response = app.test_client().post("/validate-token", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert response.get_json()["error"] == "Token abgelaufen"
+
+
+def test_request_evaluates_token_once():
+    token = make_token()
+    with app.test_request_context(headers={"Authorization": f"Bearer {token}"}), \
+         mock.patch("cinephoria_backend.auth_context.verify_token", wraps=auth_context.verify_token) as verify:
+        assert auth_context.current_claims()["role"] == "admin"
+        assert auth_context.authenticate().error is None
+    assert verify.call_count == 1
+
+    with app.test_request_context():
+        assert auth_context.authenticate().error == auth_context.AUTH_MISSING
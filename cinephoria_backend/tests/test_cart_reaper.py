@@ -0,0 +1,55 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from unittest import mock
+
+from cinephoria_backend import cart_reaper
+from cinephoria_backend.app import app
+
+
+def reaper_conn(locked=True, rowcounts=()):
+    conn = mock.MagicMock()
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = (locked,)
+    counts = iter(rowcounts)
+
+    def execute(sql, params=None):
+        if "DELETE" in sql:
+            cursor.rowcount = next(counts)
+    cursor.execute.side_effect = execute
+    conn.cursor.return_value.__enter__.return_value = cursor
+    return conn, cursor
+
+
+def test_reaps_in_batches_until_done():
+    # 1. Batch voll, 2. Batch: Rest
+    conn, cursor = reaper_conn(rowcounts=[2, 1])
+    total = cart_reaper.reap_expired_carts(conn, batch_size=2)
+    assert total == 3
+    assert conn.commit.call_count == 2
+    deletes = [c for c in cursor.execute.call_args_list if "DELETE" in c[0][0]]
+    assert all(c[0][1] == (2,) for c in deletes)
+
+
+def test_skips_when_another_process_reaps():
+    conn, cursor = reaper_conn(locked=False)
+    assert cart_reaper.reap_expired_carts(conn) is None
+    assert not any("DELETE" in c[0][0] for c in cursor.execute.call_args_list)
+    conn.commit.assert_not_called()
+
+
+def test_cart_requests_do_not_sweep_all_carts():
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = []
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+
+    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn) as get_conn:
+        response = app.test_client().get("/guest/cart?guest_id=g1")
+
+    assert response.status_code == 200
+    # Eine Verbindung; abgelaufene Reservierungen werden nur herausgefiltert, nicht gelöscht
+    assert get_conn.call_count == 1
+    assert not any("DELETE" in c[0][0] for c in cursor.execute.call_args_list)
+    assert "reserved_until >= NOW()" in cursor.execute.call_args[0][0]
@@ -3,6 +3,7 @@ os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werde
 
 import json
 from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from unittest import mock
 import pytest
 import psycopg2.extras
@@ -10,6 +11,8 @@ import jwt
 
 from cinephoria_backend.app import app
 from cinephoria_backend.config import SECRET_KEY
+from cinephoria_backend.pricing import PricedCart, PricedItem, PricingError
+from cinephoria_backend.seat_finder import BestSeats, Cell
 
 # Erzeuge einen gültigen User-Token für user_cart-Endpunkte
 user_payload = {
@@ -26,6 +29,10 @@ def fake_db_conn(cursor):
     conn.cursor.return_value.__enter__.return_value = cursor
     return conn
 
+# Preis eines Sitzes, wie ihn pricing.price_seat() serverseitig berechnet
+def priced_seat(seat_id, price="12.50"):
+    return PricedItem(seat_id, None, None, Decimal(price), Decimal(price))
+
 #############################################
 # Tests für Guest-Cart (guestcart.py)
 #############################################
@@ -33,12 +40,8 @@ def fake_db_conn(cursor):
 # GET /guest/cart: Test, wenn kein Eintrag existiert (Neuanlage)
 def test_guest_cart_get_new():
     guest_id = "guest123"
-    # Simuliere: SELECT guest_id, valid_until gibt zunächst nichts zurück
     cursor = mock.MagicMock()
-    # Erstes fetchone() (für den Warenkorb) liefert None
-    cursor.fetchone.side_effect = [None,  # SELECT guest cart -> None
-                                   ] 
-    # Danach wird für Items fetchall() aufgerufen – simulieren wir leere Liste
+    # Keine Reservierungen in seat_claims
     cursor.fetchall.return_value = []
     conn = fake_db_conn(cursor)
     
@@ -46,33 +49,32 @@ def test_guest_cart_get_new():
         client = app.test_client()
         response = client.get(f"/guest/cart?guest_id={guest_id}")
         data = response.get_json()
-        # Wir erwarten einen 200-Status, einen valid_until-Wert (als ISO-String) und leere cart_items
+        # Wir erwarten einen 200-Status, valid_until ohne Reservierungen leer und leere cart_items
         assert response.status_code == 200
-        assert "valid_until" in data
+        assert data["valid_until"] is None
         assert data["cart_items"] == []
+        # Reines Lesen: nichts wird angelegt oder gelöscht
+        assert cursor.execute.call_count == 1
+        conn.commit.assert_not_called()
 
 # GET /guest/cart: Test, wenn ein Eintrag bereits existiert (mit gültigem valid_until)
 def test_guest_cart_get_existing():
     guest_id = "guest456"
     valid_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-    # Simuliere einen vorhandenen Warenkorb (als Dict-like Objekt)
-    fake_cart = {"guest_id": guest_id, "valid_until": valid_until}
     cursor = mock.MagicMock()
-    # Hier liefert der erste fetchone() das Fake-Cart als dict
-    cursor.fetchone.return_value = fake_cart
-    # Für Items liefern wir z. B. zwei Einträge
+    # Zwei gültige Reservierungen des Gastes
     fake_items = [
         {
             "seat_id": 101,
             "price": 12.50,
-            "reserved_until": datetime.now(timezone.utc) + timedelta(minutes=15),
+            "reserved_until": valid_until - timedelta(minutes=1),
             "showtime_id": 300,
             "seat_type_discount_id": None
         },
         {
             "seat_id": 102,
             "price": 12.50,
-            "reserved_until": datetime.now(timezone.utc) + timedelta(minutes=15),
+            "reserved_until": valid_until,
             "showtime_id": 300,
             "seat_type_discount_id": 5
         }
@@ -88,6 +90,12 @@ def test_guest_cart_get_existing():
         # Es sollten zwei Items zurückgegeben werden
         assert isinstance(data["cart_items"], list)
         assert len(data["cart_items"]) == 2
+        # valid_until ist die späteste Reservierung
+        assert data["valid_until"] == valid_until.isoformat()
+        # Eine Abfrage über seat_claims mit Inhaber-Typ und -ID
+        sql, params = cursor.execute.call_args[0]
+        assert "FROM seat_claims" in sql
+        assert params == {"holder_type": "guest", "holder_id": guest_id}
 
 # POST /guest/cart: Sitz zum Guest-Warenkorb hinzufügen
 def test_guest_cart_post_success():
@@ -96,19 +104,15 @@ def test_guest_cart_post_success():
     price = 15.0
     showtime_id = 400
     seat_type_discount_id = None
-    # Wir simulieren: Zuerst SELECT guest_cart -> kein Eintrag, dann INSERT in guest_carts
-    # Dann: SELECT seat_id from user_cart_items -> gibt None zurück (kein Konflikt)
-    # Anschließend: INSERT in guest_cart_items liefert RETURNING seat_id
+    # Ein INSERT in seat_claims, der Sitz war frei -> RETURNING seat_id
     cursor = mock.MagicMock()
     cursor.fetchone.side_effect = [
-        None,  # SELECT guest_cart -> None
-        None,  # SELECT seat_id from user_cart_items -> None (kein Reservierungs-Konflikt)
-        (seat_id,),  # INSERT INTO guest_cart_items -> RETURNING seat_id
+        (seat_id,),
     ]
-    cursor.fetchall.return_value = []  # für eventuelle Items-Abfrage
     conn = fake_db_conn(cursor)
     
-    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn):
+    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.guestcart.price_seat", return_value=priced_seat(seat_id)):
         client = app.test_client()
         payload = {
             "guest_id": guest_id,
@@ -122,6 +126,36 @@ def test_guest_cart_post_success():
         assert response.status_code == 201
         assert "Sitzplatz zum Guest-Warenkorb hinzugefügt" in data.get("message", "")
         assert "reserved_until" in data
+        # Gespeichert wird der Serverpreis, nicht der vom Client geschickte
+        assert cursor.execute.call_count == 1
+        sql, params = cursor.execute.call_args[0]
+        assert "INSERT INTO seat_claims" in sql
+        assert params["price"] == Decimal("12.50")
+        assert (params["holder_type"], params["holder_id"]) == ("guest", guest_id)
+        conn.commit.assert_called_once()
+
+
+# POST /guest/cart: Sitz ist schon reserviert (egal ob von User oder Gast)
+def test_guest_cart_post_conflict():
+    cursor = mock.MagicMock()
+    # ON CONFLICT ... WHERE reserved_until < NOW() greift nicht -> keine Zeile
+    cursor.fetchone.side_effect = [None]
+    # Alternativen: freie Sitze gleichen Typs, nächstgelegene zuerst
+    cursor.fetchall.return_value = [(400, 201, 202), (400, 201, 200)]
+    conn = fake_db_conn(cursor)
+
+    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.guestcart.price_seat", return_value=priced_seat(201)):
+        client = app.test_client()
+        payload = {"guest_id": "guest789", "seat_id": 201, "showtime_id": 400}
+        response = client.post("/guest/cart", json=payload)
+        assert response.status_code == 409
+        assert response.get_json()["error"] == "Der Sitzplatz ist bereits reserviert"
+        assert response.get_json()["alternatives"] == [202, 200]
+        # Keine Vorab-Prüfung der User-Warenkörbe mehr, nur Reservierung und Alternativen
+        assert cursor.execute.call_count == 2
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
 
 # DELETE /guest/cart/<int:showtime_id>/<int:seat_id>: Ein einzelnes Item entfernen
 def test_guest_cart_delete_item_success():
@@ -129,7 +163,8 @@ def test_guest_cart_delete_item_success():
     seat_id = 301
     showtime_id = 500
     cursor = mock.MagicMock()
-    # Wir simulieren, dass das Update und der DELETE erfolgreich sind.
+    # DELETE ... RETURNING zählt einen freigegebenen Sitz
+    cursor.fetchone.return_value = (1,)
     conn = fake_db_conn(cursor)
     
     with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn):
@@ -158,16 +193,16 @@ def test_guest_cart_update_success():
     seat_id = 401
     showtime_id = 600
     new_discount = 7  # Beispielwert
-    # Simuliere, dass das Item existiert und die Validierung erfolgreich ist
-    fake_cart_item = (55, None)  # z. B. cart_item_id = 55
+    # Simuliere, dass die Reservierung existiert und die Validierung erfolgreich ist
     cursor = mock.MagicMock()
     cursor.fetchone.side_effect = [
-        fake_cart_item,      # SELECT cart_item_id, seat_type_discount_id FROM guest_cart_items ...
-        (1,),                # SELECT 1 FROM seat_type_discounts ... (Validierung erfolgreich)
+        (seat_id,),      # UPDATE seat_claims ... RETURNING seat_id
     ]
     conn = fake_db_conn(cursor)
     
-    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn):
+    # Validierung des Discounts über die Preismatrix
+    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.guestcart.price_seat", return_value=priced_seat(seat_id)):
         client = app.test_client()
         payload = {
             "guest_id": guest_id,
@@ -180,6 +215,21 @@ def test_guest_cart_update_success():
         assert response.status_code == 200
         assert "Gast-Warenkorb erfolgreich aktualisiert" in data.get("message", "")
 
+
+# POST /guest/cart/update: Sitz ist nicht (mehr) im Warenkorb
+def test_guest_cart_update_missing_hold():
+    cursor = mock.MagicMock()
+    cursor.fetchone.side_effect = [None]
+    conn = fake_db_conn(cursor)
+
+    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.guestcart.price_seat", return_value=priced_seat(401)):
+        client = app.test_client()
+        payload = {"guest_id": "guestUPDATE", "seat_id": 401, "showtime_id": 600, "seat_type_discount_id": None}
+        response = client.post("/guest/cart/update", json=payload)
+        assert response.status_code == 404
+        conn.commit.assert_not_called()
+
 #############################################
 # Tests für User-Cart (usercart.py)
 #############################################
@@ -188,8 +238,6 @@ def test_guest_cart_update_success():
 def test_user_cart_get_new():
     user_id = 20  # Dieser Wert wird aus dem Token (user_token) übernommen
     cursor = mock.MagicMock()
-    # Erster fetchone() liefert None, danach fetchall() leere Liste
-    cursor.fetchone.side_effect = [None]
     cursor.fetchall.return_value = []
     conn = fake_db_conn(cursor)
     
@@ -200,6 +248,7 @@ def test_user_cart_get_new():
         assert response.status_code == 200
         assert "valid_until" in data
         assert data["cart_items"] == []
+        assert cursor.execute.call_args[0][1] == {"holder_type": "user", "holder_id": "20"}
 
 # DELETE /user/cart/<int:showtime_id>/<int:seat_id>: Ein Item entfernen
 def test_user_cart_delete_item_success():
@@ -207,6 +256,7 @@ def test_user_cart_delete_item_success():
     showtime_id = 700
     seat_id = 501
     cursor = mock.MagicMock()
+    cursor.fetchone.return_value = (1,)
     conn = fake_db_conn(cursor)
     
     with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn):
@@ -237,15 +287,14 @@ def test_user_cart_post_success():
     showtime_id = 800
     seat_type_discount_id = None
     cursor = mock.MagicMock()
-    # Simuliere: SELECT user_cart (None) -> INSERT, dann SELECT in guest_cart_items -> None, danach INSERT in user_cart_items liefert RETURNING seat_id
+    # Ein INSERT in seat_claims liefert RETURNING seat_id
     cursor.fetchone.side_effect = [
-        None,     # SELECT user_carts -> None
-        None,     # SELECT seat_id FROM guest_cart_items -> None (kein Konflikt)
-        (seat_id,)  # INSERT in user_cart_items -> RETURNING seat_id
+        (seat_id,)
     ]
     conn = fake_db_conn(cursor)
     
-    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn):
+    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.usercart.price_seat", return_value=priced_seat(seat_id)):
         client = app.test_client()
         payload = {
             "seat_id": seat_id,
@@ -265,17 +314,15 @@ def test_user_cart_update_success():
     seat_id = 701
     showtime_id = 900
     new_discount = 9
-    # Simuliere, dass das Item existiert: Rückgabe von (cart_item_id, current_discount)
-    fake_cart_item = (77, None)
     cursor = mock.MagicMock()
-    # Zuerst SELECT cart_item; danach SELECT zur Validierung des Discounts liefert (1,)
+    # UPDATE seat_claims ... RETURNING; der Discount wird vorher über die Preismatrix validiert
     cursor.fetchone.side_effect = [
-        fake_cart_item,
-        (1,)
+        (seat_id,),
     ]
     conn = fake_db_conn(cursor)
     
-    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn):
+    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.usercart.price_seat", return_value=priced_seat(seat_id)):
         client = app.test_client()
         payload = {
             "seat_id": seat_id,
@@ -287,3 +334,123 @@ def test_user_cart_update_success():
         assert response.status_code == 200
         assert "Warenkorb erfolgreich aktualisiert" in data.get("message", "")
 
+
+# POST /user/cart/update: Discount, der nicht zum Sitztyp passt
+def test_user_cart_update_rejects_foreign_discount():
+    cursor = mock.MagicMock()
+    cursor.fetchone.side_effect = [(701,)]
+    conn = fake_db_conn(cursor)
+
+    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.usercart.price_seat", side_effect=PricingError("falscher Sitztyp")):
+        client = app.test_client()
+        payload = {"seat_id": 701, "showtime_id": 900, "seat_type_discount_id": 3}
+        response = client.post("/user/cart/update", json=payload, headers={"Authorization": f"Bearer {user_token}"})
+        assert response.status_code == 400
+        assert not any("UPDATE seat_claims" in c[0][0] for c in cursor.execute.call_args_list)
+
+
+#############################################
+# Tests für Batch-Reservierungen (/user/cart/batch, /guest/cart/batch)
+#############################################
+
+def priced_batch(seats):
+    items = [PricedItem(s["seat_id"], s["showtime_id"], s.get("seat_type_discount_id"),
+                        Decimal("12.50"), Decimal("12.50")) for s in seats]
+    return PricedCart(items, sum(i.price for i in items))
+
+
+FAMILY = [{"showtime_id": 800, "seat_id": seat_id} for seat_id in range(601, 607)]
+
+
+# POST /user/cart/batch: sechs Sitze mit einem Statement
+def test_user_cart_batch_holds_all_seats():
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = []  # keine Konflikte
+    conn = fake_db_conn(cursor)
+
+    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.usercart.price_cart", return_value=priced_batch(FAMILY)):
+        client = app.test_client()
+        response = client.post("/user/cart/batch", json={"seats": FAMILY},
+                               headers={"Authorization": f"Bearer {user_token}"})
+        data = response.get_json()
+        assert response.status_code == 201
+        assert [s["seat_id"] for s in data["seats"]] == list(range(601, 607))
+        assert "reserved_until" in data
+        # Ein mehrzeiliger INSERT, ein Commit
+        assert cursor.execute.call_count == 1
+        sql, params = cursor.execute.call_args[0]
+        assert "unnest" in sql and "INSERT INTO seat_claims" in sql
+        assert params["seat_ids"] == list(range(601, 607))
+        assert params["holder_id"] == "20"
+        conn.commit.assert_called_once()
+        conn.rollback.assert_not_called()
+
+
+# POST /guest/cart/batch: ein Sitz belegt -> keiner wird reserviert
+def test_guest_cart_batch_all_or_nothing():
+    cursor = mock.MagicMock()
+    # Konflikte aus hold_seats, danach die Alternativen zum belegten Sitz
+    cursor.fetchall.side_effect = [[(800, 603)], [(800, 603, 610)]]
+    conn = fake_db_conn(cursor)
+
+    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.guestcart.price_cart", return_value=priced_batch(FAMILY)):
+        client = app.test_client()
+        response = client.post("/guest/cart/batch", json={"guest_id": "g1", "seats": FAMILY})
+        data = response.get_json()
+        assert response.status_code == 409
+        assert data["conflicts"] == [{"showtime_id": 800, "seat_id": 603, "alternatives": [610]}]
+        # Die übrigen Sitze des Batches werden nicht als Alternative vorgeschlagen
+        _, params = cursor.execute.call_args[0]
+        assert set(params["exclude"]) >= {item["seat_id"] for item in FAMILY}
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+
+
+def test_cart_batch_rejects_invalid_lists():
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {user_token}"}
+    too_many = [{"showtime_id": 1, "seat_id": i} for i in range(1, 30)]
+    duplicate = [{"showtime_id": 1, "seat_id": 5}, {"showtime_id": 1, "seat_id": 5}]
+    cursor = mock.MagicMock()
+    conn = fake_db_conn(cursor)
+
+    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.usercart.price_cart", return_value=priced_batch(duplicate)):
+        assert client.post("/user/cart/batch", json={}, headers=headers).status_code == 400
+        assert client.post("/user/cart/batch", json={"seats": too_many}, headers=headers).status_code == 400
+        assert client.post("/user/cart/batch", json={"seats": [{"seat_id": 1}]}, headers=headers).status_code == 400
+        assert client.post("/user/cart/batch", json={"seats": duplicate}, headers=headers).status_code == 400
+    cursor.execute.assert_not_called()
+    conn.commit.assert_not_called()
+
+
+# POST /user/cart/best: bester Block wird in einem Request gesucht und reserviert
+def test_user_cart_best_seats():
+    reserved_until = datetime.now(timezone.utc)
+    best = BestSeats(
+        reserved_until,
+        [PricedItem(304, 5, None, Decimal("10.00"), Decimal("10.00")),
+         PricedItem(305, 5, None, Decimal("10.00"), Decimal("10.00"))],
+        [Cell(304, "C", 4, 1, 0.5), Cell(305, "C", 5, 1, 0.5)]
+    )
+    cursor = mock.MagicMock()
+    conn = fake_db_conn(cursor)
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    with mock.patch("cinephoria_backend.routes.usercart.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.routes.usercart.hold_best_seats", return_value=best) as finder:
+        client = app.test_client()
+        response = client.post("/user/cart/best", json={"showtime_id": 5, "count": 2}, headers=headers)
+        data = response.get_json()
+        assert response.status_code == 201
+        assert [(s["row"], s["number"]) for s in data["seats"]] == [("C", 4), ("C", 5)]
+        assert finder.call_args[0][1:] == (("user", "20"), 5, 2, None)
+        conn.commit.assert_called_once()
+
+        finder.return_value = BestSeats(None, [], [])
+        response = client.post("/user/cart/best", json={"showtime_id": 5, "count": 2}, headers=headers)
+        assert response.status_code == 409
+        assert client.post("/user/cart/best", json={"showtime_id": 5, "count": 50}, headers=headers).status_code == 400
@@ -0,0 +1,315 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from cinephoria_backend.app import app
+from cinephoria_backend import checkout
+from cinephoria_backend.pricing import PricedCart, PricedItem
+
+
+def fake_db_conn(cursor):
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+    return conn
+
+
+CHECKOUT_PAYLOAD = {
+    "orderID": "order_async",
+    "vorname": "Max",
+    "nachname": "Mustermann",
+    "email": "test@example.com",
+    "total_amount": "20.00",
+    "cart_items": [{"seat_id": 1, "showtime_id": 2, "seat_type_discount_id": None}]
+}
+
+
+PRICED_CART = PricedCart([PricedItem(1, 2, None, Decimal("20.00"), Decimal("20.00"))], Decimal("20.00"))
+
+
+def job_row(status="pending", result=None, user_id=None):
+    return {"paypal_order_id": "order_async", "user_id": user_id, "status": status, "attempts": 0, "result": result}
+
+
+def enqueued_row(created=True, email="test@example.com", user_id=None):
+    return dict(job_row(user_id=user_id), created=created, email=email)
+
+
+def test_checkout_is_enqueued_without_calling_paypal():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = enqueued_row()
+    with mock.patch("cinephoria_backend.routes.paypal.get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch("cinephoria_backend.routes.paypal.price_checkout", return_value=PRICED_CART), \
+         mock.patch("cinephoria_backend.http_client.http.post") as paypal_post, \
+         mock.patch.object(checkout.hub, "publish") as publish:
+        response = app.test_client().post("/paypal/checkout", json=CHECKOUT_PAYLOAD)
+
+    assert response.status_code == 202
+    data = response.get_json()
+    assert data["status"] == "pending"
+    assert data["status_url"] == "/paypal/checkout/order_async"
+    assert data["checkout_token"] == checkout.checkout_token("order_async")
+    paypal_post.assert_not_called()
+    publish.assert_called_once_with(cursor, checkout.JOB_CREATED_CHANNEL, "order_async")
+
+
+def test_checkout_status_waits_for_worker():
+    cursor = mock.MagicMock()
+    cursor.fetchone.side_effect = [
+        job_row("running"),
+        job_row("completed", {"booking_id": 77, "qr_token": "qr"}),
+    ]
+    # Worker meldet sich, während die Abfrage wartet
+    timer = threading.Timer(0.1, checkout.checkout_waiters.notify, args=("order_async",))
+    with mock.patch("cinephoria_backend.routes.paypal.get_db_connection", return_value=fake_db_conn(cursor)):
+        timer.start()
+        response = app.test_client().get(
+            "/paypal/checkout/order_async?wait=5",
+            headers={"X-Checkout-Token": checkout.checkout_token("order_async")}
+        )
+
+    assert response.status_code == 200
+    assert response.get_json() == {"orderID": "order_async", "status": "completed", "booking_id": 77, "qr_token": "qr"}
+
+
+def test_checkout_status_not_found():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = None
+    with mock.patch("cinephoria_backend.routes.paypal.get_db_connection", return_value=fake_db_conn(cursor)):
+        response = app.test_client().get("/paypal/checkout/unknown")
+    assert response.status_code == 404
+
+
+def test_checkout_status_requires_owner():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = job_row("completed", {"booking_id": 77, "qr_token": "qr"}, user_id=10)
+    client = app.test_client()
+    with mock.patch("cinephoria_backend.routes.paypal.get_db_connection", return_value=fake_db_conn(cursor)):
+        # Nur die Order-ID zu kennen reicht nicht für das Ticket
+        assert client.get("/paypal/checkout/order_async").status_code == 404
+        response = client.get("/paypal/checkout/order_async", headers={"X-Checkout-Token": "geraten"})
+        assert response.status_code == 404
+        with mock.patch("cinephoria_backend.routes.auth.current_claims", return_value={"user_id": 10}):
+            response = client.get("/paypal/checkout/order_async")
+    assert response.status_code == 200
+    assert response.get_json()["qr_token"] == "qr"
+
+
+def test_repeated_checkout_by_someone_else_is_rejected():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = enqueued_row(created=False, email="opfer@example.com")
+    with mock.patch("cinephoria_backend.routes.paypal.get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch("cinephoria_backend.routes.paypal.price_checkout", return_value=PRICED_CART):
+        response = app.test_client().post("/paypal/checkout", json=CHECKOUT_PAYLOAD)
+    assert response.status_code == 409
+    assert "checkout_token" not in response.get_json()
+
+
+JOB = {
+    "job_id": 5, "paypal_order_id": "order_async", "user_id": 10, "attempts": 1,
+    "payload": {k: CHECKOUT_PAYLOAD[k] for k in ("vorname", "nachname", "email", "total_amount", "cart_items")}
+}
+
+
+def test_worker_captures_and_books_once():
+    cursor = mock.MagicMock()
+    cursor.fetchone.side_effect = [{"status": "running"}, None]  # Auftrag gesperrt, noch keine Buchung
+    with mock.patch.object(checkout, "capture_order", return_value={"status": "COMPLETED"}), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "persist_booking", return_value=(88, "qr88")) as persist, \
+         mock.patch.object(checkout.hub, "publish") as publish:
+        checkout.process_job(JOB)
+
+    persist.assert_called_once()
+    assert persist.call_args[0][1:3] == ("order_async", 10)
+    assert persist.call_args[0][-2:] == (PRICED_CART, checkout.Holder.user(10))
+    update = cursor.execute.call_args_list[-1][0]
+    assert "status = 'completed'" in update[0]
+    assert update[1][0] == 88
+    publish.assert_called_once_with(cursor, checkout.JOB_DONE_CHANNEL, "order_async")
+
+
+def test_worker_does_not_capture_seats_held_by_someone_else():
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = [(2, 1)]
+    job = dict(JOB, user_id=None, payload=dict(JOB["payload"], guest_id="gast-1"))
+    with mock.patch.object(checkout, "capture_order") as capture, \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout.hub, "publish"):
+        checkout.process_job(job)
+
+    capture.assert_not_called()
+    check = cursor.execute.call_args_list[0][0][1]
+    assert (check["holder_type"], check["holder_id"]) == ("guest", "gast-1")
+    assert "status = 'failed'" in cursor.execute.call_args[0][0]
+
+
+def test_worker_reuses_existing_booking():
+    cursor = mock.MagicMock()
+    cursor.fetchone.side_effect = [{"status": "running"}, {"booking_id": 66, "qr_seite": "qr66"}]
+    with mock.patch.object(checkout, "capture_order", return_value={"status": "COMPLETED"}), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "persist_booking") as persist, \
+         mock.patch.object(checkout.hub, "publish"):
+        checkout.process_job(JOB)
+
+    persist.assert_not_called()
+    assert cursor.execute.call_args_list[-1][0][1][0] == 66
+
+
+def test_worker_fails_on_amount_mismatch():
+    cursor = mock.MagicMock()
+    capture = {"status": "COMPLETED",
+               "purchase_units": [{"payments": {"captures": [{"amount": {"value": "5.00"}}]}}]}
+    with mock.patch.object(checkout, "capture_order", return_value=capture), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "persist_booking") as persist, \
+         mock.patch.object(checkout.hub, "publish"):
+        checkout.process_job(JOB)
+
+    persist.assert_not_called()
+    assert "status = 'failed'" in cursor.execute.call_args[0][0]
+
+
+def test_worker_reschedules_on_paypal_outage():
+    cursor = mock.MagicMock()
+    with mock.patch.object(checkout, "capture_order", side_effect=checkout.RetryableCheckoutError("503")), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "persist_booking") as persist:
+        checkout.process_job(JOB)
+
+    persist.assert_not_called()
+    sql, params = cursor.execute.call_args[0]
+    assert "status = 'pending'" in sql
+    assert params[0] == checkout.RETRY_DELAYS[0]
+
+
+def test_worker_gives_up_after_max_attempts():
+    cursor = mock.MagicMock()
+    job = dict(JOB, attempts=checkout.MAX_ATTEMPTS)
+    with mock.patch.object(checkout, "capture_order", side_effect=checkout.RetryableCheckoutError("503")), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout.hub, "publish") as publish:
+        checkout.process_job(job)
+
+    assert "status = 'failed'" in cursor.execute.call_args[0][0]
+    publish.assert_called_once()
+
+
+CAPTURED = {"status": "COMPLETED",
+            "purchase_units": [{"payments": {"captures": [{"id": "CAP1", "amount": {"value": "20.00"}}]}}]}
+
+
+def test_worker_refunds_capture_when_seat_is_gone():
+    cursor = mock.MagicMock()
+    with mock.patch.object(checkout, "capture_order", return_value=CAPTURED), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "complete_job", side_effect=checkout.SeatsAlreadyBooked([(2, 1)])), \
+         mock.patch.object(checkout, "refund_capture") as refund, \
+         mock.patch.object(checkout.hub, "publish") as publish:
+        checkout.process_job(JOB)
+
+    refund.assert_called_once_with("CAP1")
+    sql, params = cursor.execute.call_args[0]
+    assert "status = 'refunded'" in sql
+    assert params[0] == "CAP1"
+    publish.assert_called_once()
+
+
+def test_worker_keeps_refund_pending_until_paypal_answers():
+    cursor = mock.MagicMock()
+    capture = dict(CAPTURED, purchase_units=[{"payments": {"captures": [{"id": "CAP1", "amount": {"value": "5.00"}}]}}])
+    with mock.patch.object(checkout, "capture_order", return_value=capture), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "refund_capture", side_effect=checkout.RetryableCheckoutError("503")), \
+         mock.patch.object(checkout.hub, "publish"):
+        checkout.process_job(JOB)
+
+    sql, params = cursor.execute.call_args[0]
+    assert "status = 'refund_pending'" in sql
+    assert params[0] == "CAP1"
+
+    # Der nächste Versuch erstattet nur noch, ohne erneuten Capture
+    job = dict(JOB, status=checkout.JOB_REFUND_PENDING, capture_id="CAP1", attempts=9,
+               result={"error": "Betrag weicht ab"})
+    with mock.patch.object(checkout, "capture_order") as capture_order, \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "refund_capture") as refund, \
+         mock.patch.object(checkout.hub, "publish"):
+        checkout.process_job(job)
+
+    capture_order.assert_not_called()
+    refund.assert_called_once_with("CAP1")
+    sql, params = cursor.execute.call_args[0]
+    assert "status = 'refunded'" in sql
+    assert params[1].adapted == {"error": "Betrag weicht ab", "refunded": True}
+
+
+def test_refund_capture_is_idempotent():
+    response = mock.MagicMock(status_code=422, text='{"name": "UNPROCESSABLE_ENTITY", "details": [{"issue": "CAPTURE_FULLY_REFUNDED"}]}')
+    with mock.patch.object(checkout.paypal_tokens, "get_token", return_value="token"), \
+         mock.patch.object(checkout.http, "post", return_value=response) as post:
+        checkout.refund_capture("CAP1")
+
+    url = post.call_args[0][0]
+    assert url.endswith("/v2/payments/captures/CAP1/refund")
+    assert post.call_args[1]["headers"]["PayPal-Request-Id"] == "refund-CAP1"
+
+
+def test_captured_job_is_refunded_when_retry_finds_seat_taken():
+    cursor = mock.MagicMock()
+    # 1. Versuch: bezahlt, dann scheitert die Buchung vorübergehend
+    with mock.patch.object(checkout, "capture_order", return_value=CAPTURED), \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "complete_job", side_effect=Exception("DB weg")), \
+         mock.patch.object(checkout, "refund_capture") as refund:
+        checkout.process_job(JOB)
+
+    refund.assert_not_called()
+    statements = [call[0] for call in cursor.execute.call_args_list]
+    assert any("captured = TRUE" in sql and params[0] == "CAP1" for sql, params in statements)
+    sql, params = statements[-1]
+    assert "status = 'pending'" in sql
+    assert params[2:4] == (True, "CAP1")
+
+    # 2. Versuch: Reservierung abgelaufen, Sitz inzwischen vergeben – kein neuer Capture, sondern Erstattung
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = [(2, 1)]
+    job = dict(JOB, attempts=2, captured=True, capture_id="CAP1")
+    with mock.patch.object(checkout, "capture_order") as capture_order, \
+         mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "complete_job", side_effect=checkout.SeatsAlreadyBooked([(2, 1)])), \
+         mock.patch.object(checkout, "refund_capture") as refund, \
+         mock.patch.object(checkout.hub, "publish"):
+        checkout.process_job(job)
+
+    capture_order.assert_not_called()
+    refund.assert_called_once_with("CAP1")
+    assert "status = 'refunded'" in cursor.execute.call_args[0][0]
+
+
+def test_captured_job_is_refunded_after_max_attempts():
+    cursor = mock.MagicMock()
+    job = dict(JOB, attempts=checkout.MAX_ATTEMPTS, captured=True, capture_id="CAP1")
+    with mock.patch.object(checkout, "get_db_connection", return_value=fake_db_conn(cursor)), \
+         mock.patch.object(checkout, "price_cart", return_value=PRICED_CART), \
+         mock.patch.object(checkout, "complete_job", side_effect=Exception("DB weg")), \
+         mock.patch.object(checkout, "refund_capture") as refund, \
+         mock.patch.object(checkout.hub, "publish"):
+        checkout.process_job(job)
+
+    refund.assert_called_once_with("CAP1")
+    assert "status = 'refunded'" in cursor.execute.call_args[0][0]
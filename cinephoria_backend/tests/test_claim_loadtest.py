@@ -0,0 +1,45 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from cinephoria_backend import claim_loadtest
+from cinephoria_backend.claim_loadtest import ClaimResult
+from cinephoria_backend.pricing import PricedItem
+
+
+def test_run_claims_spreads_claimants_over_seats():
+    items = [PricedItem(seat_id, 5, None, Decimal("9.50"), Decimal("9.50")) for seat_id in (1, 2)]
+    taken = set()
+    lock = threading.Lock()
+
+    # Ersatz für die Datenbank: der erste Käufer pro Sitz gewinnt
+    def fake_claim(pool, number, item, book):
+        with lock:
+            won = item.seat_id not in taken
+            taken.add(item.seat_id)
+        return ClaimResult(item.seat_id, won, None, 0.001)
+
+    with mock.patch("cinephoria_backend.claim_loadtest.claim", side_effect=fake_claim):
+        results, elapsed = claim_loadtest.run_claims(mock.MagicMock(), items, 20)
+
+    stats = claim_loadtest.summarize(results, elapsed)
+    assert stats["claimants"] == 20
+    assert stats["won"] == 2 and stats["conflicts"] == 18
+    assert stats["double_claims"] == 0 and stats["errors"] == 0
+
+
+def test_summarize_counts_double_claims_and_errors():
+    results = [
+        ClaimResult(1, True, None, 0.01),
+        ClaimResult(1, True, None, 0.02),
+        ClaimResult(2, False, None, 0.03),
+        ClaimResult(2, False, "PoolTimeout", 0.5),
+    ]
+    stats = claim_loadtest.summarize(results, 2.0)
+    assert stats["double_claims"] == 1
+    assert (stats["won"], stats["conflicts"], stats["errors"]) == (2, 1, 1)
+    assert stats["claims_per_second"] == 2.0
+    assert stats["p99_ms"] == 500.0
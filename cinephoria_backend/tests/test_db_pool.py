@@ -0,0 +1,220 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import threading
+import pytest
+from unittest import mock
+import psycopg2
+from psycopg2 import extensions
+
+from cinephoria_backend.db_pool import ConnectionPool, PoolTimeout
+
+
+# Hilfsklasse: minimale Fake-Verbindung mit dem Teil der psycopg2-API, den der Pool nutzt
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.cursor = mock.MagicMock()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return self.status
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect(dsn):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    kwargs.setdefault("minconn", 0)
+    pool = ConnectionPool("postgres://fake", connect=connect, **kwargs)
+    return pool, created
+
+
+def test_connection_is_reused():
+    pool, created = make_pool(maxconn=2)
+    with pool.connection() as conn1:
+        pass
+    with pool.connection() as conn2:
+        pass
+    assert conn1 is conn2
+    assert len(created) == 1
+    assert conn1.commits == 2  # Commit beim Verlassen des with-Blocks
+
+
+def test_rollback_on_exception_and_connection_returned():
+    pool, created = make_pool(maxconn=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            raise RuntimeError("boom")
+    assert conn.rollbacks == 1
+    assert pool.stats()["idle"] == 1
+    assert pool.stats()["in_use"] == 0
+
+
+def test_failed_commit_is_raised_and_connection_discarded():
+    pool, created = make_pool(maxconn=1)
+    with pytest.raises(psycopg2.extensions.TransactionRollbackError):
+        with pool.connection() as conn:
+            conn.commit = mock.Mock(side_effect=psycopg2.extensions.TransactionRollbackError("serialization"))
+    assert conn.closed
+    assert pool.stats() == {"size": 0, "idle": 0, "in_use": 0, "maxconn": 1}
+
+
+def test_failed_rollback_keeps_original_exception():
+    pool, created = make_pool(maxconn=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.rollback = mock.Mock(side_effect=psycopg2.OperationalError("weg"))
+            raise RuntimeError("boom")
+    assert conn.closed
+    assert pool.stats()["in_use"] == 0
+
+
+def test_minconn_warm_up():
+    pool, created = make_pool(minconn=3, maxconn=5)
+    with pool.connection():
+        pass
+    assert len(created) == 3
+
+
+def test_closed_connection_is_replaced():
+    pool, created = make_pool(maxconn=1)
+    with pool.connection() as conn:
+        pass
+    conn.closed = 1
+    with pool.connection() as conn2:
+        pass
+    assert conn2 is not conn
+    assert len(created) == 2
+
+
+def test_health_check_after_idle_time():
+    pool, created = make_pool(maxconn=1, health_check_after=0)
+    with pool.connection() as conn:
+        pass
+    conn.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError("weg")
+    with pool.connection() as conn2:
+        pass
+    assert conn2 is not conn
+    assert conn.closed
+
+
+def test_slow_health_check_does_not_block_the_pool():
+    pool, created = make_pool(maxconn=2, health_check_after=0, timeout=2)
+    slow = pool.getconn()
+    other = pool.getconn()
+    pool.putconn(slow)
+
+    checking, release = threading.Event(), threading.Event()
+
+    def hanging_select(sql):
+        checking.set()
+        release.wait(2)
+
+    slow.cursor.return_value.__enter__.return_value.execute.side_effect = hanging_select
+    result = []
+    t = threading.Thread(target=lambda: result.append(pool.getconn()))
+    t.start()
+    assert checking.wait(2)
+
+    # Während SELECT 1 hängt, sind Rückgabe und Ausleihen weiter möglich
+    done = threading.Event()
+    threading.Thread(target=lambda: (pool.putconn(other), pool.getconn(), done.set())).start()
+    assert done.wait(1)
+    release.set()
+    t.join(2)
+    assert result == [slow]
+
+
+def test_slow_rollback_on_return_does_not_block_the_pool():
+    pool, created = make_pool(maxconn=2, timeout=2)
+    slow = pool.getconn()
+    other = pool.getconn()
+
+    rolling_back, release = threading.Event(), threading.Event()
+
+    def hanging_rollback():
+        rolling_back.set()
+        release.wait(2)
+        slow.status = extensions.TRANSACTION_STATUS_IDLE
+
+    slow.status = extensions.TRANSACTION_STATUS_INTRANS
+    slow.rollback = hanging_rollback
+    t = threading.Thread(target=pool.putconn, args=(slow,))
+    t.start()
+    assert rolling_back.wait(2)
+
+    # Während der Rollback hängt, sind Rückgabe und Ausleihen weiter möglich
+    done = threading.Event()
+    threading.Thread(target=lambda: (pool.putconn(other), pool.getconn(), done.set())).start()
+    assert done.wait(1)
+    release.set()
+    t.join(2)
+    assert pool.stats() == {"size": 2, "idle": 1, "in_use": 1, "maxconn": 2}
+
+
+def test_warm_up_respects_maxconn():
+    pool, created = make_pool(minconn=2, maxconn=2)
+    first = pool.getconn()
+    second = pool.getconn()
+    assert {first, second} == set(created)
+    assert pool.stats()["size"] == 2
+
+
+def test_max_lifetime_recycles_connection():
+    pool, created = make_pool(maxconn=1, max_lifetime=0)
+    with pool.connection() as conn:
+        pass
+    assert conn.closed
+    with pool.connection() as conn2:
+        pass
+    assert conn2 is not conn
+
+
+def test_timeout_when_pool_exhausted():
+    pool, created = make_pool(maxconn=1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+
+
+def test_waiting_thread_gets_returned_connection():
+    pool, created = make_pool(maxconn=1, timeout=2)
+    conn = pool.getconn()
+    result = []
+    t = threading.Thread(target=lambda: result.append(pool.getconn()))
+    t.start()
+    pool.putconn(conn)
+    t.join(2)
+    assert result == [conn]
+    assert len(created) == 1
+
+
+def test_pool_reinitialised_after_fork():
+    pool, created = make_pool(maxconn=2)
+    with pool.connection() as conn:
+        pass
+    with mock.patch("cinephoria_backend.db_pool.os.getpid", return_value=os.getpid() + 1):
+        with pool.connection() as conn2:
+            pass
+    # Die Verbindung des "Elternprozesses" wird weder benutzt noch geschlossen
+    assert conn2 is not conn
+    assert not conn.closed
@@ -212,8 +212,14 @@ def test_get_seat_types_with_discounts_success():
 
 # 8. GET /discount/<int:seat_type_id>
 def test_get_discount_for_seat_type_success():
+    # Kommt aus demselben Katalog wie /seat_types_with_discounts
     fake_results = [
         {
+            "seat_type_id": 2,
+            "seat_type_name": "VIP",
+            "price": 20.0,
+            "color": "red",
+            "icon": "vip.png",
             "discount_id": 1,
             "seat_type_discount_id": 10,
             "discount_name": "VIP Rabatt",
@@ -238,3 +244,36 @@ def test_get_discount_for_seat_type_success():
         assert len(data["discounts"]) == 1
         # Prüfe, ob der Name des Discounts stimmt (basierend auf fake_results)
         assert data["discounts"][0]["name"] == "VIP Rabatt"
+
+
+# 9. Katalog wird einmal gebaut, mit ETag ausgeliefert und nach Admin-Änderungen neu geladen
+def test_seat_type_catalog_is_cached_with_etag():
+    rows = [{
+        "seat_type_id": 1, "seat_type_name": "Normal", "price": 10.0, "color": "blue", "icon": None,
+        "discount_id": 3, "discount_name": "Student", "description": "", "discount_amount": None,
+        "discount_percentage": 20, "seat_type_discount_id": 7
+    }]
+    conn = mock.MagicMock()
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = rows
+    cursor.rowcount = 1
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+
+    with mock.patch("cinephoria_backend.routes.discounts.get_db_connection", return_value=conn) as get_conn:
+        client = app.test_client()
+        first = client.get("/seat_types_with_discounts")
+        etag = first.headers["ETag"]
+        assert first.status_code == 200
+        assert client.get("/discount/1").get_json()["discounts"][0]["discount_percentage"] == 20.0
+        assert client.get("/discount/99").get_json() == {"discounts": []}
+
+        cached = client.get("/seat_types_with_discounts", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert get_conn.call_count == 1
+
+        client.put("/discounts/3", json={"name": "Studierende"}, headers={"Authorization": f"Bearer {admin_token}"})
+        rows[0]["discount_name"] = "Studierende"
+        changed = client.get("/seat_types_with_discounts", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.get_json()["seat_types"][0]["discounts"][0]["name"] == "Studierende"
@@ -54,11 +54,14 @@ def test_get_user_bookings_success():
         "seats": [{"seat_id": 1, "price": "10", "row": "A", "number": 1, "seat_type": "normal", "seat_type_discount_id": None}]
     }
     cursor = mock.MagicMock()
-    cursor.fetchall.return_value = [fake_booking]
+    # Buchungen, danach movie_metadata (Film noch unbekannt)
+    cursor.fetchall.side_effect = [[fake_booking], []]
     conn = fake_db_conn(cursor)
 
     # Patch die DB-Funktion
-    with mock.patch("cinephoria_backend.routes.extras.get_db_connection", return_value=conn):
+    with mock.patch("cinephoria_backend.routes.extras.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.movie_metadata.get_db_connection", return_value=fake_db_conn(mock.MagicMock())), \
+         mock.patch("cinephoria_backend.movie_metadata.store_movie_metadata") as store:
         # Patch den externen Request an TMDB: Wir simulieren eine Antwort für movie_id 555
         fake_tmdb_response = mock.MagicMock()
         fake_tmdb_response.status_code = 200
@@ -66,7 +69,7 @@ def test_get_user_bookings_success():
             "title": "Test Movie",
             "poster_path": "/test.jpg"
         }
-        with mock.patch("cinephoria_backend.routes.extras.requests.get", return_value=fake_tmdb_response):
+        with mock.patch("cinephoria_backend.http_client.http.get", return_value=fake_tmdb_response):
             client = app.test_client()
             response = client.get(
                 "/bookings",
@@ -82,6 +85,29 @@ def test_get_user_bookings_success():
             # created_at, start_time, end_time sollten ISO-Strings sein
             assert isinstance(booking["created_at"], str)
             assert isinstance(booking["start_time"], str)
+            # Der nachgeladene Film wird für die nächste Anfrage gespeichert
+            assert store.call_args[0][1] == {555: ("Test Movie", "/test.jpg")}
+
+
+def test_get_user_bookings_uses_stored_movie_metadata():
+    fake_booking = {
+        "booking_id": 101, "showtime_id": 200, "total_amount": 12.0, "payment_status": "completed",
+        "paypal_order_id": "order_124", "created_at": datetime(2025, 2, 1, 12, 0, 0), "movie_id": 556,
+        "screen_id": 1, "start_time": datetime(2025, 2, 1, 14, 0, 0), "end_time": None,
+        "screen_name": "Hauptscreen", "seats": []
+    }
+    cursor = mock.MagicMock()
+    cursor.fetchall.side_effect = [[fake_booking], [(556, "Gespeicherter Film", "/p.jpg")]]
+    conn = fake_db_conn(cursor)
+
+    with mock.patch("cinephoria_backend.routes.extras.get_db_connection", return_value=conn), \
+         mock.patch("cinephoria_backend.http_client.http.get") as tmdb_get:
+        client = app.test_client()
+        response = client.get("/bookings", headers={"Authorization": f"Bearer {user_token}"})
+        booking = response.get_json()["bookings"][0]
+        assert booking["movie_title"] == "Gespeicherter Film"
+        assert booking["movie_poster_url"] == "https://image.tmdb.org/t/p/w500/p.jpg"
+        tmdb_get.assert_not_called()
 
 # 2. Test: GET /user/points
 def test_get_user_points_success():
@@ -263,3 +289,13 @@ def test_get_leaderboard_success():
         assert len(data["leaderboard"]) == 2
         # Prüfe, ob die User-Daten enthalten sind
         assert data["leaderboard"][0]["nickname"] in ["Alice", "Bob"]
+
+
+def test_outbound_stats_admin_only():
+    client = app.test_client()
+    assert client.get("/admin/outbound-stats", headers={"Authorization": f"Bearer {user_token}"}).status_code == 403
+    response = client.get("/admin/outbound-stats", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert "hosts" in data["http"]
+    assert "hits" in data["tmdb"]
@@ -0,0 +1,105 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from cinephoria_backend.http_client import HTTPClient
+
+
+class StubServer:
+    """HTTP/1.1-Server mit Keep-Alive; merkt sich Client-Ports und liefert vorgegebene Statuscodes."""
+
+    def __init__(self):
+        self.statuses = []  # werden der Reihe nach verwendet, danach 200
+        self.client_ports = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self):
+                stub.client_ports.append(self.client_address[1])
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                status = stub.statuses.pop(0) if stub.statuses else 200
+                body = b'{"ok": true}'
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"127.0.0.1:{self.server.server_port}"
+        self.url = f"http://{self.host}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+def test_connections_are_reused(stub):
+    client = HTTPClient()
+    for _ in range(3):
+        assert client.get(f"{stub.url}/a").status_code == 200
+    # Alle Aufrufe über dieselbe TCP-Verbindung
+    assert len(set(stub.client_ports)) == 1
+    assert client.stats()["hosts"][stub.host]["requests"] == 3
+
+
+def test_get_is_retried_with_backoff(stub):
+    sleeps = []
+    client = HTTPClient(retries=2, backoff=0.1, sleep=sleeps.append)
+    stub.statuses = [503, 502]
+    assert client.get(f"{stub.url}/a").status_code == 200
+    assert sleeps == [0.1, 0.2]
+    assert client.stats()["hosts"][stub.host]["retries"] == 2
+
+
+def test_post_is_not_retried_unless_idempotent(stub):
+    client = HTTPClient(retries=2, sleep=lambda s: None)
+    stub.statuses = [503]
+    assert client.post(f"{stub.url}/a", json={}).status_code == 503
+
+    stub.statuses = [503]
+    assert client.post(f"{stub.url}/a", json={}, idempotent=True).status_code == 200
+
+
+def test_connection_errors_raise_after_retries():
+    client = HTTPClient(retries=1, sleep=lambda s: None)
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://127.0.0.1:9/a")
+    counters = client.stats()["hosts"]["127.0.0.1:9"]
+    assert counters["requests"] == 2
+    assert counters["errors"] == 2
+    assert counters["in_flight"] == 0
+
+
+def test_saturation_is_counted():
+    client = HTTPClient(pool_maxsize=1)
+    client._enter("host")
+    client._enter("host")
+    client._leave("host", 0.1)
+    client._leave("host", 0.1)
+    counters = client.stats()["hosts"]["host"]
+    assert counters["saturated"] == 1
+    assert counters["peak_in_flight"] == 2
@@ -6,9 +6,11 @@ import pytest
 import jwt
 from unittest import mock
 from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 
 from cinephoria_backend.app import app
 from cinephoria_backend.config import SECRET_KEY
+from cinephoria_backend.pricing import PricedCart, PricedItem
 
 # Wir bauen uns ein User-Token (role=user)
 user_payload = {
@@ -18,23 +20,27 @@ user_payload = {
 }
 user_token = jwt.encode(user_payload, SECRET_KEY, algorithm="HS256")
 
+# Preise kommen vom Server (pricing.py); die Preismatrix wird hier nicht aus der DB geladen
+PRICED_SEAT = PricedItem(777, 55, None, Decimal("15.00"), Decimal("15.00"))
+PRICED_CART = PricedCart([PRICED_SEAT], Decimal("15.00"))
+
 
 ##############################################################################
 # 1) Abbruch der Zahlung
 ##############################################################################
+@mock.patch("cinephoria_backend.routes.usercart.price_seat", return_value=PRICED_SEAT)
 @mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="fake_access_token")
-@mock.patch("requests.post")
+@mock.patch("cinephoria_backend.http_client.http.post")
 @mock.patch("cinephoria_backend.routes.paypal.get_db_connection")
 @mock.patch("cinephoria_backend.routes.usercart.get_db_connection")
-@mock.patch("cinephoria_backend.routes.usercart.clear_expired_user_cart_items")
 @mock.patch("cinephoria_backend.routes.auth.token_required")
 def test_integration_ticket_booking_abort(
     mock_token_required,
-    mock_clear_expired,
     mock_db_usercart,
     mock_db_paypal,
     mock_requests_post,
-    mock_get_paypal_access_token
+    mock_get_paypal_access_token,
+    mock_price_seat
 ):
     """
     Testet den Ablauf:
@@ -55,43 +61,31 @@ def test_integration_ticket_booking_abort(
 
     # Wir simulieren folgende fetchone()-Aufrufe:
     #
-    # 1) POST /user/cart => SELECT user_carts => None => wir legen an
-    # 2) POST /user/cart => SELECT seat_id FROM guest_cart_items => None => kein Konflikt
-    # 3) POST /user/cart => INSERT => returning seat_id=1 => OK
-    #
-    # 4) POST (Double-Add) => SELECT user_carts => (1,) => existiert
-    # 5) POST (Double-Add) => SELECT seat_id FROM guest_cart_items => None
-    # 6) POST (Double-Add) => INSERT => returning seat_id=None => 409
-    #
-    # 7) POST /user/cart/update => SELECT cart_item_id => (123, None)
-    # 8) POST /user/cart/update => SELECT 1 FROM seat_type_discounts => (1,)
-    #
-    # 9) GET /user/cart => SELECT user_id, valid_until => dict mit valid_until
+    # 1) POST /user/cart => INSERT INTO seat_claims => returning seat_id=777 => OK
+    # 2) POST (Double-Add) => INSERT ... ON CONFLICT => keine Zeile => 409
+    # 3) POST /user/cart/update => UPDATE seat_claims => returning seat_id=777
+    #    (Der Discount wird über die Preismatrix geprüft, siehe price_seat-Mock)
     #
     mock_cursor_usercart.fetchone.side_effect = [
-        None,               # (1)
+        (777,),             # (1)
         None,               # (2)
-        (1,),               # (3)
-        (1,),               # (4)
-        None,               # (5)
-        None,               # (6)
-        (123, None),        # (7)
-        (1,),               # (8)
-        {
-            "user_id": 999,
-            "valid_until": datetime.now(timezone.utc) + timedelta(minutes=15)
-        }                   # (9)
+        (777,),             # (3)
     ]
 
-    # Außerdem brauchen wir fetchall() für GET /user/cart => cart_items:
-    mock_cursor_usercart.fetchall.return_value = [
-        {
-            "seat_id": 777,
-            "price": 10.0,
-            "reserved_until": datetime.now(timezone.utc),
-            "showtime_id": 55,
-            "seat_type_discount_id": 99
-        }
+    # fetchall()-Aufrufe:
+    # (2) Double-Add => Alternativen zum belegten Sitz => keine freien Sitze
+    # GET /user/cart => über seat_claims
+    mock_cursor_usercart.fetchall.side_effect = [
+        [],
+        [
+            {
+                "seat_id": 777,
+                "price": 10.0,
+                "reserved_until": datetime.now(timezone.utc),
+                "showtime_id": 55,
+                "seat_type_discount_id": 99
+            }
+        ]
     ]
 
     mock_db_usercart.return_value = mock_conn_usercart
@@ -138,6 +132,7 @@ def test_integration_ticket_booking_abort(
         headers={"Authorization": f"Bearer {user_token}"}
     )
     assert resp_add_again.status_code == 409, "Doppeltes Hinzufügen sollte 409 liefern"
+    assert resp_add_again.get_json()["alternatives"] == []
 
     # ----------------------------------------------------------------------------------
     # (D) Schritt 2: Discount anwenden
@@ -180,19 +175,21 @@ def test_integration_ticket_booking_abort(
 ##############################################################################
 # 2) Erfolgreiche Zahlung
 ##############################################################################
+@mock.patch("cinephoria_backend.routes.paypal.price_checkout", return_value=PRICED_CART)
+@mock.patch("cinephoria_backend.routes.usercart.price_seat", return_value=PRICED_SEAT)
 @mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="fake_access_token")
-@mock.patch("requests.post")
+@mock.patch("cinephoria_backend.http_client.http.post")
 @mock.patch("cinephoria_backend.routes.paypal.get_db_connection")
 @mock.patch("cinephoria_backend.routes.usercart.get_db_connection")
-@mock.patch("cinephoria_backend.routes.usercart.clear_expired_user_cart_items")
 @mock.patch("cinephoria_backend.routes.auth.token_required")
 def test_integration_ticket_booking_success(
     mock_token_required,
-    mock_clear_expired,
     mock_db_usercart,
     mock_db_paypal,
     mock_requests_post,
-    mock_get_paypal_access_token
+    mock_get_paypal_access_token,
+    mock_price_seat,
+    mock_price_checkout
 ):
     """
     Testet den Ablauf:
@@ -211,23 +208,13 @@ def test_integration_ticket_booking_success(
     mock_conn_usercart.cursor.return_value.__enter__.return_value = mock_cursor_usercart
 
     # fetchone() für:
-    #   - SELECT user_carts => None (Cart existiert noch nicht)
-    #   - SELECT seat_id FROM guest_cart_items => None (kein Konflikt)
-    #   - INSERT => returning seat_id (777)
+    #   - INSERT INTO seat_claims => returning seat_id (777)
     #
-    # Später ruft get_user_cart() evtl. fetchone() + fetchall() noch mal auf,
-    # nach dem Capture. Da wir den Cart aber leeren, fetchall() => [].
+    # Nach dem Capture ruft get_user_cart() nur noch fetchall() auf.
+    # Da wir den Cart aber leeren, fetchall() => [].
     #
     mock_cursor_usercart.fetchone.side_effect = [
-        None,      # user_carts => None
-        None,      # guest_cart_items => None
-        (777,),    # user_cart_items => seat_id=777
-        # Falls dein Code später noch mal user_carts abfragt => erwarte dict
-        {
-            "user_id": 999,
-            "valid_until": datetime.now(timezone.utc) + timedelta(minutes=15)
-        },
-        # Dann fetchall => []
+        (777,),    # seat_claims => seat_id=777
     ]
     # fetchall => 2. Phase (nach dem Capture) => leerer Warenkorb:
     mock_cursor_usercart.fetchall.return_value = []
@@ -244,10 +231,10 @@ def test_integration_ticket_booking_success(
 
     # Wenn wir capturing machen, führst du in `capture_paypal_order` typically aus:
     #   INSERT INTO bookings(...) RETURNING booking_id
-    # => fetchone() => [1234]
+    # => fetchone() => (1234, Anzahl Sitze, festgeschriebene Claims)
     #
     mock_cursor_paypal.fetchone.side_effect = [
-        [1234],   # booking_id=1234
+        (1234, 1, [[55, 777]]),   # booking_id=1234
     ]
 
     mock_db_paypal.return_value = mock_conn_paypal
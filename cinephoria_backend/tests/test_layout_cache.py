@@ -0,0 +1,70 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from unittest import mock
+
+import pytest
+
+from cinephoria_backend.layout_cache import LayoutCache, ScreenNotFound, layout_cache, _handle_notification
+
+
+def fake_cursor(rows):
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = rows
+    return cursor
+
+
+def test_layout_loaded_once_per_screen():
+    cache = LayoutCache()
+    cursor = fake_cursor([(1, 7, "A", 1, 1, "standard", 9.5, None, None, "Saal 7")])
+    first = cache.get(cursor, 7)
+    second = cache.get(cursor, 7)
+    assert first is second
+    assert cursor.execute.call_count == 1
+    assert first.seats[0]["seat_type_name"] == "standard"
+
+
+def test_invalidation_during_load_is_not_cached():
+    cache = LayoutCache()
+    cursor = fake_cursor([])
+
+    # Admin-Änderung trifft ein, während das (alte) Layout gerade geladen wird
+    def fetchall():
+        cache.invalidate(7)
+        return [(1, 7, "A", 1, 1, "standard", 9.5, None, None, "Saal 7")]
+    cursor.fetchall.side_effect = fetchall
+
+    cache.get(cursor, 7)
+    cursor.fetchall.side_effect = None
+    cursor.fetchall.return_value = []
+    assert cache.get(cursor, 7).seats == ()
+    assert cursor.execute.call_count == 3  # Layout zweimal, beim leeren Ergebnis die Saal-Prüfung
+
+
+def test_notification_payloads():
+    cursor = fake_cursor([(1, 8, "A", 1, 1, "standard", 9.5, None, None, "Saal 8")])
+    layout_cache.get(cursor, 8)
+    layout_cache.get(cursor, 9)
+
+    _handle_notification("8")
+    layout_cache.get(cursor, 9)
+    assert cursor.execute.call_count == 2  # Saal 9 noch im Cache
+
+    _handle_notification("*")
+    layout_cache.get(cursor, 9)
+    assert cursor.execute.call_count == 3
+
+
+def test_unknown_screen_is_not_cached():
+    cache = LayoutCache()
+    cursor = fake_cursor([])
+    cursor.fetchone.return_value = None
+    for _ in range(2):
+        with pytest.raises(ScreenNotFound):
+            cache.get(cursor, 404)
+    assert cache._layouts == {}
+
+    # Saal ohne Sitze gibt es dagegen: leeres Layout, gecacht
+    cursor.fetchone.return_value = (1,)
+    assert cache.get(cursor, 5).seats == ()
+    assert 5 in cache._layouts
@@ -0,0 +1,147 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from datetime import datetime, timedelta
+from unittest import mock
+
+from cinephoria_backend.app import app
+from cinephoria_backend.movie_catalog import CatalogMovie, CatalogSnapshot, MovieCatalog
+from cinephoria_backend import movie_sync
+
+
+def test_routes_served_from_catalog_without_tmdb(empty_movie_catalog):
+    empty_movie_catalog.movies[42] = CatalogMovie(
+        42, {"id": 42, "title": "Gespiegelt"}, {"iso_3166_1": "DE", "release_dates": []}, "abc"
+    )
+    empty_movie_catalog.lists["now_playing"] = {"results": [{"id": 42, "poster_path": "/p.jpg"}]}
+
+    with mock.patch("cinephoria_backend.http_client.http.get") as tmdb_get:
+        client = app.test_client()
+        assert client.get("/movies/42").get_json()["title"] == "Gespiegelt"
+        assert client.get("/movie/42/release_dates").get_json()["iso_3166_1"] == "DE"
+        assert client.get("/movie/42/trailer_url").get_json()["trailer_url"].endswith("/abc")
+        assert client.get("/movies/now_playing").get_json()["results"][0]["id"] == 42
+        tmdb_get.assert_not_called()
+
+
+def test_mirrored_movie_without_trailer_is_404(empty_movie_catalog):
+    empty_movie_catalog.movies[43] = CatalogMovie(43, {"id": 43}, None, None)
+    with mock.patch("cinephoria_backend.http_client.http.get") as tmdb_get:
+        client = app.test_client()
+        assert client.get("/movie/43/trailer_url").status_code == 404
+        assert client.get("/movie/43/release_dates").status_code == 404
+        tmdb_get.assert_not_called()
+
+
+def test_catalog_reloads_after_change_and_backs_off_on_errors():
+    snapshots = [CatalogSnapshot(lists={"upcoming": {"v": 1}}), CatalogSnapshot(lists={"upcoming": {"v": 2}})]
+    loader = mock.MagicMock(side_effect=snapshots)
+    catalog = MovieCatalog(loader=loader)
+
+    assert catalog.snapshot().lists["upcoming"] == {"v": 1}
+    assert catalog.snapshot().lists["upcoming"] == {"v": 1}
+    assert loader.call_count == 1
+
+    catalog.invalidate()
+    catalog._reload()  # sonst im Hintergrund-Thread
+    assert catalog.snapshot().lists["upcoming"] == {"v": 2}
+
+    failing = MovieCatalog(loader=mock.MagicMock(side_effect=Exception("DB weg")))
+    assert failing.snapshot().movies == {}
+    assert failing.snapshot().movies == {}
+    assert failing._loader.call_count == 1  # kein erneuter Versuch vor Ablauf von RETRY_AFTER
+
+
+def fake_sync_cursor(since, mirrored, scheduled):
+    cursor = mock.MagicMock()
+    # Lock beim Lesen, Stand des letzten Laufs, Lock beim Schreiben
+    cursor.fetchone.side_effect = [(True,), (since,) if since else None, (True,)]
+    cursor.fetchall.side_effect = [[(m,) for m in mirrored], [(m,) for m in scheduled]]
+    return cursor
+
+
+def fake_connection(cursor):
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+    return mock.MagicMock(return_value=conn)
+
+
+def run_sync(cursor, lists, changed, full=False):
+    connection = fake_connection(cursor)
+    entries = mock.MagicMock(side_effect=lambda ids: {i: ({"id": i}, None, None) for i in ids})
+    with mock.patch.object(movie_sync, "fetch_lists", return_value=lists), \
+         mock.patch.object(movie_sync, "fetch_changed_ids", return_value=changed) as changes, \
+         mock.patch.object(movie_sync, "fetch_movie_entries", entries), \
+         mock.patch.object(movie_sync, "store_movies") as store_movies, \
+         mock.patch.object(movie_sync, "store_lists"), \
+         mock.patch.object(movie_sync.hub, "publish") as publish:
+        count = movie_sync.sync_movies(connection, full=full)
+    return count, entries.call_args[0][0], changes, store_movies, publish
+
+
+def test_sync_fetches_new_and_changed_movies_only():
+    since = datetime.utcnow() - timedelta(hours=1)
+    cursor = fake_sync_cursor(since, mirrored=[1, 2, 3], scheduled=[7])
+    lists = {"now_playing": {"results": [{"id": 1}, {"id": 5}]}}
+
+    count, requested, changes, store_movies, publish = run_sync(cursor, lists, changed={2, 99})
+    # 5 und 7 sind neu, 2 wurde bei TMDB geändert; 1 und 3 bleiben unverändert
+    assert requested == [2, 5, 7]
+    assert count == 3
+    changes.assert_called_once_with(since)
+    assert publish.call_args[0][1] == "movie_catalog_changed"
+    # Zeitpunkt für den nächsten inkrementellen Lauf wird gespeichert
+    assert any("movie_sync_state" in call.args[0] for call in cursor.execute.call_args_list)
+
+
+def test_sync_refreshes_everything_after_long_pause():
+    since = datetime.utcnow() - timedelta(days=30)
+    cursor = fake_sync_cursor(since, mirrored=[1, 2], scheduled=[])
+    count, requested, changes, _, _ = run_sync(cursor, {}, changed=set())
+    assert requested == [1, 2]
+    changes.assert_not_called()
+
+
+def test_sync_skipped_when_locked():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = (False,)
+    with mock.patch.object(movie_sync, "fetch_lists") as fetch_lists:
+        assert movie_sync.sync_movies(fake_connection(cursor)) is None
+    fetch_lists.assert_not_called()
+
+
+def test_sync_fetches_from_tmdb_without_holding_a_connection():
+    cursor = fake_sync_cursor(None, mirrored=[], scheduled=[1])
+    connection = fake_connection(cursor)
+    conn = connection.return_value
+
+    def fetch_lists():
+        # Die Lese-Transaktion ist beendet, die Schreib-Transaktion noch nicht begonnen
+        assert conn.__enter__.call_count == conn.__exit__.call_count == 1
+        return {}
+
+    with mock.patch.object(movie_sync, "fetch_lists", side_effect=fetch_lists), \
+         mock.patch.object(movie_sync, "fetch_movie_entries", return_value={1: ({"id": 1}, None, None)}), \
+         mock.patch.object(movie_sync, "store_movies") as store_movies, \
+         mock.patch.object(movie_sync.hub, "publish"):
+        assert movie_sync.sync_movies(connection) == 1
+    assert conn.__enter__.call_count == 2
+    store_movies.assert_called_once()
+
+
+def test_fetch_movie_entries_splits_appended_responses():
+    fake_get = mock.MagicMock()
+    fake_get.return_value.status_code = 200
+    fake_get.return_value.json.return_value = {
+        "id": 8, "title": "Film",
+        "release_dates": {"results": [{"iso_3166_1": "DE", "release_dates": [{"certification": "12"}]}]},
+        "videos": {"results": [{"type": "Trailer", "site": "YouTube", "key": "xyz"}]}
+    }
+    with mock.patch("cinephoria_backend.http_client.http.get", fake_get):
+        entries = movie_sync.fetch_movie_entries([8])
+    details, release_de, key = entries[8]
+    assert details == {"id": 8, "title": "Film"}
+    assert release_de["iso_3166_1"] == "DE"
+    assert key == "xyz"
+    assert "append_to_response=release_dates,videos" in fake_get.call_args[0][0]
@@ -27,7 +27,7 @@ def test_get_now_playing_success():
     fake_get.return_value.status_code = 200
     fake_get.return_value.json.return_value = fake_response
 
-    with mock.patch("cinephoria_backend.routes.movies.requests.get", fake_get):
+    with mock.patch("cinephoria_backend.http_client.http.get", fake_get):
         client = app.test_client()
         response = client.get("/movies/now_playing")
         data = response.get_json()
@@ -38,6 +38,20 @@ def test_get_now_playing_success():
         for movie in data["results"]:
             assert movie.get("poster_path")  # Nur Filme mit poster_path kommen rein
 
+def test_get_now_playing_page_count_configurable():
+    fake_get = mock.MagicMock()
+    fake_get.return_value.status_code = 200
+    fake_get.return_value.json.return_value = {"results": [{"id": 1, "poster_path": "/a.jpg"}, {"id": 2}]}
+
+    with mock.patch("cinephoria_backend.http_client.http.get", fake_get), \
+         mock.patch("cinephoria_backend.movie_catalog.TMDB_NOW_PLAYING_PAGES", 2):
+        client = app.test_client()
+        response = client.get("/movies/now_playing")
+        assert response.status_code == 200
+        assert len(response.get_json()["results"]) == 2  # ohne Poster wird gefiltert
+        requested_pages = sorted(call.args[0].split("page=")[1].split("&")[0] for call in fake_get.call_args_list)
+        assert requested_pages == ["1", "2"]
+
 # Test für /movies/upcoming
 def test_get_upcoming_success():
     fake_upcoming = {"results": [{"id": 321, "title": "Upcoming Movie"}]}
@@ -45,7 +59,7 @@ def test_get_upcoming_success():
     fake_get.return_value.status_code = 200
     fake_get.return_value.json.return_value = fake_upcoming
 
-    with mock.patch("cinephoria_backend.routes.movies.requests.get", fake_get):
+    with mock.patch("cinephoria_backend.http_client.http.get", fake_get):
         client = app.test_client()
         response = client.get("/movies/upcoming")
         data = response.get_json()
@@ -60,7 +74,7 @@ def test_get_movie_details_success():
     fake_get.return_value.status_code = 200
     fake_get.return_value.json.return_value = fake_details
 
-    with mock.patch("cinephoria_backend.routes.movies.requests.get", fake_get):
+    with mock.patch("cinephoria_backend.http_client.http.get", fake_get):
         client = app.test_client()
         response = client.get(f"/movies/{movie_id}")
         data = response.get_json()
@@ -81,7 +95,7 @@ def test_get_movie_release_dates_success():
     fake_get.return_value.status_code = 200
     fake_get.return_value.json.return_value = fake_release
 
-    with mock.patch("cinephoria_backend.routes.movies.requests.get", fake_get):
+    with mock.patch("cinephoria_backend.http_client.http.get", fake_get):
         client = app.test_client()
         response = client.get(f"/movie/{movie_id}/release_dates")
         data = response.get_json()
@@ -102,7 +116,7 @@ def test_get_movie_trailer_url_success():
     fake_get.return_value.status_code = 200
     fake_get.return_value.json.return_value = fake_video
 
-    with mock.patch("cinephoria_backend.routes.movies.requests.get", fake_get):
+    with mock.patch("cinephoria_backend.http_client.http.get", fake_get):
         client = app.test_client()
         response = client.get(f"/movie/{movie_id}/trailer_url")
         data = response.get_json()
@@ -271,3 +285,44 @@ def test_get_screens_success():
         assert "screens" in data
         assert len(data["screens"]) == 2
         assert data["screens"][0]["name"] == "Saal 1"
+
+def test_get_screen_layout_document_with_etag():
+    from cinephoria_backend.layout_cache import layout_cache
+    layout_cache.invalidate(12)
+    # Spalten wie layout_cache.LAYOUT_QUERY
+    fake_rows = [
+        (1, 12, "A", 1, 1, "standard", 9.5, None, None, "Saal 12"),
+        (2, 12, "A", 2, 2, "premium", 12.0, "#ff0000", "star", "Saal 12"),
+        (3, 12, "B", 1, 1, "standard", 9.5, None, None, "Saal 12"),
+    ]
+    fake_cursor = mock.MagicMock()
+    fake_cursor.fetchall.return_value = fake_rows
+    fake_conn = mock.MagicMock()
+    fake_conn.__enter__.return_value = fake_conn
+    fake_conn.cursor.return_value.__enter__.return_value = fake_cursor
+
+    with mock.patch("cinephoria_backend.routes.screens.get_db_connection", return_value=fake_conn):
+        client = app.test_client()
+        response = client.get("/screens/12/layout")
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data["screen_name"] == "Saal 12"
+        # Sitztypen nur einmal, Sitze als [seat_id, row, number, typ_index]
+        assert len(data["seat_types"]) == 2
+        assert data["seats"] == [[1, "A", 1, 0], [2, "A", 2, 1], [3, "B", 1, 0]]
+
+        etag = response.headers["ETag"]
+        response = client.get("/screens/12/layout", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+def test_get_screen_layout_document_unknown_screen():
+    fake_cursor = mock.MagicMock()
+    fake_cursor.fetchall.return_value = []
+    fake_cursor.fetchone.return_value = None
+    fake_conn = mock.MagicMock()
+    fake_conn.__enter__.return_value = fake_conn
+    fake_conn.cursor.return_value.__enter__.return_value = fake_cursor
+
+    with mock.patch("cinephoria_backend.routes.screens.get_db_connection", return_value=fake_conn):
+        response = app.test_client().get("/screens/99999/layout")
+        assert response.status_code == 404
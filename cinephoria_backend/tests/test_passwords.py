@@ -0,0 +1,62 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+import pytest
+
+from cinephoria_backend.passwords import PasswordHasher, PasswordHasherBusy, is_bcrypt_hash
+
+
+def test_process_pool_hashes_and_verifies():
+    hasher = PasswordHasher(workers=1, max_pending=2, rounds=4)
+    try:
+        stored = hasher.hash("geheim")
+        assert stored.startswith("$2b$04$") and is_bcrypt_hash(stored)
+        assert hasher.verify("geheim", stored) is True
+        assert hasher.verify("falsch", stored) is False
+        assert not hasher.needs_rehash(stored)
+    finally:
+        hasher.shutdown()
+
+
+def test_pgcrypto_hashes_and_long_passwords():
+    hasher = PasswordHasher(rounds=4, executor_factory=ThreadPoolExecutor)
+    # pgcrypto: $2a$ mit Kosten 6, Passwörter nach 72 Byte abgeschnitten
+    long_password = "ä" * 50
+    legacy = bcrypt.hashpw(long_password.encode()[:72], bcrypt.gensalt(6, prefix=b"2a")).decode()
+    assert hasher.verify(long_password, legacy) is True
+    assert hasher.needs_rehash(legacy)
+    assert hasher.needs_rehash("$1$abc$md5hashausalterzeit")
+    with pytest.raises(ValueError):
+        hasher.verify("geheim", "$1$abc$md5hashausalterzeit")
+    hasher.shutdown()
+
+
+def test_full_pool_rejects_immediately():
+    hasher = PasswordHasher(max_pending=1, rounds=4, executor_factory=ThreadPoolExecutor)
+    assert hasher._slots.acquire(blocking=False)
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("geheim")
+    hasher._slots.release()
+    assert is_bcrypt_hash(hasher.hash("geheim"))
+    hasher.shutdown()
+
+
+def test_dead_pool_process_is_replaced():
+    hasher = PasswordHasher(workers=1, max_pending=2, rounds=4)
+    try:
+        stored = hasher.hash("geheim")
+        executor = hasher._executor
+        # Pool-Prozess stirbt (wie bei einem OOM-Kill)
+        for process in list(executor._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join(5)
+        assert hasher.verify("geheim", stored) is True
+        assert hasher._executor is not executor
+        # Alle Plätze wieder frei
+        assert hasher._slots._value == 2
+    finally:
+        hasher.shutdown()
@@ -2,11 +2,19 @@ import pytest
 import importlib
 from unittest import mock
 import json
+from decimal import Decimal
 from cinephoria_backend.app import app
+from cinephoria_backend.bookings import SeatsAlreadyBooked
+from cinephoria_backend.pricing import PricedCart, PricedItem
 from cinephoria_backend.routes.paypal import get_paypal_access_token, capture_paypal_order
 
+def priced_cart(cart_items, holder=None, order_id=None, price="10.00"):
+    items = [PricedItem(i["seat_id"], i["showtime_id"], i.get("seat_type_discount_id"), Decimal(price), Decimal(price))
+             for i in cart_items]
+    return PricedCart(items, sum((item.price for item in items), Decimal("0.00")))
+
 # 🔹 Test für `get_paypal_access_token`
-@mock.patch("requests.post")
+@mock.patch("cinephoria_backend.http_client.http.post")
 def test_get_paypal_access_token(mock_post):
     mock_post.return_value.status_code = 200
     mock_post.return_value.json.return_value = {"access_token": "test_access_token"}
@@ -18,7 +26,7 @@ def test_get_paypal_access_token(mock_post):
 
 # 🔹 Test für `create_paypal_order`
 @mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="test_access_token")
-@mock.patch("requests.post")
+@mock.patch("cinephoria_backend.http_client.http.post")
 def test_create_paypal_order(mock_post, mock_get_token):
     mock_post.return_value.status_code = 201
     mock_post.return_value.json.return_value = {"id": "test_order_id"}
@@ -31,13 +39,30 @@ def test_create_paypal_order(mock_post, mock_get_token):
     mock_post.assert_called_once()
     mock_get_token.assert_called_once()  # Prüft, ob der Token-Mock aufgerufen wurde
 
+# 🔹 Mit cart_items bestimmt der Server den Betrag der Order
+@mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="test_access_token")
+@mock.patch("cinephoria_backend.http_client.http.post")
+def test_create_paypal_order_uses_server_prices(mock_post, mock_get_token):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.json.return_value = {"id": "test_order_id"}
+    cart_items = [{"seat_id": 1, "showtime_id": 2}, {"seat_id": 2, "showtime_id": 2}]
+
+    with mock.patch("cinephoria_backend.routes.paypal.price_checkout", return_value=priced_cart(cart_items)):
+        response = app.test_client().post("/paypal/create-order", json={"total_amount": "0.01", "cart_items": cart_items})
+
+    assert response.status_code == 200
+    assert response.get_json() == {"orderID": "test_order_id", "total_amount": "20.00"}
+    amount = mock_post.call_args[1]["json"]["purchase_units"][0]["amount"]
+    assert amount == {"currency_code": "EUR", "value": "20.00"}
+
 # 🔹 Test für `capture_paypal_order`
+@mock.patch("cinephoria_backend.routes.paypal.price_checkout", side_effect=priced_cart)
 @mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="test_access_token")
-@mock.patch("requests.post")
+@mock.patch("cinephoria_backend.http_client.http.post")
 # Hier patchen wir get_db_connection an der Stelle, an der es in paypal.py genutzt wird:
 @mock.patch("cinephoria_backend.routes.paypal.get_db_connection")
 @mock.patch("cinephoria_backend.routes.auth.token_optional")
-def test_capture_paypal_order(mock_token_optional, mock_get_db_connection, mock_post, mock_get_token):
+def test_capture_paypal_order(mock_token_optional, mock_get_db_connection, mock_post, mock_get_token, mock_price):
     mock_post.return_value.status_code = 201
     mock_post.return_value.json.return_value = {"status": "COMPLETED"}
 
@@ -47,7 +72,8 @@ def test_capture_paypal_order(mock_token_optional, mock_get_db_connection, mock_
 
     # Erstelle einen MagicMock für den Cursor
     mock_cursor = mock.MagicMock()
-    mock_cursor.fetchone.return_value = [123]
+    # booking_id, Anzahl Sitze, festgeschriebene Claims (showtime_id, seat_id)
+    mock_cursor.fetchone.return_value = (123, 1, [[2, 1]])
     mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
     mock_get_db_connection.return_value = mock_conn  # Setzt den Mock für die DB-Verbindung
@@ -70,3 +96,200 @@ def test_capture_paypal_order(mock_token_optional, mock_get_db_connection, mock_
     mock_post.assert_called_once()
     mock_get_db_connection.assert_called_once()
     mock_get_token.assert_called_once()
+
+
+# 🔹 Gruppenbuchung: ein einziges Statement für Buchung, Sitze und Punkte
+@mock.patch("cinephoria_backend.routes.paypal.price_checkout", side_effect=priced_cart)
+@mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="test_access_token")
+@mock.patch("cinephoria_backend.http_client.http.post")
+@mock.patch("cinephoria_backend.routes.paypal.get_db_connection")
+def test_capture_group_booking_single_round_trip(mock_get_db_connection, mock_post, mock_get_token, mock_price):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.json.return_value = {"status": "COMPLETED"}
+
+    mock_conn = mock.MagicMock()
+    mock_conn.__enter__.return_value = mock_conn
+    mock_cursor = mock.MagicMock()
+    mock_cursor.fetchone.return_value = (321, 15, [[2, i] for i in range(1, 16)])
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_get_db_connection.return_value = mock_conn
+
+    cart_items = [{"seat_id": i, "showtime_id": 2, "seat_type_discount_id": None} for i in range(1, 16)]
+    client = app.test_client()
+    response = client.post("/paypal/capture-order", json={
+        "orderID": "group_order",
+        "vorname": "Max",
+        "nachname": "Mustermann",
+        "email": "test@example.com",
+        "total_amount": "150.00",
+        "cart_items": cart_items
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()["booking_id"] == 321
+    assert mock_cursor.execute.call_count == 1
+    params = mock_cursor.execute.call_args[0][1]
+    assert params["seat_ids"] == list(range(1, 16))
+    assert params["showtime_ids"] == [2] * 15
+    assert params["order_id"] == "group_order"
+    # Preise und Summe vom Server, nicht die 150.00 des Clients
+    assert params["prices"] == [Decimal("10.00")] * 15
+    assert params["total_amount"] == Decimal("150.00")
+
+
+# 🔹 Zweite Buchung desselben Sitzes: seat_claims lässt nur einen Käufer zu
+@mock.patch("cinephoria_backend.routes.paypal.price_checkout", side_effect=priced_cart)
+@mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="test_access_token")
+@mock.patch("cinephoria_backend.http_client.http.post")
+@mock.patch("cinephoria_backend.routes.paypal.get_db_connection")
+def test_capture_rejects_already_booked_seat(mock_get_db_connection, mock_post, mock_get_token, mock_price):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.json.return_value = {"status": "COMPLETED"}
+
+    mock_conn = mock.MagicMock()
+    mock_conn.__enter__.return_value = mock_conn
+    mock_conn.__exit__.return_value = False
+    mock_cursor = mock.MagicMock()
+    # Nur Sitz 1 wurde übernommen, Sitz 2 gehört schon einer anderen Buchung
+    mock_cursor.fetchone.return_value = (322, 2, [[2, 1]])
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_get_db_connection.return_value = mock_conn
+
+    response = app.test_client().post("/paypal/capture-order", json={
+        "orderID": "late_order",
+        "vorname": "Max",
+        "nachname": "Mustermann",
+        "email": "test@example.com",
+        "total_amount": "20.00",
+        "cart_items": [{"seat_id": 1, "showtime_id": 2}, {"seat_id": 2, "showtime_id": 2}]
+    })
+
+    assert response.status_code == 409
+    assert response.get_json()["conflicts"] == [{"showtime_id": 2, "seat_id": 2}]
+    # Die Exception verlässt den with-Block: der Pool rollt zurück statt zu committen
+    exc_type = mock_conn.__exit__.call_args[0][0]
+    assert exc_type is not None and issubclass(exc_type, SeatsAlreadyBooked)
+
+
+# 🔹 Weicht der erfasste Betrag vom Serverpreis ab, wird nicht gebucht
+@mock.patch("cinephoria_backend.routes.paypal.price_checkout", side_effect=priced_cart)
+@mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="test_access_token")
+@mock.patch("cinephoria_backend.http_client.http.post")
+@mock.patch("cinephoria_backend.routes.paypal.persist_booking")
+def test_capture_rejects_amount_mismatch(mock_persist, mock_post, mock_get_token, mock_price):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.json.return_value = {
+        "status": "COMPLETED",
+        "purchase_units": [{"payments": {"captures": [{"amount": {"currency_code": "EUR", "value": "1.00"}}]}}]
+    }
+    response = app.test_client().post("/paypal/capture-order", json={
+        "orderID": "cheap_order",
+        "vorname": "Max",
+        "nachname": "Mustermann",
+        "email": "test@example.com",
+        "total_amount": "1.00",
+        "cart_items": [{"seat_id": 1, "showtime_id": 2}]
+    })
+    assert response.status_code == 409
+    mock_persist.assert_not_called()
+
+
+# 🔹 Unvollständige cart_items werden vor dem Capture abgelehnt
+@mock.patch("cinephoria_backend.http_client.http.post")
+def test_capture_rejects_incomplete_items_before_payment(mock_post):
+    client = app.test_client()
+    response = client.post("/paypal/capture-order", json={
+        "orderID": "order",
+        "vorname": "Max",
+        "nachname": "Mustermann",
+        "email": "test@example.com",
+        "total_amount": "10.00",
+        "cart_items": [{"seat_id": 1}]
+    })
+    assert response.status_code == 400
+    mock_post.assert_not_called()
+
+
+# 🔹 Derselbe Sitz zweimal im Warenkorb wird vor dem Capture abgelehnt
+@mock.patch("cinephoria_backend.http_client.http.post")
+def test_capture_rejects_duplicate_seats_before_payment(mock_post):
+    response = app.test_client().post("/paypal/capture-order", json={
+        "orderID": "order",
+        "vorname": "Max",
+        "nachname": "Mustermann",
+        "email": "test@example.com",
+        "total_amount": "20.00",
+        "cart_items": [{"seat_id": 1, "showtime_id": 2}, {"seat_id": 1, "showtime_id": 2}]
+    })
+    assert response.status_code == 400
+    mock_post.assert_not_called()
+
+
+# 🔹 Von jemand anderem reservierte Sitze: 409 vor dem Capture, die eigene Reservierung zählt nicht
+@mock.patch("cinephoria_backend.http_client.http.post")
+@mock.patch("cinephoria_backend.routes.paypal.price_cart", side_effect=lambda cursor, items: priced_cart(items))
+@mock.patch("cinephoria_backend.routes.paypal.get_db_connection")
+def test_capture_rejects_foreign_hold_before_payment(mock_get_db_connection, mock_price, mock_post):
+    mock_conn = mock.MagicMock()
+    mock_conn.__enter__.return_value = mock_conn
+    mock_cursor = mock.MagicMock()
+    mock_cursor.fetchall.return_value = [(2, 2)]
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_get_db_connection.return_value = mock_conn
+
+    response = app.test_client().post("/paypal/capture-order", json={
+        "orderID": "order",
+        "vorname": "Max",
+        "nachname": "Mustermann",
+        "email": "test@example.com",
+        "guest_id": "gast-1",
+        "cart_items": [{"seat_id": 1, "showtime_id": 2}, {"seat_id": 2, "showtime_id": 2}]
+    })
+
+    assert response.status_code == 409
+    assert response.get_json()["conflicts"] == [{"showtime_id": 2, "seat_id": 2}]
+    mock_post.assert_not_called()
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "reserved_until >= NOW()" in sql
+    assert (params["holder_type"], params["holder_id"], params["order_id"]) == ("guest", "gast-1", "order")
+
+
+# 🔹 Die Buchung übernimmt nur eigene oder abgelaufene Reservierungen
+def test_persist_booking_only_takes_over_own_or_expired_holds():
+    from cinephoria_backend.bookings import persist_booking
+    from cinephoria_backend.reservations import Holder
+
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = (5, 1, [[2, 1]])
+    cart = priced_cart([{"seat_id": 1, "showtime_id": 2}])
+    persist_booking(cursor, "order", 10, "Max", "Mustermann", "test@example.com", cart, Holder.user(10))
+
+    sql, params = cursor.execute.call_args[0]
+    assert "seat_claims.reserved_until < NOW()" in sql
+    assert (params["holder_type"], params["holder_id"]) == ("user", "10")
+
+
+# 🔹 Bezahlt, aber nicht buchbar: der Capture wird erstattet
+@mock.patch("cinephoria_backend.routes.paypal.price_checkout", side_effect=priced_cart)
+@mock.patch("cinephoria_backend.routes.paypal.get_paypal_access_token", return_value="test_access_token")
+@mock.patch("cinephoria_backend.routes.paypal.persist_booking", side_effect=SeatsAlreadyBooked([(2, 1)]))
+@mock.patch("cinephoria_backend.routes.paypal.get_db_connection")
+@mock.patch("cinephoria_backend.checkout.refund_capture")
+def test_capture_refunds_when_seat_is_gone(mock_refund, mock_get_db_connection, mock_persist, mock_get_token, mock_price):
+    with mock.patch("cinephoria_backend.http_client.http.post") as mock_post:
+        mock_post.return_value.status_code = 201
+        mock_post.return_value.json.return_value = {
+            "status": "COMPLETED",
+            "purchase_units": [{"payments": {"captures": [{"id": "CAP9", "amount": {"value": "10.00"}}]}}]
+        }
+        response = app.test_client().post("/paypal/capture-order", json={
+            "orderID": "late_order",
+            "vorname": "Max",
+            "nachname": "Mustermann",
+            "email": "test@example.com",
+            "cart_items": [{"seat_id": 1, "showtime_id": 2}]
+        })
+
+    assert response.status_code == 409
+    assert response.get_json()["refunded"] is True
+    mock_refund.assert_called_once_with("CAP9")
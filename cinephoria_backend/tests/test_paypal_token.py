@@ -0,0 +1,129 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cinephoria_backend.paypal_token import PayPalTokenError, PayPalTokenManager, request_access_token
+
+
+class FakePayPal:
+    """Lokaler OAuth-Endpunkt, der fortlaufende Tokens ausgibt."""
+
+    def __init__(self, expires_in=32400, delay=0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.status = 200
+        self.calls = 0
+        self.authorization = None
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                fake.calls += 1
+                fake.authorization = self.headers.get("Authorization")
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(fake.delay)
+                if fake.status == 200:
+                    body = {"access_token": f"token-{fake.calls}", "expires_in": fake.expires_in}
+                else:
+                    body = {"error": "invalid_client"}
+                data = json.dumps(body).encode()
+                self.send_response(fake.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def manager(self, **kwargs):
+        return PayPalTokenManager(lambda: request_access_token(self.url, "client", "secret"), **kwargs)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def paypal():
+    fake = FakePayPal()
+    yield fake
+    fake.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_is_cached(paypal):
+    manager = paypal.manager()
+    assert manager.get_token() == "token-1"
+    assert manager.get_token() == "token-1"
+    assert paypal.calls == 1
+    assert paypal.authorization.startswith("Basic ")
+    stats = manager.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["refreshes"] == 1
+
+
+def test_concurrent_checkouts_share_one_fetch(paypal):
+    paypal.delay = 0.2
+    manager = paypal.manager()
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(manager.get_token())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert paypal.calls == 1
+    assert tokens == ["token-1"] * 10
+
+
+def test_token_refreshed_in_background_before_expiry(paypal):
+    clock = FakeClock()
+    manager = paypal.manager(refresh_before=300, clock=clock)
+    paypal.expires_in = 1000
+    assert manager.get_token() == "token-1"
+
+    # 200 s vor Ablauf: alter Token wird noch ausgegeben, der neue kommt im Hintergrund
+    clock.now = 800
+    assert manager.get_token() == "token-1"
+    for _ in range(100):
+        if manager.stats()["background_refreshes"]:
+            break
+        time.sleep(0.01)
+    assert manager.get_token() == "token-2"
+    assert paypal.calls == 2
+
+
+def test_expired_token_is_refreshed_synchronously(paypal):
+    clock = FakeClock()
+    manager = paypal.manager(clock=clock)
+    paypal.expires_in = 1000
+    manager.get_token()
+    clock.now = 980  # weniger als min_lifetime übrig
+    assert manager.get_token() == "token-2"
+
+    manager.invalidate()
+    assert manager.get_token() == "token-3"
+
+
+def test_failed_fetch_raises_and_is_counted(paypal):
+    paypal.status = 401
+    manager = paypal.manager()
+    with pytest.raises(PayPalTokenError):
+        manager.get_token()
+    assert manager.stats()["errors"] == 1
@@ -0,0 +1,70 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+from cinephoria_backend import pricing
+from cinephoria_backend.pricing import PriceMatrixCache, PricingError
+
+SEAT_TYPES = [(1, Decimal("12.00")), (2, Decimal("18.50"))]
+SEAT_TYPE_DISCOUNTS = [
+    (10, 1, None, Decimal("20")),          # 20 % auf Standard
+    (11, 1, Decimal("3.00"), None),        # 3 € auf Standard
+    (12, 2, Decimal("25.00"), None),       # mehr als der Preis
+]
+
+
+def matrix_cursor(seats):
+    """Cursor, der Sitztypen, Rabatte und dann die Zuordnung seat_id -> seat_type_id liefert."""
+    cursor = mock.MagicMock()
+    cursor.fetchall.side_effect = [SEAT_TYPES, SEAT_TYPE_DISCOUNTS, seats]
+    return cursor
+
+
+@pytest.fixture(autouse=True)
+def fresh_matrix(monkeypatch):
+    monkeypatch.setattr(pricing, "price_matrix_cache", PriceMatrixCache())
+
+
+def test_cart_is_priced_in_one_pass():
+    cursor = matrix_cursor([(100, 1), (101, 1), (102, 2), (103, 2)])
+    cart = pricing.price_cart(cursor, [
+        {"seat_id": 100, "showtime_id": 5},
+        {"seat_id": 101, "showtime_id": 5, "seat_type_discount_id": 10},
+        {"seat_id": 102, "showtime_id": 5, "seat_type_discount_id": 12},
+        {"seat_id": 103, "showtime_id": 5},
+    ])
+    assert [item.price for item in cart.items] == [
+        Decimal("12.00"), Decimal("9.60"), Decimal("0.00"), Decimal("18.50")
+    ]
+    assert cart.total == Decimal("40.10")
+    # Matrix (2 Abfragen) + eine Abfrage für alle Sitze
+    assert cursor.execute.call_count == 3
+
+
+def test_matrix_is_cached_until_invalidated():
+    cursor = matrix_cursor([(100, 1)])
+    pricing.price_cart(cursor, [{"seat_id": 100, "seat_type_discount_id": 11}])
+
+    cursor.fetchall.side_effect = [[(100, 1)]]
+    assert pricing.price_seat(cursor, 100, 11).price == Decimal("9.00")
+    assert cursor.execute.call_count == 4
+
+    pricing.publish_pricing_change(cursor)
+    cursor.fetchall.side_effect = [[(1, Decimal("14.00"))], [], [(100, 1)]]
+    assert pricing.price_seat(cursor, 100).price == Decimal("14.00")
+
+
+def test_discount_of_other_seat_type_is_rejected():
+    cursor = matrix_cursor([(102, 2)])
+    with pytest.raises(PricingError):
+        pricing.price_cart(cursor, [{"seat_id": 102, "seat_type_discount_id": 10}])
+
+
+def test_unknown_seat_is_rejected():
+    cursor = matrix_cursor([])
+    with pytest.raises(PricingError):
+        pricing.price_cart(cursor, [{"seat_id": 999}])
@@ -0,0 +1,121 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from unittest import mock
+
+from cinephoria_backend.app import app
+from cinephoria_backend.rate_limit import (
+    Limit, MemoryBucketStore, PostgresBucketStore, RateLimiter, hashed_key
+)
+
+
+def test_memory_bucket_refills_continuously():
+    now = [0.0]
+    store = MemoryBucketStore(clock=lambda: now[0])
+    assert all(store.take("k", 3, 1.0).allowed for _ in range(3))
+    denied = store.take("k", 3, 1.0)
+    assert not denied.allowed and denied.retry_after == 1.0
+    now[0] = 1.5
+    assert store.take("k", 3, 1.0).allowed
+    assert not store.take("k", 3, 1.0).allowed
+
+
+def test_memory_store_is_bounded():
+    store = MemoryBucketStore(max_entries=2)
+    for key in ("a", "b", "c"):
+        store.take(key, 1, 0.1)
+    # a ist rausgeflogen und startet wieder mit vollem Bucket
+    assert store.take("a", 1, 0.1).allowed
+    assert not store.take("c", 1, 0.1).allowed
+
+
+def test_limiter_charges_all_buckets_and_fails_open():
+    store = MemoryBucketStore()
+    limiter = RateLimiter(store)
+    ip, email = Limit("ip", 2, 60), Limit("email", 1, 60)
+    assert limiter.check([(ip, "1.2.3.4"), (email, "x")]).allowed
+    assert not limiter.check([(ip, "1.2.3.4"), (email, "x")]).allowed
+    assert not limiter.check([(ip, "1.2.3.4"), (email, "y")]).allowed
+
+    broken = mock.Mock()
+    broken.take.side_effect = RuntimeError("DB weg")
+    assert RateLimiter(broken).check([(ip, "1.2.3.4")]).allowed
+
+
+def test_postgres_store_single_upsert():
+    cursor = mock.MagicMock()
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+    store = PostgresBucketStore(connection=lambda: conn, prune_every=2)
+
+    cursor.fetchone.return_value = (4.0,)
+    assert store.take("login-ip:1.2.3.4", 5, 0.5).allowed
+    assert cursor.execute.call_count == 1
+    sql, params = cursor.execute.call_args[0]
+    assert "ON CONFLICT (bucket_key) DO UPDATE" in sql
+    assert params == {"key": "login-ip:1.2.3.4", "capacity": 5, "rate": 0.5, "cost": 1}
+
+    # Kein Ergebnis: abgelehnt, Wartezeit aus dem aktuellen Stand; jeder zweite Aufruf räumt auf
+    cursor.reset_mock()
+    cursor.fetchone.side_effect = [None, (0.5,)]
+    decision = store.take("login-ip:1.2.3.4", 5, 0.5)
+    assert not decision.allowed and decision.retry_after == 1.0
+    assert "DELETE FROM rate_limit_buckets" in cursor.execute.call_args_list[0][0][0]
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_login_is_throttled_per_email_before_db(mock_get_db_connection):
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value.fetchone.return_value = None
+    mock_get_db_connection.return_value = conn
+    client = app.test_client()
+
+    payload = {"email": "Opfer@example.com", "password": "falsch"}
+    statuses = [client.post("/login", json=payload).status_code for _ in range(6)]
+    assert statuses == [401] * 5 + [429]
+    assert mock_get_db_connection.call_count == 5
+
+    # Groß-/Kleinschreibung umgeht das Limit nicht, eine andere E-Mail schon
+    response = client.post("/login", json={"email": "opfer@example.com ", "password": "x"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.post("/login", json={"email": "anders@example.com", "password": "x"}).status_code == 401
+
+
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_login_is_throttled_per_ip(mock_get_db_connection):
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value.fetchone.return_value = None
+    mock_get_db_connection.return_value = conn
+    client = app.test_client()
+
+    statuses = [
+        client.post("/login", json={"email": f"user{i}@example.com", "password": "x"}).status_code
+        for i in range(21)
+    ]
+    assert statuses[-1] == 429 and statuses.count(401) == 20
+    assert hashed_key("email", " A@B.de") == hashed_key("email", "a@b.de")
+
+
+@mock.patch("cinephoria_backend.routes.auth.TRUSTED_PROXIES", 1)
+@mock.patch("cinephoria_backend.routes.auth.get_db_connection")
+def test_login_ip_limit_uses_forwarded_client_address(mock_get_db_connection):
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value.fetchone.return_value = None
+    mock_get_db_connection.return_value = conn
+    client = app.test_client()
+
+    def login(i, forwarded_for):
+        return client.post("/login", json={"email": f"user{i}@example.com", "password": "x"},
+                           headers={"X-Forwarded-For": forwarded_for}).status_code
+
+    # Der Router hängt die echte Adresse hinten an; vorangestellte Einträge kann der Client fälschen
+    statuses = [login(i, f"10.9.9.{i}, 203.0.113.7") for i in range(21)]
+    assert statuses[-1] == 429 and statuses.count(401) == 20
+    # Andere Clients hinter demselben Router haben ihr eigenes Limit
+    assert login(99, "198.51.100.1") == 401
+
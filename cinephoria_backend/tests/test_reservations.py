@@ -0,0 +1,75 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+
+from cinephoria_backend import reservations
+from cinephoria_backend.reservations import Holder
+
+
+def test_hold_is_a_single_conditional_insert():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = (12,)
+
+    reserved_until = reservations.hold_seat(cursor, Holder.user(20), 5, 12, Decimal("9.50"), 3)
+
+    assert reserved_until is not None
+    assert cursor.execute.call_count == 1
+    sql, params = cursor.execute.call_args[0]
+    # Eindeutigkeit über den Constraint; abgelaufene Reservierungen werden übernommen
+    assert "ON CONFLICT (showtime_id, seat_id) DO UPDATE" in sql
+    assert "WHERE seat_claims.reserved_until < NOW()" in sql
+    assert params["holder_type"] == "user" and params["holder_id"] == "20"
+    assert params["reserved_until"] == reserved_until
+    assert (params["showtime_id"], params["seat_id"], params["seat_type_discount_id"]) == (5, 12, 3)
+
+
+def test_hold_returns_none_when_taken():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = None
+    assert reservations.hold_seat(cursor, Holder.guest("g1"), 5, 12, Decimal("9.50")) is None
+
+
+def test_release_does_not_touch_the_released_seat():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = (1,)
+
+    assert reservations.release_seat(cursor, Holder.guest("g1"), 5, 12) is True
+    sql, params = cursor.execute.call_args[0]
+    # Sonst würden DELETE und UPDATE im selben Statement dieselbe Zeile ändern
+    assert "(showtime_id, seat_id) <> (%(showtime_id)s, %(seat_id)s)" in sql
+    assert params["holder_type"] == "guest"
+
+
+def test_load_cart_uses_latest_reservation():
+    now = datetime.now(timezone.utc)
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = [
+        {"seat_id": 1, "price": Decimal("9.50"), "reserved_until": now,
+         "showtime_id": 5, "seat_type_discount_id": None},
+        {"seat_id": 2, "price": Decimal("9.50"), "reserved_until": now + timedelta(minutes=2),
+         "showtime_id": 5, "seat_type_discount_id": 4},
+    ]
+
+    cart = reservations.load_cart(cursor, Holder.user(20))
+
+    assert cart["valid_until"] == (now + timedelta(minutes=2)).isoformat()
+    assert [item["seat_id"] for item in cart["cart_items"]] == [1, 2]
+    assert cart["cart_items"][0]["price"] == 9.5
+
+
+def test_alternatives_one_query_for_all_conflicts():
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = [(5, 12, 13), (5, 12, 11), (5, 40, 41)]
+
+    alternatives = reservations.find_alternatives(cursor, [(5, 12), ("5", "40"), (5, 50)], exclude=[13, 14])
+
+    assert cursor.execute.call_count == 1
+    _, params = cursor.execute.call_args[0]
+    # Belegte Sitze und der Rest des Batches sind keine Alternativen
+    assert params["exclude"] == [12, 13, 14, 40, 50]
+    assert alternatives == {(5, 12): [13, 11], (5, 40): [41], (5, 50): []}
+    assert reservations.find_alternatives(cursor, []) == {}
+    assert cursor.execute.call_count == 1
@@ -0,0 +1,124 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import jwt
+
+from cinephoria_backend.app import app
+from cinephoria_backend.config import SECRET_KEY
+from cinephoria_backend.routes import showtimes
+from cinephoria_backend.layout_cache import layout_cache
+from cinephoria_backend.notifications import hub
+from cinephoria_backend.seat_events import SEAT_CHANNEL, RESYNC, Subscription, seat_event_broker
+
+
+def notify(showtime_id, state, seats, holder=None):
+    # In-Process-Zustellung, wie sie sonst der LISTEN-Thread übernimmt
+    hub.dispatch(SEAT_CHANNEL, json.dumps({
+        "showtime_id": showtime_id, "state": state, "holder": holder, "seats": seats
+    }))
+
+
+def test_broker_fans_out_to_showtime_subscribers_only():
+    a = seat_event_broker.subscribe(1, holder="g:abc")
+    b = seat_event_broker.subscribe(1, holder="u:5")
+    other = seat_event_broker.subscribe(2)
+    try:
+        notify(1, "held", [10, 11], holder="g:abc")
+        assert a.get(timeout=1) == {"event": "seats", "seats": [10, 11], "state": "held_by_self", "code": 3}
+        assert b.get(timeout=1) == {"event": "seats", "seats": [10, 11], "state": "held", "code": 2}
+        assert other.get(timeout=0.01) is None
+    finally:
+        for s in (a, b, other):
+            seat_event_broker.unsubscribe(s)
+    assert seat_event_broker.subscriber_count(1) == 0
+
+
+def test_reconnect_and_overflow_trigger_resync():
+    subscription = seat_event_broker.subscribe(3)
+    try:
+        hub.dispatch(SEAT_CHANNEL, None)
+        assert subscription.get(timeout=1) == RESYNC
+    finally:
+        seat_event_broker.unsubscribe(subscription)
+
+    slow = Subscription(4, None, maxsize=2)
+    for i in range(5):
+        slow.put({"event": "seats", "seats": [i], "state": "free", "code": 0})
+    assert slow.get(timeout=1) == RESYNC
+    assert slow.get(timeout=0.01) is None
+
+
+def test_stream_sends_snapshot_then_deltas():
+    layout_cache.invalidate(9)
+    conn = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [
+        [{"screen_id": 9, "seat_id": 2, "seat_state": "booked"}],
+        [(i, 9, "A", i, 1, "standard", 9.5, None, None, "Saal 9") for i in range(1, 4)],
+    ]
+    with mock.patch("cinephoria_backend.routes.showtimes.get_db_connection", return_value=conn), \
+            mock.patch("cinephoria_backend.routes.showtimes.STREAM_KEEPALIVE", 0.01):
+        client = app.test_client()
+        response = client.get("/showtimes/50/seats/stream?guest_id=abc", buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        chunks = iter(response.response)
+
+        snapshot = next(chunks)
+        assert snapshot.startswith(b"event: snapshot\n")
+        assert json.loads(snapshot.split(b"data: ")[1])["seat_count"] == 3
+        assert seat_event_broker.subscriber_count(50) == 1
+
+        assert next(chunks) == b": keep-alive\n\n"
+        notify(50, "held", [3], holder="g:abc")
+        delta = next(chunks)
+        assert delta.startswith(b"event: seats\n")
+        assert json.loads(delta.split(b"data: ")[1]) == {"seats": [3], "state": "held_by_self", "code": 3}
+        response.close()
+    assert seat_event_broker.subscriber_count(50) == 0
+    # Der Stream-Platz ist wieder frei
+    assert showtimes.stream_slots._value == showtimes.SEAT_STREAM_MAX
+
+
+def test_stream_is_capped_per_worker():
+    with mock.patch("cinephoria_backend.routes.showtimes.stream_slots", threading.BoundedSemaphore(1)) as slots, \
+            mock.patch("cinephoria_backend.routes.showtimes.get_db_connection") as get_db_connection:
+        assert slots.acquire(blocking=False)
+        response = app.test_client().get("/showtimes/50/seats/stream?guest_id=abc")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "30"
+        assert response.get_json()["poll_url"] == "/showtimes/50/availability"
+        get_db_connection.assert_not_called()
+
+        # Fehlgeschlagenes Öffnen gibt den Platz wieder frei
+        slots.release()
+        get_db_connection.side_effect = RuntimeError("DB weg")
+        assert app.test_client().get("/showtimes/50/seats/stream").status_code == 500
+        assert slots.acquire(blocking=False)
+    assert seat_event_broker.subscriber_count(50) == 0
+
+
+def test_stream_ticket_replaces_access_token_in_url():
+    access = jwt.encode({"user_id": 5, "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+                        SECRET_KEY, algorithm="HS256")
+    client = app.test_client()
+    assert client.post("/showtimes/50/seats/stream-ticket").status_code == 401
+    response = client.post("/showtimes/50/seats/stream-ticket", headers={"Authorization": f"Bearer {access}"})
+    assert response.status_code == 200
+    ticket = response.get_json()["ticket"]
+
+    with app.test_request_context(f"/showtimes/50/seats/stream?ticket={ticket}"):
+        assert showtimes.get_stream_viewer(50) == (5, None, None)
+    # Nur für diese Vorstellung, und der Access-Token selbst wird in der URL nicht akzeptiert
+    with app.test_request_context(f"/showtimes/51/seats/stream?ticket={ticket}"):
+        assert showtimes.get_stream_viewer(51)[2]
+    with app.test_request_context(f"/showtimes/50/seats/stream?ticket={access}"):
+        assert showtimes.get_stream_viewer(50)[2]
+    # Das Ticket taugt nicht als Access-Token
+    assert client.post("/validate-token", headers={"Authorization": f"Bearer {ticket}"}).status_code == 401
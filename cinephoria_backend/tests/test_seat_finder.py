@@ -0,0 +1,121 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+from cinephoria_backend import seat_finder
+from cinephoria_backend.layout_cache import ScreenLayout
+from cinephoria_backend.pricing import PriceMatrix
+from cinephoria_backend.reservations import Holder
+
+STANDARD, LOGE = 1, 2
+
+
+def make_layout(rows="ABCD", numbers=range(1, 9), types=None, skip=()):
+    # Saal mit Reihen A (Leinwand) bis D, seat_id = 100 * Reihe + Nummer
+    seats = []
+    for row_index, row in enumerate(rows, start=1):
+        for number in numbers:
+            if (row, number) in skip:
+                continue
+            seats.append({
+                "seat_id": row_index * 100 + number, "screen_id": 3, "row": row, "number": number,
+                "seat_type_id": (types or {}).get((row, number), STANDARD),
+            })
+    return ScreenLayout(3, 0, tuple(seats))
+
+
+def test_grid_is_built_once_per_layout():
+    layout = make_layout()
+    grid = seat_finder.seat_grid(layout)
+    assert seat_finder.seat_grid(layout) is grid
+    assert [cells[0].row for cells in grid.rows] == ["A", "B", "C", "D"]
+    assert grid.index[304] == (2, 3)
+
+
+def test_best_block_is_central_in_ideal_row():
+    grid = seat_finder.seat_grid(make_layout())
+    blocks = seat_finder.find_blocks(grid, seat_finder.occupancy_grid(grid, {}), 4)
+    # Zwei Drittel von vier Reihen: Reihe C, mittig 3-6
+    assert [cell.seat_id for cell in blocks[0]] == [303, 304, 305, 306]
+
+
+def test_blocks_skip_taken_seats_gaps_and_mixed_types():
+    layout = make_layout(skip={("C", 6)}, types={("B", 4): LOGE})
+    grid = seat_finder.seat_grid(layout)
+    occupancy = seat_finder.occupancy_grid(grid, {302: "booked", 999: "held"})
+    blocks = seat_finder.find_blocks(grid, occupancy, 3)
+
+    for block in blocks:
+        numbers = [cell.number for cell in block]
+        assert numbers == list(range(numbers[0], numbers[0] + 3))
+        assert len({cell.seat_type_id for cell in block}) == 1
+        assert 302 not in [cell.seat_id for cell in block]
+    # In Reihe C bleibt zwischen 302 und dem Gang bei 6 nur 303-305
+    assert [cell.seat_id for cell in blocks[0]] == [303, 304, 305]
+    loge = seat_finder.find_blocks(grid, occupancy, 1, seat_type_id=LOGE)
+    assert [[cell.seat_id for cell in block] for block in loge] == [[204]]
+
+
+def test_hold_tries_next_block_after_conflict():
+    grid_layout = make_layout()
+    matrix = PriceMatrix(0, {STANDARD: Decimal("10.00"), LOGE: Decimal("15.00")}, {})
+    cursor = mock.MagicMock()
+    reserved_until = datetime.now(timezone.utc)
+    # Erster Versuch: 304 wurde inzwischen reserviert; zweiter Versuch klappt
+    hold = mock.Mock(side_effect=[(reserved_until, [(5, 304)]), (reserved_until, [])])
+
+    with mock.patch("cinephoria_backend.seat_finder.load_seat_states", return_value=(3, {})), \
+         mock.patch("cinephoria_backend.seat_finder.get_screen_layout", return_value=grid_layout), \
+         mock.patch("cinephoria_backend.seat_finder.get_price_matrix", return_value=matrix), \
+         mock.patch("cinephoria_backend.seat_finder.hold_seats", hold):
+        best = seat_finder.hold_best_seats(cursor, Holder.guest("g1"), 5, 2)
+
+    cursor.connection.rollback.assert_called_once()
+    assert hold.call_count == 2
+    assert 304 not in [item.seat_id for item in best.items]
+    assert [item.seat_id for item in best.items] == [305, 306]
+    assert best.items[0].base_price == Decimal("10.00")
+    assert seat_finder.best_seats_to_dict(best)[0]["row"] == "C"
+
+
+def test_hold_without_free_block_and_invalid_count():
+    cursor = mock.MagicMock()
+    with mock.patch("cinephoria_backend.seat_finder.load_seat_states", return_value=None):
+        assert seat_finder.hold_best_seats(cursor, Holder.guest("g1"), 5, 2) is None
+    with pytest.raises(ValueError):
+        seat_finder.hold_best_seats(cursor, Holder.guest("g1"), 5, 0)
+
+    layout = make_layout(rows="A", numbers=range(1, 3))
+    with mock.patch("cinephoria_backend.seat_finder.load_seat_states", return_value=(3, {})), \
+         mock.patch("cinephoria_backend.seat_finder.get_screen_layout", return_value=layout), \
+         mock.patch("cinephoria_backend.seat_finder.get_price_matrix"):
+        best = seat_finder.hold_best_seats(cursor, Holder.guest("g1"), 5, 3)
+    assert best.items == [] and best.reserved_until is None
+
+
+def test_seat_type_id_from_json_string_is_converted():
+    layout = make_layout(types={("B", 4): LOGE})
+    matrix = PriceMatrix(0, {STANDARD: Decimal("10.00"), LOGE: Decimal("15.00")}, {})
+    hold = mock.Mock(return_value=(datetime.now(timezone.utc), []))
+    with mock.patch("cinephoria_backend.seat_finder.load_seat_states", return_value=(3, {})), \
+         mock.patch("cinephoria_backend.seat_finder.get_screen_layout", return_value=layout), \
+         mock.patch("cinephoria_backend.seat_finder.get_price_matrix", return_value=matrix), \
+         mock.patch("cinephoria_backend.seat_finder.hold_seats", hold):
+        best = seat_finder.hold_best_seats(mock.MagicMock(), Holder.guest("g1"), 5, 1, seat_type_id="2")
+    assert [item.seat_id for item in best.items] == [204]
+
+
+@pytest.mark.parametrize("seat_type_id", ["abc", "2.5", True, [2]])
+def test_invalid_seat_type_id_is_400(seat_type_id):
+    from cinephoria_backend.app import app
+    with mock.patch("cinephoria_backend.routes.guestcart.get_db_connection") as get_db_connection:
+        response = app.test_client().post("/guest/cart/best", json={
+            "guest_id": "g1", "showtime_id": 5, "count": 2, "seat_type_id": seat_type_id
+        })
+    assert response.status_code == 400
+    get_db_connection.assert_not_called()
@@ -11,6 +11,7 @@ import jwt
 
 from cinephoria_backend.app import app
 from cinephoria_backend.config import SECRET_KEY
+from cinephoria_backend.layout_cache import layout_cache
 
 # ------------------------------------------------------
 # 1) Admin-Token erzeugen (gültig für 1 Stunde)
@@ -159,7 +160,7 @@ def test_delete_seat_success():
     """
     Testet DELETE /seats/<seat_id>, wenn rowcount=1 => 200
     """
-    fake_cursor_obj = fake_db_cursor()
+    fake_cursor_obj = fake_db_cursor(one_row=(10,))  # RETURNING screen_id
     fake_cursor_obj.rowcount = 1
     fake_conn = setup_mock_conn(fake_cursor_obj)
 
@@ -242,10 +243,13 @@ def test_get_seats_success():
     Testet GET /seats?screen_id=..., erwartet seats-Liste.
     (Kein Admin-Token nötig, da GET /seats nicht @admin_required hat.)
     """
+    # Spalten wie layout_cache.LAYOUT_QUERY:
+    # seat_id, screen_id, row, number, seat_type_id, seat_type_name, price, color, icon, screen_name
     rows = [
-        (101, 10, "A", 5, "standard", 12.5),
-        (102, 10, "A", 6, "premium", 15.0),
+        (101, 10, "A", 5, 1, "standard", 12.5, None, None, "Saal 1"),
+        (102, 10, "A", 6, 2, "premium", 15.0, "#ff0000", None, "Saal 1"),
     ]
+    layout_cache.invalidate(10)
     fake_cursor_obj = fake_db_cursor(rows=rows)
     fake_conn = setup_mock_conn(fake_cursor_obj)
 
@@ -258,6 +262,35 @@ def test_get_seats_success():
         assert response.status_code == 200
         assert "seats" in data
         assert len(data["seats"]) == 2
+        assert data["seats"][1]["type"] == "premium"
+
+    # Zweiter Aufruf kommt aus dem Layout-Cache, ohne Datenbankzugriff
+    fake_cursor_obj.execute.reset_mock()
+    with mock.patch("cinephoria_backend.routes.seats.get_db_connection", return_value=fake_conn):
+        response = app.test_client().get("/seats?screen_id=10")
+        assert len(response.get_json()["seats"]) == 2
+        fake_cursor_obj.execute.assert_not_called()
+
+
+def test_layout_cache_invalidated_by_admin_write():
+    """
+    Testet, dass ein Admin-Schreibzugriff (DELETE /seats?screen_id=...) das Layout
+    verwirft und eine NOTIFY für die anderen Worker verschickt.
+    """
+    layout_cache.invalidate(11)
+    fake_cursor_obj = fake_db_cursor(rows=[(201, 11, "B", 1, 1, "standard", 10.0, None, None, "Saal 2")])
+    fake_conn = setup_mock_conn(fake_cursor_obj)
+
+    with mock.patch("cinephoria_backend.routes.seats.get_db_connection", return_value=fake_conn):
+        client = app.test_client()
+        client.get("/seats?screen_id=11")
+        client.delete("/seats?screen_id=11", headers={"Authorization": f"Bearer {admin_token}"})
+        notify_calls = [c for c in fake_cursor_obj.execute.call_args_list if "pg_notify" in c[0][0]]
+        assert notify_calls[0][0][1] == ("seat_layout_changed", "11")
+
+        fake_cursor_obj.fetchall.return_value = []
+        response = client.get("/seats?screen_id=11")
+        assert response.get_json()["seats"] == []
 
 
 def test_get_seats_missing_screen_id():
@@ -0,0 +1,73 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import hashlib
+from unittest import mock
+
+from cinephoria_backend import sessions
+from cinephoria_backend.sessions import RevocationList, rotate_refresh_token
+
+
+def fake_db_connection():
+    conn = mock.MagicMock()
+    cursor = mock.MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+    return conn, cursor
+
+
+def test_revocation_list_loads_once_and_follows_notifications():
+    conn, cursor = fake_db_connection()
+    cursor.fetchall.return_value = [(3,)]
+    revoked = RevocationList(connection=lambda: conn, access_seconds=900)
+
+    assert revoked.is_revoked(3)
+    assert not revoked.is_revoked(4)
+    assert cursor.execute.call_count == 1
+    assert cursor.execute.call_args[0][1] == (900,)
+
+    revoked.handle_notification("4")
+    assert revoked.is_revoked(4)
+    assert cursor.execute.call_count == 1
+
+    # Listener getrennt: beim nächsten Bedarf neu laden
+    revoked.handle_notification(None)
+    cursor.fetchall.return_value = [(3,), (4,), (5,)]
+    assert revoked.is_revoked(5)
+    assert cursor.execute.call_count == 2
+
+
+def test_revocation_list_fails_open_without_database():
+    def broken():
+        raise RuntimeError("keine Datenbank")
+
+    revoked = RevocationList(connection=broken)
+    assert not revoked.is_revoked(1)
+    # Nichts gemerkt: der nächste Request versucht es erneut
+    assert revoked._revoked is None
+
+
+def test_reused_refresh_token_revokes_the_session(fresh_revocation_list):
+    _, cursor = fake_db_connection()
+    # Rotation findet nichts, das Token ist aber der Vorgänger in Sitzung 9
+    cursor.fetchone.side_effect = [None, (9,)]
+    fresh_revocation_list._revoked = set()
+
+    with mock.patch.object(sessions.hub, "publish") as publish:
+        assert rotate_refresh_token(cursor, "kopiert", lifetime=3600, grace=10) is None
+
+    sql, params = cursor.execute.call_args[0]
+    assert "previous_hash" in sql
+    assert params == {"old_hash": hashlib.sha256(b"kopiert").digest(), "grace": 10}
+    publish.assert_called_once_with(cursor, sessions.SESSION_CHANNEL, "9")
+    assert fresh_revocation_list.is_revoked(9)
+
+
+def test_rotation_returns_fresh_refresh_token():
+    _, cursor = fake_db_connection()
+    cursor.fetchone.return_value = (9, 1, "Max", "Mustermann", "user")
+
+    session = rotate_refresh_token(cursor, "alt", lifetime=3600, grace=10)
+    assert session.session_id == 9 and session.user_id == 1
+    assert len(session.refresh_token) >= 43 and session.refresh_token != "alt"
+    assert cursor.execute.call_count == 1
@@ -9,6 +9,7 @@ import pytest
 import jwt
 from cinephoria_backend.app import app
 from cinephoria_backend.config import SECRET_KEY
+from cinephoria_backend.layout_cache import layout_cache
 
 # Erzeuge einen gültigen Admin-Token
 admin_payload = {
@@ -110,3 +111,90 @@ def test_update_showtime_success():
         data = response.get_json()
         assert response.status_code == 200, f"Statuscode: {response.status_code}"
         assert "Showtime aktualisiert" in data.get("message", "")
+
+
+# Test für GET /showtimes/<id>/seats (Sitzstatus in einer Abfrage, Layout aus dem Cache)
+def layout_row(seat_id, number):
+    # Spalten wie layout_cache.LAYOUT_QUERY
+    return (seat_id, 5, "A", number, 1, "standard", 9.5, None, None, "Saal 1")
+
+def test_get_seats_for_showtime_single_query():
+    layout_cache.invalidate(5)
+    state_rows = [
+        {"screen_id": 5, "seat_id": 2, "seat_state": "booked"},
+        {"screen_id": 5, "seat_id": 3, "seat_state": "held"},
+        {"screen_id": 5, "seat_id": 4, "seat_state": "held_by_self"},
+    ]
+    conn = fake_db_conn(return_values=[])
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [state_rows, [layout_row(i, i) for i in range(1, 5)], state_rows]
+    with mock.patch("cinephoria_backend.routes.showtimes.get_db_connection", return_value=conn) as get_conn:
+        client = app.test_client()
+        response = client.get("/showtimes/20/seats?guest_id=abc")
+        data = response.get_json()
+        assert response.status_code == 200
+        get_conn.assert_called_once()
+        params = cursor.execute.call_args_list[0][0][1]
+        assert params == {"showtime_id": 20, "user_id": None, "guest_id": "abc"}
+
+        status = {s["seat_id"]: (s["status"], s["reserved_by_self"]) for s in data["seats"]}
+        assert status == {
+            1: ("available", False),
+            2: ("unavailable", False),
+            3: ("unavailable", False),
+            4: ("available", True),
+        }
+        assert data["seats"][0]["color"] == "#678be0"
+        assert data["seats"][0]["screen_name"] == "Saal 1"
+
+        # Mit warmem Layout-Cache kostet der Sitzplan nur noch einen Round-Trip
+        cursor.execute.reset_mock()
+        response = client.get("/showtimes/20/seats?guest_id=abc")
+        assert len(response.get_json()["seats"]) == 4
+        cursor.execute.assert_called_once()
+
+def test_get_seats_for_showtime_not_found():
+    conn = fake_db_conn(return_values=[], fetchall_return=[])
+    with mock.patch("cinephoria_backend.routes.showtimes.get_db_connection", return_value=conn):
+        client = app.test_client()
+        response = client.get("/showtimes/99/seats")
+        assert response.status_code == 404
+
+def test_get_seats_for_showtime_screen_without_seats():
+    # Vorstellung existiert, Saal hat aber keine Sitze
+    layout_cache.invalidate(6)
+    conn = fake_db_conn(return_values=[(1,)])  # der Saal existiert
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [[{"screen_id": 6, "seat_id": None, "seat_state": None}], []]
+    with mock.patch("cinephoria_backend.routes.showtimes.get_db_connection", return_value=conn):
+        client = app.test_client()
+        response = client.get("/showtimes/20/seats")
+        assert response.status_code == 200
+        assert response.get_json() == {"seats": []}
+
+# Test für GET /showtimes/<id>/availability (kompakte Status-Bitmap)
+def test_get_availability_for_showtime():
+    from cinephoria_backend.seatmap import decode_availability
+    layout_cache.invalidate(7)
+    state_rows = [
+        {"screen_id": 7, "seat_id": 2, "seat_state": "booked"},
+        {"screen_id": 7, "seat_id": 5, "seat_state": "held"},
+        {"screen_id": 7, "seat_id": 6, "seat_state": "held_by_self"},
+    ]
+    layout = [(i, 7, "A", i, 1, "standard", 9.5, None, None, "Saal 7") for i in range(1, 7)]
+    conn = fake_db_conn(return_values=[])
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [state_rows, layout, state_rows]
+    with mock.patch("cinephoria_backend.routes.showtimes.get_db_connection", return_value=conn):
+        client = app.test_client()
+        response = client.get("/showtimes/30/availability?guest_id=abc")
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data["screen_id"] == 7
+        assert data["seat_count"] == 6
+        assert decode_availability(data["states"], 6) == [0, 1, 0, 0, 2, 3]
+
+        # Unveränderte Verfügbarkeit => 304
+        response = client.get("/showtimes/30/availability?guest_id=abc",
+                              headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304
@@ -0,0 +1,200 @@
+import os
+os.environ["SECRET_KEY"] = "testsecret"  # Muss vor allen Importen gesetzt werden!
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cinephoria_backend.tmdb import ResponseCache, TMDBClient
+
+
+class StubTMDB:
+    """Lokaler HTTP-Server, der TMDB spielt und die Anfragen pro Pfad zählt."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.delays = {}  # Pfad -> Verzögerung, überschreibt delay
+        self.status = 200
+        self.hits = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                time.sleep(stub.delays.get(self.path, stub.delay))
+                body = json.dumps({"path": self.path, "hit": stub.hits[self.path]}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubTMDB()
+    yield server
+    server.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fresh_entries_served_from_cache(stub):
+    client = TMDBClient({}, cache=ResponseCache())
+    first = client.get(f"{stub.url}/movie/1", ttl=60)
+    second = client.get(f"{stub.url}/movie/1", ttl=60)
+    assert first.status_code == 200 and not first.cached
+    assert second.cached and second.json() == first.json()
+    assert stub.hits == {"/movie/1": 1}
+
+
+def test_concurrent_misses_share_one_request(stub):
+    stub.delay = 0.2
+    client = TMDBClient({}, cache=ResponseCache())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get(f"{stub.url}/now_playing")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.hits == {"/now_playing": 1}
+    assert all(r.status_code == 200 and r.json()["hit"] == 1 for r in results)
+
+
+def test_stale_entry_served_while_revalidating(stub):
+    clock = FakeClock()
+    client = TMDBClient({}, cache=ResponseCache(), clock=clock)
+    url = f"{stub.url}/movie/2"
+    client.get(url, ttl=10, stale_ttl=100)
+
+    clock.now += 50
+    stale = client.get(url, ttl=10, stale_ttl=100)
+    assert stale.cached and stale.json()["hit"] == 1
+
+    # Hintergrund-Refresh abwarten
+    for _ in range(100):
+        if client.cache.get(url)[1]["hit"] == 2:
+            break
+        time.sleep(0.01)
+    assert client.get(url, ttl=10, stale_ttl=100).json()["hit"] == 2
+
+    # Nach Ablauf von stale_ttl wird synchron neu geladen
+    clock.now += 1000
+    assert client.get(url, ttl=10, stale_ttl=100).json()["hit"] == 3
+
+
+def test_errors_are_not_cached_and_stale_survives(stub):
+    clock = FakeClock()
+    client = TMDBClient({}, cache=ResponseCache(), clock=clock)
+    url = f"{stub.url}/movie/3"
+    client.get(url, ttl=10, stale_ttl=100)
+
+    stub.status = 500
+    assert client.get(f"{stub.url}/movie/4").status_code == 500
+    assert client.get(f"{stub.url}/movie/4").status_code == 500
+    assert stub.hits["/movie/4"] == 2
+
+    clock.now += 20
+    assert client.get(url, ttl=10, stale_ttl=100).json()["hit"] == 1
+
+
+def test_unreachable_upstream_returns_gateway_error():
+    client = TMDBClient({}, cache=ResponseCache(), timeout=0.5)
+    response = client.get("http://127.0.0.1:9/movie/1")
+    assert response.status_code == 502
+    assert client.stats()["errors"] == 1
+
+
+def test_disk_cache_survives_restart(stub, tmp_path):
+    url = f"{stub.url}/movie/5"
+    TMDBClient({}, cache=ResponseCache(directory=str(tmp_path))).get(url)
+
+    # Neuer Worker: leerer Speicher, aber gleiche Cache-Dateien
+    restarted = TMDBClient({}, cache=ResponseCache(directory=str(tmp_path)))
+    assert restarted.get(url).cached
+    assert stub.hits == {"/movie/5": 1}
+
+
+def test_get_many_runs_in_parallel_and_keeps_order(stub):
+    for page in range(1, 5):
+        stub.delays[f"/page/{page}"] = 0.3
+    client = TMDBClient({}, cache=ResponseCache())
+    urls = [f"{stub.url}/page/{page}" for page in range(1, 5)]
+
+    started = time.monotonic()
+    responses = client.get_many(urls, timeout=2)
+    assert time.monotonic() - started < 1.0  # nicht 4 x 0,3 s nacheinander
+    assert [r.json()["path"] for r in responses] == [f"/page/{page}" for page in range(1, 5)]
+
+
+def test_get_many_skips_slow_page(stub):
+    stub.delays["/page/2"] = 1.0
+    client = TMDBClient({}, cache=ResponseCache())
+    urls = [f"{stub.url}/page/{page}" for page in range(1, 4)]
+
+    started = time.monotonic()
+    responses = client.get_many(urls, timeout=0.3)
+    assert time.monotonic() - started < 0.8
+    assert [r.status_code for r in responses] == [200, 504, 200]
+
+
+def test_lru_evicts_oldest_entry():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 0, 1)
+    cache.put("b", 0, 2)
+    cache.get("a")
+    cache.put("c", 0, 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == (0, 1)
+    assert len(cache) == 2
+
+
+def test_disk_cache_drops_old_and_surplus_files(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    for i in range(4):
+        cache.put(f"url-{i}", 0, i)
+    now = time.time()
+    for i, age in enumerate([10, 20, 30, 3 * 24 * 60 * 60]):
+        os.utime(cache._path(f"url-{i}"), (now - age, now - age))
+    leftover = tmp_path / "abc.json.1.2.tmp"
+    leftover.write_text("{")
+    os.utime(leftover, (now - 2 * 60 * 60, now - 2 * 60 * 60))
+
+    # Neuer Worker räumt beim Start auf: url-3 zu alt, url-2 über max_files, .tmp verwaist
+    restarted = ResponseCache(directory=str(tmp_path), max_age=24 * 60 * 60, max_files=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        os.path.basename(cache._path(f"url-{i}")) for i in range(2))
+    assert restarted.get("url-0") == (0, 0)
+    assert restarted.get("url-2") is None
+
+
+def test_disk_cache_pruned_on_write_at_most_every_interval(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), max_files=1, prune_interval=3600)
+    cache.put("a", 0, 1)
+    cache.put("b", 0, 2)
+    assert len(list(tmp_path.iterdir())) == 2  # seit dem Start noch nicht wieder aufgeräumt
+
+    cache.prune_interval = 0
+    cache.put("c", 0, 3)
+    assert len(list(tmp_path.iterdir())) == 1
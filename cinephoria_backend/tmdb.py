@@ -0,0 +1,327 @@
+# cinephoria_backend/tmdb.py
+#
+# Client für die TMDB-API mit Antwort-Cache:
+#  - begrenzter LRU-Cache im Speicher mit TTL pro Aufruf
+#  - stale-while-revalidate: abgelaufene Einträge werden noch bis stale_ttl ausgeliefert,
+#    während im Hintergrund neu geladen wird (auch bei TMDB-Fehlern)
+#  - gleichzeitige identische Anfragen teilen sich einen Upstream-Request (single-flight)
+#  - optionaler Cache auf der Platte, damit ein neu gestarteter Worker nicht alles neu lädt;
+#    beim Start und danach höchstens alle prune_interval Sekunden (beim Schreiben) werden Dateien
+#    älter als max_age und, über max_files hinaus, die ältesten gelöscht
+#
+# Gecacht werden nur 200-Antworten. Die zurückgegebenen Daten sind zwischen Requests geteilt
+# und dürfen nicht verändert werden.
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from cinephoria_backend.http_client import http
+
+# Cache-Dauer der TMDB-Antworten in Sekunden: (frisch, danach noch ausliefern + neu laden)
+LIST_TTL = (10 * 60, 60 * 60)             # now_playing, upcoming
+DETAILS_TTL = (60 * 60, 24 * 60 * 60)     # Filmdetails
+EXTRAS_TTL = (6 * 60 * 60, 24 * 60 * 60)  # release_dates, videos
+
+# Übrig gebliebene .tmp-Dateien (Worker beim Schreiben abgestürzt) nach so vielen Sekunden löschen
+TMP_FILE_MAX_AGE = 60 * 60
+
+
+class TMDBResponse:
+    """Minimaler Ersatz für requests.Response: status_code und json()."""
+
+    __slots__ = ('status_code', 'data', 'cached')
+
+    def __init__(self, status_code, data=None, cached=False):
+        self.status_code = status_code
+        self.data = data
+        self.cached = cached
+
+    def json(self):
+        return self.data
+
+
+class ResponseCache:
+    """LRU-Cache url -> (fetched_at, data), optional mit einer JSON-Datei pro Eintrag auf der Platte."""
+
+    def __init__(self, max_entries=512, directory=None, max_age=None, max_files=None, prune_interval=600):
+        self.max_entries = max_entries
+        self.directory = directory or None
+        self.max_age = max_age
+        self.max_files = max_files
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._pruned_at = None
+        self._entries = OrderedDict()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self.prune()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._read_file(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, fetched_at, data):
+        entry = (fetched_at, data)
+        self._remember(key, entry)
+        if self.directory:
+            self._write_file(key, entry)
+            if self._pruned_at is None or time.monotonic() - self._pruned_at >= self.prune_interval:
+                self.prune()
+
+    def prune(self):
+        """
+        Löscht Cache-Dateien, die älter als max_age Sekunden sind, und über max_files hinaus die
+        ältesten (nach mtime). Gibt die Anzahl gelöschter Dateien zurück.
+        """
+        if not self.directory or not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._pruned_at = time.monotonic()
+            now = time.time()
+            files = []
+            try:
+                with os.scandir(self.directory) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(('.json', '.tmp')):
+                            try:
+                                files.append((entry.stat().st_mtime, entry.path))
+                            except OSError:
+                                pass
+            except OSError as e:
+                print(f"TMDB-Cache konnte nicht aufgeräumt werden: {e}")
+                return 0
+
+            files.sort(reverse=True)  # neueste zuerst
+            removed = kept = 0
+            for mtime, path in files:
+                if path.endswith('.tmp'):
+                    expired = now - mtime > TMP_FILE_MAX_AGE
+                else:
+                    expired = (self.max_age is not None and now - mtime > self.max_age) or \
+                              (self.max_files is not None and kept >= self.max_files)
+                if not expired:
+                    kept += not path.endswith('.tmp')
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            return removed
+        finally:
+            self._prune_lock.release()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _read_file(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored.get('key') != key:
+            return None
+        return stored['fetched_at'], stored['data']
+
+    def _write_file(self, key, entry):
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'fetched_at': entry[0], 'data': entry[1]}, f)
+            # Atomar ersetzen, damit andere Worker nie eine halbe Datei lesen
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"TMDB-Cache konnte nicht geschrieben werden: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class _Flight:
+    __slots__ = ('done', 'response')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+class TMDBClient:
+    def __init__(self, headers, cache=None, timeout=5, default_ttl=600, default_stale_ttl=3600,
+                 clock=time.time, max_parallel=8):
+        self.headers = headers
+        self.max_parallel = max_parallel
+        self.cache = cache if cache is not None else ResponseCache()
+        self.timeout = timeout
+        self.default_ttl = default_ttl
+        self.default_stale_ttl = default_stale_ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._inflight = {}  # url -> _Flight
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'errors': 0}
+        self._executor = None
+        self._executor_pid = None
+
+    def get(self, url, ttl=None, stale_ttl=None, timeout=None, cache=True):
+        """
+        Liefert die TMDB-Antwort für url als TMDBResponse.
+        ttl: so lange gilt ein Eintrag als frisch (Sekunden).
+        stale_ttl: so lange danach wird er noch ausgeliefert und im Hintergrund erneuert.
+        cache=False: immer direkt bei TMDB fragen und nichts speichern (z. B. für movie_sync).
+        """
+        if not cache:
+            return self._request(url, timeout, store=False)
+        ttl = self.default_ttl if ttl is None else ttl
+        stale_ttl = self.default_stale_ttl if stale_ttl is None else stale_ttl
+
+        entry = self.cache.get(url)
+        if entry is not None:
+            age = self.clock() - entry[0]
+            if age < ttl:
+                self._count('hits')
+                return TMDBResponse(200, entry[1], cached=True)
+            if age < ttl + stale_ttl:
+                self._count('stale_hits')
+                self._refresh_in_background(url, timeout)
+                return TMDBResponse(200, entry[1], cached=True)
+
+        self._count('misses')
+        return self._fetch(url, timeout)
+
+    def get_many(self, urls, ttl=None, stale_ttl=None, timeout=None, cache=True):
+        """
+        Wie get(), aber für mehrere URLs parallel. Ergebnisse in der Reihenfolge von urls.
+        Was nach timeout Sekunden noch nicht da ist, wird als 504 gemeldet; der Request läuft
+        im Hintergrund weiter und füllt den Cache für den nächsten Aufruf.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        executor = self._get_executor()
+        futures = [executor.submit(self.get, url, ttl, stale_ttl, timeout, cache) for url in urls]
+        deadline = time.monotonic() + timeout
+        results = []
+        for url, future in zip(urls, futures):
+            try:
+                results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+            except concurrent.futures.TimeoutError:
+                print(f"TMDB-Timeout nach {timeout}s für {url}")
+                results.append(TMDBResponse(504, None))
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['inflight'] = len(self._inflight)
+        stats['entries'] = len(self.cache)
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _get_executor(self):
+        # Threads überleben keinen fork: pro Prozess einen eigenen Pool anlegen
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_parallel, thread_name_prefix='tmdb')
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _refresh_in_background(self, url, timeout):
+        with self._lock:
+            if url in self._inflight:
+                return
+        threading.Thread(target=self._fetch, args=(url, timeout),
+                         name='tmdb-refresh', daemon=True).start()
+
+    def _fetch(self, url, timeout):
+        # Single-flight: nur der erste Aufrufer fragt TMDB, alle anderen warten auf sein Ergebnis
+        with self._lock:
+            flight = self._inflight.get(url)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[url] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            return flight.response
+
+        try:
+            flight.response = self._request(url, timeout)
+        finally:
+            with self._lock:
+                del self._inflight[url]
+            flight.done.set()
+        return flight.response
+
+    def _request(self, url, timeout, store=True):
+        try:
+            response = http.get(url, headers=self.headers,
+                                timeout=self.timeout if timeout is None else timeout)
+            if response.status_code != 200:
+                print(f"TMDB-Fehler {response.status_code} für {url}")
+                self._count('errors')
+                return TMDBResponse(response.status_code, None)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"TMDB nicht erreichbar ({url}): {e}")
+            self._count('errors')
+            return TMDBResponse(504 if isinstance(e, requests.Timeout) else 502, None)
+
+        if store:
+            self.cache.put(url, self.clock(), data)
+        return TMDBResponse(200, data)
+
+
+def _create_client():
+    from cinephoria_backend import config
+    cache = ResponseCache(max_entries=config.TMDB_CACHE_SIZE, directory=config.TMDB_CACHE_DIR,
+                          max_age=config.TMDB_CACHE_MAX_AGE, max_files=config.TMDB_CACHE_MAX_FILES)
+    return TMDBClient(config.HEADERS, cache=cache, timeout=config.TMDB_TIMEOUT,
+                      max_parallel=config.TMDB_MAX_PARALLEL)
+
+
+tmdb_client = _create_client()